@@ -0,0 +1,67 @@
+"""
+AugmentedNet input encoding with transposition augmentation : per-frame encoding of each
+transposition against the vectorized encoders of
+:mod:`musiclang.analyze.augmented_net.input_representations`.
+
+Usage : ``python benchmarks/bench_augmented_net_inputs.py``
+"""
+import re
+import time
+
+import music21
+import numpy as np
+
+from musiclang.analyze.augmented_net import score_parser
+from musiclang.analyze.augmented_net.cache import TransposePitch, m21Pitch
+from musiclang.analyze.augmented_net.feature_representation import NOTENAMES, SPELLINGS
+from musiclang.analyze.augmented_net.input_representations import available_representations
+
+INTERVALS = ['P1', 'm2', 'M2', 'm3', 'M3', 'P4', 'A4', 'd5', 'P5', 'm6', 'M6', 'm7', 'M7', '-m2', '-M2', '-m3']
+
+
+def frame_bass_chromagram38(df, transposition):
+    array = np.zeros((len(df.index), 38), dtype='i8')
+    for frame, notes in enumerate(df.s_notes):
+        bass = m21Pitch(TransposePitch(notes[0], transposition))
+        array[frame, NOTENAMES.index(bass.step)] = 1
+        array[frame, 7 + bass.pitchClass] = 1
+        for note in notes:
+            pitch = m21Pitch(TransposePitch(note, transposition))
+            array[frame, 19 + NOTENAMES.index(pitch.step)] = 1
+            array[frame, 26 + pitch.pitchClass] = 1
+    return array
+
+
+def frame_bass_chromagram70(df, transposition):
+    array = np.zeros((len(df.index), 70), dtype='i8')
+    for frame, notes in enumerate(df.s_notes):
+        for offset, frame_notes in [(0, notes[:1]), (35, notes)]:
+            for note in frame_notes:
+                transposed = TransposePitch(re.sub(r"\d", "", note), transposition)
+                if transposed in SPELLINGS:
+                    array[frame, offset + SPELLINGS.index(transposed)] = 1
+    return array
+
+
+def timeit(f, *args, **kwargs):
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    dfs = [score_parser.parseScore(str(f)) for f in sorted(music21.corpus.getComposer('bach'))[:10]]
+    print(f'{len(dfs)} scores, {sum(len(df.index) for df in dfs)} frames, {len(INTERVALS)} transpositions')
+    print(f"{'representation':>18} {'per frame (s)':>14} {'vectorized (s)':>15}")
+    for name, frame_encoding in [('BassChromagram38', frame_bass_chromagram38),
+                                 ('BassChromagram70', frame_bass_chromagram70)]:
+        frame_time, frame_arrays = timeit(
+            lambda: [np.stack([frame_encoding(df, interval) for interval in INTERVALS]) for df in dfs])
+        vectorized_time, arrays = timeit(
+            lambda: [available_representations[name].encode(df, INTERVALS) for df in dfs])
+        assert all(np.array_equal(a, b) for a, b in zip(frame_arrays, arrays))
+        print(f'{name:>18} {frame_time:>14.3f} {vectorized_time:>15.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Binary score format of :mod:`musiclang.write.binary_score` against pickle : file size, write time, time to load
+the whole score, and time to read a single chord or a time range from a memory-mapped file (pickle has to
+load the whole file).
+
+Usage : ``python benchmarks/bench_binary_score.py``
+"""
+import gc
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from musiclang import Score, ScoreBuilder
+from musiclang.library import *
+from musiclang.write.binary_score import BinaryScore
+
+DEGREES = [I, II, III, IV, V, VI, VII]
+TONALITIES = [I.M, II.b.m, V.M, VI.m]
+NOTES = [s0, s1, s2, s3, s4, s5, s6, c0, c1, c2, b0, b1, su1, sd2, h1, h3, r, l]
+DURATIONS = ['e', 'q', 'h']
+AMPS = ['p', 'mf', 'f']
+
+
+def random_score(nb_chords, nb_voices, rng):
+    builder = ScoreBuilder()
+    for _ in range(nb_chords):
+        chord = DEGREES[int(rng.integers(0, 7))] % TONALITIES[int(rng.integers(0, len(TONALITIES)))]
+        voices = {}
+        for idx in range(nb_voices):
+            melody = None
+            for _ in range(4):
+                note = getattr(NOTES[int(rng.integers(0, len(NOTES)))], DURATIONS[int(rng.integers(0, 3))])
+                melody += getattr(note.o(int(rng.integers(-1, 2))), AMPS[int(rng.integers(0, 3))])
+            voices[f'piano__{idx}'] = melody
+        builder += chord(**voices)
+    return builder.freeze()
+
+
+def timeit(f, *args, **kwargs):
+    gc.collect()
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'chords':>7} {'format':>7} {'size (MB)':>10} {'write (s)':>10} {'load (s)':>9} {'one chord (ms)':>15} "
+          f"{'8 quarters (ms)':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        for nb_chords in [1000, 10000]:
+            score = random_score(nb_chords, 8, rng)
+            pickle_path = os.path.join(directory, 'score.pkl')
+            binary_path = os.path.join(directory, 'score.mlb')
+
+            write_time, _ = timeit(score.to_pickle, pickle_path)
+            load_time, loaded = timeit(Score.from_pickle, pickle_path)
+            print(f'{nb_chords:>7} {"pickle":>7} {os.path.getsize(pickle_path) / 1e6:>10.2f} {write_time:>10.3f} '
+                  f'{load_time:>9.3f} {1000 * load_time:>15.1f} {1000 * load_time:>16.1f}')
+
+            write_time, _ = timeit(score.to_binary, binary_path)
+            load_time, result = timeit(Score.from_binary, binary_path)
+            assert result == loaded
+            middle = nb_chords // 2
+            chord_time, chord = timeit(lambda: BinaryScore.open(binary_path)[middle])
+            assert chord == score.chords[middle]
+            start = float(score.duration) / 2
+            range_time, _ = timeit(lambda: BinaryScore.open(binary_path).chords_between(start, start + 8))
+            print(f'{nb_chords:>7} {"binary":>7} {os.path.getsize(binary_path) / 1e6:>10.2f} {write_time:>10.3f} '
+                  f'{load_time:>9.3f} {1000 * chord_time:>15.1f} {1000 * range_time:>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
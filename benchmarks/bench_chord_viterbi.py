@@ -0,0 +1,61 @@
+"""
+Key path decoding of :func:`musiclang.analyze.chord_inference.optimal_chord_inference` : batched numpy Viterbi
+against the per-candidate python loop it replaces, on one long piece and on a batch of files.
+
+Usage : ``python benchmarks/bench_chord_viterbi.py``
+"""
+import time
+
+import numpy as np
+
+from musiclang.analyze.chord_inference import (dynamic_programming_for_chord_inference,
+                                               batch_dynamic_programming_for_chord_inference)
+
+
+def loop_dynamic_programming(lists):
+    n = len(lists)
+    m = max(len(lst) for lst in lists)
+    dp = [[float('inf')] * m for _ in range(n)]
+    indices = [[0] * m for _ in range(n)]
+    for i in range(len(lists[0])):
+        dp[0][i] = 0
+    for i in range(1, n):
+        for j in range(len(lists[i])):
+            for k in range(len(lists[i - 1])):
+                cost = 1 if lists[i][j] != lists[i - 1][k] else 0
+                if dp[i][j] > dp[i - 1][k] + cost:
+                    dp[i][j] = dp[i - 1][k] + cost
+                    indices[i][j] = k
+    res = [0] * n
+    res[-1] = min((cost, index) for index, cost in enumerate(dp[-1]))[1]
+    for i in range(n - 2, -1, -1):
+        res[i] = indices[i + 1][res[i + 1]]
+    return res
+
+
+def random_candidates(nb_bars, max_candidates, rng):
+    return [rng.integers(0, 12, rng.integers(1, max_candidates + 1)).tolist() for _ in range(nb_bars)]
+
+
+def timeit(f, *args, **kwargs):
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'files':>6} {'bars':>6} {'candidates':>11} {'loop (s)':>9} {'viterbi (s)':>12}")
+    for nb_files, nb_bars, max_candidates in [(1, 10000, 8), (1, 10000, 24), (2000, 200, 8), (2000, 200, 24)]:
+        batch = [random_candidates(nb_bars, max_candidates, rng) for _ in range(nb_files)]
+        loop_time, loop = timeit(lambda: [loop_dynamic_programming(sequence) for sequence in batch])
+        if nb_files == 1:
+            viterbi_time, viterbi = timeit(lambda: [dynamic_programming_for_chord_inference(batch[0])])
+        else:
+            viterbi_time, viterbi = timeit(batch_dynamic_programming_for_chord_inference, batch)
+        assert loop == viterbi
+        print(f'{nb_files:>6} {nb_bars:>6} {max_candidates:>11} {loop_time:>9.3f} {viterbi_time:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
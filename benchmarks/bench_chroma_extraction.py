@@ -0,0 +1,74 @@
+"""
+Bar chroma and bass note extraction of :func:`musiclang.analyze.chord_inference.fast_chord_inference` :
+searchsorted implementation against the dense notes x bars matrix and the per-bar filtering it replaces.
+
+Usage : ``python benchmarks/bench_chroma_extraction.py``
+"""
+import time
+
+import numpy as np
+
+from musiclang.analyze.chord_inference import get_chroma_vectors, get_bass_note_bar
+
+
+def dense_chroma_vectors(notes, bars):
+    notes = notes[notes[:, 5] != 9]
+    times_array = np.asarray([notes[:, 0], notes[:, 0] + notes[:, 2]])
+    pitches_class_matrix = np.asarray(
+        [[1.0 * ((i % 12) == pitch_class) for i in range(12)] for pitch_class in notes[:, 1] % 12])
+    starts = np.asarray([bar[0] for bar in bars])
+    ends = np.asarray([bar[1] for bar in bars])
+    intersections = np.maximum(0, np.minimum(times_array[1, :, None], ends[None, :])
+                               - np.maximum(times_array[0, :, None], starts[None, :])).T
+    bar_chroma_vectors = intersections.dot(pitches_class_matrix)
+    normalizer = bar_chroma_vectors.sum(axis=1)[:, None]
+    normalizer[normalizer == 0] = 1
+    return bar_chroma_vectors / normalizer
+
+
+def loop_bass_note_bar(notes, bars):
+    notes = notes[notes[:, 5] != 9]
+    start_times, end_times = notes[:, 0], notes[:, 0] + notes[:, 2]
+    bass_notes = []
+    for start, end in bars:
+        bar_notes = notes[((start_times >= start) & (start_times < end)) | ((end_times > start) & (end_times < end))]
+        bass_notes.append(None if len(bar_notes) == 0 else np.min(bar_notes[:, 1]) % 12)
+    return bass_notes
+
+
+def random_piece(nb_notes, nb_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    notes = np.zeros((nb_notes, 6))
+    notes[:, 0] = np.round(rng.uniform(0, 4 * nb_bars, nb_notes) * 4) / 4
+    notes[:, 1] = rng.integers(30, 90, nb_notes)
+    notes[:, 2] = np.round(rng.exponential(1.0, nb_notes) * 4) / 4 + 0.25
+    notes[:, 5] = rng.choice([0, 1, 9], nb_notes, p=[0.5, 0.4, 0.1])
+    bars = [(4.0 * i, 4.0 * (i + 1)) for i in range(nb_bars)]
+    return notes, bars
+
+
+def timeit(f, *args):
+    start = time.perf_counter()
+    result = f(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    print(f"{'notes':>8} {'bars':>6} {'dense chroma (s)':>17} {'chroma (s)':>11} {'loop bass (s)':>14} {'bass (s)':>9}")
+    for nb_notes, nb_bars in [(5000, 250), (20000, 1000), (100000, 5000)]:
+        notes, bars = random_piece(nb_notes, nb_bars)
+        chroma_time, chroma = timeit(get_chroma_vectors, notes, bars)
+        bass_time, bass = timeit(get_bass_note_bar, notes, bars)
+        if nb_notes * nb_bars <= 2 * 10 ** 7:
+            dense_time, dense = timeit(dense_chroma_vectors, notes, bars)
+            loop_time, loop = timeit(loop_bass_note_bar, notes, bars)
+            assert np.allclose(dense, chroma) and loop == bass
+            dense_time, loop_time = f'{dense_time:.3f}', f'{loop_time:.3f}'
+        else:
+            # The dense intersection matrix would take nb_notes x nb_bars x 8 bytes (4 GB here)
+            dense_time, loop_time = 'skipped', 'skipped'
+        print(f'{nb_notes:>8} {nb_bars:>6} {dense_time:>17} {chroma_time:>11.3f} {loop_time:>14} {bass_time:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
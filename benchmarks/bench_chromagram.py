@@ -0,0 +1,85 @@
+"""
+Chromagram of :func:`musiclang.analyze.chroma.musiclang_to_chromagram` : the cross join of every time step with
+every note of the score sequence it replaces against the sweep line over the sorted note starts and ends,
+then :func:`musiclang.analyze.chroma.iter_chromagram` by windows on a long finely quantized piece.
+
+Usage : ``python benchmarks/bench_chromagram.py``
+"""
+import gc
+import time
+from fractions import Fraction as frac
+
+import numpy as np
+import pandas as pd
+
+from musiclang import ScoreBuilder
+from musiclang.analyze.chroma import iter_chromagram, musiclang_to_chromagram
+from musiclang.library import *
+
+DEGREES = [I, II, IV, V, VI]
+NOTES = [s0, s1, s2, s3, s4, s5, s6, c0, c1, c2, r]
+DURATIONS = [frac(1, 4), frac(1, 2), frac(1, 3), frac(1), frac(2)]
+
+
+def random_score(nb_chords, nb_voices, rng):
+    builder = ScoreBuilder()
+    for _ in range(nb_chords):
+        parts = {}
+        for voice in range(nb_voices):
+            melody, time = None, 0
+            while time < 4:
+                duration = min(DURATIONS[int(rng.integers(len(DURATIONS)))], 4 - time)
+                melody += NOTES[int(rng.integers(len(NOTES)))].o(int(rng.integers(-1, 2))).set_duration(duration)
+                time += duration
+            parts[f'piano__{voice}'] = melody
+        builder += (DEGREES[int(rng.integers(len(DEGREES)))] % I.M)(**parts)
+    return builder.freeze()
+
+
+def cross_join_chromagram(score, quantization=None):
+    # Previous implementation : every time step is joined with every note of the sequence
+    seq = score.to_sequence()
+    seq = seq[~seq['instrument'].str.startswith('drums')]
+    seq = seq[seq['pitch'].notnull()]
+    seq['pitch_class'] = seq['pitch'] % 12
+    if quantization is None:
+        start_times = seq['start'].unique()
+    else:
+        start_times = np.arange(0, seq['end'].max(), quantization)
+    times_df = pd.DataFrame(start_times, columns=['time']).merge(seq, how='cross')
+    times_df = times_df[(times_df['start'] <= times_df['time']) & (times_df['end'] > times_df['time'])]
+    times_df['pitch_class'] = pd.Categorical(times_df['pitch_class'], categories=list(range(12)))
+    chroma = (pd.crosstab(times_df['pitch_class'], times_df['time'], dropna=False).fillna(0).astype(int) > 0)
+    chroma = chroma.astype(int).sort_index(axis=1)
+    return chroma.to_numpy().T, chroma.columns.to_numpy().astype(float)
+
+
+def timeit(f, *args, **kwargs):
+    gc.collect()
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'chords':>7} {'quantization':>13} {'frames':>7} {'cross join (s)':>15} {'sweep line (s)':>15}")
+    for nb_chords in [25, 100]:
+        score = random_score(nb_chords, 4, rng)
+        for quantization in [None, frac(1, 12)]:
+            cross_time, (expected, expected_t) = timeit(cross_join_chromagram, score, quantization)
+            sweep_time, (Cs, t, _) = timeit(musiclang_to_chromagram, score, quantization)
+            assert np.array_equal(Cs, expected) and np.array_equal(t, expected_t)
+            print(f'{nb_chords:>7} {str(quantization):>13} {len(t):>7} {cross_time:>15.3f} {sweep_time:>15.3f}')
+
+    score = random_score(2000, 4, rng)
+    sweep_time, (Cs, t, _) = timeit(musiclang_to_chromagram, score, frac(1, 12))
+    start = time.perf_counter()
+    nb_windows = sum(1 for _ in iter_chromagram(score, 16, quantization=frac(1, 12), empty_frames=True))
+    window_time = time.perf_counter() - start
+    print(f'2000 chords, quantization 1/12 : {len(t)} frames in {sweep_time:.2f} s, '
+          f'{nb_windows} windows of 16 quarters in {window_time:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Counterpoint of :mod:`musiclang.transform.composing.counterpoint` on long chorales with several fixed voices :
+the greedy note per note search against the beam search for several beam widths, comparing the time and the
+total score reached (higher is better).
+
+Usage : ``python benchmarks/bench_counterpoint.py``
+"""
+import gc
+import time
+
+import numpy as np
+
+from musiclang.transform.composing.counterpoint import counterpoint_score, get_counterpoint, get_counterpoint_beam
+
+
+def random_chorale(nb_subjects, nb_notes, rng):
+    subjects = [[None if rng.random() < 0.1 else int(rng.integers(-7, 21)) for _ in range(nb_notes)]
+                for _ in range(nb_subjects)]
+    to_fix = [None if rng.random() < 0.1 else int(rng.integers(-7, 21)) for _ in range(nb_notes)]
+    return subjects, to_fix
+
+
+def timeit(f, *args, **kwargs):
+    gc.collect()
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'subjects':>9} {'notes':>6} {'method':>8} {'time (s)':>9} {'score':>8}")
+    for nb_subjects, nb_notes in [(3, 400), (6, 1000), (12, 2000)]:
+        subjects, to_fix = random_chorale(nb_subjects, nb_notes, rng)
+        np.random.seed(0)
+        greedy_time, greedy = timeit(get_counterpoint, subjects, to_fix)
+        print(f'{nb_subjects:>9} {nb_notes:>6} {"greedy":>8} {greedy_time:>9.3f} '
+              f'{counterpoint_score(subjects, to_fix, greedy):>8.1f}')
+        for beam_width in [1, 4, 16, 64]:
+            beam_time, beam = timeit(get_counterpoint_beam, subjects, to_fix, beam_width=beam_width)
+            print(f'{nb_subjects:>9} {nb_notes:>6} {"beam " + str(beam_width):>8} {beam_time:>9.3f} '
+                  f'{counterpoint_score(subjects, to_fix, beam):>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
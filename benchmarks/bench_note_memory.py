@@ -0,0 +1,32 @@
+"""
+Memory footprint of :class:`musiclang.Note` objects (heap and pickle bytes per note).
+
+Usage : ``python benchmarks/bench_note_memory.py [nb_notes]``
+"""
+import pickle
+import sys
+import tracemalloc
+
+from musiclang.library import *
+
+
+def build_notes(nb_notes):
+    """Build a list of notes with a realistic mix of durations, octaves and amplitudes"""
+    base = [s0, s2.e, s4.o(-1).s, h3.ed, r.q, l.e, s1.e3, s5.f.h]
+    return [base[i % len(base)].o(i % 3) for i in range(nb_notes)]
+
+
+def main(nb_notes=100000):
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    notes = build_notes(nb_notes)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pickle_size = len(pickle.dumps(notes, protocol=pickle.HIGHEST_PROTOCOL))
+    print(f'Notes                : {nb_notes}')
+    print(f'Heap bytes per note   : {(after - before) / nb_notes:.1f}')
+    print(f'Pickle bytes per note : {pickle_size / nb_notes:.1f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,91 @@
+"""
+Pattern sampling from a corpus of pickle files : the former ``PicklePatternSampler.sample`` that unpickled a whole
+random score for each sample against the :class:`musiclang.analyze.corpus_index.CorpusIndex` built once, that reads
+a single chord of a memory-mapped binary score. Throughput is given in samples per second, the pattern extraction
+is included in both.
+
+Usage : ``python benchmarks/bench_pattern_sampler.py``
+"""
+import gc
+import glob
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from musiclang import Score, ScoreBuilder
+from musiclang.library import *
+from musiclang.analyze.pattern_analyzer import PatternExtractor
+from musiclang.analyze.pattern_sampler import PicklePatternSampler
+
+DEGREES = [I, II, III, IV, V, VI, VII]
+TONALITIES = [I.M, II.b.m, V.M, VI.m]
+NOTES = [s0, s1, s2, s3, s4, s5, s6, c0, c1, c2, b0, b1, h1, h3]
+DURATIONS = ['q', 'h']
+AMPS = ['p', 'mf', 'f']
+
+
+def random_score(nb_chords, nb_voices, rng):
+    builder = ScoreBuilder()
+    for _ in range(nb_chords):
+        chord = DEGREES[int(rng.integers(0, 7))] % TONALITIES[int(rng.integers(0, len(TONALITIES)))]
+        voices = {}
+        for idx in range(int(rng.integers(1, nb_voices + 1))):
+            melody = None
+            for _ in range(2):
+                note = getattr(NOTES[int(rng.integers(0, len(NOTES)))], DURATIONS[int(rng.integers(0, 2))])
+                melody += getattr(note.o(int(rng.integers(-1, 2))), AMPS[int(rng.integers(0, 3))])
+            voices[f'piano__{idx}'] = melody
+        builder += chord(**voices)
+    return builder.freeze()
+
+
+def pickle_sample(files, bar_duration=4, min_nb_instruments=2):
+    # Previous implementation : unpickle a whole random score per sample
+    for _ in range(100):
+        score = Score.from_pickle(random.choice(files))
+        available_chords = [chord for chord in score.chords if (chord.duration == bar_duration)
+                            and len(chord.instruments) >= min_nb_instruments]
+        if len(available_chords) == 0:
+            continue
+        return PatternExtractor().extract(random.choice(available_chords))
+    raise Exception('No chord respecting criterias were found')
+
+
+def timeit(f, *args, **kwargs):
+    gc.collect()
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    nb_samples = 200
+    print(f"{'files':>6} {'chords/file':>12} {'index (s)':>10} {'pickle (samples/s)':>19} "
+          f"{'index (samples/s)':>18} {'prefetch (samples/s)':>21} {'speedup':>8}")
+    for nb_files, nb_chords in [(10, 500), (20, 2000)]:
+        with tempfile.TemporaryDirectory() as directory:
+            for idx in range(nb_files):
+                random_score(nb_chords, 4, rng).to_pickle(os.path.join(directory, 'corpus', f'{idx}.pkl'),
+                                                          create_dir=True)
+            files = glob.glob(os.path.join(directory, 'corpus', '*.pkl'))
+            pickle_time, _ = timeit(lambda: [pickle_sample(files) for _ in range(nb_samples)])
+            index_time, sampler = timeit(PicklePatternSampler, os.path.join(directory, 'corpus'),
+                                         index_directory=os.path.join(directory, 'index'), seed=0)
+            sample_time, _ = timeit(sampler.sample_batch, nb_samples)
+            prefetcher = PicklePatternSampler(os.path.join(directory, 'corpus'),
+                                              index_directory=os.path.join(directory, 'index'), prefetch=16, seed=0)
+            time.sleep(0.1)
+            prefetch_time, _ = timeit(prefetcher.sample_batch, nb_samples)
+            prefetcher.close()
+            sampler.close()
+        print(f'{nb_files:>6} {nb_chords:>12} {index_time:>10.2f} {nb_samples / pickle_time:>19.0f} '
+              f'{nb_samples / sample_time:>18.0f} {nb_samples / prefetch_time:>21.0f} '
+              f'{pickle_time / sample_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
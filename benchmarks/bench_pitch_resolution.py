@@ -0,0 +1,50 @@
+"""
+Pitch resolution with and without the memoized pitch table of
+:func:`musiclang.write.pitches.pitches_utils.note_to_pitch_result`.
+
+Usage : ``python benchmarks/bench_pitch_resolution.py``
+"""
+import time
+
+from musiclang.library import *
+from musiclang import Score
+from musiclang.write.pitches.pitches_utils import set_pitch_cache_size, clear_pitch_cache, pitch_cache_info
+
+
+def build_score(nb_chords):
+    progression = [I % I.M, VI % I.M, II['6'] % I.M, V['7'] % I.M, I % II.m, IV % II.m, V['65'] % II.m, I % II.m]
+    melody = s0 + su1 + su1 + sd2 + c2.o(1) + cu1 + h1 + s4.o(-1)
+    return Score.concat(progression[i % len(progression)](piano__0=melody, piano__1=b0.o(-1) + b1.o(-1) + b2.o(-1),
+                                                           piano__2=s0.o(-1) + s2.o(-1) + s4.o(-1))
+                        for i in range(nb_chords))
+
+
+def resolve(score):
+    for chord in score.chords:
+        for melody in chord.score.values():
+            last_pitch = 0
+            for note in melody.notes:
+                last_pitch = chord.to_pitch(note, last_pitch=last_pitch)
+
+
+def timeit(score):
+    start = time.perf_counter()
+    resolve(score)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'chords':>8} {'no cache (s)':>13} {'cache (s)':>10} {'hits':>8} {'misses':>8}")
+    for nb_chords in [250, 1000, 4000]:
+        score = build_score(nb_chords)
+        set_pitch_cache_size(0)
+        no_cache = timeit(score)
+        set_pitch_cache_size(65536)
+        clear_pitch_cache()
+        cache = timeit(score)
+        info = pitch_cache_info()
+        print(f'{nb_chords:>8} {no_cache:>13.3f} {cache:>10.3f} {info.hits:>8} {info.misses:>8}')
+
+
+if __name__ == '__main__':
+    main()
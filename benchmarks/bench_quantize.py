@@ -0,0 +1,64 @@
+"""
+MIDI import quantization of :func:`musiclang.analyze.load_score.load_score` : one music21 stream
+quantized per channel against the numpy :func:`musiclang.analyze.load_score.quantize`, on dense
+piano-like note arrays.
+
+Usage : ``python benchmarks/bench_quantize.py``
+"""
+import gc
+import time
+
+import numpy as np
+from music21 import note, stream
+
+from musiclang.analyze.load_score import quantize
+
+
+def music21_quantize(onsets, durations, quantization):
+    s = stream.Stream()
+    for onset, duration in zip(onsets, durations):
+        n = note.Note()
+        n.quarterLength = duration
+        s.repeatInsert(n, [onset])
+    s.quantize(quantization, processOffsets=True, processDurations=True, inPlace=True)
+    return [e.offset for e in s], [e.quarterLength for e in s]
+
+
+def random_notes(nb_notes, nb_channels, rng, ticks_per_beat=480):
+    onsets = np.sort(rng.integers(0, nb_notes * ticks_per_beat // 8, nb_notes)) / ticks_per_beat
+    durations = rng.integers(1, 2 * ticks_per_beat, nb_notes) / ticks_per_beat
+    return onsets, durations, rng.integers(0, nb_channels, nb_notes)
+
+
+def timeit(f, *args, **kwargs):
+    gc.collect()
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'notes':>7} {'channels':>9} {'music21 (s)':>12} {'numpy (s)':>10} {'speedup':>8}")
+    for nb_notes, nb_channels in [(1000, 1), (10000, 2), (50000, 4)]:
+        onsets, durations, channels = random_notes(nb_notes, nb_channels, rng)
+
+        def per_channel():
+            result_onsets, result_durations = [None] * nb_notes, [None] * nb_notes
+            for channel in np.unique(channels):
+                idx = np.flatnonzero(channels == channel)
+                channel_onsets, channel_durations = music21_quantize(onsets[idx].tolist(), durations[idx].tolist(),
+                                                                     (4, 3))
+                for i, onset, duration in zip(idx, channel_onsets, channel_durations):
+                    result_onsets[i], result_durations[i] = onset, duration
+            return result_onsets, result_durations
+
+        music21_time, expected = timeit(per_channel)
+        numpy_time, (quantized_onsets, quantized_durations) = timeit(quantize, onsets, durations, groups=channels)
+        assert (quantized_onsets.tolist(), quantized_durations.tolist()) == expected
+        print(f'{nb_notes:>7} {nb_channels:>9} {music21_time:>12.3f} {numpy_time:>10.3f} '
+              f'{music21_time / numpy_time:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
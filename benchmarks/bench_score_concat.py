@@ -0,0 +1,46 @@
+"""
+Scaling of score concatenation : ``score += chord`` against :class:`musiclang.ScoreBuilder` and
+:func:`musiclang.Score.concat`.
+
+Usage : ``python benchmarks/bench_score_concat.py``
+"""
+import time
+
+from musiclang.library import *
+from musiclang import Score, ScoreBuilder
+
+
+def build_chords(nb_chords):
+    return [(I % I.M)(piano__0=s0 + s2 + s4 + s0.o(1), piano__1=s0.h + s4.h) for _ in range(nb_chords)]
+
+
+def with_add(chords):
+    score = None
+    for chord in chords:
+        score += chord
+    return score
+
+
+def with_builder(chords):
+    builder = ScoreBuilder()
+    for chord in chords:
+        builder += chord
+    return builder.freeze()
+
+
+def timeit(f, chords):
+    start = time.perf_counter()
+    f(chords)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'chords':>8} {'+= (s)':>10} {'builder (s)':>12} {'concat (s)':>12}")
+    for nb_chords in [250, 500, 1000, 2000]:
+        chords = build_chords(nb_chords)
+        print(f'{nb_chords:>8} {timeit(with_add, chords):>10.3f} {timeit(with_builder, chords):>12.4f} '
+              f'{timeit(Score.concat, chords):>12.4f}')
+
+
+if __name__ == '__main__':
+    main()
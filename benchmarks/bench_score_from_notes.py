@@ -0,0 +1,71 @@
+"""
+Score creation from the note sequence of :func:`musiclang.analyze.to_musiclang.infer_score_with_chords_durations`
+on pieces of growing length : the notes are split per chord and track in a single pass instead of one scan of
+the sequence per chord, so the time per note stays constant.
+
+Usage : ``python benchmarks/bench_score_from_notes.py``
+"""
+import gc
+import time
+from fractions import Fraction
+
+import numpy as np
+
+from musiclang.analyze.item import Item
+from musiclang.analyze.to_musiclang import _bucket_notes, infer_score_with_chords_durations
+from musiclang.library import I, V
+
+
+def random_piece(nb_bars, rng, nb_tracks=3, nb_voices=2):
+    chords = [((I if idx % 2 == 0 else V) % I.M).set_duration(4) for idx in range(nb_bars)]
+    bars = [(4 * idx, 4 * (idx + 1)) for idx in range(nb_bars)]
+    sequence = []
+    for track in range(1, nb_tracks + 1):
+        for voice in range(nb_voices):
+            durations = rng.choice([Fraction(1, 2), Fraction(1), Fraction(2)], 8 * nb_bars)
+            starts = np.cumsum([Fraction(0)] + list(durations[:-1]))
+            for start, duration in zip(starts, durations):
+                if start >= 4 * nb_bars:
+                    break
+                end = min(start + duration, Fraction(4 * nb_bars))
+                sequence.append(Item('name', start, end, vel=80, pitch=int(rng.integers(48, 84)), track=track,
+                                     channel=track - 1, voice=voice))
+    sequence.sort(key=lambda n: (n.start, n.pitch))
+    instruments = {track - 1: 'piano' for track in range(1, nb_tracks + 1)}
+    return sequence, chords, instruments, bars
+
+
+def scan_per_chord(sequence, chords):
+    # Previous split : one scan of the whole sequence per chord
+    time_end, chords_notes = 0, []
+    for chord in chords:
+        time_start, time_end = time_end, time_end + chord.duration
+        chords_notes.append([n for n in sequence if time_start <= n.start < time_end])
+    return chords_notes
+
+
+def timeit(f, *args, **kwargs):
+    gc.collect()
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'bars':>6} {'notes':>7} {'scan split (s)':>15} {'single pass (s)':>16} {'score (s)':>10} "
+          f"{'us/note':>8}")
+    for nb_bars in [50, 200, 800]:
+        sequence, chords, instruments, bars = random_piece(nb_bars, rng)
+        scan_time, expected = timeit(scan_per_chord, sequence, chords)
+        time_ends = np.cumsum([chord.duration for chord in chords]).tolist()
+        bucket_time, chords_notes = timeit(_bucket_notes, sequence, time_ends)
+        assert [sorted(id(n) for notes in chord_notes.values() for n in notes) for chord_notes in chords_notes] \
+            == [sorted(id(n) for n in notes) for notes in expected]
+        score_time, _ = timeit(infer_score_with_chords_durations, sequence, chords, instruments, bars)
+        print(f'{nb_bars:>6} {len(sequence):>7} {scan_time:>15.3f} {bucket_time:>16.4f} {score_time:>10.3f} '
+              f'{1e6 * score_time / len(sequence):>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
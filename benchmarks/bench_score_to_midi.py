@@ -0,0 +1,51 @@
+"""
+Midi export : :func:`musiclang.write.out.midi_writer.score_to_midi_bytes` against the
+:func:`musiclang.write.out.midi_utils.matrix_to_mid` path (NotePitch rows and pandas).
+
+Usage : ``python benchmarks/bench_score_to_midi.py``
+"""
+import io
+import time
+
+from musiclang.library import *
+from musiclang import Score
+from musiclang.write.out.midi_utils import matrix_to_mid
+from musiclang.write.out.midi_writer import score_to_midi_bytes
+from musiclang.write.out.to_midi import get_notes, get_track_list, tracks_to_instruments
+
+
+def build_score(nb_chords):
+    progression = [I % I.M, VI % I.M, II['6'] % I.M, V['7'] % I.M]
+    return Score.concat(progression[i % len(progression)](
+        piano__0=s0 + su1 + su1 + sd2 + c2.o(1) + l + h1 + r,
+        piano__1=b0.o(-1).h + b1.o(-1).h,
+        violin__0=s4.o(1).w,
+        cello__0=b0.o(-2).q + l.q + b1.o(-2).h,
+        drums_0__0=(bd.e + hh.e + sn.e + hh.e) * 2,
+    ) for i in range(nb_chords))
+
+
+def legacy(score):
+    instruments, instrument_names = tracks_to_instruments(get_track_list(score))
+    output = io.BytesIO()
+    matrix_to_mid(get_notes(score), output_file=output, instruments=instruments, instrument_names=instrument_names)
+    return output.getvalue()
+
+
+def timeit(f, score):
+    start = time.perf_counter()
+    result = f(score)
+    return time.perf_counter() - start, result
+
+
+def main():
+    print(f"{'chords':>8} {'legacy (s)':>11} {'writer (s)':>11} {'identical':>10}")
+    for nb_chords in [100, 400, 1600]:
+        score = build_score(nb_chords)
+        writer_time, writer_bytes = timeit(score_to_midi_bytes, score)
+        legacy_time, legacy_bytes = timeit(legacy, score)
+        print(f'{nb_chords:>8} {legacy_time:>11.3f} {writer_time:>11.3f} {str(legacy_bytes == writer_bytes):>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Score <-> sequence conversion of :mod:`musiclang.write.sequence` : the row by row pandas conversion it replaces
+(``Series.apply`` per column, ``groupby`` + ``iterrows`` for the inverse) against the single traversal filling
+typed numpy columns of :class:`~musiclang.write.sequence.ColumnarSequence`, then writing and memory-mapping a corpus
+with pyarrow when it is installed.
+
+Usage : ``python benchmarks/bench_sequence.py``
+"""
+import gc
+import os
+import tempfile
+import time
+from fractions import Fraction as frac
+
+import numpy as np
+import pandas as pd
+
+from musiclang import Melody, Score, ScoreBuilder
+from musiclang.library import *
+from musiclang.write.sequence import ColumnarSequence, SEQUENCE_COLUMNS
+
+DEGREES = [I, II, IV, V, VI]
+NOTES = [s0, s1, s2, s3, s4, s5, s6, c0, c1, c2, r, l]
+DURATIONS = [frac(1, 4), frac(1, 2), frac(1, 3), frac(1), frac(2)]
+
+
+def random_score(nb_chords, nb_voices, rng):
+    builder = ScoreBuilder()
+    for _ in range(nb_chords):
+        parts = {}
+        for voice in range(nb_voices):
+            melody, time = None, 0
+            while time < 4:
+                duration = min(DURATIONS[int(rng.integers(len(DURATIONS)))], 4 - time)
+                melody += NOTES[int(rng.integers(len(NOTES)))].o(int(rng.integers(-1, 2))).set_duration(duration)
+                time += duration
+            parts[f'piano__{voice}'] = melody
+        builder += (DEGREES[int(rng.integers(len(DEGREES)))] % I.M)(**parts)
+    return builder.freeze()
+
+
+def row_by_row_sequence(score):
+    # Previous conversion : python rows, then one apply per derived column
+    rows = []
+    time = 0
+    for idx, chord in enumerate(score):
+        rows += [[time, idx] + row for row in chord.to_sequence()]
+        time += chord.duration
+    sequence = pd.DataFrame(rows, columns=['chord_time', 'chord_idx', 'chord_relative_start', 'chord_relative_end',
+                                           'pitch', 'chord', 'instrument', 'note'])
+    sequence['start'] = sequence['chord_time'] + sequence['chord_relative_start']
+    sequence['end'] = sequence['chord_time'] + sequence['chord_relative_end']
+    for column, attribute in [('chord_degree', 'element'), ('chord_extension', 'extension'), ('chord_octave', 'octave')]:
+        sequence[column] = sequence['chord'].apply(lambda chord: getattr(chord, attribute))
+    for column, attribute in [('tonality_degree', 'degree'), ('tonality_mode', 'mode'), ('tonality_octave', 'octave')]:
+        sequence[column] = sequence['chord'].apply(lambda chord: getattr(chord.tonality, attribute))
+    for column, attribute in [('silence', 'is_silence'), ('continuation', 'is_continuation'), ('note_type', 'type'),
+                              ('note_val', 'val'), ('note_octave', 'octave'), ('note_amp', 'amp'),
+                              ('note_duration', 'duration')]:
+        sequence[column] = sequence['note'].apply(lambda note: getattr(note, attribute))
+    sequence['note_idx'] = np.arange(len(sequence))
+    return sequence[SEQUENCE_COLUMNS].sort_values(by='start', ascending=True)
+
+
+def iterrows_score(sequence):
+    # Previous inverse : groupby chord then instrument, one Series per row
+    from musiclang import Chord, Tonality, Note
+    from musiclang.write.note import Silence, Continuation
+    score = []
+    for chord_idx, group_chord in sequence.groupby('chord_idx'):
+        row = group_chord.iloc[0]
+        tonality = Tonality(int(row['tonality_degree']), mode=row['tonality_mode'], octave=int(row['tonality_octave']))
+        chord = Chord(int(row['chord_degree']), extension=row['chord_extension'], octave=row['chord_octave'],
+                      tonality=tonality)
+        parts = {}
+        for instrument, rows in group_chord.groupby('instrument', sort=False):
+            part = []
+            for _, note in rows.iterrows():
+                if note['silence']:
+                    part.append(Silence(note['note_duration']))
+                elif note['continuation']:
+                    part.append(Continuation(note['note_duration']))
+                else:
+                    part.append(Note(note['note_type'], val=int(note['note_val']), octave=int(note['note_octave']),
+                                     duration=frac(note['note_duration']).limit_denominator(8),
+                                     amp=int(note['note_amp'])))
+            parts[instrument] = Melody(part)
+        score.append(chord(**parts))
+    return Score(score)
+
+
+def timeit(f, *args, **kwargs):
+    gc.collect()
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'chords':>7} {'rows':>7} {'rows (s)':>9} {'to_sequence (s)':>16} {'columnar (s)':>13} "
+          f"{'iterrows (s)':>13} {'from_sequence (s)':>18} {'to_score (s)':>13}")
+    scores = []
+    for nb_chords in [100, 400, 1600]:
+        score = random_score(nb_chords, 4, rng)
+        scores.append(score)
+        rows_time, expected = timeit(row_by_row_sequence, score)
+        sequence_time, sequence = timeit(score.to_sequence)
+        assert sequence.fillna(-1).equals(expected.fillna(-1))
+        columnar_time, columnar = timeit(score.to_columnar_sequence)
+        iterrows_time, expected_score = timeit(iterrows_score, sequence)
+        from_sequence_time, new_score = timeit(Score.from_sequence, sequence)
+        assert new_score == expected_score
+        to_score_time, _ = timeit(columnar.to_score)
+        print(f'{nb_chords:>7} {len(sequence):>7} {rows_time:>9.2f} {sequence_time:>16.2f} {columnar_time:>13.2f} '
+              f'{iterrows_time:>13.2f} {from_sequence_time:>18.2f} {to_score_time:>13.2f}')
+
+    try:
+        import pyarrow
+    except ImportError:
+        print('pyarrow is not installed, skipping the arrow and parquet files')
+        return
+    corpus = ColumnarSequence.concat([score.to_columnar_sequence() for score in scores * 10])
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ['corpus.arrow', 'corpus.parquet']:
+            path = os.path.join(directory, name)
+            write_time, _ = timeit(corpus.write, path)
+            read_time, _ = timeit(ColumnarSequence.read, path)
+            print(f'{name} : {len(corpus)} rows, {os.path.getsize(path) / 1e6:.1f} MB, write {write_time:.3f} s, '
+                  f'read {read_time:.3f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Loading of musiclang text files : the former ``Score.from_str`` that called ``eval`` on each chord against the
+parser of :mod:`musiclang.write.text_parser` which interns the note tokens, for the whole text and for the
+chord by chord streaming of :func:`Score.iter_file`. Throughput is given in chords per second.
+
+Usage : ``python benchmarks/bench_text_parser.py``
+"""
+import gc
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+
+from musiclang import Score, ScoreBuilder
+from musiclang.library import *
+
+DEGREES = [I, II, III, IV, V, VI, VII]
+TONALITIES = [I.M, II.b.m, V.M, VI.m]
+NOTES = [s0, s1, s2, s3, s4, s5, s6, c0, c1, c2, b0, b1, su1, sd2, h1, h3, r, l]
+DURATIONS = ['e', 'q', 'h']
+AMPS = ['p', 'mf', 'f']
+
+
+def random_score(nb_chords, nb_voices, rng):
+    builder = ScoreBuilder()
+    for _ in range(nb_chords):
+        chord = DEGREES[int(rng.integers(0, 7))] % TONALITIES[int(rng.integers(0, len(TONALITIES)))]
+        voices = {}
+        for idx in range(nb_voices):
+            melody = None
+            for _ in range(4):
+                note = getattr(NOTES[int(rng.integers(0, len(NOTES)))], DURATIONS[int(rng.integers(0, 3))])
+                melody += getattr(note.o(int(rng.integers(-1, 2))), AMPS[int(rng.integers(0, 3))])
+            voices[f'piano__{idx}'] = melody
+        builder += chord(**voices)
+    return builder.freeze()
+
+
+def eval_from_str(s):
+    # Previous implementation : one eval of the library DSL per chord
+    pattern = re.compile(r'(?<=\))\s*\+\s*(?=\()')
+    data = re.split(pattern, str(s))
+    return Score([eval(str(d).replace('\n', '')) for d in data])
+
+
+def timeit(f, *args, **kwargs):
+    gc.collect()
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'chords':>7} {'eval (chords/s)':>16} {'parser (chords/s)':>18} {'streaming (chords/s)':>21} "
+          f"{'speedup':>8}")
+    for nb_chords in [100, 1000, 5000]:
+        text = str(random_score(nb_chords, 4, rng))
+        eval_time, expected = timeit(eval_from_str, text)
+        parse_time, score = timeit(Score.from_str, text)
+        assert str(score) == str(expected) == text
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'score.txt')
+            with open(path, 'w') as f:
+                f.write(text)
+            stream_time, chords = timeit(lambda: list(Score.iter_file(path, chunk_size=1 << 16)))
+        assert str(Score(chords)) == text
+        print(f'{nb_chords:>7} {nb_chords / eval_time:>16.0f} {nb_chords / parse_time:>18.0f} '
+              f'{nb_chords / stream_time:>21.0f} {eval_time / parse_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
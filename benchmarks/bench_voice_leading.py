@@ -0,0 +1,89 @@
+"""
+Rule checker of :class:`musiclang.transform.composing.VoiceLeading` : the pair by pair python loop it replaces
+against the vectorized ``get_pitch_solution`` and ``get_problems``, then the time of a full ``optimize`` on a
+100 voices x 1000 chords score, and the fitness reached by the population optimizer for several population sizes.
+
+Usage : ``python benchmarks/bench_voice_leading.py``
+"""
+import gc
+import time
+
+import numpy as np
+
+from musiclang import ScoreBuilder
+from musiclang.library import *
+from musiclang.transform.composing import VoiceLeading
+from musiclang.transform.composing.voice_leading import DISSONNANCES
+
+DEGREES = [I, II, III, IV, V, VI, VII]
+NOTES = [s0, s1, s2, s3, s4, s5, s6, c0, c1, c2, b0, b1, b2, b3, h1, h3]
+
+
+def random_score(nb_voices, nb_chords, rng):
+    builder = ScoreBuilder()
+    for _ in range(nb_chords):
+        chord = DEGREES[int(rng.integers(0, len(DEGREES)))] % I.M
+        builder += chord(**{f'piano__{idx}': NOTES[int(rng.integers(0, len(NOTES)))].o(int(rng.integers(-2, 2)))
+                            if rng.random() > 0.1 else r for idx in range(nb_voices)})
+    return builder.freeze()
+
+
+def loop_problems(vl, pitches):
+    problems = np.zeros(pitches.shape)
+    nb_voices, nb_chords = pitches.shape
+    for v1 in range(nb_voices):
+        for v2 in range(v1):
+            for idxc in range(nb_chords):
+                rel_val = pitches[v1, idxc] - pitches[v2, idxc]
+                val = abs(rel_val) % 12
+                next_val = vl.get_val(pitches, v1, v2, idxc + 1)
+                parallel = (val == 7 and next_val == 7) + (val == 0 and next_val == 0) \
+                    + (val in DISSONNANCES and next_val in DISSONNANCES)
+                for voice in [v1, v2]:
+                    problems[voice, idxc] += parallel + 3 * (rel_val < 0) + 5 * (rel_val == 0)
+                    if parallel:
+                        problems[voice, idxc + 1] += parallel
+    return problems * vl.dvalsmask
+
+
+def timeit(f, *args, **kwargs):
+    gc.collect()
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'voices':>7} {'chords':>7} {'loop (s)':>9} {'numpy (s)':>10} {'speedup':>8}")
+    for nb_voices, nb_chords in [(4, 100), (10, 300), (30, 300)]:
+        vl = VoiceLeading(seed=0)
+        vl.init(random_score(nb_voices, nb_chords, rng))
+        dvals = rng.integers(-3, 4, vl.pitch.shape)
+        loop_time, expected = timeit(loop_problems, vl, vl.get_pitch_solution(dvals))
+        numpy_time, problems = timeit(lambda: vl.get_problems(vl.get_pitch_solution(dvals)))
+        assert np.array_equal(problems, expected)
+        print(f'{nb_voices:>7} {nb_chords:>7} {loop_time:>9.3f} {numpy_time:>10.4f} {loop_time / numpy_time:>7.0f}x')
+
+    score = random_score(100, 1000, rng)
+    vl = VoiceLeading(seed=0)
+    init_time, _ = timeit(vl.init, score)
+    dvals = np.zeros(vl.pitch.shape, dtype=np.int16)
+    problems_time, _ = timeit(lambda: vl.get_problems(vl.get_pitch_solution(dvals)))
+    optimize_time, _ = timeit(vl.optimize, score)
+    print(f'100 voices x 1000 chords : init {init_time:.2f} s, get_problems {problems_time:.3f} s, '
+          f'optimize {optimize_time:.2f} s (including init and get_score)')
+
+    score = random_score(30, 300, rng)
+    print(f"{'population':>11} {'restarts':>9} {'fitness':>10} {'solutions/s':>12} {'fitness/s':>10} {'time (s)':>9}")
+    for population_size, restarts in [(1, 1), (8, 1), (32, 1), (8, 4)]:
+        vl = VoiceLeading(seed=0, method='population', population_size=population_size, restarts=restarts,
+                          max_iter=100)
+        optimize_time, _ = timeit(vl.optimize, score)
+        best = min(vl.population_history, key=lambda history: history['best_fitness'])
+        print(f"{population_size:>11} {restarts:>9} {best['best_fitness']:>10.1f} "
+              f"{best['evaluations_per_second']:>12.0f} {best['fitness_per_second']:>10.1f} {optimize_time:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-from .write.score import Score
+from .write.score import Score, ScoreBuilder
 from .write.note import Note, Silence, Continuation
 from .write.melody import Melody
 from .write.chord import Chord
@@ -12,7 +12,7 @@ from .analyze import ScoreFormatter
 from .transform.library import VoiceLeading
 from .transform import PartComposer
 
-__all__ = ['Score', 'Note', 'Silence', 'Continuation', 'Melody',
+__all__ = ['Score', 'ScoreBuilder', 'Note', 'Silence', 'Continuation', 'Melody',
            'Chord', 'Tonality', 'Element', 'library', 'Metric', 'CompositeMetric', 'ScoreRhythm', 'ScoreFormatter',
            'VoiceLeading', 'PartComposer', 'CustomChord'
            ]
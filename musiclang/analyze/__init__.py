@@ -2,11 +2,13 @@ from .parser import parse_to_musiclang, get_chords_from_analysis, get_chords_fro
     parse_midi_to_musiclang, parse_mxl_to_musiclang
 from .roman_parser import annotation_to_musiclang
 from .score_formatter import ScoreFormatter
-from .pattern_sampler import PicklePatternSampler, TextPatternSampler
+from .pattern_sampler import PicklePatternSampler, TextPatternSampler, BinaryPatternSampler
+from .corpus_index import CorpusIndex
 from .pattern_analyzer import PatternExtractor, PatternFeatureExtractor, recursive_correct_octave, inverse_recursive_correct_octave
 
 __all__ = ['parse_to_musiclang', 'get_chords_from_analysis', 'get_chords_from_mxl',
           'parse_mxl_to_musiclang', 'parse_midi_to_musiclang', 'annotation_to_musiclang', 'ScoreFormatter',
-           'PicklePatternSampler', 'TextPatternSampler', 'PatternExtractor', 'PatternFeatureExtractor', 'recursive_correct_octave',
+           'PicklePatternSampler', 'TextPatternSampler', 'BinaryPatternSampler', 'CorpusIndex',
+           'PatternExtractor', 'PatternFeatureExtractor', 'recursive_correct_octave',
            'inverse_recursive_correct_octave'
            ]
\ No newline at end of file
@@ -6,5 +6,7 @@ import glob
 __author__ = "Néstor Nápoles López"
 __version__ = "1.9.0"
 
-from .inference import get_model, m21Parse, infer_chords
+from .inference import get_model, m21Parse, infer_chords, infer_chords_batch, set_inference_client
+from .frame_cache import set_frame_cache, get_frame_cache, FrameCache
+from .service import InferenceService, InferenceClient
 
@@ -3,6 +3,7 @@
 from music21.key import Key
 from music21.pitch import Pitch
 from music21.interval import Interval
+from music21.roman import RomanNumeral
 from .keydistance import weberEuclidean as _we
 from .keydistance import getTonicizationScaleDegree as _gtsd
 
@@ -14,6 +15,7 @@ _keyObj = {}
 _intervalObj = {}
 _weberEuclidean = {}
 _getTonicizationScaleDegree = {}
+_romanNumeralPitchClasses = {}
 
 
 def weberEuclidean(k1, k2):
@@ -239,3 +241,25 @@ def m21Pitch(pitch):
     pitchObj = Pitch(pitch)
     _pitchObj[pitch] = pitchObj
     return pitchObj
+
+
+def romanNumeralPitchClasses(numerator, key):
+    """A cached version of RomanNumeral(numerator, key).pitchClasses.
+
+    Parameters
+    ----------
+    numerator :
+        
+    key :
+        
+
+    Returns
+    -------
+
+    """
+    duple = (numerator, key)
+    if duple in _romanNumeralPitchClasses:
+        return _romanNumeralPitchClasses[duple]
+    pitchClasses = tuple(RomanNumeral(numerator, key).pitchClasses)
+    _romanNumeralPitchClasses[duple] = pitchClasses
+    return pitchClasses
@@ -41,17 +41,40 @@ def closestPcSet(pcset):
     v1 = np.zeros(12)
     for pc in pcset:
         v1[pc] = 1
-    mostSimilarScore = -2
-    closestPcSet = []
-    for pcs in frompcset:
-        v2 = np.zeros(12)
-        for p in pcs:
-            v2[p] = 1
-        similarity = cosineSimilarity(v1, v2)
-        if similarity > mostSimilarScore:
-            closestPcSet = pcs
-            mostSimilarScore = similarity
-    return closestPcSet
+    return closestPcSets(v1[np.newaxis])[0]
+
+
+def closestPcSets(vectors):
+    """Get the closest matching pcset from the vocabulary of many pitch class vectors.
+
+    The cosine similarities with all the pcsets of the vocabulary are computed
+    with one matrix product. Ties are resolved in favor of the first pcset of
+    the vocabulary, as in closestPcSet.
+
+    Parameters
+    ----------
+    vectors :
+        Array of shape (n, 12), the weight of each pitch class
+
+    Returns
+    -------
+    pcsets :
+        The closest pcset of each vector ([] for a null vector)
+
+    """
+    vectors = np.asarray(vectors, dtype=float)
+    norms = norm(vectors, axis=1)
+    # The vectors are not normalized before the product, so that the
+    # similarities (and their ties) are exactly the ones of cosineSimilarity
+    with np.errstate(invalid="ignore", divide="ignore"):
+        similarities = (vectors @ PCSET_MATRIX.T) / (
+            PCSET_NORMS * norms[:, np.newaxis]
+        )
+    closest = np.argmax(similarities, axis=1).tolist()
+    return [
+        VOCABULARY_PCSETS[idx] if n > 0 else []
+        for idx, n in zip(closest, norms.tolist())
+    ]
 
 
 frompcset = {
@@ -1901,3 +1924,10 @@ frompcset = {
         "g-": {"chord": ["F", "A-", "C-"], "quality": "dim", "rn": "viio"},
     },
 }
+
+# The pcsets of the vocabulary (in the order of frompcset) as rows of a matrix
+VOCABULARY_PCSETS = list(frompcset)
+PCSET_MATRIX = np.zeros((len(VOCABULARY_PCSETS), 12))
+for _idx, _pcset in enumerate(VOCABULARY_PCSETS):
+    PCSET_MATRIX[_idx, list(_pcset)] = 1
+PCSET_NORMS = norm(PCSET_MATRIX, axis=1)
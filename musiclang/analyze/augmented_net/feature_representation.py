@@ -163,9 +163,26 @@ class FeatureRepresentation(object):
         -------
 
         """
-        for interval in intervals:
-            yield self.run(transposition=interval)
-        return
+        yield from self.runTranspositions(list(intervals))
+
+    def runTranspositions(self, transpositions):
+        """Encodes several transpositions in one array.
+
+        Parameters
+        ----------
+        transpositions :
+            List of interval strings (e.g., 'm3')
+
+        Returns
+        -------
+        array :
+            Array of shape (len(transpositions), frames, features)
+
+        """
+        array = np.zeros((len(transpositions),) + self.shape, dtype=self.dtype)
+        for idx, transposition in enumerate(transpositions):
+            array[idx] = self.run(transposition=transposition)
+        return array
 
     @classmethod
     def encodeManyHot(cls, array, timestep, index, value=1):
@@ -244,3 +261,17 @@ class FeatureRepresentationTI(FeatureRepresentation):
         for _ in intervals:
             yield np.copy(self.array)
         return
+
+    def runTranspositions(self, transpositions):
+        """
+
+        Parameters
+        ----------
+        transpositions :
+            
+
+        Returns
+        -------
+
+        """
+        return np.repeat(self.array[np.newaxis], len(transpositions), axis=0)
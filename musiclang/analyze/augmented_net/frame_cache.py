@@ -0,0 +1,244 @@
+"""Content-addressed on-disk cache of the parsed score frames."""
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .score_parser import FIXEDOFFSET, S_LISTTYPE_COLUMNS, parseScoreSummary, _reindexDataFrame
+
+# Changing the stored format must change this version, it is part of the keys
+CACHE_FORMAT_VERSION = 1
+
+FRAME_CACHE = None
+
+
+def set_frame_cache(directory, maxBytes=2 ** 30, maxEntries=None):
+    """Cache the parsed scores in a directory, None to disable the cache.
+
+    Parameters
+    ----------
+    directory : str or None
+
+    maxBytes : int
+         (Default value = 2 ** 30)
+         Maximum size of the cache files, the least recently used are removed above
+    maxEntries : int
+         (Default value = None)
+         Maximum number of cache files, None for no limit
+
+    Returns
+    -------
+    cache : FrameCache or None
+
+    """
+    global FRAME_CACHE
+    FRAME_CACHE = None if directory is None else FrameCache(directory, maxBytes=maxBytes, maxEntries=maxEntries)
+    return FRAME_CACHE
+
+
+def get_frame_cache():
+    """Cache used by parseScore and the inference, None if disabled"""
+    return FRAME_CACHE
+
+
+def _encodeFrames(df):
+    """Frames dataframe as flat numpy arrays, the list columns being stored as values and lengths."""
+    arrays = {
+        "index": df.index.to_numpy(dtype=np.float64),
+        "indexName": np.asarray(df.index.name or "", dtype=np.str_),
+        "columns": np.asarray(list(df.columns), dtype=np.str_),
+    }
+    for col in df.columns:
+        if col not in S_LISTTYPE_COLUMNS:
+            arrays[col] = df[col].to_numpy()
+            continue
+        values = df[col].to_list()
+        # -1 for the missing values (rests)
+        arrays[col + ".lengths"] = np.asarray(
+            [len(v) if isinstance(v, list) else -1 for v in values], dtype=np.int32
+        )
+        flat = [x for v in values if isinstance(v, list) for x in v]
+        dtype = np.bool_ if col == "s_isOnset" else np.str_
+        arrays[col + ".values"] = np.asarray(flat, dtype=dtype) if flat else np.zeros(0, dtype=dtype)
+    return arrays
+
+
+def _decodeFrames(arrays):
+    """Inverse of _encodeFrames"""
+    data = {}
+    for col in arrays["columns"].tolist():
+        if col not in S_LISTTYPE_COLUMNS:
+            data[col] = arrays[col]
+            continue
+        lengths = arrays[col + ".lengths"].tolist()
+        flat = arrays[col + ".values"].tolist()
+        column = np.empty(len(lengths), dtype=object)
+        start = 0
+        for idx, length in enumerate(lengths):
+            if length < 0:
+                column[idx] = np.nan
+                continue
+            column[idx] = flat[start:start + length]
+            start += length
+        data[col] = column
+    index = pd.Index(arrays["index"], name=arrays["indexName"].item() or None)
+    return pd.DataFrame(data, index=index)
+
+
+class FrameCache:
+    """On-disk cache of parsed scores, keyed by the content of the files.
+
+    For each score it stores the salami-sliced frames and a summary of its chordified notes
+    (see score_parser.parseScoreSummary), and the fixed-step frames of each fixedOffset used.
+    Entries are compressed numpy archives without pickled objects. Reading an entry marks it as
+    recently used, the least recently used entries are removed when the limits are exceeded.
+
+    """
+
+    def __init__(self, directory, maxBytes=2 ** 30, maxEntries=None):
+        """
+
+        Parameters
+        ----------
+        directory : str
+        maxBytes : int
+             (Default value = 2 ** 30)
+        maxEntries : int
+             (Default value = None)
+
+        """
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.maxEntries = maxEntries
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, f, fmt=None):
+        """Hash of the content of the file, of its format and of the cache version"""
+        digest = hashlib.sha256()
+        digest.update(f"{CACHE_FORMAT_VERSION}:{fmt or os.path.splitext(f)[1].lower()}:".encode())
+        with open(f, "rb") as fd:
+            for chunk in iter(lambda: fd.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _path(self, key, name):
+        return os.path.join(self.directory, f"{key}.{name}.npz")
+
+    def _load(self, key, name):
+        path = self._path(key, name)
+        try:
+            with np.load(path, allow_pickle=False) as archive:
+                arrays = {k: archive[k] for k in archive.files}
+        except (OSError, ValueError, EOFError):
+            # Missing, or corrupted by an interrupted write
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arrays
+
+    def _save(self, key, name, arrays):
+        fd, tmpPath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                np.savez_compressed(tmp, **arrays)
+            os.replace(tmpPath, self._path(key, name))
+        except BaseException:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is within its limits"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        totalBytes = sum(size for _, size, _ in entries)
+        nbEntries = len(entries)
+        for _, size, path in entries:
+            if totalBytes <= self.maxBytes and (self.maxEntries is None or nbEntries <= self.maxEntries):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            totalBytes -= size
+            nbEntries -= 1
+
+    def clear(self):
+        """Remove all the entries"""
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.directory, name))
+
+    def score(self, f, fmt=None, key=None):
+        """Salami-sliced frames and chordified summary of a score, parsed with music21 if not cached.
+
+        Parameters
+        ----------
+        f : str
+        fmt :
+             (Default value = None)
+        key : str
+             (Default value = None)
+             Key of the file if already computed
+
+        Returns
+        -------
+        df : pd.DataFrame
+        summary : dict
+
+        """
+        key = key or self.key(f, fmt)
+        arrays = self._load(key, "score")
+        if arrays is None:
+            df, summary = parseScoreSummary(f, fmt)
+            arrays = {**{"frames." + k: v for k, v in _encodeFrames(df).items()},
+                      **{"summary." + k: v for k, v in summary.items()}}
+            self._save(key, "score", arrays)
+            return df, summary
+        df = _decodeFrames({k[len("frames."):]: v for k, v in arrays.items() if k.startswith("frames.")})
+        summary = {k[len("summary."):]: v for k, v in arrays.items() if k.startswith("summary.")}
+        return df, summary
+
+    def frames(self, f, fmt=None, fixedOffset=FIXEDOFFSET, eventBased=False):
+        """Frames of a score, as returned by score_parser.parseScore
+
+        Parameters
+        ----------
+        f : str
+        fmt :
+             (Default value = None)
+        fixedOffset :
+             (Default value = FIXEDOFFSET)
+        eventBased :
+             (Default value = False)
+
+        Returns
+        -------
+        df : pd.DataFrame
+
+        """
+        key = self.key(f, fmt)
+        if eventBased:
+            return self.score(f, fmt, key=key)[0]
+        name = f"frames-{float(fixedOffset)!r}"
+        arrays = self._load(key, name)
+        if arrays is not None:
+            return _decodeFrames(arrays)
+        df = _reindexDataFrame(self.score(f, fmt, key=key)[0], fixedOffset=fixedOffset)
+        self._save(key, name, _encodeFrames(df))
+        return df
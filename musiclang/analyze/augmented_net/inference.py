@@ -1,37 +1,60 @@
 """Run the network to annotate an unseen musical input (inference)."""
 
 import os
+import time
+import multiprocessing as mp
 
-import music21
 import numpy as np
 import pandas as pd
 import re
 
 
 from . import __version__
-from .chord_vocabulary import frompcset, cosineSimilarity
-from .cache import forceTonicization, getTonicizationScaleDegree
-from .score_parser import parseScore, m21Parse
+from .chord_vocabulary import frompcset, closestPcSets
+from .cache import (
+    forceTonicization,
+    getTonicizationScaleDegree,
+    m21Pitch,
+    romanNumeralPitchClasses,
+)
+from .score_parser import parseScore, parseScoreSummary, m21Parse, NO_MEASURE, _reindexDataFrame
+from .frame_cache import get_frame_cache, set_frame_cache
 from .input_representations import available_representations as availableInputs
 from .output_representations import (
     available_representations as availableOutputs,
 )
 from .utils import tensorflowGPUHack, disableGPU, padToSequenceLength
-from tensorflow import keras
 
 modelPath = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'AugmentedNet.hdf5')
 
 MODEL = None
 
+# Client of an InferenceService used by infer_chords instead of a local model (see set_inference_client)
+INFERENCE_CLIENT = None
+
+
 def get_model():
+    """Load the model once per process (tensorflow is only imported here)."""
     global MODEL
-    print('LOADING MODEL')
-    if MODEL is not None:
-        return MODEL
-    else:
+    if MODEL is None:
+        print('LOADING MODEL')
+        from tensorflow import keras
         disableGPU()
         MODEL = keras.models.load_model(modelPath)
-        return MODEL
+    return MODEL
+
+
+def set_inference_client(client):
+    """Send the scores of infer_chords to an InferenceService instead of loading the model in this process.
+
+    Parameters
+    ----------
+    client : InferenceClient or None
+        None to use the local model again
+
+    """
+    global INFERENCE_CLIENT
+    INFERENCE_CLIENT = client
 
 
 
@@ -129,26 +152,47 @@ def resolveRomanNumeralCosine(b, t, a, s, pcs, key, numerator, tonicizedKey):
     -------
 
     """
-    pcsetVector = np.zeros(12)
-    chord = music21.chord.Chord(f"{b}2 {t}3 {a}4 {s}5")
-    for n in chord.pitches:
-        pcsetVector[n.pitchClass] += 1
-    for pc in pcs:
-        pcsetVector[pc] += 1
-    chordNumerator = music21.roman.RomanNumeral(
-        numerator.replace("Cad", "Cad64"), tonicizedKey
-    ).pitchClasses
-    for pc in chordNumerator:
-        pcsetVector[pc] += 1
-    smallestDistance = -2
-    for pcs in frompcset:
-        v2 = np.zeros(12)
-        for p in pcs:
-            v2[p] = 1
-        similarity = cosineSimilarity(pcsetVector, v2)
-        if similarity > smallestDistance:
-            pcset = pcs
-            smallestDistance = similarity
+    return resolveRomanNumeralsCosine([(b, t, a, s, pcs, key, numerator, tonicizedKey)])[0]
+
+
+def resolveRomanNumeralsCosine(analyses):
+    """Resolve the Roman numeral and chord label of all the chords of a piece.
+
+    The pitch class vector of each chord is compared to the whole
+    vocabulary with one matrix product (see closestPcSets).
+
+    Parameters
+    ----------
+    analyses :
+        List of (b, t, a, s, pcs, key, numerator, tonicizedKey) tuples,
+        the arguments of resolveRomanNumeralCosine
+
+    Returns
+    -------
+    resolved :
+        List of (rn, chordLabel)
+
+    """
+    pcsetVectors = np.zeros((len(analyses), 12))
+    for idx, (b, t, a, s, pcs, _, numerator, tonicizedKey) in enumerate(analyses):
+        for pitch in (b, t, a, s):
+            pcsetVectors[idx, m21Pitch(pitch).pitchClass] += 1
+        for pc in pcs:
+            pcsetVectors[idx, pc] += 1
+        chordNumerator = romanNumeralPitchClasses(
+            numerator.replace("Cad", "Cad64"), tonicizedKey
+        )
+        for pc in chordNumerator:
+            pcsetVectors[idx, pc] += 1
+    pcsets = closestPcSets(pcsetVectors)
+    return [
+        _resolveRomanNumeral(pcset, b, key, numerator, tonicizedKey)
+        for pcset, (b, _, _, _, _, key, numerator, tonicizedKey) in zip(pcsets, analyses)
+    ]
+
+
+def _resolveRomanNumeral(pcset, b, key, numerator, tonicizedKey):
+    """Roman numeral and chord label of a chord, once its pcset is resolved."""
     if tonicizedKey not in frompcset[pcset]:
         # print("Forcing a tonicization")
         candidateKeys = list(frompcset[pcset].keys())
@@ -228,29 +272,159 @@ Analyst: AugmentedNet v{__version__} - https://github.com/napulen/AugmentedNet
     return rntxt
 
 
-def predict(model, inputPath):
+def generateRomanTextFromSummary(summary, lyrics):
+    """Same as generateRomanText, from the chordified summary of a score (see score_parser.parseScoreSummary).
+
+    Parameters
+    ----------
+    summary :
+        
+    lyrics :
+        Roman numeral of the chordified notes, by note index
+
+    Returns
+    -------
+
     """
+    composer = str(summary["composer"]) or "Unknown"
+    title = str(summary["title"]) or "Unknown"
+    composer = composer.split("\n")[0]
+    title = title.split("\n")[0]
+    rntxt = f"""\
+Composer: {composer}
+Title: {title}
+Analyst: AugmentedNet v{__version__} - https://github.com/napulen/AugmentedNet
+"""
+    ts = {
+        (None if measure == NO_MEASURE else measure, beat): ratio
+        for measure, beat, ratio in zip(
+            summary["tsMeasures"].tolist(), summary["tsBeats"].tolist(), summary["tsRatios"].tolist()
+        )
+    }
+    measures = summary["measures"].tolist()
+    beats = summary["beats"].tolist()
+    currentMeasure = -1
+    for idx in sorted(lyrics):
+        if not lyrics[idx]:
+            continue
+        rn = lyrics[idx].split()[0]
+        key = ""
+        measure = None if measures[idx] == NO_MEASURE else measures[idx]
+        beat = beats[idx]
+        if beat.is_integer():
+            beat = int(beat)
+        newts = ts.get((measure, beat), None)
+        if newts:
+            rntxt += f"\nTime Signature: {newts}\n"
+        if ":" in rn:
+            key, rn = rn.split(":")
+        if measure != currentMeasure:
+            rntxt += f"\nm{measure}"
+            currentMeasure = measure
+        if beat != 1:
+            rntxt += f" b{round(beat, 3)}"
+        if key:
+            rntxt += f" {key.replace('-', 'b')}:"
+        rntxt += f" {rn}"
+    return rntxt
+
+
+def modelSignature(model):
+    """Input representations, output representations and sequence length of the model.
 
     Parameters
     ----------
     model :
         
-    inputPath :
-        
 
     Returns
     -------
 
     """
-    df = parseScore(inputPath)
     inputs = [l.name.rsplit("_")[1] for l in model.inputs]
-    encodedInputs = [availableInputs[i](df) for i in inputs]
     outputLayers = [l.name.split("/")[0] for l in model.outputs]
     seqlen = model.inputs[0].shape[1]
+    return inputs, outputLayers, seqlen
+
+
+def encodeScore(inputPath, inputs, seqlen):
+    """Parse a score and encode it as padded sequences of the model inputs.
+
+    The score is parsed and chordified once, for its frames and for the summary used to place its analysis.
+
+    Parameters
+    ----------
+    inputPath :
+        
+    inputs :
+        Names of the input representations
+    seqlen :
+        Sequence length of the model
+
+    Returns
+    -------
+    df :
+        Parsed score
+    summary :
+        Chordified notes of the score (see score_parser.parseScoreSummary)
+    modelInputs :
+        One (sequences, seqlen, features) array per input
+
+    """
+    cache = get_frame_cache()
+    if cache is not None:
+        df = parseScore(inputPath)
+        summary = cache.score(inputPath)[1]
+    else:
+        df, summary = parseScoreSummary(inputPath)
+        df = _reindexDataFrame(df)
+    encodedInputs = [availableInputs[i](df) for i in inputs]
     modelInputs = [
         padToSequenceLength(i.array, seqlen, value=-1) for i in encodedInputs
     ]
+    return df, summary, modelInputs
+
+
+def predict(model, inputPath):
+    """
+
+    Parameters
+    ----------
+    model :
+        
+    inputPath :
+        
+
+    Returns
+    -------
+
+    """
+    inputs, outputLayers, seqlen = modelSignature(model)
+    df, summary, modelInputs = encodeScore(inputPath, inputs, seqlen)
     predictions = model.predict(modelInputs)
+    annotateScore(inputPath, df, summary, predictions, outputLayers)
+
+
+def annotateScore(inputPath, df, summary, predictions, outputLayers):
+    """Decode the predictions of a score and write its "_annotated.rntxt" analysis next to it.
+
+    Parameters
+    ----------
+    inputPath :
+        
+    df :
+        Parsed score
+    summary :
+        Chordified notes of the score, as returned by encodeScore
+    predictions :
+        One (sequences, seqlen, classes) array per output
+    outputLayers :
+        Names of the output representations
+
+    Returns
+    -------
+
+    """
     predictions = [p.reshape(1, -1, p.shape[2]) for p in predictions]
     dfdict = {}
     for outputRepr, pred in zip(outputLayers, predictions):
@@ -266,60 +440,166 @@ def predict(model, inputPath):
     dfout["offset"] = paddedIndex
     dfout["measure"] = paddedMeasure
     chords = solveChordSegmentation(dfout)
-    #s = music21.converter.parse(inputPath, forceSource=True)
-    s = m21Parse(inputPath)
-    ts = {
-        (ts.measureNumber, float(ts.beat)): ts.ratioString
-        for ts in s.flat.getElementsByClass("TimeSignature")
-    }
-    schord = s.chordify().flat.notesAndRests
-    schord.metadata = s.metadata
-    # remove all lyrics from score
-    # for note in s.recurse().notes:
-    #     note.lyrics = []
-    prevkey = ""
+    # Indexes of the chordified notes starting at each offset
+    notesByOffset = {}
+    for idx, offset in enumerate(summary["offsets"].tolist()):
+        notesByOffset.setdefault(offset, []).append(idx)
+    bassMidi = summary["bass"].tolist()
+    analyses = []
     for analysis in chords.itertuples():
-        notes = []
-        for n in schord.getElementsByOffset(analysis.offset):
-            if isinstance(n, music21.note.Note):
-                notes.append((n, n.pitch.midi))
-            elif isinstance(n, music21.chord.Chord) and not isinstance(
-                n, music21.harmony.NoChord
-            ):
-                notes.append((n, n[0].pitch.midi))
-        if not notes:
-            continue
-        bass = sorted(notes, key=lambda n: n[1])[0][0]
+        notes = notesByOffset.get(analysis.offset, [])
+        if notes:
+            analyses.append((analysis, sorted(notes, key=lambda n: bassMidi[n])[0]))
+    resolved = resolveRomanNumeralsCosine(
+        [
+            (
+                analysis.Bass35,
+                analysis.Tenor35,
+                analysis.Alto35,
+                analysis.Soprano35,
+                analysis.PitchClassSet121,
+                analysis.LocalKey38,
+                analysis.RomanNumeral31,
+                analysis.TonicizedKey38,
+            )
+            for analysis, _ in analyses
+        ]
+    )
+    lyrics = {}
+    prevkey = ""
+    for (analysis, bass), (rn2, chordLabel) in zip(analyses, resolved):
         thiskey = analysis.LocalKey38
-        tonicizedKey = analysis.TonicizedKey38
-        pcset = analysis.PitchClassSet121
-        numerator = analysis.RomanNumeral31
-        rn2, chordLabel = resolveRomanNumeralCosine(
-            analysis.Bass35,
-            analysis.Tenor35,
-            analysis.Alto35,
-            analysis.Soprano35,
-            pcset,
-            thiskey,
-            numerator,
-            tonicizedKey,
-        )
         if thiskey != prevkey:
             rn2fig = f"{thiskey}:{rn2}"
             prevkey = thiskey
         else:
             rn2fig = rn2
-        bass.addLyric(formatRomanNumeral(rn2fig, thiskey))
-        bass.addLyric(formatChordLabel(chordLabel))
-    rntxt = generateRomanText(schord, ts)
+        # The first analysis of a note is the one written
+        lyrics.setdefault(bass, formatRomanNumeral(rn2fig, thiskey))
+    rntxt = generateRomanTextFromSummary(summary, lyrics)
     filename, _ = inputPath.rsplit(".", 1)
     annotatedRomanText = f"{filename}_annotated.rntxt"
     with open(annotatedRomanText, "w") as fd:
         fd.write(rntxt)
 
 
-def infer_chords(inputPath, useGpu=False):
+def _encodeScoreTask(args):
+    """Encode one score in a worker, returning the error message instead of raising."""
+    inputPath, inputs, seqlen = args
+    try:
+        df, summary, modelInputs = encodeScore(inputPath, inputs, seqlen)
+    except Exception as e:
+        return inputPath, None, None, None, f"{type(e).__name__}: {e}"
+    return inputPath, df, summary, modelInputs, None
+
+
+def _annotateScoreTask(args):
+    """Annotate one score in a worker, returning the error message instead of raising."""
+    inputPath, df, summary, predictions, outputLayers = args
+    try:
+        annotateScore(inputPath, df, summary, predictions, outputLayers)
+    except Exception as e:
+        return inputPath, f"{type(e).__name__}: {e}"
+    return inputPath, None
+
+
+def infer_chords_batch(inputPaths, batchSize=64, filesPerBatch=64, nJobs=1, pool=None, verbose=True):
+    """Annotate many scores with a single model.
+
+    The scores are parsed and encoded in parallel, their padded sequences are packed
+    into one ``model.predict`` call per group of ``filesPerBatch`` files, and the predictions
+    are scattered back to each score to write its "_annotated.rntxt" analysis.
+    A file that fails does not stop the others, its error is returned in the summary.
+
+    Parameters
+    ----------
+    inputPaths : list[str]
+        Score files to annotate
+    batchSize : int
+         (Default value = 64)
+         Number of sequences per batch of the model
+    filesPerBatch : int
+         (Default value = 64)
+         Number of files whose sequences are packed in one predict call
+    nJobs : int
+         (Default value = 1)
+         Number of processes used to parse, encode and annotate the scores
+    pool : multiprocessing.Pool
+         (Default value = None)
+         Pool to use instead of creating one with nJobs processes
+    verbose : bool
+         (Default value = True)
+
+    Returns
+    -------
+    summary : dict
+        Number of files and frames, errors by file, time and throughput in frames/sec
+
     """
+    inputPaths = list(inputPaths)
+    start = time.monotonic()
+    ownPool = pool is None and nJobs > 1
+    if ownPool:
+        # Created before the model is loaded, the workers do not need tensorflow
+        pool = mp.Pool(nJobs)
+    mapper = pool.imap if pool is not None else map
+    model = get_model()
+    inputs, outputLayers, seqlen = modelSignature(model)
+    summary = {"files": 0, "frames": 0, "errors": {}, "predict_seconds": 0.0}
+    try:
+        for groupStart in range(0, len(inputPaths), filesPerBatch):
+            group = inputPaths[groupStart:groupStart + filesPerBatch]
+            encoded = []
+            for inputPath, df, scoreSummary, modelInputs, error in mapper(
+                _encodeScoreTask, [(path, inputs, seqlen) for path in group]
+            ):
+                if error is not None:
+                    summary["errors"][inputPath] = error
+                else:
+                    encoded.append((inputPath, df, scoreSummary, modelInputs))
+            if not encoded:
+                continue
+            # Pack the sequences of all the scores, then split the predictions back per score
+            sequences = [modelInputs[0].shape[0] for _, _, _, modelInputs in encoded]
+            packed = [
+                np.concatenate([modelInputs[i] for _, _, _, modelInputs in encoded])
+                for i in range(len(inputs))
+            ]
+            predictStart = time.monotonic()
+            predictions = model.predict(packed, batch_size=batchSize, verbose=0)
+            summary["predict_seconds"] += time.monotonic() - predictStart
+            if not isinstance(predictions, list):
+                predictions = [predictions]
+            splits = np.cumsum(sequences)[:-1]
+            predictions = [np.split(p, splits) for p in predictions]
+            tasks = [
+                (inputPath, df, scoreSummary, [p[idx] for p in predictions], outputLayers)
+                for idx, (inputPath, df, scoreSummary, _) in enumerate(encoded)
+            ]
+            frames = {inputPath: len(df.index) for inputPath, df, _, _ in encoded}
+            for inputPath, error in mapper(_annotateScoreTask, tasks):
+                if error is not None:
+                    summary["errors"][inputPath] = error
+                else:
+                    summary["files"] += 1
+                    summary["frames"] += frames[inputPath]
+    finally:
+        if ownPool:
+            pool.close()
+            pool.join()
+    summary["seconds"] = time.monotonic() - start
+    summary["frames_per_second"] = summary["frames"] / summary["seconds"] if summary["seconds"] > 0 else 0.0
+    if verbose:
+        print(
+            f"Annotated {summary['files']} files, {summary['frames']} frames, "
+            f"{len(summary['errors'])} errors, {summary['frames_per_second']:.1f} frames/sec"
+        )
+    return summary
+
+
+def infer_chords(inputPath, useGpu=False, batchSize=64, nJobs=1):
+    """Annotate a score, or all the scores of a directory with infer_chords_batch.
+    If an inference client is set (see set_inference_client), the scores are sent to its service.
 
     Parameters
     ----------
@@ -327,6 +607,10 @@ def infer_chords(inputPath, useGpu=False):
         
     useGpu :
          (Default value = False)
+    batchSize :
+         (Default value = 64)
+    nJobs :
+         (Default value = 1)
 
     Returns
     -------
@@ -334,7 +618,14 @@ def infer_chords(inputPath, useGpu=False):
     """
 
     if not os.path.isdir(inputPath):
-        predict(get_model(), inputPath)
+        if INFERENCE_CLIENT is not None:
+            errors = INFERENCE_CLIENT.annotate([inputPath])["errors"]
+            if errors:
+                raise Exception(f"Chord inference failed for {inputPath} : {errors[inputPath]}")
+        else:
+            predict(get_model(), inputPath)
+        return
+    inputPaths = []
     for root, _, files in os.walk(inputPath):
         for f in files:
             name, ext = os.path.splitext(f)
@@ -343,6 +634,7 @@ def infer_chords(inputPath, useGpu=False):
             if "_annotated" in name:
                 # do not recursively annotate an annotated_file
                 continue
-            filepath = os.path.join(root, f)
-            predict(get_model(), inputPath=filepath)
-
+            inputPaths.append(os.path.join(root, f))
+    if INFERENCE_CLIENT is not None:
+        return INFERENCE_CLIENT.annotate(inputPaths)
+    return infer_chords_batch(inputPaths, batchSize=batchSize, nJobs=nJobs)
@@ -19,6 +19,189 @@ from .feature_representation import (
 )
 
 
+def _flatten(column):
+    """Frame and value of each element of a column of lists.
+
+    Parameters
+    ----------
+    column :
+        
+
+    Returns
+    -------
+
+    """
+    values = column.to_list()
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    frames = np.repeat(np.arange(len(values)), lengths)
+    return frames, [x for value in values for x in value]
+
+
+def _framesSinceStart(starts, maximum):
+    """Number of frames since the last start (or the first frame), capped at maximum.
+
+    Parameters
+    ----------
+    starts :
+        
+    maximum :
+        
+
+    Returns
+    -------
+
+    """
+    frames = np.arange(len(starts))
+    lastStart = np.maximum.accumulate(np.where(starts, frames, 0))
+    return np.minimum(frames - lastStart, maximum)
+
+
+def _encodeManyHot(array, frames, values, transpositions, featureIndex):
+    """Sets array[t, frame, featureIndex(value, transpositions[t])] to 1.
+
+    featureIndex is called once per distinct value and transposition,
+    the values for which it returns None are not encoded.
+
+    Parameters
+    ----------
+    array :
+        Array of shape (len(transpositions), frames, features)
+    frames :
+        Frame of each value
+    values :
+        
+    transpositions :
+        
+    featureIndex :
+        
+
+    Returns
+    -------
+
+    """
+    distinct = {}
+    codes = np.fromiter(
+        (distinct.setdefault(value, len(distinct)) for value in values),
+        dtype=np.int64,
+        count=len(values),
+    )
+    table = np.full((len(transpositions), len(distinct)), -1, dtype=np.int64)
+    for t, transposition in enumerate(transpositions):
+        for code, value in enumerate(distinct):
+            index = featureIndex(value, transposition)
+            if index is not None:
+                table[t, code] = index
+    indices = table[:, codes]
+    t, n = np.nonzero(indices >= 0)
+    array[t, frames[n], indices[t, n]] = 1
+    return array
+
+
+class _TranspositionEncoding(FeatureRepresentation):
+    """Representation that encodes all the transpositions of a score at once."""
+
+    def run(self, transposition="P1"):
+        """
+
+        Parameters
+        ----------
+        transposition :
+             (Default value = "P1")
+
+        Returns
+        -------
+
+        """
+        return self.runTranspositions([transposition])[0]
+
+    def runTranspositions(self, transpositions):
+        """
+
+        Parameters
+        ----------
+        transpositions :
+            
+
+        Returns
+        -------
+
+        """
+        return self.encode(self.df, transpositions, self.dtype)
+
+    @classmethod
+    def encode(cls, df, transpositions, dtype="i8"):
+        """
+
+        Parameters
+        ----------
+        df :
+            
+        transpositions :
+            
+        dtype :
+             (Default value = "i8")
+
+        Returns
+        -------
+
+        """
+        raise NotImplementedError
+
+
+class _NotesEncoding(_TranspositionEncoding):
+    """Many-hot encoding of the notes of each frame, one feature per note."""
+    bassOnly = False
+
+    @classmethod
+    def featureIndex(cls, note, transposition):
+        """
+
+        Parameters
+        ----------
+        note :
+            
+        transposition :
+            
+
+        Returns
+        -------
+
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def encode(cls, df, transpositions, dtype="i8"):
+        """Encodes all the transpositions at once.
+
+        Parameters
+        ----------
+        df :
+            
+        transpositions :
+            List of interval strings (e.g., 'm3')
+        dtype :
+             (Default value = "i8")
+
+        Returns
+        -------
+        array :
+            Array of shape (len(transpositions), frames, features)
+
+        """
+        array = np.zeros((len(transpositions), len(df.index), cls.features), dtype=dtype)
+        if cls.bassOnly:
+            frames = np.arange(len(df.index))
+            notes = [notes[0] for notes in df.s_notes]
+        else:
+            frames, notes = _flatten(df.s_notes)
+        return _encodeManyHot(array, frames, notes, transpositions, cls.featureIndex)
+
+
+class _BassEncoding(_NotesEncoding):
+    """One-hot encoding of the bass of each frame."""
+    bassOnly = True
+
+
 class MeasureOnset7(FeatureRepresentationTI):
     """ """
     features = len(NOTEDURATIONS)
@@ -38,17 +221,28 @@ class MeasureOnset7(FeatureRepresentationTI):
         -------
 
         """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        prev_measure = -1
-        idx = 0
-        for frame, measure in enumerate(self.df.s_measure):
-            if measure != prev_measure:
-                idx = 0
-                prev_measure = measure
-            pattern = self.pattern[idx]
-            array[frame] = pattern
-            idx = min(idx + 1, len(self.pattern) - 1)
-        return array
+        return self.encode(self.df, self.dtype)
+
+    @classmethod
+    def encode(cls, df, dtype="i8"):
+        """
+
+        Parameters
+        ----------
+        df :
+            
+        dtype :
+             (Default value = "i8")
+
+        Returns
+        -------
+
+        """
+        patterns = np.array(cls.pattern, dtype=dtype)
+        measures = df.s_measure.to_numpy()
+        starts = np.ones(len(measures), dtype=bool)
+        starts[1:] = measures[1:] != measures[:-1]
+        return patterns[_framesSinceStart(starts, len(patterns) - 1)]
 
     @classmethod
     def decode(cls, array):
@@ -86,15 +280,27 @@ class NoteOnset7(MeasureOnset7):
         -------
 
         """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        idx = 0
-        for frame, onset in enumerate(self.df.s_isOnset):
-            if sum(onset) > 0:
-                idx = 0
-            pattern = self.pattern[idx]
-            array[frame] = pattern
-            idx = min(idx + 1, len(self.pattern) - 1)
-        return array
+        return self.encode(self.df, self.dtype)
+
+    @classmethod
+    def encode(cls, df, dtype="i8"):
+        """
+
+        Parameters
+        ----------
+        df :
+            
+        dtype :
+             (Default value = "i8")
+
+        Returns
+        -------
+
+        """
+        patterns = np.array(cls.pattern, dtype=dtype)
+        frames, onsets = _flatten(df.s_isOnset)
+        starts = np.bincount(frames, weights=np.asarray(onsets, dtype=float), minlength=len(df.index)) > 0
+        return patterns[_framesSinceStart(starts, len(patterns) - 1)]
 
     @classmethod
     def decode(cls, array):
@@ -135,10 +341,26 @@ class MeasureNoteOnset14(FeatureRepresentationTI):
         -------
 
         """
-        self.measure7 = MeasureOnset7(self.df).run(transposition)
-        self.note7 = NoteOnset7(self.df).run(transposition)
-        array = np.concatenate((self.measure7, self.note7), axis=1)
-        return array
+        return self.encode(self.df, self.dtype)
+
+    @classmethod
+    def encode(cls, df, dtype="i8"):
+        """
+
+        Parameters
+        ----------
+        df :
+            
+        dtype :
+             (Default value = "i8")
+
+        Returns
+        -------
+
+        """
+        measure7 = MeasureOnset7.encode(df, dtype)
+        note7 = NoteOnset7.encode(df, dtype)
+        return np.concatenate((measure7, note7), axis=1)
 
     @classmethod
     def decode(cls, array):
@@ -158,30 +380,26 @@ class MeasureNoteOnset14(FeatureRepresentationTI):
         return [(tuple(mm), tuple(n)) for mm, n in zip(measure7, note7)]
 
 
-class Bass12(FeatureRepresentation):
+class Bass12(_BassEncoding):
     """ """
     features = len(PITCHCLASSES)
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def featureIndex(cls, note, transposition):
+        """Pitch class of a transposed note
 
         Parameters
         ----------
+        note :
+            
         transposition :
-             (Default value = "P1")
+            
 
         Returns
         -------
 
         """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            bass = notes[0]
-            transposed = TransposePitch(bass, transposition)
-            pitchObj = m21Pitch(transposed)
-            pitchClass = pitchObj.pitchClass
-            array[frame, pitchClass] = 1
-        return array
+        return m21Pitch(TransposePitch(note, transposition)).pitchClass
 
     @classmethod
     def decode(cls, array):
@@ -205,31 +423,26 @@ class Bass12(FeatureRepresentation):
         return ret
 
 
-class Bass7(FeatureRepresentation):
+class Bass7(_BassEncoding):
     """ """
     features = len(NOTENAMES)
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def featureIndex(cls, note, transposition):
+        """Letter of a transposed note
 
         Parameters
         ----------
+        note :
+            
         transposition :
-             (Default value = "P1")
+            
 
         Returns
         -------
 
         """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            bass = notes[0]
-            transposed = TransposePitch(bass, transposition)
-            pitchObj = m21Pitch(transposed)
-            pitchLetter = pitchObj.step
-            pitchLetterIndex = NOTENAMES.index(pitchLetter)
-            array[frame, pitchLetterIndex] = 1
-        return array
+        return NOTENAMES.index(m21Pitch(TransposePitch(note, transposition)).step)
 
     @classmethod
     def decode(cls, array):
@@ -253,27 +466,32 @@ class Bass7(FeatureRepresentation):
         return ret
 
 
-class Bass19(FeatureRepresentation):
+class Bass19(_TranspositionEncoding):
     """ """
     features = Bass12.features + Bass7.features
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def encode(cls, df, transpositions, dtype="i8"):
+        """Encodes all the transpositions at once.
 
         Parameters
         ----------
-        transposition :
-             (Default value = "P1")
+        df :
+            
+        transpositions :
+            List of interval strings (e.g., 'm3')
+        dtype :
+             (Default value = "i8")
 
         Returns
         -------
+        array :
+            Array of shape (len(transpositions), frames, features)
 
         """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        self.letter = Bass7(self.df).run(transposition)
-        self.pc = Bass12(self.df).run(transposition)
-        array = np.concatenate((self.letter, self.pc), axis=1)
-        return array
+        letter = Bass7.encode(df, transpositions, dtype)
+        pc = Bass12.encode(df, transpositions, dtype)
+        return np.concatenate((letter, pc), axis=2)
 
     @classmethod
     def decode(cls, array):
@@ -293,30 +511,26 @@ class Bass19(FeatureRepresentation):
         return [(l, pc) for l, pc in zip(letters, pcs)]
 
 
-class Chromagram12(FeatureRepresentation):
+class Chromagram12(_NotesEncoding):
     """ """
     features = len(PITCHCLASSES)
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def featureIndex(cls, note, transposition):
+        """Pitch class of a transposed note
 
         Parameters
         ----------
+        note :
+            
         transposition :
-             (Default value = "P1")
+            
 
         Returns
         -------
 
         """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            for note in notes:
-                transposedNote = TransposePitch(note, transposition)
-                pitchObj = m21Pitch(transposedNote)
-                pitchClass = pitchObj.pitchClass
-                array[frame, pitchClass] = 1
-        return array
+        return Bass12.featureIndex(note, transposition)
 
     @classmethod
     def decode(cls, array):
@@ -340,31 +554,26 @@ class Chromagram12(FeatureRepresentation):
         return ret
 
 
-class Chromagram7(FeatureRepresentation):
+class Chromagram7(_NotesEncoding):
     """ """
     features = len(NOTENAMES)
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def featureIndex(cls, note, transposition):
+        """Letter of a transposed note
 
         Parameters
         ----------
+        note :
+            
         transposition :
-             (Default value = "P1")
+            
 
         Returns
         -------
 
         """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            for note in notes:
-                transposedNote = TransposePitch(note, transposition)
-                pitchObj = m21Pitch(transposedNote)
-                pitchLetter = pitchObj.step
-                pitchLetterIndex = NOTENAMES.index(pitchLetter)
-                array[frame, pitchLetterIndex] = 1
-        return array
+        return Bass7.featureIndex(note, transposition)
 
     @classmethod
     def decode(cls, array):
@@ -388,27 +597,32 @@ class Chromagram7(FeatureRepresentation):
         return ret
 
 
-class Chromagram19(FeatureRepresentation):
+class Chromagram19(_TranspositionEncoding):
     """ """
     features = Chromagram12.features + Chromagram7.features
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def encode(cls, df, transpositions, dtype="i8"):
+        """Encodes all the transpositions at once.
 
         Parameters
         ----------
-        transposition :
-             (Default value = "P1")
+        df :
+            
+        transpositions :
+            List of interval strings (e.g., 'm3')
+        dtype :
+             (Default value = "i8")
 
         Returns
         -------
+        array :
+            Array of shape (len(transpositions), frames, features)
 
         """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        self.letter = Chromagram7(self.df).run(transposition)
-        self.pc = Chromagram12(self.df).run(transposition)
-        array = np.concatenate((self.letter, self.pc), axis=1)
-        return array
+        letter = Chromagram7.encode(df, transpositions, dtype)
+        pc = Chromagram12.encode(df, transpositions, dtype)
+        return np.concatenate((letter, pc), axis=2)
 
     @classmethod
     def decode(cls, array):
@@ -434,16 +648,40 @@ class Intervals19(FeatureRepresentationTI):
 
     def run(self):
         """ """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, intervals in enumerate(self.df.s_intervals):
-            for interval in intervals:
-                intervalObj = m21IntervalStr(interval)
-                chromatic = intervalObj.chromatic.mod12
-                genericClass = intervalObj.generic.simpleUndirected - 1
-                array[frame, genericClass] = 1
-                array[frame, chromatic + len(NOTENAMES)] = 1
+        return self.encode(self.df, self.dtype)
+
+    @classmethod
+    def encode(cls, df, dtype="i8"):
+        """
+
+        Parameters
+        ----------
+        df :
+            
+        dtype :
+             (Default value = "i8")
+
+        Returns
+        -------
+
+        """
+        array = np.zeros((len(df.index), cls.features), dtype=dtype)
+        frames, intervals = _flatten(df.s_intervals)
+        _encodeManyHot(array[np.newaxis], frames, intervals, [None], cls.genericIndex)
+        _encodeManyHot(array[np.newaxis], frames, intervals, [None], cls.chromaticIndex)
         return array
 
+
+    @classmethod
+    def genericIndex(cls, interval, transposition=None):
+        """Generic interval class of an interval string"""
+        return m21IntervalStr(interval).generic.simpleUndirected - 1
+
+    @classmethod
+    def chromaticIndex(cls, interval, transposition=None):
+        """Chromatic interval class of an interval string, after the generic features"""
+        return m21IntervalStr(interval).chromatic.mod12 + len(NOTENAMES)
+
     @classmethod
     def decode(cls, array):
         """
@@ -473,13 +711,34 @@ class Intervals39(FeatureRepresentationTI):
 
     def run(self):
         """ """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, intervals in enumerate(self.df.s_intervals):
-            for interval in intervals:
-                intervalIndex = INTERVALCLASSES.index(interval)
-                array[frame, intervalIndex] = 1
+        return self.encode(self.df, self.dtype)
+
+    @classmethod
+    def encode(cls, df, dtype="i8"):
+        """
+
+        Parameters
+        ----------
+        df :
+            
+        dtype :
+             (Default value = "i8")
+
+        Returns
+        -------
+
+        """
+        array = np.zeros((len(df.index), cls.features), dtype=dtype)
+        frames, intervals = _flatten(df.s_intervals)
+        _encodeManyHot(array[np.newaxis], frames, intervals, [None], cls.featureIndex)
         return array
 
+
+    @classmethod
+    def featureIndex(cls, interval, transposition=None):
+        """Index of an interval string in INTERVALCLASSES"""
+        return INTERVALCLASSES.index(interval)
+
     @classmethod
     def decode(cls, array):
         """
@@ -502,30 +761,29 @@ class Intervals39(FeatureRepresentationTI):
         return ret
 
 
-class Bass35(FeatureRepresentation):
+class Bass35(_BassEncoding):
     """ """
     features = len(SPELLINGS)
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def featureIndex(cls, note, transposition):
+        """Spelling of a transposed note, None if it has more than two accidentals
 
         Parameters
         ----------
+        note :
+            
         transposition :
-             (Default value = "P1")
+            
 
         Returns
         -------
 
         """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            bass = re.sub(r"\d", "", notes[0])
-            transposed = TransposePitch(bass, transposition)
-            if transposed in SPELLINGS:
-                spellingIndex = SPELLINGS.index(transposed)
-                array[frame, spellingIndex] = 1
-        return array
+        transposed = TransposePitch(re.sub(r"\d", "", note), transposition)
+        if transposed in SPELLINGS:
+            return SPELLINGS.index(transposed)
+        return None
 
     @classmethod
     def decode(cls, array):
@@ -545,31 +803,26 @@ class Bass35(FeatureRepresentation):
         return [SPELLINGS[np.argmax(onehot)] for onehot in array]
 
 
-class Chromagram35(FeatureRepresentation):
+class Chromagram35(_NotesEncoding):
     """ """
     features = len(SPELLINGS)
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def featureIndex(cls, note, transposition):
+        """Spelling of a transposed note, None if it has more than two accidentals
 
         Parameters
         ----------
+        note :
+            
         transposition :
-             (Default value = "P1")
+            
 
         Returns
         -------
 
         """
-        array = np.zeros(self.shape, dtype=self.dtype)
-        for frame, notes in enumerate(self.df.s_notes):
-            notes = [re.sub(r"\d", "", n) for n in notes]
-            for note in notes:
-                transposed = TransposePitch(note, transposition)
-                if transposed in SPELLINGS:
-                    spellingIndex = SPELLINGS.index(transposed)
-                    array[frame, spellingIndex] = 1
-        return array
+        return Bass35.featureIndex(note, transposition)
 
     @classmethod
     def decode(cls, array):
@@ -593,26 +846,32 @@ class Chromagram35(FeatureRepresentation):
         return ret
 
 
-class BassChromagram70(FeatureRepresentation):
+class BassChromagram70(_TranspositionEncoding):
     """ """
     features = Bass35.features + Chromagram35.features
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def encode(cls, df, transpositions, dtype="i8"):
+        """Encodes all the transpositions at once.
 
         Parameters
         ----------
-        transposition :
-             (Default value = "P1")
+        df :
+            
+        transpositions :
+            List of interval strings (e.g., 'm3')
+        dtype :
+             (Default value = "i8")
 
         Returns
         -------
+        array :
+            Array of shape (len(transpositions), frames, features)
 
         """
-        self.bass35 = Bass35(self.df).run(transposition)
-        self.chromagram35 = Chromagram35(self.df).run(transposition)
-        array = np.concatenate((self.bass35, self.chromagram35), axis=1)
-        return array
+        bass35 = Bass35.encode(df, transpositions, dtype)
+        chromagram35 = Chromagram35.encode(df, transpositions, dtype)
+        return np.concatenate((bass35, chromagram35), axis=2)
 
     @classmethod
     def decode(cls, array):
@@ -632,27 +891,32 @@ class BassChromagram70(FeatureRepresentation):
         return [(b, ch) for b, ch in zip(bass35, chromagram35)]
 
 
-class BassChromagram38(FeatureRepresentation):
+class BassChromagram38(_TranspositionEncoding):
     """ """
     features = Bass19.features + Chromagram19.features
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def encode(cls, df, transpositions, dtype="i8"):
+        """Encodes all the transpositions at once.
 
         Parameters
         ----------
-        transposition :
-             (Default value = "P1")
+        df :
+            
+        transpositions :
+            List of interval strings (e.g., 'm3')
+        dtype :
+             (Default value = "i8")
 
         Returns
         -------
+        array :
+            Array of shape (len(transpositions), frames, features)
 
         """
-        # super().__init__(df)
-        self.bass19 = Bass19(self.df).run(transposition)
-        self.chromagram19 = Chromagram19(self.df).run(transposition)
-        array = np.concatenate((self.bass19, self.chromagram19), axis=1)
-        return array
+        bass19 = Bass19.encode(df, transpositions, dtype)
+        chromagram19 = Chromagram19.encode(df, transpositions, dtype)
+        return np.concatenate((bass19, chromagram19), axis=2)
 
     @classmethod
     def decode(cls, array):
@@ -672,26 +936,33 @@ class BassChromagram38(FeatureRepresentation):
         return [(b[0], b[1], c[0], c[1]) for b, c in zip(bass19, chromagram19)]
 
 
-class BassIntervals58(FeatureRepresentation):
+class BassIntervals58(_TranspositionEncoding):
     """ """
     features = Bass19.features + Intervals39.features
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def encode(cls, df, transpositions, dtype="i8"):
+        """Encodes all the transpositions at once.
 
         Parameters
         ----------
-        transposition :
-             (Default value = "P1")
+        df :
+            
+        transpositions :
+            List of interval strings (e.g., 'm3')
+        dtype :
+             (Default value = "i8")
 
         Returns
         -------
+        array :
+            Array of shape (len(transpositions), frames, features)
 
         """
-        self.bass19 = Bass19(self.df).run(transposition)
-        self.intervals39 = Intervals39(self.df).run()
-        array = np.concatenate((self.bass19, self.intervals39), axis=1)
-        return array
+        bass19 = Bass19.encode(df, transpositions, dtype)
+        intervals39 = Intervals39.encode(df, dtype)
+        intervals39 = np.broadcast_to(intervals39, (len(transpositions),) + intervals39.shape)
+        return np.concatenate((bass19, intervals39), axis=2)
 
     @classmethod
     def decode(cls, array):
@@ -711,26 +982,33 @@ class BassIntervals58(FeatureRepresentation):
         return [(b[0], b[1], i) for b, i in zip(bass19, intervals39)]
 
 
-class BassChromagramIntervals77(FeatureRepresentation):
+class BassChromagramIntervals77(_TranspositionEncoding):
     """ """
     features = BassChromagram38.features + Intervals39.features
 
-    def run(self, transposition="P1"):
-        """
+    @classmethod
+    def encode(cls, df, transpositions, dtype="i8"):
+        """Encodes all the transpositions at once.
 
         Parameters
         ----------
-        transposition :
-             (Default value = "P1")
+        df :
+            
+        transpositions :
+            List of interval strings (e.g., 'm3')
+        dtype :
+             (Default value = "i8")
 
         Returns
         -------
+        array :
+            Array of shape (len(transpositions), frames, features)
 
         """
-        self.bassChroma38 = BassChromagram38(self.df).run(transposition)
-        self.intervals39 = Intervals39(self.df).run()
-        array = np.concatenate((self.bassChroma38, self.intervals39), axis=1)
-        return array
+        bassChroma38 = BassChromagram38.encode(df, transpositions, dtype)
+        intervals39 = Intervals39.encode(df, dtype)
+        intervals39 = np.broadcast_to(intervals39, (len(transpositions),) + intervals39.shape)
+        return np.concatenate((bassChroma38, intervals39), axis=2)
 
     @classmethod
     def decode(cls, array):
@@ -13,6 +13,9 @@ FLOATSCALE = 4
 FRAMEBASENOTE = 32
 FIXEDOFFSET = round(4.0 / FRAMEBASENOTE, FLOATSCALE)
 
+# Measure number of the elements that are not in a measure
+NO_MEASURE = -(2 ** 31)
+
 S_COLUMNS = [
     "s_offset",
     "s_duration",
@@ -122,7 +125,7 @@ def _lastOffset(m21Score):
     return lastOffset
 
 
-def _initialDataFrame(s, fmt=None):
+def _initialDataFrame(s, fmt=None, chordified=None):
     """Parses a score and produces a pandas dataframe.
     
     The features obtained are the note names, their position in the score,
@@ -135,6 +138,9 @@ def _initialDataFrame(s, fmt=None):
         
     fmt :
          (Default value = None)
+    chordified :
+         (Default value = None)
+         Notes and rests of the chordified score, computed if None
 
     Returns
     -------
@@ -142,7 +148,9 @@ def _initialDataFrame(s, fmt=None):
     """
     dfdict = {col: [] for col in S_COLUMNS}
     measureNumberShift = _measureNumberShift(s)
-    for c in s.chordify().flat.notesAndRests:
+    if chordified is None:
+        chordified = s.chordify().flat.notesAndRests
+    for c in chordified:
         dfdict["s_offset"].append(round(float(c.offset), FLOATSCALE))
         dfdict["s_duration"].append(round(float(c.quarterLength), FLOATSCALE))
         dfdict["s_measure"].append(c.measureNumber + measureNumberShift)
@@ -215,6 +223,81 @@ def _reindexDataFrame(df, fixedOffset=FIXEDOFFSET):
     return df
 
 
+def _chordifiedSummary(s, chordified):
+    """Everything the inference needs from the chordified score to place its analysis.
+
+    Only the chordified notes and chords that can carry an analysis are kept, in score order,
+    with their offset, bass (midi number of their first pitch), measure number and beat.
+
+    Parameters
+    ----------
+    s :
+        
+    chordified :
+        Notes and rests of the chordified score
+
+    Returns
+    -------
+    summary : dict
+        Arrays of the notes, time signatures, composer and title of the score
+
+    """
+    offsets, bass, measures, beats = [], [], [], []
+    for n in chordified:
+        if isinstance(n, music21.note.Note):
+            midi = n.pitch.midi
+        elif isinstance(n, music21.chord.Chord) and not isinstance(
+            n, music21.harmony.NoChord
+        ) and len(n) > 0:
+            midi = n[0].pitch.midi
+        else:
+            continue
+        offsets.append(float(n.offset))
+        bass.append(midi)
+        measures.append(NO_MEASURE if n.measureNumber is None else n.measureNumber)
+        beats.append(float(n.beat))
+    timeSignatures = list(s.flat.getElementsByClass("TimeSignature"))
+    metadata = s.metadata
+    return {
+        "offsets": np.asarray(offsets, dtype=np.float64),
+        "bass": np.asarray(bass, dtype=np.int16),
+        "measures": np.asarray(measures, dtype=np.int64),
+        "beats": np.asarray(beats, dtype=np.float64),
+        "tsMeasures": np.asarray(
+            [NO_MEASURE if ts.measureNumber is None else ts.measureNumber for ts in timeSignatures],
+            dtype=np.int64,
+        ),
+        "tsBeats": np.asarray([float(ts.beat) for ts in timeSignatures], dtype=np.float64),
+        "tsRatios": np.asarray([ts.ratioString for ts in timeSignatures], dtype=np.str_),
+        "composer": np.asarray((metadata.composer if metadata else None) or "", dtype=np.str_),
+        "title": np.asarray((metadata.title if metadata else None) or "", dtype=np.str_),
+    }
+
+
+def parseScoreSummary(f, fmt=None):
+    """Parses and chordifies a score once.
+
+    Parameters
+    ----------
+    f :
+        
+    fmt :
+         (Default value = None)
+
+    Returns
+    -------
+    df :
+        Salami-sliced dataframe of the score (see parseScore with eventBased=True)
+    summary :
+        Chordified notes of the score used to place its analysis
+
+    """
+    s = m21Parse(f, fmt)
+    chordified = s.chordify().flat.notesAndRests
+    df = _initialDataFrame(s, fmt, chordified=chordified)
+    return df, _chordifiedSummary(s, chordified)
+
+
 def parseScore(f, fmt=None, fixedOffset=FIXEDOFFSET, eventBased=False):
     """
 
@@ -234,6 +317,11 @@ def parseScore(f, fmt=None, fixedOffset=FIXEDOFFSET, eventBased=False):
 
     """
 
+    from .frame_cache import get_frame_cache
+    cache = get_frame_cache()
+    if cache is not None:
+        return cache.frames(f, fmt=fmt, fixedOffset=fixedOffset, eventBased=eventBased)
+
     # Step 0: Use music21 to parse the score
     s = m21Parse(f, fmt)
 
@@ -0,0 +1,176 @@
+"""Long-lived local process running the chord inference model for other processes."""
+
+import multiprocessing as mp
+import time
+import uuid
+from multiprocessing.connection import wait
+
+from .inference import get_model, infer_chords_batch
+
+
+def _serve(connections, control, batchSize, filesPerBatch, nJobs, maxWait):
+    """Loop of the service process.
+
+    Each client sends (request id, score paths) on its connection, the requests that arrive
+    within maxWait seconds are annotated together. The reply of each request is
+    (request id, {"errors": ...}). Stops when the control connection receives None.
+
+    """
+    pool = mp.Pool(nJobs) if nJobs > 1 else None
+    get_model()
+    running = True
+
+    def receive(timeout=None):
+        nonlocal running
+        requests = []
+        for connection in wait(connections + [control], timeout=timeout):
+            if connection is control:
+                control.recv()
+                running = False
+                continue
+            try:
+                requestId, paths = connection.recv()
+            except Exception:
+                # Request interrupted by a client that was killed
+                continue
+            requests.append((connection, requestId, paths))
+        return requests
+
+    try:
+        while running:
+            pending = receive()
+            deadline = time.monotonic() + maxWait
+            while running and time.monotonic() < deadline:
+                requests = receive(timeout=deadline - time.monotonic())
+                if not requests:
+                    break
+                pending += requests
+            if not pending:
+                continue
+            inputPaths = [path for _, _, paths in pending for path in paths]
+            summary = infer_chords_batch(
+                inputPaths, batchSize=batchSize, filesPerBatch=filesPerBatch, pool=pool, verbose=False
+            )
+            for connection, requestId, paths in pending:
+                errors = {path: summary["errors"][path] for path in paths if path in summary["errors"]}
+                connection.send((requestId, {"errors": errors}))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+class InferenceClient:
+    """Send scores to an InferenceService and wait for their annotation.
+
+    A client is created by the service before the process that uses it, and is passed
+    to this process as an argument (see InferenceService.client).
+
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def annotate(self, inputPaths, timeout=None):
+        """Annotate scores with the service, writing their "_annotated.rntxt" analysis.
+
+        Parameters
+        ----------
+        inputPaths : list[str]
+
+        timeout : float
+             (Default value = None)
+             Maximum time to wait for the service, None to wait indefinitely
+
+        Returns
+        -------
+        result : dict
+            Error messages of the files that failed, by path ("errors" key)
+
+        """
+        requestId = uuid.uuid4().hex
+        self.connection.send((requestId, list(inputPaths)))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not self.connection.poll(remaining):
+                raise TimeoutError(f"No answer of the inference service after {timeout} s")
+            replyId, result = self.connection.recv()
+            # Replies of requests abandoned by a previous user of this client are dropped
+            if replyId == requestId:
+                return result
+
+
+class InferenceService:
+    """Warm chord inference model in a local worker process, fed by other processes.
+
+    The model is loaded once, and the requests of all the clients that arrive within ``maxWait``
+    seconds are packed into the same model batches. Each client has its own pipe to the service,
+    so a client process can be killed without blocking the others.
+
+    Examples
+    --------
+
+    >>> service = InferenceService(nbClients=4).start()
+    >>> client = service.client(0)  # Pass it to a process, then use set_inference_client(client)
+    >>> service.stop()
+
+    """
+
+    def __init__(self, nbClients=1, batchSize=64, filesPerBatch=64, nJobs=1, maxWait=0.05):
+        """
+
+        Parameters
+        ----------
+        nbClients : int
+             (Default value = 1)
+             Number of clients, one per process feeding the service
+        batchSize : int
+             (Default value = 64)
+        filesPerBatch : int
+             (Default value = 64)
+        nJobs : int
+             (Default value = 1)
+             Number of processes of the service used to parse, encode and annotate the scores
+        maxWait : float
+             (Default value = 0.05)
+             Time to wait for other requests before running a batch
+
+        """
+        pipes = [mp.Pipe() for _ in range(nbClients)]
+        self.serviceConnections = [serviceConnection for serviceConnection, _ in pipes]
+        self.clientConnections = [clientConnection for _, clientConnection in pipes]
+        self.control, self.serviceControl = mp.Pipe()
+        self.batchSize = batchSize
+        self.filesPerBatch = filesPerBatch
+        self.nJobs = nJobs
+        self.maxWait = maxWait
+        self.process = None
+
+    def start(self):
+        """Start the service process"""
+        # Not daemonic, the service may have its own pool of processes
+        self.process = mp.Process(
+            target=_serve,
+            args=(self.serviceConnections, self.serviceControl, self.batchSize, self.filesPerBatch,
+                  self.nJobs, self.maxWait),
+        )
+        self.process.start()
+        return self
+
+    def client(self, clientId):
+        """Client number ``clientId`` of the service"""
+        return InferenceClient(self.clientConnections[clientId])
+
+    def stop(self):
+        """Stop the service once the pending requests are annotated"""
+        if self.process is not None:
+            self.control.send(None)
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -1,9 +1,12 @@
+import functools
+import operator
+
 from musiclang import Score, Tonality
 import numpy as np
 from scipy.spatial.distance import cdist
 
 from musiclang.analyze.chord_inference_utils import TEMPLATES, COEFFS, CHROMA_VECTORS_MATRIX, PITCH_CLASSES_DICT, \
-    CHORD_TYPE_TO_PITCHES, CHORD_TYPES
+    CHORD_TYPE_TO_PITCHES, CHORD_TYPES, TONALITY_VECTORS, TEMPLATE_CANDIDATES, TEMPLATE_CANDIDATES_TONALITIES
 
 EXTENSION_DICT = {(0, 3): '', (1, 3): '6', (2, 3): '64', (0, 4): '7', (1, 4): '65', (2, 4): '43',
                   (3, 4): '2'}
@@ -41,96 +44,297 @@ def filter_notes(notes, start, end):
     pass
 
 
+def _bar_bounds(bars):
+    starts = np.asarray([bar[0] for bar in bars], dtype=float)
+    ends = np.asarray([bar[1] for bar in bars], dtype=float)
+    return starts, ends
+
+
+def _dense_bar_chroma(note_starts, note_ends, pitch_classes, starts, ends):
+    """
+    Bar chroma through the dense nb_bars x nb_notes matrix of intersection lengths, for unsorted or overlapping bars
+    """
+    pitches_class_matrix = np.zeros((len(pitch_classes), 12))
+    pitches_class_matrix[np.arange(len(pitch_classes)), pitch_classes] = 1.0
+    intersections = np.maximum(0, np.minimum(note_ends[:, None], ends[None, :])
+                               - np.maximum(note_starts[:, None], starts[None, :])).T
+    return intersections.dot(pitches_class_matrix)
+
+
 def get_chroma_vectors(notes, bars):
-    drums_array = notes[:, 5] == 9
-    # Remove drums
-    notes = notes[~drums_array]
-    times_array = np.asarray([notes[:, 0], notes[:, 0] + notes[:, 2]])
-    pitches_class_array = notes[:, 1] % 12
-    # Convert pitch class array to a 12xnb_notes matrix with each row being the indexes of the pitch class
-    pitches_class_matrix = np.asarray(
-        [[1.0 * ((i % 12) == pitch_class) for i in range(12)] for pitch_class in pitches_class_array])
-    starts = np.asarray([bar[0] for bar in bars])
-    ends = np.asarray([bar[1] for bar in bars])
-    # Create a nb_notesxnb_bars array with each cell being the intersection length between the note and the bar
-    intersections = np.maximum(0,
-                               np.minimum(times_array[1, :, None], ends[None, :]) - np.maximum(times_array[0, :, None],
-                                                                                               starts[None, :])).T
-    bar_chroma_vectors = intersections.dot(pitches_class_matrix)
-    # Normalize each rows
-    try:
-        normalizer = bar_chroma_vectors.sum(axis=1)[:, None]
-    except:
-        bar_chroma_vectors = np.zeros((len(bars), 12))
-        normalizer = bar_chroma_vectors.sum(axis=1)[:, None]
+    """
+    Return the chroma vector of each bar : for each pitch class, the total duration of the notes in the bar,
+    normalized to sum to one. Drums are ignored.
+
+    When the bars are sorted and do not overlap (as returned by the midi parser), each note is only matched with
+    the bars it intersects (found with ``np.searchsorted``), so the cost is O(N log B) plus the number of
+    (note, bar) intersections instead of the O(N.B) dense intersection matrix.
+
+    The chords are then chosen with exact float comparisons of correlations, so the values are computed as the
+    former dense object product : for notes with Fraction onsets or durations the intersection lengths are
+    computed exactly before the conversion to float, and the lengths are summed in the order of the notes.
+
+    Parameters
+    ----------
+    notes: np.ndarray
+        Notes array (start, pitch, duration, ..., channel)
+    bars: list of tuple
+        (start, end) of each bar
+
+    Returns
+    -------
+    bar_chroma_vectors: np.ndarray
+        Array of shape (nb_bars, 12)
+    """
+    notes = notes[notes[:, 5] != 9]
+    note_starts = notes[:, 0].astype(float)
+    note_ends = note_starts + notes[:, 2].astype(float)
+    pitch_classes = (notes[:, 1] % 12).astype(int)
+    starts, ends = _bar_bounds(bars)
+
+    if len(bars) > 0 and np.all(starts[1:] >= ends[:-1]) and np.all(ends >= starts):
+        # Range of bars intersected by each note, widened by one bar for the rounding of Fraction times
+        first = np.maximum(np.searchsorted(ends, note_starts, side='right') - 1, 0)
+        last = np.minimum(np.searchsorted(starts, note_ends, side='left'), len(bars) - 1)
+        counts = np.maximum(last - first + 1, 0)
+        note_idx = np.repeat(np.arange(len(notes)), counts)
+        bar_idx = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - first, counts)
+        if notes.dtype == object:
+            exact_starts = notes[:, 0]
+            exact_ends = exact_starts + notes[:, 2]
+            lengths = np.maximum(0, np.minimum(exact_ends[note_idx], ends[bar_idx])
+                                 - np.maximum(exact_starts[note_idx], starts[bar_idx])).astype(float)
+        else:
+            lengths = np.maximum(0, np.minimum(note_ends[note_idx], ends[bar_idx])
+                                 - np.maximum(note_starts[note_idx], starts[bar_idx]))
+        # bincount adds the weights in order
+        bar_chroma_vectors = np.bincount(bar_idx * 12 + pitch_classes[note_idx], weights=lengths,
+                                         minlength=12 * len(bars)).reshape(len(bars), 12)
+    else:
+        bar_chroma_vectors = _dense_bar_chroma(note_starts, note_ends, pitch_classes, starts, ends)
 
+    # Normalize each rows, the rows of an object array were summed from left to right
+    if notes.dtype == object:
+        normalizer = functools.reduce(operator.add, bar_chroma_vectors.T, np.zeros(len(bars)))[:, None]
+    else:
+        normalizer = bar_chroma_vectors.sum(axis=1)[:, None]
     normalizer[normalizer == 0] = 1
     bar_chroma_vectors = bar_chroma_vectors / normalizer
     return bar_chroma_vectors
 
 
+def _range_min(values, lo, hi):
+    """
+    Minimum of ``values[lo[i]:hi[i]]`` for each i, NaN for the empty ranges
+    """
+    result = np.full(len(lo), np.nan)
+    non_empty = hi > lo
+    if non_empty.any():
+        # Even positions of the reduction are the [lo, hi) ranges, the sentinel keeps all indices in bounds
+        bounds = np.stack([lo[non_empty], hi[non_empty]], axis=1).ravel()
+        result[non_empty] = np.minimum.reduceat(np.append(values, np.inf), bounds)[::2]
+    return result
+
+
 def get_bass_note_bar(notes, bars):
     """
-    Return the bass note of each bar
+    Return the bass note of each bar : the pitch class of the lowest note that starts in the bar or ends
+    strictly inside it (None if there is no such note).
+
+    The notes are sorted once by start and once by end, the notes of each bar are then two contiguous ranges
+    found with ``np.searchsorted``, whose minimum pitches are computed with ``np.minimum.reduceat``.
+
     Parameters
     ----------
-    notes
-    bars
+    notes: np.ndarray
+        Notes array (start, pitch, duration, ..., channel)
+    bars: list of tuple
+        (start, end) of each bar
 
     Returns
     -------
-
+    bass_notes: list
     """
-    drums_array = notes[:, 5] == 9
-    notes = notes[~drums_array]
+    notes = notes[notes[:, 5] != 9]
     start_times, end_times = notes[:, 0], notes[:, 0] + notes[:, 2]
+    pitches = notes[:, 1].astype(float)
+    starts, ends = _bar_bounds(bars)
+
+    by_start = np.argsort(start_times, kind='stable')
+    sorted_starts = start_times[by_start].astype(float)
+    lowest_starting = _range_min(pitches[by_start], np.searchsorted(sorted_starts, starts, side='left'),
+                                 np.searchsorted(sorted_starts, ends, side='left'))
+    by_end = np.argsort(end_times, kind='stable')
+    sorted_ends = end_times[by_end].astype(float)
+    lowest_ending = _range_min(pitches[by_end], np.searchsorted(sorted_ends, starts, side='right'),
+                               np.searchsorted(sorted_ends, ends, side='left'))
+
+    lowest = np.fmin(lowest_starting, lowest_ending)
     bass_notes = []
-    for bar in bars:
-        start, end = bar
-        bar_notes = notes[((start_times >= start) & (start_times < end)) | ((end_times > start) & (end_times < end))]
-
-        if len(bar_notes) == 0:
+    for pitch in lowest:
+        if pitch != pitch:
             bass_notes.append(None)
         else:
-            min_pitch = np.min(bar_notes[:, 1]) % 12
-            bass_notes.append(min_pitch)
+            bass_notes.append(notes.dtype.type(pitch) % 12)
     return bass_notes
 
 
-def dynamic_programming_for_chord_inference(lists):
+def chord_change_cost(previous, current):
+    """
+    Transition cost of the chord inference : 1 if the key changes, 0 otherwise.
+
+    Parameters
+    ----------
+    previous: np.ndarray
+        Keys of the previous bar candidates (relative major root, between 0 and 11)
+    current: np.ndarray
+        Keys of the current bar candidates, broadcastable with ``previous``
+
+    Returns
+    -------
+    cost: np.ndarray
+    """
+    return 1.0 * (previous != current)
+
+
+def key_distance_cost(previous, current):
+    """
+    Transition cost of the chord inference : distance between the keys on the circle of fifths, between 0 and 1.
+    Relative minor and major keys share the same key, so changing between them is free.
+
+    Parameters
+    ----------
+    previous: np.ndarray
+        Keys of the previous bar candidates (relative major root, between 0 and 11)
+    current: np.ndarray
+        Keys of the current bar candidates, broadcastable with ``previous``
+
+    Returns
+    -------
+    cost: np.ndarray
+    """
+    fifths = (7 * (current - previous)) % 12
+    return np.minimum(fifths, 12 - fifths) / 6
 
 
-    n = len(lists)
-    m = max(len(lst) for lst in lists)
-    dp = [[float('inf')] * m for _ in range(n)]
-    indices = [[0] * m for _ in range(n)]
+def batch_dynamic_programming_for_chord_inference(batch, transition_cost=chord_change_cost,
+                                                  max_block_size=2 ** 24):
+    """
+    Viterbi decoding of several chord candidate sequences at once.
 
-    for i, s in enumerate(lists[0]):
-        dp[0][i] = 0  # No string changes needed at the start
+    Each sequence is a list of bars, each bar a list of candidate keys. The decoded path minimizes the sum of the
+    transition costs between consecutive bars (costs are negative log-probabilities, so any probabilistic
+    transition model can be used with ``-log(p)``). On ties, the first candidate is chosen.
 
-    for i in range(1, n):
-        for j in range(len(lists[i])):
-            # FIXME : Better cost function to include relative minor/major and key distances
-            for k in range(len(lists[i - 1])):
-                if lists[i][j] != lists[i - 1][k]:  # If the strings are different, we need a change
-                    cost = 1
-                else:
-                    cost = 0
+    Sequences and candidates are padded into (bars, files, candidates) arrays, each bar being one vectorized step
+    for all the files. Files of similar numbers of candidates are processed together, in blocks of at most
+    ``max_block_size`` padded candidates (and transitions per step).
 
-                if dp[i][j] > dp[i - 1][
-                    k] + cost:  # If we found a better (smaller) cost, update the dp and indices array
-                    dp[i][j] = dp[i - 1][k] + cost
-                    indices[i][j] = k
+    Parameters
+    ----------
+    batch: list[list[list[int]]]
+        Candidate keys of each bar of each file
+    transition_cost: callable, default=chord_change_cost
+        Function of (previous keys, current keys) returning the cost of each transition, it must broadcast
+        (see :func:`chord_change_cost` and :func:`key_distance_cost`)
+    max_block_size: int
+        Maximum size of the padded arrays of a block of files
 
-    res = [0] * n
-    min_cost, min_index = min(
-        (cost, index) for index, cost in enumerate(dp[-1]))  # Find the smallest cost in the last row
-    res[-1] = min_index  # The last index is the one with the smallest cost
+    Returns
+    -------
+    indexes: list[list[int]]
+        Index of the chosen candidate in each bar of each file
+    """
+    result = [[] for _ in batch]
+    widths = [max((len(bar) for bar in sequence), default=0) for sequence in batch]
+    order = [idx for idx in np.argsort(widths, kind='stable').tolist() if len(batch[idx]) > 0]
+    start = 0
+    while start < len(order):
+        # Files are sorted by width : the last file of a block is the widest
+        end, max_length = start + 1, len(batch[order[start]])
+        while end < len(order):
+            max_length = max(max_length, len(batch[order[end]]))
+            if (end + 1 - start) * widths[order[end]] * max(max_length, widths[order[end]]) > max_block_size:
+                break
+            end += 1
+        block = order[start:end]
+        for idx, path in zip(block, _viterbi_block([batch[idx] for idx in block], transition_cost)):
+            result[idx] = path
+        start = end
+    return result
+
+
+def _viterbi_block(sequences, transition_cost, chunk_size=2 ** 16):
+    nb_files = len(sequences)
+    lengths = np.asarray([len(sequence) for sequence in sequences])
+    nb_bars = lengths.max()
+    width = max(max(len(bar) for sequence in sequences for bar in sequence), 1)
+
+    # Padded (bars, files, candidates) arrays of the candidate keys
+    bar_sizes = np.asarray([len(bar) for sequence in sequences for bar in sequence], dtype=np.int64)
+    file_idx = np.repeat(np.repeat(np.arange(nb_files), lengths), bar_sizes)
+    bar_idx = np.repeat(np.concatenate([np.arange(length) for length in lengths]), bar_sizes)
+    candidate_idx = np.arange(bar_sizes.sum()) - np.repeat(np.cumsum(bar_sizes) - bar_sizes, bar_sizes)
+    values = np.zeros((nb_bars, nb_files, width), dtype=np.int64)
+    padding = np.ones((nb_bars, nb_files, width), dtype=bool)
+    values[bar_idx, file_idx, candidate_idx] = [value for sequence in sequences for bar in sequence for value in bar]
+    padding[bar_idx, file_idx, candidate_idx] = False
+
+    # Files finishing at each bar, their costs are kept when they are finished
+    last_bars = lengths - 1
+    finishing = {t: np.where(last_bars == t)[0] for t in np.unique(last_bars).tolist()}
+    final_cost = np.empty((nb_files, width))
+
+    cost = np.where(padding[0], np.inf, 0.0)
+    backpointers = np.zeros((nb_bars, nb_files, width), dtype=np.int32 if width > 2 ** 15 else np.int16)
+    total = np.empty((nb_files, width, width))
+    flat_total = total.reshape(-1)
+    offsets = np.arange(nb_files * width) * width
+    # Transition costs are computed for several bars at once, chunk[t, f, j, k] being the cost of reaching
+    # candidate j of bar t from candidate k of bar t - 1 (padded k have an infinite cost already)
+    steps_per_chunk = max(chunk_size // (nb_files * width * width), 1)
+    for t in range(nb_bars):
+        if t in finishing:
+            final_cost[finishing[t]] = cost[finishing[t]]
+        if t == nb_bars - 1:
+            break
+        if t % steps_per_chunk == 0:
+            stop = min(t + steps_per_chunk, nb_bars - 1)
+            chunk = transition_cost(values[t:stop, :, None, :], values[t + 1:stop + 1, :, :, None])
+        np.add(chunk[t % steps_per_chunk], cost[:, None, :], out=total)
+        best = total.argmin(axis=2)
+        backpointers[t + 1] = best
+        cost = flat_total[offsets + best.reshape(-1)].reshape(nb_files, width)
+        cost[padding[t + 1]] = np.inf
+
+    # Backtracking, each file starting from its own last bar
+    path = np.zeros((nb_bars, nb_files), dtype=np.int64)
+    files = np.arange(nb_files)
+    index = np.argmin(final_cost, axis=1)
+    for t in range(nb_bars - 1, -1, -1):
+        path[t] = index
+        if t > 0:
+            index = np.where(last_bars >= t, backpointers[t, files, index], index)
+    return [path[:length, f].tolist() for f, length in enumerate(lengths)]
+
+
+def dynamic_programming_for_chord_inference(lists, transition_cost=chord_change_cost):
+    """
+    Find the candidate of each bar that minimizes the sum of the transition costs (by default the number of key
+    changes), see :func:`batch_dynamic_programming_for_chord_inference`
 
-    for i in range(n - 2, -1, -1):  # Backtrack to find the indices for the other lists
-        res[i] = indices[i + 1][res[i + 1]]
+    Parameters
+    ----------
+    lists: list[list[int]]
+        Candidate keys of each bar
+    transition_cost: callable, default=chord_change_cost
 
-    return res
+    Returns
+    -------
+    res: list[int]
+        Index of the chosen candidate in each bar
+    """
+    return batch_dynamic_programming_for_chord_inference([lists], transition_cost=transition_cost)[0]
 
 
 def get_pitch_tonality_vector(tonality_root, tonality_mode):
@@ -139,13 +343,17 @@ def get_pitch_tonality_vector(tonality_root, tonality_mode):
     return pitch_vector
 
 
-def optimal_chord_inference(candidates, bass_notes=None, bars=None):
+def optimal_chord_inference(candidates, bass_notes=None, bars=None, transition_cost=chord_change_cost):
     """
     List of candidates per bar
 
     Parameters
     ----------
     candidates
+    bass_notes
+    bars
+    transition_cost: callable, default=chord_change_cost
+        Cost of a key change between two bars, see :func:`batch_dynamic_programming_for_chord_inference`
 
     Returns
     -------
@@ -154,7 +362,7 @@ def optimal_chord_inference(candidates, bass_notes=None, bars=None):
     from musiclang import Chord
     candidates_nb = [[(c[1] + 3 * (c[2] == 'm')) % 12 for c in candidate] for candidate in candidates]
 
-    indexes = dynamic_programming_for_chord_inference(candidates_nb)
+    indexes = dynamic_programming_for_chord_inference(candidates_nb, transition_cost=transition_cost)
     chords_props = [candidates[i][indexes[i]] for i in range(len(indexes))]
 
     if bars is None:
@@ -162,15 +370,18 @@ def optimal_chord_inference(candidates, bass_notes=None, bars=None):
     if bass_notes is None:
         bass_notes = [None] * len(chords_props)
 
+    # Each distinct (chord, bass note) is built once, then copied with the duration of each bar
+    prototypes = {}
     chords = []
     for (roman, tonality_root, tonality_mode, extension), bar, bass_note in zip(chords_props, bars, bass_notes):
-        chord = Chord(roman, tonality=Tonality(tonality_root, tonality_mode))[extension]
-        if bar is not None:
-            chord = chord.set_duration(bar[1] - bar[0])
-
-        if bass_note is not None:
+        key = (roman, tonality_root, tonality_mode, extension, bass_note)
+        if key not in prototypes:
+            chord = Chord(roman, tonality=Tonality(tonality_root, tonality_mode))[extension]
+            if bass_note is not None:
                 chord = get_chord_extended_from_bass_note(bass_note, chord)
-        chords.append(chord)
+            prototypes[key] = chord
+        chord = prototypes[key]
+        chords.append(chord.set_duration(bar[1] - bar[0]) if bar is not None else chord.copy())
 
     return chords
 
@@ -214,29 +425,23 @@ def fast_chord_inference(notes, bars):
 
     chord_rootss, chord_typess = max_correlation_index(bar_chroma_vectors, CHROMA_VECTORS_MATRIX, bass_notes, use_first_max=False)
 
+    # Score of each bar against each tonality, candidates are scored with the vector of their tonality
+    tonality_scores = bar_chroma_vectors.dot(TONALITY_VECTORS.T)
+
     candidates = []
-    for chord_roots, chord_types, bar, chroma in zip(chord_rootss, chord_typess, bars, bar_chroma_vectors):
+    for chord_roots, chord_types, scores in zip(chord_rootss, chord_typess, tonality_scores):
         all_sub_candidates = []
         for chord_type, chord_root in zip(chord_roots, chord_types):
-            from musiclang import Tonality, Chord
-            # Get the list of roman numeral candidates
-            pitches = tuple(
-                sorted([(chord_root + pitch) % 12 for pitch in CHORD_TYPE_TO_PITCHES[CHORD_TYPES[chord_type]]]))
-            subcandidates = PITCH_CLASSES_DICT[pitches]
-            # Filter only maximum correlation candidates
-            pitch_vectors = np.asarray([get_pitch_tonality_vector(tonality_root, tonality_mode)
-                                        for (roman, tonality_root, tonality_mode, extension) in subcandidates])
-            correlations = np.asarray([np.correlate(chroma, pitch_vector) for pitch_vector in pitch_vectors])
+            template_idx = chord_root * len(TEMPLATES) + chord_type
             # Get the list of maximum correlation candidates (there can be several)
-            max_correlations = np.where(correlations == correlations.max())[0]
-            subcandidates = [subcandidates[i] for i in max_correlations]
-            all_sub_candidates += subcandidates
+            correlations = scores[TEMPLATE_CANDIDATES_TONALITIES[template_idx]]
+            max_correlations = np.flatnonzero(correlations == correlations.max())
+            all_sub_candidates += [TEMPLATE_CANDIDATES[template_idx][i] for i in max_correlations]
 
         if len(all_sub_candidates) == 0:
             all_sub_candidates = [(0, 0, 'M', '')]
         candidates.append(all_sub_candidates)
 
-
     # Choose the candidate chord path that minimize the number of tonality changes
     chords = optimal_chord_inference(candidates, bass_notes=bass_notes, bars=bars)
     chords = Score(chords)
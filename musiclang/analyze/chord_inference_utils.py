@@ -55,4 +55,19 @@ for k, v in PITCHES_DICT.items():
     pitch_class = tuple(sorted(v))
     if pitch_class not in PITCH_CLASSES_DICT:
         PITCH_CLASSES_DICT[pitch_class] = []
-    PITCH_CLASSES_DICT[pitch_class].append(k)
\ No newline at end of file
+    PITCH_CLASSES_DICT[pitch_class].append(k)
+
+# Scale vector of each tonality, candidates are scored against the bar chroma with their tonality vector
+TONALITY_KEYS = [(tonality_root, tonality_mode) for tonality_mode in MODES for tonality_root in TONALITIES]
+TONALITY_INDEX = {key: idx for idx, key in enumerate(TONALITY_KEYS)}
+TONALITY_VECTORS = np.asarray([[1.0 * (i in {s % 12 for s in Tonality(tonality_root, tonality_mode).scale_pitches})
+                                for i in range(12)] for tonality_root, tonality_mode in TONALITY_KEYS])
+
+# Candidates of each row of CHROMA_VECTORS_MATRIX (chord root * len(TEMPLATES) + chord type),
+# with the index in TONALITY_KEYS of the tonality of each candidate
+TEMPLATE_CANDIDATES = [PITCH_CLASSES_DICT[tuple(sorted([(idx // len(TEMPLATES) + pitch) % 12
+                                                        for pitch in TEMPLATES[idx % len(TEMPLATES)][1]]))]
+                       for idx in range(CHROMA_VECTORS_MATRIX.shape[0])]
+TEMPLATE_CANDIDATES_TONALITIES = [np.asarray([TONALITY_INDEX[(tonality_root, tonality_mode)]
+                                              for (roman, tonality_root, tonality_mode, extension) in candidates])
+                                  for candidates in TEMPLATE_CANDIDATES]
@@ -1,3 +1,6 @@
+import math
+from fractions import Fraction as frac
+
 from scipy.optimize import linear_sum_assignment
 import numpy as np
 
@@ -108,8 +111,75 @@ def plot_chroma(chroma, t_start=None, t_end=None):
 Transform functions from musiclang to chromagrams and inverse
 """
 
-import pandas as pd
-def musiclang_to_chromagram(score, quantization=None):
+def _chroma_notes(chords):
+    """
+    Start, end and pitch class of each sounding note of a sequence of chords, drums excluded.
+    Notes are yielded chord by chord, so their start is always after the start of their chord
+    """
+    time = 0
+    for chord in chords:
+        for part, melody in chord.score.items():
+            if part.startswith('drums'):
+                continue
+            note_time = time
+            for note in melody.notes:
+                pitch = chord.to_pitch(note)
+                if pitch is not None:
+                    yield note_time, note_time + note.duration, pitch % 12
+                note_time += note.duration
+        time += chord.duration
+
+
+def _quantization_to_fraction(quantization):
+    if quantization is None:
+        return None
+    if isinstance(quantization, float):
+        return frac(quantization).limit_denominator(10 ** 6)
+    return frac(quantization)
+
+
+def _to_ticks(values, resolution):
+    return np.asarray([value.numerator * (resolution // value.denominator) for value in values], dtype=np.int64)
+
+
+def _sweep_chroma(notes, start, end, quantization=None, empty_frames=False):
+    """
+    Chroma matrix of notes (start, end, pitch class) for the frames in [start, end) : the note starts,
+    or the multiples of quantization.
+    It uses a sweep line over the sorted starts and ends : at time t the number of sounding notes of a pitch class
+    is the number of starts <= t minus the number of ends <= t. O((N + T) log N) for N notes and T frames.
+    """
+    starts, ends, classes = zip(*notes) if len(notes) > 0 else ((), (), ())
+    # Work in integer ticks so the comparisons are exact
+    denominators = {value.denominator for value in (*starts, *ends, start, end)}
+    if quantization is not None:
+        denominators.add(quantization.denominator)
+    resolution = math.lcm(*denominators)
+    starts, ends = _to_ticks(starts, resolution), _to_ticks(ends, resolution)
+    start, end = _to_ticks([start, end], resolution)
+    if quantization is None:
+        times = np.unique(starts[(starts >= start) & (starts < end)])
+    else:
+        step = quantization.numerator * (resolution // quantization.denominator)
+        times = np.arange(-(-start // step), -(-end // step), dtype=np.int64) * step
+    if len(times) == 0:
+        return np.zeros((0, 12), dtype=int), np.zeros(0)
+
+    # One sorted array per pitch class, offset by pitch class so a single sort and search is needed
+    classes = np.asarray(classes, dtype=np.int64)
+    offset = int(max(ends.max(initial=0), times.max())) + 1
+    queries = (np.arange(12) * offset)[:, None] + times[None, :]
+    counts = np.searchsorted(np.sort(classes * offset + starts), queries, side='right') \
+        - np.searchsorted(np.sort(classes * offset + ends), queries, side='right')
+    Cs = (counts.T > 0).astype(int)
+    t = times / resolution
+    if not empty_frames:
+        sounding = Cs.any(axis=1)
+        Cs, t = Cs[sounding], t[sounding]
+    return Cs, t
+
+
+def musiclang_to_chromagram(score, quantization=None, empty_frames=False):
     """
     Transform a musiclang score to a chromagram
 
@@ -117,6 +187,7 @@ def musiclang_to_chromagram(score, quantization=None):
     ----------
     score: musiclang.Score
     quantization: frac or None : Fraction of a beat to quantize to
+    empty_frames: bool : If True keep the frames where no note is sounding (Default value = False)
 
     Returns
     -------
@@ -125,41 +196,65 @@ def musiclang_to_chromagram(score, quantization=None):
     time_signature : time signature of the score
 
     """
-    def chroma_matrix(A):
-        A['pitch_class'] = pd.Categorical(A['pitch_class'], categories=list(range(12)))
-        B = pd.crosstab(A['pitch_class'], A['time'], dropna=False)
-
-        # Replace NaNs with 0s and convert to integers
-        B = (B.fillna(0).astype(int) > 0).astype(int)
+    time_signature = score.config['time_signature']
+    quantization = _quantization_to_fraction(quantization)
+    notes = list(_chroma_notes(score.chords))
+    end = max((note_end for _, note_end, _ in notes), default=0)
+    Cs, t = _sweep_chroma(notes, 0, end if quantization is not None else end + 1, quantization,
+                          empty_frames=empty_frames)
+    return Cs, t, time_signature
 
-        # Sort the columns if needed
-        B = B.sort_index(axis=1)
-        return B
 
-    time_signature = score.config['time_signature']
-    seq = score.to_sequence()
+def iter_chromagram(score, window, quantization=None, empty_frames=False):
+    """
+    Iterate over the chromagram of a score by windows of fixed duration, without building the whole chromagram.
+    Only the notes that are still sounding are kept in memory, so it works on arbitrarily long scores
+    (or any iterable of chords). Concatenating the windows gives :func:`~musiclang_to_chromagram`.
 
-    seq = seq[~seq['instrument'].str.startswith('drums')]
-    seq = seq[seq['pitch'].notnull()]
-    seq['pitch_class'] = seq['pitch'] % 12
-    # Step 1: Create a DataFrame of time ranges
-    if quantization is None:
-        start_times = seq['start'].unique()
-    else:
-        start_times = np.arange(0, seq['end'].max(), quantization)
+    With a quantization and ``empty_frames=True`` every window but the last has the same number of frames.
 
-    times_df = pd.DataFrame(start_times, columns=['time']).merge(seq, how='cross')
-    times_df = times_df[(times_df['start'] <= times_df['time']) &
-                        (times_df['end'] > times_df['time'])
-                        ]
-    times_df = times_df[['time', 'pitch_class']]
-    # Create a chromagram
-    chroma = chroma_matrix(times_df)
+    Parameters
+    ----------
+    score: musiclang.Score or iterable of Chord
+    window: frac : Duration of a window in quarters
+    quantization: frac or None : Fraction of a beat to quantize to
+    empty_frames: bool : If True keep the frames where no note is sounding (Default value = False)
 
-    Cs = chroma.to_numpy().T
-    t = chroma.columns.to_numpy().astype(float)
+    Yields
+    ------
+    Cs : chroma matrix of the window
+    t : time vector of the window
 
-    return Cs, t, time_signature
+    """
+    from musiclang import Score
+    window = frac(window)
+    if window <= 0:
+        raise ValueError(f'Window must be positive, got {window}')
+    quantization = _quantization_to_fraction(quantization)
+    chords = score.chords if isinstance(score, Score) else score
+
+    pending = []
+    window_start = frac(0)
+    end = 0
+    time = 0
+    for chord in chords:
+        # All the notes starting before this chord are known, the windows before it are complete. The windows after
+        # the end of the notes wait for a next note, the chromagram stops at the end of the last note
+        while time >= window_start + window and end >= window_start + window:
+            yield _sweep_chroma(pending, window_start, window_start + window, quantization, empty_frames=empty_frames)
+            window_start += window
+            pending = [note for note in pending if note[1] > window_start]
+        notes = list(_chroma_notes([chord]))
+        pending += [(note_start + time, note_end + time, pitch_class) for note_start, note_end, pitch_class in notes]
+        end = max([end] + [note_end + time for _, note_end, _ in notes])
+        time += chord.duration
+
+    # Last windows, up to the end of the last note
+    while window_start < end:
+        window_end = min(window_start + window, end) if quantization is not None else window_start + window
+        yield _sweep_chroma(pending, window_start, window_end, quantization, empty_frames=empty_frames)
+        window_start += window
+        pending = [note for note in pending if note[1] > window_start]
 
 
 def chroma_to_musiclang(Cs, t):
@@ -0,0 +1,258 @@
+"""
+Copyright (c) 2023, Florian GARDIN
+All rights reserved.
+
+This source code is licensed under the BSD-style license found in the
+LICENSE file in the root directory of this source tree.
+"""
+import os
+from collections import OrderedDict
+from fractions import Fraction as frac
+
+import numpy as np
+
+from musiclang.write.binary_score import BinaryScore, BINARY_EXTENSION
+
+#: One row per chord of the corpus
+INDEX_DTYPE = np.dtype([
+    ('file', '<i4'),                  # Row of the files of the index
+    ('chord', '<i4'),                 # Index of the chord in its binary score
+    ('duration_numerator', '<i8'),    # Duration of the chord in quarters
+    ('duration_denominator', '<i8'),
+    ('nb_instruments', '<i2'),
+    ('tonality_degree', '<i2'),
+    ('tonality_mode', '<i2'),         # Code in modes, -1 for a chord without tonality
+])
+
+#: Name of the index file saved in the store directory of a :class:`CorpusIndex`
+INDEX_FILENAME = 'index.npz'
+
+
+def _file_stats(filepaths):
+    """
+    Size and modification time in nanoseconds of each file, -1 for a missing file
+    """
+    stats = np.full((len(filepaths), 2), -1, dtype='<i8')
+    for idx, filepath in enumerate(filepaths):
+        if os.path.exists(filepath):
+            stat = os.stat(filepath)
+            stats[idx] = stat.st_size, stat.st_mtime_ns
+    return stats
+
+
+def _load_score(filepath):
+    from musiclang import Score
+    if filepath.endswith('.txt'):
+        return Score.from_file(filepath)
+    return Score.from_pickle(filepath)
+
+
+class CorpusIndex:
+    """
+    Index of all the chords of a corpus of scores, to select chords by duration, number of instruments or
+    tonality and read them one at a time.
+
+    Each score of the corpus is stored once in the binary score format (see :mod:`musiclang.write.binary_score`),
+    pickle and text files are converted when the index is built. The index itself is a numpy table with one row
+    per chord (see ``INDEX_DTYPE``), so that reading a chord only maps its binary file and reads its rows.
+    The size and modification time of the original files are saved with the index to detect edited files
+    (see :func:`~CorpusIndex.is_up_to_date`).
+
+    Examples
+    --------
+
+    >>> from musiclang.library import *
+    >>> score = (I % I.M)(piano__0=s0.w, piano__1=s2.w) + (V % I.M)(piano__0=s4.h)
+    >>> score.to_pickle('/tmp/corpus/score.pkl', create_dir=True)
+    >>> index = CorpusIndex.build(['/tmp/corpus/score.pkl'], '/tmp/corpus_index')
+    >>> rows = index.select(duration=4, min_nb_instruments=2)
+    >>> index.chord(rows[0]) == score[0]
+    True
+    """
+
+    def __init__(self, rows, files, sources, modes, source_stats=None, max_open_files=64):
+        """
+
+        Parameters
+        ----------
+        rows: np.ndarray
+            Rows of the index, with the ``INDEX_DTYPE`` dtype
+        files: list[str]
+            Binary score file of each file code
+        sources: list[str]
+            Original file of each file code
+        modes: list[str]
+            Tonality mode of each mode code
+        source_stats: np.ndarray, optional
+            Size and modification time in nanoseconds of each original file when it was indexed
+        max_open_files: int
+            Number of binary scores kept open when reading chords
+        """
+        self.rows = rows
+        self.files = list(files)
+        self.sources = list(sources)
+        self.modes = list(modes)
+        self.source_stats = _file_stats(self.sources) if source_stats is None else np.asarray(source_stats)
+        self.max_open_files = max_open_files
+        self._scores = OrderedDict()
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, files, directory, max_open_files=64):
+        """
+        Index all the chords of a list of score files and save the index in a directory
+
+        Parameters
+        ----------
+        files: list[str]
+            Pickle (``.pkl``), musiclang text (``.txt``) or binary score files
+        directory: str
+            Directory of the index, where the pickle and text files are converted to binary scores
+        max_open_files: int
+            Number of binary scores kept open when reading chords
+
+        Returns
+        -------
+        index: CorpusIndex
+        """
+        os.makedirs(directory, exist_ok=True)
+        # Before the conversion, a file edited while it is indexed is then indexed again
+        source_stats = _file_stats(files)
+        rows, binary_files, modes = [], [], {}
+        for file_code, filepath in enumerate(files):
+            if filepath.endswith(BINARY_EXTENSION):
+                binary_file = os.path.abspath(filepath)
+            else:
+                binary_file = os.path.abspath(os.path.join(directory, f'{file_code:06d}{BINARY_EXTENSION}'))
+                _load_score(filepath).to_binary(binary_file)
+            binary_files.append(binary_file)
+            binary_score = BinaryScore.open(binary_file)
+            chords = binary_score.chords
+            score_rows = np.zeros(len(chords), dtype=INDEX_DTYPE)
+            score_rows['file'] = file_code
+            score_rows['chord'] = np.arange(len(chords))
+            resolution = binary_score.resolution
+            divisor = np.gcd(chords['duration'], resolution)
+            score_rows['duration_numerator'] = chords['duration'] // divisor
+            score_rows['duration_denominator'] = resolution // divisor
+            score_rows['nb_instruments'] = chords['nb_parts']
+            score_rows['tonality_degree'] = chords['tonality_degree']
+            # Codes of the strings of the binary score to codes of the index, the last one for -1
+            mode_codes = np.full(len(binary_score.strings) + 1, -1, dtype='<i2')
+            for code in np.unique(chords['tonality_mode']).tolist():
+                if code >= 0:
+                    mode_codes[code] = modes.setdefault(binary_score.strings[code], len(modes))
+            score_rows['tonality_mode'] = mode_codes[chords['tonality_mode']]
+            rows.append(score_rows)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=INDEX_DTYPE)
+        index = cls(rows, binary_files, [os.path.abspath(filepath) for filepath in files], list(modes),
+                    source_stats=source_stats, max_open_files=max_open_files)
+        index.save(os.path.join(directory, INDEX_FILENAME))
+        return index
+
+    def save(self, filepath):
+        """
+        Save the index table in a numpy ``.npz`` file
+        """
+        with open(filepath, 'wb') as f:
+            np.savez(f, rows=self.rows, files=np.array(self.files, dtype=str),
+                     sources=np.array(self.sources, dtype=str), modes=np.array(self.modes, dtype=str),
+                     source_stats=self.source_stats)
+
+    @classmethod
+    def load(cls, filepath, max_open_files=64):
+        """
+        Load an index saved with :func:`~CorpusIndex.save`
+
+        Parameters
+        ----------
+        filepath: str
+        max_open_files: int
+            Number of binary scores kept open when reading chords
+
+        Returns
+        -------
+        index: CorpusIndex
+        """
+        with np.load(filepath) as data:
+            return cls(data['rows'], data['files'].tolist(), data['sources'].tolist(), data['modes'].tolist(),
+                       source_stats=data['source_stats'], max_open_files=max_open_files)
+
+    def is_up_to_date(self, files):
+        """
+        Check that the index was built from these files and that none of them was modified since
+
+        Parameters
+        ----------
+        files: list[str]
+
+        Returns
+        -------
+        up_to_date: bool
+        """
+        if self.sources != [os.path.abspath(filepath) for filepath in files]:
+            return False
+        return bool(np.array_equal(self.source_stats, _file_stats(self.sources)))
+
+    def close(self):
+        """
+        Release the opened binary scores
+        """
+        self._scores.clear()
+
+    def select(self, duration=None, min_nb_instruments=0, tonality_mode=None):
+        """
+        Rows of the chords respecting all the criteria
+
+        Parameters
+        ----------
+        duration: int, float or Fraction, optional
+            Exact duration of the chords in quarters
+        min_nb_instruments: int
+            Minimum number of instruments of the chords
+        tonality_mode: str, optional
+            Mode of the tonality of the chords (eg : 'M', 'm')
+
+        Returns
+        -------
+        rows: np.ndarray
+            Rows of the index, to use with :func:`~CorpusIndex.chord`
+        """
+        mask = self.rows['nb_instruments'] >= min_nb_instruments
+        if duration is not None:
+            duration = frac(duration)
+            mask &= self.rows['duration_numerator'] * duration.denominator == \
+                duration.numerator * self.rows['duration_denominator']
+        if tonality_mode is not None:
+            code = self.modes.index(tonality_mode) if tonality_mode in self.modes else -2
+            mask &= self.rows['tonality_mode'] == code
+        return np.flatnonzero(mask)
+
+    def binary_score(self, file_code):
+        """
+        Open binary score of a file code, the last ``max_open_files`` opened scores are kept open
+        """
+        score = self._scores.pop(file_code, None)
+        if score is None:
+            score = BinaryScore.open(self.files[file_code])
+            if len(self._scores) >= self.max_open_files:
+                self._scores.popitem(last=False)
+        self._scores[file_code] = score
+        return score
+
+    def chord(self, row):
+        """
+        Read the chord of a row of the index
+
+        Parameters
+        ----------
+        row: int
+
+        Returns
+        -------
+        chord: Chord
+        """
+        file_code, chord_idx = self.rows[['file', 'chord']][row].tolist()
+        return self.binary_score(file_code)[chord_idx]
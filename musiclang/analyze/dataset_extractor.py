@@ -1,74 +1,242 @@
-
 import glob
-
+import json
+import math
 import os
 import multiprocessing as mp
+from multiprocessing.connection import wait
 import random
+import time
+from collections import deque
 
 from musiclang import Score
+from musiclang.write.binary_score import BINARY_EXTENSION
+
+
+MANIFEST_FILENAME = 'manifest.jsonl'
+
+
+def read_manifest(manifest_file):
+    """
+    Read an extraction manifest (one json record per line). Truncated lines (interrupted run) are ignored.
+
+    Parameters
+    ----------
+    manifest_file: str
+
+    Returns
+    -------
+    records: dict
+        Last record of each file, by file basename
+    """
+    records = {}
+    if not os.path.exists(manifest_file):
+        return records
+    with open(manifest_file, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record['file']] = record
+    return records
+
+
+def _warm_up():
+    """
+    Import once per worker the modules used by the midi extraction
+    """
+    import musiclang.analyze.parser
+    import musiclang.analyze.to_musiclang
+    import musiclang.analyze.chord_inference
+    for module in ['music21', 'partitura', 'miditok', 'miditoolkit']:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+
+
+def _extraction_worker(extractor, connection, inference_client=None):
+    """
+    Loop of a worker process : signal when warm, then receive file names and send back their manifest record.
+    Stops on None.
+    """
+    _warm_up()
+    if inference_client is not None:
+        from musiclang.analyze.augmented_net import set_inference_client
+        set_inference_client(inference_client)
+    connection.send('ready')
+    while True:
+        try:
+            filename = connection.recv()
+        except EOFError:
+            break
+        if filename is None:
+            break
+        connection.send(extractor.extract_one(filename))
+
+
+class ExtractionPool:
+    """
+    Pool of warm worker processes that extract one file at a time each.
+
+    A worker that exceeds the time budget of its current file is terminated and replaced, the other workers
+    keep their state. No signal handler is used.
+    If inference clients are given (one per worker), the workers send their chord inference to the
+    corresponding service instead of loading the model.
+    """
+
+    def __init__(self, extractor, n_jobs=1, time_budget_per_file=None, max_files_per_worker=None,
+                 poll_interval=0.1, inference_clients=None):
+        self.extractor = extractor
+        self.n_jobs = max(n_jobs, 1)
+        self.inference_clients = inference_clients
+        self.time_budget_per_file = time_budget_per_file
+        self.max_files_per_worker = max_files_per_worker
+        self.poll_interval = poll_interval
+        self.workers = [None] * self.n_jobs
+
+    def _start(self, idx):
+        connection, child_connection = mp.Pipe()
+        inference_client = self.inference_clients[idx] if self.inference_clients is not None else None
+        process = mp.Process(target=_extraction_worker, args=(self.extractor, child_connection, inference_client),
+                             daemon=True)
+        process.start()
+        child_connection.close()
+        self.workers[idx] = {'process': process, 'connection': connection, 'ready': False,
+                             'task': None, 'start': None, 'done': 0}
+
+    def _stop(self, idx, kill=False):
+        worker = self.workers[idx]
+        if kill:
+            worker['process'].terminate()
+        else:
+            try:
+                worker['connection'].send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        worker['process'].join()
+        worker['connection'].close()
+        self.workers[idx] = None
+
+    def _restart(self, idx, kill=False):
+        self._stop(idx, kill=kill)
+        self._start(idx)
+
+    def _active(self, worker):
+        return worker['task'] is not None or not worker['ready']
+
+    def _assign(self, idx, pending):
+        worker = self.workers[idx]
+        if not worker['ready'] or not pending:
+            worker['task'] = None
+            return
+        worker['task'] = pending.popleft()
+        worker['start'] = time.monotonic()
+        worker['connection'].send(worker['task'])
+
+    def _failure(self, idx, status, error):
+        worker = self.workers[idx]
+        return self.extractor.record(worker['task'], status, time.monotonic() - worker['start'], error=error)
+
+    def run(self, files):
+        """
+        Extract the files, yielding the manifest record of each file as soon as it is finished
+
+        Parameters
+        ----------
+        files: list[str]
+
+        Returns
+        -------
+        records: generator of dict
+        """
+        pending = deque(files)
+        for idx in range(self.n_jobs):
+            self._start(idx)
+        try:
+            while pending or any(worker['task'] is not None for worker in self.workers):
+                busy = {worker['connection']: idx for idx, worker in enumerate(self.workers) if self._active(worker)}
+                for connection in wait(list(busy.keys()), timeout=self.poll_interval):
+                    idx = busy[connection]
+                    try:
+                        record = connection.recv()
+                    except (EOFError, OSError):
+                        exitcode = self.workers[idx]['process'].exitcode
+                        if self.workers[idx]['task'] is None:
+                            raise RuntimeError(f'Extraction worker failed to start (exit code {exitcode})')
+                        yield self._failure(idx, 'error', f'Worker exited with code {exitcode}')
+                        self._restart(idx, kill=True)
+                        continue
+                    if record == 'ready':
+                        self.workers[idx]['ready'] = True
+                        self._assign(idx, pending)
+                        continue
+                    yield record
+                    self.workers[idx]['done'] += 1
+                    if self.max_files_per_worker is not None and self.workers[idx]['done'] >= self.max_files_per_worker:
+                        self._restart(idx)
+                    else:
+                        self._assign(idx, pending)
+
+                if not self.time_budget_per_file:
+                    continue
+                now = time.monotonic()
+                for idx, worker in enumerate(self.workers):
+                    if worker['task'] is not None and now - worker['start'] > self.time_budget_per_file:
+                        yield self._failure(idx, 'timeout', f'Timed out after {self.time_budget_per_file} s')
+                        self._restart(idx, kill=True)
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Stop all the workers, killing the ones still busy
+        """
+        for idx, worker in enumerate(self.workers):
+            if worker is not None:
+                self._stop(idx, kill=self._active(worker))
 
-import concurrent.futures
-import time
-import signal
-
-def signal_handler(signum, frame):
-    raise Exception("Timed out!")
-
-signal.signal(signal.SIGALRM, signal_handler)
-
-
-def extract_one(self, filename):
-    try:
-        score = self.extract_musiclang(filename)
-        if self.remove_drums:
-            score = Score([self.remove_drums_in_score(chord) for chord in score.chords])
-            score = Score([chord for chord in score.chords if chord.duration > 0])
-        if score is not None:
-            text_filename = ''.join(os.path.basename(filename).split('.')[:-1]) + '.txt'
-            pickle_filename = ''.join(os.path.basename(filename).split('.')[:-1]) + '.pkl'
-            text_output_filename = os.path.join(self.text_output_directory, text_filename)
-            pickle_output_filename = os.path.join(self.pickle_output_directory, pickle_filename)
-            score.to_text_file(text_output_filename)
-            score.to_pickle(pickle_output_filename)
-            print('SUCCESS !')
-    except Exception as e:
-        print('Error while processing file %s' % filename)
-        print(e)
-        # Add the file to the error file
-        with open(self.error_file, 'a') as f:
-            f.write(os.path.basename(filename) + '\n')
-
-        return None
-def extract_one_with_time_limit(self, filename):
-    import time
-    print('Processing file %s' % filename)
-    start = time.time()
-    signal.signal(signal.SIGALRM, signal_handler)
-    signal.alarm(self.time_budget_per_file)
-    try:
-        extract_one(self, filename)
-    except Exception as msg:
-        print("Timed out!", msg)
-        with open(self.error_file, 'a') as f:
-            f.write(os.path.basename(filename) + '\n')
-    # Try to extract the file (self.extract_one) within a given time budget (self.time_budget_per_file)
-    # If it fails, add the file to the error file
-    print('TOOK', time.time() - start)
 
 class DatasetExtractor:
 
     """
     Main class to extract musiclang notation from a glob pattern of midi files
+
+    Each processed file gets a record in an append-only manifest (``manifest.jsonl`` in the output directory)
+    with its status (success, error or timeout), the extraction duration, the number of notes and bars and the
+    error message. Files that already have a record are skipped, so an interrupted extraction can be resumed.
+    In an output directory written before the manifest, the files listed in ``errors.txt`` and the files that
+    already have a text output are skipped too.
     """
 
     def __init__(self, input_pattern, output_directory,
                  remove_drums=False, fast_chord_inference=True,
-                 time_budget_per_file=120
+                 time_budget_per_file=120, retry_failed=False, write_binary=False
                  ):
+        """
+
+        Parameters
+        ----------
+        input_pattern: str
+            Glob pattern of the midi files
+        output_directory: str
+            Directory where the text, pickle and binary files and the manifest are written
+        remove_drums: bool, default=False
+        fast_chord_inference: bool, default=True
+        time_budget_per_file: int or None, default=120
+            Maximum time in seconds to extract one file, None for no limit
+        retry_failed: bool, default=False
+            If True, the files recorded as errors or timeouts in the manifest are extracted again
+        write_binary: bool, default=False
+            If True, also write each score in the binary score format (see :mod:`musiclang.write.binary_score`)
+            in the ``binary`` directory
+        """
 
         self.remove_drums = remove_drums
         self.time_budget_per_file = time_budget_per_file
         self.fast_chord_inference = fast_chord_inference
+        self.retry_failed = retry_failed
+        self.write_binary = write_binary
 
         # List all the files to process
         self.files = glob.glob(input_pattern)
@@ -87,25 +255,43 @@ class DatasetExtractor:
         if not os.path.exists(self.pickle_output_directory):
             os.makedirs(self.pickle_output_directory)
 
-        # Create error file
+        # Create binary output directory
+        self.binary_output_directory = os.path.join(output_directory, 'binary')
+        if write_binary and not os.path.exists(self.binary_output_directory):
+            os.makedirs(self.binary_output_directory)
+
+        self.manifest_file = os.path.join(output_directory, MANIFEST_FILENAME)
+        # Failed files of the extractions made before the manifest
         self.error_file = os.path.join(output_directory, 'errors.txt')
 
         # Filter files that have already been processed
         print('Original length :', len(self.files))
         self.filter_files()
 
-
     def filter_files(self):
-        # Read error files and remove them from the list of files to process
+        # Remove the files that already have a record in the manifest
+        records = read_manifest(self.manifest_file)
+        # Output directories written before the manifest : the files listed in errors.txt failed and the files
+        # with a text output succeeded
+        errors = set()
         if os.path.exists(self.error_file):
             with open(self.error_file, 'r') as f:
-                errors = f.read().split('\n')
-            self.files = [file for file in self.files if not os.path.basename(file) in errors]
-        print('Filtered error length :', len(self.files))
-        self.files = [file for file in self.files
-                      if not
-                      os.path.exists(os.path.join(self.text_output_directory,
-                                                  ''.join(os.path.basename(file).split('.')[:-1]) + '.txt'))]
+                errors = set(f.read().split('\n'))
+
+        def status(file):
+            basename = os.path.basename(file)
+            if basename in records:
+                return records[basename]['status']
+            if os.path.exists(os.path.join(self.text_output_directory,
+                                           ''.join(basename.split('.')[:-1]) + '.txt')):
+                return 'success'
+            if basename in errors:
+                return 'error'
+            return None
+
+        statuses = [status(file) for file in self.files]
+        self.files = [file for file, file_status in zip(self.files, statuses)
+                      if file_status is None or (self.retry_failed and file_status != 'success')]
         print('Filtered length :', len(self.files))
 
     def remove_drums_in_score(self, chord):
@@ -117,36 +303,100 @@ class DatasetExtractor:
         """
         return Score.from_midi(filename, fast_chord_inference=self.fast_chord_inference)
 
+    @staticmethod
+    def record(filename, status, duration, notes=0, bars=0, error=None):
+        """
+        Manifest record of a file
+        """
+        return {'file': os.path.basename(filename), 'path': filename, 'status': status,
+                'duration': round(duration, 3), 'notes': notes, 'bars': bars, 'error': error}
 
+    def extract_one(self, filename):
+        """
+        Extract one file and write its text, pickle and binary outputs
 
-    def extract_all_files(self, n_jobs=1):
+        Parameters
+        ----------
+        filename: str
+
+        Returns
+        -------
+        record: dict
+            Manifest record of the file
         """
-        Multiprocess the extract one method to parallelize the extraction, it call extract_one with a mapping
+        start = time.monotonic()
+        try:
+            score = self.extract_musiclang(filename)
+            if self.remove_drums:
+                score = Score([self.remove_drums_in_score(chord) for chord in score.chords])
+                score = Score([chord for chord in score.chords if chord.duration > 0])
+            name = ''.join(os.path.basename(filename).split('.')[:-1])
+            score.to_text_file(os.path.join(self.text_output_directory, name + '.txt'))
+            score.to_pickle(os.path.join(self.pickle_output_directory, name + '.pkl'))
+            if self.write_binary:
+                score.to_binary(os.path.join(self.binary_output_directory, name + BINARY_EXTENSION))
+            notes = int(score.to_table(pitches=False).sounding_mask.sum()) if len(score.chords) > 0 else 0
+            time_signature = score.config['time_signature']
+            bars = math.ceil(score.duration / (4 * time_signature[0] / time_signature[1]))
+        except Exception as e:
+            return self.record(filename, 'error', time.monotonic() - start, error=f'{type(e).__name__}: {e}')
+        return self.record(filename, 'success', time.monotonic() - start, notes=notes, bars=bars)
+
+    def extract_all_files(self, n_jobs=1, max_files_per_worker=None, report_every=10):
         """
-        import functools
-        if n_jobs > 1:
-            print('Using multiprocessing')
-            pool = mp.Pool(n_jobs, maxtasksperchild=1)
-            pool.map(functools.partial(extract_one_with_time_limit, self), self.files)
-            pool.close()
-            pool.join()
-        else:
-            print('Not using multiprocessing')
-            import time
-
-            for filename in self.files:
-                print('Processing file %s' % filename)
-
-                start = time.time()
-                signal.signal(signal.SIGALRM, signal_handler)
-                signal.alarm(self.time_budget_per_file)
-                try:
-                    extract_one(self, filename)
-                except Exception as msg:
-                    print("Timed out!", msg)
-                    with open(self.error_file, 'a') as f:
-                        f.write(os.path.basename(filename) + '\n')
-                # Try to extract the file (self.extract_one) within a given time budget (self.time_budget_per_file)
-                # If it fails, add the file to the error file
-                print('TOOK', time.time() - start)
+        Extract all the files with a pool of ``n_jobs`` warm worker processes.
+
+        Records are appended to the manifest as soon as each file is finished, the throughput is reported
+        every ``report_every`` files. Without fast chord inference, the workers share one chord inference
+        model in a separate process (see :class:`musiclang.analyze.augmented_net.InferenceService`).
+
+        Parameters
+        ----------
+        n_jobs: int, default=1
+            Number of worker processes
+        max_files_per_worker: int or None, default=None
+            Replace a worker after this number of files (to bound memory), None to keep the workers
+        report_every: int, default=10
+
+        Returns
+        -------
+        summary: dict
+            Number of files by status and throughput in files/sec
+        """
+        summary = {'success': 0, 'error': 0, 'timeout': 0}
+        start = time.monotonic()
+        service = None
+        if not self.fast_chord_inference:
+            from musiclang.analyze.augmented_net import InferenceService
+            service = InferenceService(nbClients=max(n_jobs, 1)).start()
+        pool = ExtractionPool(self, n_jobs=n_jobs, time_budget_per_file=self.time_budget_per_file,
+                              max_files_per_worker=max_files_per_worker,
+                              inference_clients=None if service is None
+                              else [service.client(idx) for idx in range(max(n_jobs, 1))])
+        with open(self.manifest_file, 'a+b') as manifest:
+            # Terminate a record truncated by an interrupted run
+            if manifest.tell() > 0:
+                manifest.seek(-1, os.SEEK_END)
+                if manifest.read(1) != b'\n':
+                    manifest.write(b'\n')
+        try:
+            with open(self.manifest_file, 'a') as manifest:
+                for nb_files, record in enumerate(pool.run(self.files), 1):
+                    manifest.write(json.dumps(record) + '\n')
+                    manifest.flush()
+                    summary[record['status']] += 1
+                    if record['status'] != 'success':
+                        print(f"{record['status'].upper()} {record['file']} : {record['error']}")
+                    if nb_files % report_every == 0:
+                        speed = nb_files / (time.monotonic() - start)
+                        print(f'{nb_files}/{len(self.files)} files, {speed:.2f} files/sec')
+        finally:
+            if service is not None:
+                service.stop()
 
+        elapsed = time.monotonic() - start
+        summary['files_per_second'] = sum(summary[k] for k in ['success', 'error', 'timeout']) / elapsed \
+            if elapsed > 0 else 0.0
+        print(f"Done : {summary['success']} success, {summary['error']} errors, {summary['timeout']} timeouts, "
+              f"{summary['files_per_second']:.2f} files/sec")
+        return summary
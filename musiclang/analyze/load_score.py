@@ -1,3 +1,7 @@
+import io
+import math
+from fractions import Fraction
+
 import pandas as pd
 import numpy as np
 from miditoolkit import MidiFile
@@ -5,6 +9,182 @@ import partitura.musicanalysis as analysis
 from musiclang.write.out.constants import REVERSE_INSTRUMENT_DICT
 
 
+def _nearest_multiples(values, divisor):
+    """
+    Nearest multiple of ``1 / divisor`` of each value, computed as ``music21.common.nearestMultiple``
+
+    Returns
+    -------
+    multiples: np.ndarray
+        Integer k of each match k / divisor
+    matches: np.ndarray
+        Match of each value, as the float computed by music21
+    errors: np.ndarray
+        Absolute error of each value, rounded to 7 digits
+    ambiguous: np.ndarray
+        Errors close to a rounding tie, that numpy may not round like python
+    """
+    unit = 1 / divisor
+    mult = np.floor(values / unit)
+    match_low = unit * mult
+    match_high = unit * (mult + 1)
+    low = (match_low <= values) & (values <= match_low + unit / 2.0)
+    matches = np.where(low, match_low, match_high)
+    errors = np.where(low, values - match_low, match_high - values)
+    scaled = errors * 1e7
+    ambiguous = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-3
+    return np.where(low, mult, mult + 1).astype(np.int64), matches, np.round(errors, 7), ambiguous
+
+
+def _exact_error(value, divisor):
+    """
+    Error of the nearest multiple of ``1 / divisor`` of one value, rounded as music21 with python's round
+    """
+    unit = 1 / divisor
+    mult = math.floor(value / unit)
+    match_low = unit * mult
+    if match_low <= value <= match_low + unit / 2.0:
+        return round(value - match_low, 7)
+    return round(unit * (mult + 1) - value, 7)
+
+
+def _best_matches(values, divisors):
+    """
+    Nearest multiples of each value for each divisor, and the index of the best divisor of each value :
+    the one with the smallest error, then with the smallest unit (as in music21 ``Stream.quantize``)
+    """
+    candidates = [_nearest_multiples(values, divisor) for divisor in divisors]
+    multiples = np.stack([candidate[0] for candidate in candidates])
+    matches = np.stack([candidate[1] for candidate in candidates])
+    errors = np.stack([candidate[2] for candidate in candidates])
+    # The errors that numpy may not round like python are computed again exactly
+    for i in np.flatnonzero(np.stack([candidate[3] for candidate in candidates]).any(axis=0)):
+        errors[:, i] = [_exact_error(float(values[i]), divisor) for divisor in divisors]
+    order = sorted(range(len(divisors)), key=lambda idx: 1 / divisors[idx])
+    best = np.full(len(values), order[0])
+    best_errors = errors[order[0]].copy()
+    for idx in order[1:]:
+        better = errors[idx] < best_errors
+        best[better] = idx
+        best_errors[better] = errors[idx][better]
+    return multiples, matches, best
+
+
+def _to_quarters(numerators, denominators):
+    """
+    Quarter lengths ``numerators / denominators`` as music21 offsets : floats, or Fractions if they are not
+    binary expressible
+    """
+    values = numerators / denominators
+    gcd = np.gcd(numerators, denominators)
+    reduced_numerators, reduced_denominators = numerators // gcd, denominators // gcd
+    fractional = (reduced_denominators & (reduced_denominators - 1)) != 0
+    if not fractional.any():
+        return values
+    values = values.astype(object)
+    values[fractional] = [Fraction(numerator, denominator) for numerator, denominator
+                          in zip(reduced_numerators[fractional].tolist(), reduced_denominators[fractional].tolist())]
+    return values
+
+
+def quantize(onsets, durations, groups=None, quantization=(4, 3)):
+    """
+    Quantize note onsets and durations (in quarters) to the nearest multiple of ``1 / divisor``
+    for the divisors of ``quantization``.
+
+    It reproduces ``music21.stream.Stream.quantize(quantization, processOffsets=True, processDurations=True)``
+    applied to one stream per group, with the notes inserted in the given order :
+
+    - the divisor with the smallest error is used, the largest divisor on ties
+    - a duration that leaves a gap smaller than the smallest unit before the next note of its group
+      is quantized again with the divisor of the next note onset
+    - a null duration becomes the smallest unit
+    - the notes of each group are read back sorted by quantized onset, as from the stream
+
+    The onsets and durations are expected to be numbers of ticks divided by a number of ticks per quarter
+    below 65536, as in midi files (music21 first rounds other values to such fractions).
+
+    Parameters
+    ----------
+    onsets: np.ndarray
+        Onsets in quarters, sorted in each group
+    durations: np.ndarray
+        Durations in quarters
+    groups: np.ndarray or None
+        Group of each note (the channel), None for a single group
+    quantization: tuple
+        Divisors of the quarter
+
+    Returns
+    -------
+    onsets: np.ndarray
+        Quantized onsets, floats or Fractions if they are not binary expressible (object array)
+    durations: np.ndarray
+        Quantized durations
+    """
+    onsets = np.asarray(onsets, dtype=float)
+    durations = np.maximum(np.asarray(durations, dtype=float), 0)
+    divisors = list(quantization)
+    nb_notes = len(onsets)
+    # Notes of each group consecutive, in the given order
+    order = np.argsort(groups, kind='stable') if groups is not None else np.arange(nb_notes)
+    onsets, durations = onsets[order], durations[order]
+    sorted_groups = np.asarray(groups)[order] if groups is not None else np.zeros(nb_notes)
+    rows = np.arange(nb_notes)
+    divisor_array = np.asarray(divisors, dtype=np.int64)
+
+    onset_multiples, onset_matches, onset_best = _best_matches(onsets, divisors)
+    onset_numerators = onset_multiples[onset_best, rows]
+    onset_denominators = divisor_array[onset_best]
+
+    duration_multiples, duration_matches, duration_best = _best_matches(durations, divisors)
+    duration_match = duration_matches[duration_best, rows]
+    has_next = np.zeros(nb_notes, dtype=bool)
+    has_next[:-1] = sorted_groups[1:] == sorted_groups[:-1]
+    gaps = np.zeros(nb_notes)
+    gaps[:-1] = onset_matches[onset_best[1:], rows[1:]] - (onset_numerators[:-1] / onset_denominators[:-1]
+                                                            + duration_match[:-1])
+    requantize = has_next & (0 < gaps) & (gaps < 1 / max(divisors))
+    duration_best[:-1] = np.where(requantize[:-1], onset_best[1:], duration_best[:-1])
+    duration_numerators = duration_multiples[duration_best, rows]
+    duration_denominators = divisor_array[duration_best]
+    null = duration_matches[duration_best, rows] == 0
+    duration_numerators[null] = 1
+    duration_denominators[null] = max(divisors)
+
+    # The stream returns its notes sorted by quantized onset (then by insertion order), and they are read back in
+    # this order : quantization can swap the onsets of close notes of a group, and their durations with them
+    stream_order = np.lexsort((rows, onset_numerators / onset_denominators, sorted_groups))
+    onset_numerators, onset_denominators = onset_numerators[stream_order], onset_denominators[stream_order]
+    duration_numerators, duration_denominators = duration_numerators[stream_order], duration_denominators[stream_order]
+
+    inverse = np.empty(nb_notes, dtype=np.int64)
+    inverse[order] = rows
+    return (_to_quarters(onset_numerators, onset_denominators)[inverse],
+            _to_quarters(duration_numerators, duration_denominators)[inverse])
+
+
+def read_midi(midi):
+    """
+    Read a midi file without going through the disk when it is already in memory
+
+    Parameters
+    ----------
+    midi: str, bytes, file object or miditoolkit.MidiFile
+        Path to the midi file, content of the midi file, binary file object or already parsed midi file
+
+    Returns
+    -------
+    midi: miditoolkit.MidiFile
+    """
+    if isinstance(midi, MidiFile):
+        return midi
+    if isinstance(midi, (bytes, bytearray, memoryview)):
+        return MidiFile(file=io.BytesIO(midi))
+    if hasattr(midi, 'read'):
+        return MidiFile(file=midi)
+    return MidiFile(midi)
+
 
 def load_score(filename, merge_tracks=True, quantization=(4, 3), **kwargs):
     """
@@ -12,8 +192,8 @@ def load_score(filename, merge_tracks=True, quantization=(4, 3), **kwargs):
 
     Parameters
     ----------
-    filename: str
-        Path to the midi file
+    filename: str, bytes, file object or miditoolkit.MidiFile
+        Midi file, see :func:`read_midi`
     merge_tracks: bool
         If True, merge tracks to estimate voices
     quantization: tuple
@@ -53,7 +233,7 @@ def load_score(filename, merge_tracks=True, quantization=(4, 3), **kwargs):
         result.index = x.index  # Set the index to match the input
         return result
 
-    m = MidiFile(filename)
+    m = read_midi(filename)
     ticks_per_beat = m.ticks_per_beat
     score = []
 
@@ -100,30 +280,16 @@ def load_score(filename, merge_tracks=True, quantization=(4, 3), **kwargs):
 
     df = pd.DataFrame(score)
 
-    def quantize_channel(df):
-        ## Step 2 : Quantize
-        from music21 import stream, note
-        s = stream.Stream()
-
-        for idx, row in df.iterrows():
-            n = note.Note()
-            n.quarterLength = row['duration_quarter']
-            s.repeatInsert(n, [row['onset_quarter']])
-
-        s.quantize(quantization, processOffsets=True, processDurations=True, inPlace=True)
-        onsets = [e.offset for e in s]
-        durations = [e.quarterLength for e in s]
-
-        df['onset_quarter'] = onsets
-        df['duration_quarter'] = durations
-        df['onset_beat'] = df['onset_quarter']
-        df['duration_beat'] = df['duration_quarter']
-        df['onset_div'] = df['onset_quarter'] * ticks_per_beat
-        df['duration_div'] = df['duration_quarter'] * ticks_per_beat
-        return df
-
-    df = df.sort_values(by=['onset_beat', 'pitch', 'duration_beat'])
-    df = df.groupby('channel').apply(quantize_channel).reset_index(level=0, drop=True)
+    ## Step 2 : Quantize each channel
+    df = df.sort_values(by=['onset_beat', 'pitch', 'duration_beat']).reset_index(drop=True)
+    onsets, durations = quantize(df['onset_quarter'].to_numpy(), df['duration_quarter'].to_numpy(),
+                                 groups=df['channel'].to_numpy(), quantization=quantization)
+    df['onset_quarter'] = onsets
+    df['duration_quarter'] = durations
+    df['onset_beat'] = df['onset_quarter']
+    df['duration_beat'] = df['duration_quarter']
+    df['onset_div'] = df['onset_quarter'] * ticks_per_beat
+    df['duration_div'] = df['duration_quarter'] * ticks_per_beat
     df['offset_beat'] = df['onset_beat'] + df['duration_beat']
     df = df.sort_values(by=['onset_beat', 'pitch', 'duration_beat'])
 
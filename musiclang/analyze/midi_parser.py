@@ -33,6 +33,7 @@ def parse_midi(filename, **kwargs):
     Parameters
     ----------
     filename :
+        Path, bytes, binary file object or miditoolkit.MidiFile
         param kwargs:
     **kwargs :
         
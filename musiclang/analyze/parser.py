@@ -10,15 +10,20 @@ LICENSE file in the root directory of this source tree.
 This file groups a set of functions to parse files into MusicLang objects
 """
 
-def parse_to_musiclang(input_file: str, **kwargs):
+import functools
+import os
+import shutil
+
+
+def parse_to_musiclang(input_file, **kwargs):
     """Parse an input file into a musiclang Score
     - Get chords with the AugmentedNet (https://github.com/napulen/AugmentedNet)
     - Get voice separation and parsing
 
     Parameters
     ----------
-    input_file : str
-        Input filepath
+    input_file : str, bytes, file object or miditoolkit.MidiFile
+        Input filepath, or midi file already in memory
 
     Returns
     -------
@@ -29,7 +34,9 @@ def parse_to_musiclang(input_file: str, **kwargs):
         Dict of score configuration
 
     """
-    extension = input_file.split('.')[-1]
+    if not isinstance(input_file, (str, os.PathLike)):
+        return parse_midi_to_musiclang(input_file, **kwargs)
+    extension = str(input_file).split('.')[-1]
     if extension.lower() in ['mid', 'midi']:
         return parse_midi_to_musiclang(input_file, **kwargs)
     elif extension.lower() in ['mxl', 'xml', 'mscx', 'musicxml', 'krn']:
@@ -38,8 +45,76 @@ def parse_to_musiclang(input_file: str, **kwargs):
         raise Exception('Unknown extension {}'.format(extension))
 
 
-def tokenize_midi_file(input_file, output_file, chord_range=None, quantization=16):
+@functools.lru_cache(maxsize=None)
+def _remi_tokenizer(quantization):
+    """REMI tokenizer used to normalize the midi files, built once per quantization"""
+    from miditok import REMI
+    from miditok.classes import TokenizerConfig
+
+    config = TokenizerConfig(
+        beat_res={(0, 8): quantization, (8, 16): quantization},
+        use_tempos=True,
+        use_time_signatures=True,
+        time_signature_range={8: [3, 12, 5, 6, 7, 9, 10, 11],
+                              4: [5, 6, 7, 3, 2, 1, 4],
+                              16: [3, 6, 5, 7, 9, 12, 14, 15, 17],
+                              2: [1, 2, 3, 4],
+                              1: [1, 2, 3, 4]
+                              },
+        one_token_stream_for_programs=True,
+        use_programs=True)
+
+    return REMI(
+        tokenizer_config=config,
+    )
+
+
+def _read_back(midi):
+    """Write a midi file built in memory and read it again with miditoolkit, in a memory buffer
+
+    Reading the file back pairs the note on and note off events (of overlapping notes with the same pitch),
+    drops the instruments without notes and rounds the tempos as a file written on disk, so that the score
+    loaded from the midi file is the same as with the former temporary file.
+
+    Parameters
+    ----------
+    midi: miditoolkit.MidiFile
+
+    Returns
+    -------
+    midi: miditoolkit.MidiFile
+        Midi file read from the written bytes
+
+    """
+    import io
+    from miditoolkit import MidiFile
+    buffer = io.BytesIO()
+    midi.dump(file=buffer)
+    buffer.seek(0)
+    return MidiFile(file=buffer)
+
+
+def tokenize_midi(midi, chord_range=None, quantization=16):
+    """Normalize a midi file with a REMI tokenization round-trip, in memory
+
+    Parameters
+    ----------
+    midi : str, bytes, file object or miditoolkit.MidiFile
+        Midi file to normalize (see :func:`musiclang.analyze.load_score.read_midi`)
+    chord_range : tuple or None
+        (start, end) range of bars to keep, None to keep all the bars
+    quantization : int
+        Number of positions per quarter of the tokenizer
+
+    Returns
+    -------
+    midi: miditoolkit.MidiFile
+        Normalized midi file, that can be given directly to :func:`parse_midi_to_musiclang`
+
+    """
     import itertools
+    from .load_score import read_midi
+
     def get_chord_range(tokens, tokenizer, start, end):
         bar_none = tokenizer['Bar_None']
 
@@ -63,50 +138,43 @@ def tokenize_midi_file(input_file, output_file, chord_range=None, quantization=1
 
         return tokens
 
-    from miditok import REMI
-    from miditok.classes import TokenizerConfig
-    from miditoolkit import MidiFile
+    tokenizer = _remi_tokenizer(quantization)
+    tokens = tokenizer.midi_to_tokens(read_midi(midi))
 
-    config = TokenizerConfig(
-        beat_res={(0, 8): quantization, (8, 16): quantization},
-        use_tempos=True,
-        use_time_signatures=True,
-        time_signature_range={8: [3, 12, 5, 6, 7, 9, 10, 11],
-                              4: [5, 6, 7, 3, 2, 1, 4],
-                              16: [3, 6, 5, 7, 9, 12, 14, 15, 17],
-                              2: [1, 2, 3, 4],
-                              1: [1, 2, 3, 4]
-                              },
-        one_token_stream_for_programs=True,
-        use_programs=True)
+    if chord_range is not None:
+        tokens = get_chord_range(tokens, tokenizer, *chord_range)
 
-    tokenizer = REMI(
-        tokenizer_config=config,
-    )
-    #tokenizer.one_token_stream = True
+    return _read_back(tokenizer.tokens_to_midi(tokens))
 
-    tokens = tokenizer.midi_to_tokens(MidiFile(input_file))
-    # Clear all tempo tokens
-    #tokens.events = [event for event in tokens.events if event.type != 'Tempo']
 
-    if chord_range is not None:
-        tokens = get_chord_range(tokens, tokenizer, *chord_range)
+def tokenize_midi_file(input_file, output_file, chord_range=None, quantization=16):
+    """Normalize a midi file with a REMI tokenization round-trip and write it, see :func:`tokenize_midi`"""
+    tokenize_midi(input_file, chord_range=chord_range, quantization=quantization).dump(output_file)
 
-    midi = tokenizer.tokens_to_midi(tokens)
 
-    #midi.dump('tester.mid')
-    # Reload for test
-    midi.dump(output_file)
+def _write_midi(midi, output_file):
+    """Write a midi file given as a path, bytes, a binary file object or a miditoolkit.MidiFile"""
+    from miditoolkit import MidiFile
+    if isinstance(midi, MidiFile):
+        midi.dump(output_file)
+    elif isinstance(midi, (bytes, bytearray, memoryview)) or hasattr(midi, 'read'):
+        with open(output_file, 'wb') as f:
+            f.write(midi if not hasattr(midi, 'read') else midi.read())
+    else:
+        shutil.copy(midi, output_file)
+
 
-def parse_midi_to_musiclang(input_file: str, chord_range=None, tokenize_before=True, quantization=(4, 3), fast_chord_inference=True, **kwargs):
+def parse_midi_to_musiclang(input_file, chord_range=None, tokenize_before=True, quantization=(4, 3), fast_chord_inference=True, **kwargs):
     """Parse a midi input file into a musiclang Score
     - Get chords with dynamic programming
     - Get voice separation and parsing
 
+    With the fast chord inference the midi file is tokenized, loaded and parsed in memory, without temporary files.
+
     Parameters
     ----------
-    input_file : str
-        Input midi filepath
+    input_file : str, bytes, file object or miditoolkit.MidiFile
+        Input midi filepath, or midi file already in memory
 
     Returns
     -------
@@ -118,31 +186,31 @@ def parse_midi_to_musiclang(input_file: str, chord_range=None, tokenize_before=T
 
     """
     import tempfile
-    import time
-    import os
-    import shutil
     # First tokenize the midi file
-
+    midi = input_file
+    if tokenize_before:
+        quantization_for_tokenize = 8
+        midi = tokenize_midi(input_file, chord_range=chord_range, quantization=quantization_for_tokenize)
+    elif chord_range is not None:
+        raise Exception('Chord range must be None if tokenize_before is False')
+
+    if fast_chord_inference:
+        score, config = parse_midi_to_musiclang_without_annotation(midi, quantization=quantization, **kwargs)
+        return score.to_drum(), config
+
+    # The chord inference model reads its input score from a file
     with tempfile.TemporaryDirectory() as di:
         midi_file = os.path.join(di, 'data.mid')
-        if tokenize_before:
-            quantization_for_tokenize = 8
-            tokenize_midi_file(input_file, midi_file, chord_range=chord_range, quantization=quantization_for_tokenize)
-        elif chord_range is None:
-            shutil.copy(input_file, midi_file)
-        else:
-            raise Exception('Chord range must be None if tokenize_before is False')
-
-        if not fast_chord_inference:
-            mxl_file = os.path.join(di, 'data.mxl')
-            obj = _m21Parse(midi_file)
-            obj.write('mxl', fp=os.path.join(mxl_file))
+        _write_midi(midi, midi_file)
+        mxl_file = os.path.join(di, 'data.mxl')
+        obj = _m21Parse(midi_file)
+        obj.write('mxl', fp=os.path.join(mxl_file))
 
         result = parse_directory_to_musiclang(di, fast_chord_inference=fast_chord_inference, quantization=quantization, **kwargs)
     return result
 
 
-def parse_mxl_to_musiclang(input_file: str, **kwargs):
+def parse_mxl_to_musiclang(input_file: str, fast_chord_inference=True, **kwargs):
     """Parse a music xml input file into a musiclang Score
     - Either get chord with dynamic programming (fast_inference=True), or with the AugmentedNet (https://github.com/napulen/AugmentedNet)
     - Separate into monophonic voice with the proper instrument
@@ -161,16 +229,19 @@ def parse_mxl_to_musiclang(input_file: str, **kwargs):
     """
 
     import tempfile
-    import os
-    import music21
-    import shutil
+    from music21.midi.translate import music21ObjectToMidiFile
+    obj = _m21Parse(input_file, remove_perc=False)
+    midi = music21ObjectToMidiFile(obj).writestr()
+    if fast_chord_inference:
+        score, config = parse_midi_to_musiclang_without_annotation(midi, **kwargs)
+        return score.to_drum(), config
+
     with tempfile.TemporaryDirectory() as di:
         midi_file = os.path.join(di, 'data.mid')
         mxl_file = os.path.join(di, 'data.mxl')
-        obj = _m21Parse(input_file, remove_perc=False)
-        obj.write('midi', fp=os.path.join(midi_file))
+        _write_midi(midi, midi_file)
         shutil.copy(input_file, mxl_file)
-        result = parse_directory_to_musiclang(di, **kwargs)
+        result = parse_directory_to_musiclang(di, fast_chord_inference=fast_chord_inference, **kwargs)
     return result
 
 def parse_directory_to_musiclang(directory: str, fast_chord_inference=True, **kwargs):
@@ -208,13 +279,13 @@ def parse_directory_to_musiclang(directory: str, fast_chord_inference=True, **kw
 
 
 
-def parse_midi_to_musiclang_without_annotation(midi_file: str, **kwargs):
+def parse_midi_to_musiclang_without_annotation(midi_file, **kwargs):
     """
 
     Parameters
     ----------
-    midi_file: str :
-        Filepath to the midi file to parse
+    midi_file: str, bytes, file object or miditoolkit.MidiFile
+        Midi file to parse, see :func:`musiclang.analyze.load_score.read_midi`
 
     annotation_file: str :
         Filepath to the anotation file to parse
@@ -429,8 +500,8 @@ def parse_musiclang_sequence_and_chords(midi_file, **kwargs):
 
     Parameters
     ----------
-    midi_file : str
-        Path to the midi file
+    midi_file : str, bytes, file object or miditoolkit.MidiFile
+        Midi file, see :func:`musiclang.analyze.load_score.read_midi`
     """
     from musiclang import Score
     from .midi_parser import parse_midi
@@ -547,8 +618,8 @@ def chords_to_musiclang(chords):
     -------
 
     """
-    from musiclang import Tonality, Chord, Note
-    new_score = None
+    from musiclang import Tonality, Chord, Note, ScoreBuilder
+    new_score = ScoreBuilder()
     for notes, duration, degree, figure, key in chords:
         key_tonic, key_mode = key
         tonality = Tonality(key_tonic, mode=key_mode)
@@ -561,7 +632,7 @@ def chords_to_musiclang(chords):
         chord_score = {f'piano__{idx}': sn for idx, sn in enumerate(scale_notes)}
         new_score += chord(**chord_score)
 
-    return new_score
+    return new_score.freeze()
 
 
 def music21_roman_analysis_to_chords(score):
@@ -1,22 +1,71 @@
 import json
-from musiclang import Score
+import os
+import queue
+import tempfile
+import threading
+
+import numpy as np
+
+from musiclang.write.binary_score import BINARY_EXTENSION
+from .corpus_index import CorpusIndex, INDEX_FILENAME
 from .pattern_analyzer import PatternExtractor
 
+
 class PicklePatternSampler:
     """
-    Sample a chord pattern from a nested directory of musiclang text files
+    Sample a chord pattern from a nested directory of musiclang pickle files
+
+    The chords of all the files are indexed once (see :class:`CorpusIndex`), each sample reads a single chord
+    among the chords respecting the bar duration and the number of instruments.
     """
+    extension = '.pkl'
+
     def __init__(self, directory, metadata_file=None,
                  bar_duration=4, min_nb_instruments=2,
+                 index_directory=None, prefetch=0, seed=None,
                  **kwargs
                  ):
+        """
+
+        Parameters
+        ----------
+        directory: str
+            Directory of the corpus
+        metadata_file: str, optional
+        bar_duration: int or Fraction
+            Duration of the sampled chords
+        min_nb_instruments: int
+            Minimum number of instruments of the sampled chords
+        index_directory: str, optional
+            Directory where the index of the corpus is saved, and reused if none of the files was added, removed
+            or modified. If None the index is built in a temporary directory removed by :func:`close`
+        prefetch: int
+            If positive, number of patterns extracted in advance in a background thread
+        seed: int, optional
+            Seed of the random choice of the chords
+        kwargs:
+            Parameters of the :class:`PatternExtractor`
+        """
         self.directory = directory
         self.metadata_file = metadata_file
         self.bar_duration = bar_duration
         self.files = self.load_files()
         self.metadata = self.load_metadata()
         self.min_nb_instruments = min_nb_instruments
+        self.index_directory = index_directory
+        self._temporary_directory = None
         self.kwargs = kwargs
+        self.rng = np.random.default_rng(seed)
+        self.index = self.load_index()
+        self.candidates = self.index.select(duration=self.bar_duration, min_nb_instruments=self.min_nb_instruments)
+        self.prefetch = prefetch
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        if prefetch > 0 and len(self.candidates) > 0:
+            self._queue = queue.Queue(maxsize=prefetch)
+            self._thread = threading.Thread(target=self._prefetch, daemon=True)
+            self._thread.start()
 
     def load_metadata(self):
         if self.metadata_file is None:
@@ -28,42 +77,98 @@ class PicklePatternSampler:
 
     def load_files(self):
         import glob
-        files = glob.glob(self.directory + '/**/*.pkl', recursive=True)
-        return files
+        files = glob.glob(self.directory + '/**/*' + self.extension, recursive=True)
+        return sorted(files)
+
+    def load_index(self):
+        """
+        Load the index of the files from the index directory, or build it if the files changed
+        """
+        if self.index_directory is None:
+            self._temporary_directory = tempfile.TemporaryDirectory(prefix='musiclang_index_')
+            return CorpusIndex.build(self.files, self._temporary_directory.name)
+        index_file = os.path.join(self.index_directory, INDEX_FILENAME)
+        if os.path.exists(index_file):
+            index = CorpusIndex.load(index_file)
+            if index.is_up_to_date(self.files):
+                return index
+        return CorpusIndex.build(self.files, self.index_directory)
+
+    def _sample(self):
+        if len(self.candidates) == 0:
+            raise Exception('No chord respecting criterias were found')
+        row = self.candidates[self.rng.integers(len(self.candidates))]
+        chord = self.index.chord(row)
+        return PatternExtractor(**self.kwargs).extract(chord)
+
+    def _prefetch(self):
+        while not self._stop.is_set():
+            try:
+                pattern = self._sample()
+            except Exception as e:
+                pattern = e
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(pattern, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
 
     def sample(self):
-        # Sample a file
-        import random
-        max_iter = 100
-        idx = 0
-        while idx < max_iter:
-            file = random.choice(self.files)
-            # Load the score from the file
-            score = Score.from_pickle(file)
-
-            # if score.config['time_signature'] != (4, 4):
-            #     print('No good time signature', score.config['time_signature'])
-            #     continue
-            # Look for a chord with proper bar duration
-            available_chords = [chord for chord in score.chords if (chord.duration == self.bar_duration)
-                                and len(chord.instruments) >= self.min_nb_instruments]
-            if len(available_chords) == 0:
-                idx += 1
-                continue
-
-            chord_idx = random.choice(range(len(available_chords)))
-            chord = available_chords[chord_idx]
-            # Sort instruments from lower to higher pitch
-            return PatternExtractor(**self.kwargs).extract(chord)
-
-        raise Exception('No chord respecting criterias were found')
+        """
+        Sample the pattern of a random chord respecting the criteria
+
+        Returns
+        -------
+        pattern: dict
+        """
+        if self._stop.is_set():
+            raise Exception('Cannot sample from a closed sampler')
+        if self._queue is None:
+            return self._sample()
+        pattern = self._queue.get()
+        if isinstance(pattern, Exception):
+            raise pattern
+        return pattern
 
+    def sample_batch(self, n):
+        """
+        Sample the patterns of n random chords respecting the criteria
+
+        Parameters
+        ----------
+        n: int
+
+        Returns
+        -------
+        patterns: list[dict]
+        """
+        return [self.sample() for _ in range(n)]
+
+    def close(self):
+        """
+        Stop the prefetching thread and remove the temporary index directory, the sampler cannot sample afterwards
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._queue = None
+        self.index.close()
+        if self._temporary_directory is not None:
+            self._temporary_directory.cleanup()
+            self._temporary_directory = None
 
 
 class TextPatternSampler(PicklePatternSampler):
+    """
+    Sample a chord pattern from a nested directory of musiclang text files
+    """
+    extension = '.txt'
 
 
-    def load_files(self):
-        import glob
-        files = glob.glob(self.directory + '/**/*.txt', recursive=True)
-        return files
+class BinaryPatternSampler(PicklePatternSampler):
+    """
+    Sample a chord pattern from a nested directory of binary score files, that are indexed without conversion
+    """
+    extension = BINARY_EXTENSION
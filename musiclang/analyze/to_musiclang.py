@@ -6,6 +6,9 @@ This source code is licensed under the BSD-style license found in the
 LICENSE file in the root directory of this source tree.
 """
 
+import bisect
+import itertools
+
 from .voice_separation import separate_voices
 from musiclang.write.note import Silence, Continuation
 from musiclang.write.constants import OCTAVES
@@ -28,34 +31,38 @@ def infer_score_with_chords_durations(sequence, chords, instruments, bars):
 
     """
     # Split each chords, instruments, voices
-    time_start = 0
-    time_end = 0
     score = []
     continuations = {}
     offsets_voices = {}  # Store the offset of voice to deduplicate voice idx between tracks
     offsets_voices_raw = {}  # Store the offset of voice to deduplicate voice idx between tracks
     tracks = list(set([s.track for s in sequence]))
+    max_voices = {}
+    for n in sequence:
+        max_voices[n.track] = max(max_voices.get(n.track, n.voice), n.voice)
     for channel, instrument in instruments.items():
         for track_idx in tracks:
-            track_notes = [n for n in sequence if n.track == track_idx]
-            voices = {n.voice for n in track_notes}
             offsets_voices[track_idx] = offsets_voices_raw.get(channel, 0)
             if channel not in offsets_voices_raw.keys():
-                offsets_voices_raw[channel] = max(voices) + 1
+                offsets_voices_raw[channel] = max_voices[track_idx] + 1
             else:
-                offsets_voices_raw[channel] += max(voices) + 1
+                offsets_voices_raw[channel] += max_voices[track_idx] + 1
+    time_ends = list(itertools.accumulate(chord.duration for chord, _ in zip(chords, bars)))
+    chords_notes = _bucket_notes(sequence, time_ends)
     for idx, (chord, bar) in enumerate(zip(chords, bars)):
         is_last_bar = idx == len(bars) - 1
         chord_duration = bar[1] - bar[0]
-        time_start = 0 if idx == 0 else time_start + chords[idx - 1].duration
-        time_end += chord.duration
-        chord_notes = [n for n in sequence if time_start <= n.start < time_end]
+        time_start = 0 if idx == 0 else time_ends[idx - 1]
+        time_end = time_ends[idx]
+        chord_notes = chords_notes[idx]
         chord_dict = {}
         for track in tracks:
-            track_notes = [n for n in chord_notes if n.track == track]
+            track_notes = chord_notes.get(track, [])
             voices = {n.voice for n in track_notes}
+            voices_notes = {}
+            for n in track_notes:
+                voices_notes.setdefault(n.voice, []).append(n)
             for voice in voices:
-                voice_notes = [n for n in track_notes if n.voice == voice]
+                voice_notes = voices_notes[voice]
                 if len(voice_notes) > 0:
                     instrument = instruments.get(voice_notes[0].channel, 'piano')
                     voice_name = instrument + '__' + str(offsets_voices.get(track, 0) + int(voice))
@@ -80,6 +87,32 @@ def infer_score_with_chords_durations(sequence, chords, instruments, bars):
     return Score(score)
 
 
+def _bucket_notes(sequence, time_ends):
+    """Split the notes per chord and per track in a single pass, keeping the order of the sequence
+
+    Parameters
+    ----------
+    sequence :
+        List[Item] : notes of the score
+    time_ends :
+        End time of each chord, non decreasing (the first chord starts at 0)
+
+    Returns
+    -------
+    chords_notes : list of dict
+        For each chord, notes starting during the chord (start <= note.start < end) by track
+
+    """
+    chords_notes = [{} for _ in time_ends]
+    for n in sequence:
+        if n.start < 0:
+            continue
+        idx = bisect.bisect_right(time_ends, n.start)
+        if idx < len(time_ends):
+            chords_notes[idx].setdefault(n.track, []).append(n)
+    return chords_notes
+
+
 def infer_score(sequence, chords, instruments, bar_duration_in_ticks, offset_in_ticks, tick_value):
     """
 
@@ -104,9 +137,10 @@ def infer_score(sequence, chords, instruments, bar_duration_in_ticks, offset_in_
     """
 
     # Split each chord, instrument, voice
+    from musiclang import ScoreBuilder
     time_start = 0
     time_end = bar_duration_in_ticks
-    score = None
+    score = ScoreBuilder()
     continuations = {}
 
     # Get all track, voices
@@ -147,7 +181,7 @@ def infer_score(sequence, chords, instruments, bar_duration_in_ticks, offset_in_
         time_start += bar_duration_in_ticks
         time_end += bar_duration_in_ticks
 
-    return score
+    return score.freeze()
 
 
 
@@ -31,6 +31,25 @@ class Arranger:
 
             self.states = {mode: [s for s in self.states[mode] if s in keep_index[mode]] for mode in self.states.keys()}
 
+        self._build_matrices()
+        self._models = {}
+
+    def _build_matrices(self):
+        """
+        Dense probability matrices of each mode, in the order of ``self.states[mode]`` :
+        priors (states), transitions (previous state x state) and emissions (states x 12 pitch classes)
+        """
+        self.state_index = {mode: {state: idx for idx, state in enumerate(states)}
+                            for mode, states in self.states.items()}
+        self.prior_matrices = {mode: self.priors[mode].reindex(states).fillna(0).values.astype(np.float64)
+                               for mode, states in self.states.items()}
+        self.transition_matrices = {mode: self.transitions[mode].reindex(index=states, columns=states).fillna(0)
+                                    .values.astype(np.float64)
+                                    for mode, states in self.states.items()}
+        self.emission_matrices = {mode: self.emissions[mode].reindex(index=states, columns=list(range(12))).fillna(0)
+                                  .values.astype(np.float64)
+                                  for mode, states in self.states.items()}
+
     @staticmethod
     def _to_dataframe(x):
         return {key: pd.DataFrame(val) for key, val in x.items()}
@@ -39,13 +58,64 @@ class Arranger:
     def _to_series(x):
         return {key: pd.Series(val) for key, val in x.items()}
 
-    def arrange(self, melody, tonality, candidates=None, instrument='piano',
-                temperature=0.0, eps=1e-5, zero_diag=True, weak_beat_importance=0.5,
-                return_score=False
-                ):
+    def get_model(self, mode, eps=1e-5, zero_diag=True, temperature=0.0):
+        """
+        Probability matrices used by the decoding, cached at temperature 0
+
+        Parameters
+        ----------
+        mode: str
+            'M' or 'm'
+        eps: float, default=1e-5
+            Added to the transition and emission probabilities
+        zero_diag: bool, default=True
+            If True, a state can not follow itself (except with the ``eps`` probability)
+        temperature: float, default=0.0
+            Standard deviation of a gaussian noise added to the probabilities (drawn at each call)
+
+        Returns
+        -------
+        priors: np.ndarray
+            Prior of each state
+        transitions: np.ndarray
+            Probability of each (previous state, state) transition
+        emissions: np.ndarray
+            Probability of each pitch class for each state
+        """
+        key = (mode, eps, zero_diag)
+        if temperature == 0 and key in self._models:
+            return self._models[key]
+        priors = self.prior_matrices[mode]
+        transitions = self.transition_matrices[mode]
+        emissions = self.emission_matrices[mode]
+        if temperature > 0:
+            priors = priors + (temperature * np.random.randn(*priors.shape))
+            transitions = transitions + (temperature * np.random.randn(*transitions.shape))
+            emissions = emissions + (temperature * np.random.randn(*emissions.shape))
+        if zero_diag:
+            transitions = transitions * (1 - np.eye(*transitions.shape))
+        model = priors, transitions + eps, emissions + eps
+        if temperature == 0:
+            self._models[key] = model
+        return model
+
+    def get_pitches(self, melody, tonality, weak_beat_importance=0.5):
+        """
+        Observations of the decoding : for each chord change, list of (pitch class relative to the tonality, strength)
 
+        Parameters
+        ----------
+        melody: list[list[(Note, bool)]]
+            For each chord change, list of (note, is in chord)
+        tonality: str
+        weak_beat_importance: float, default=0.5
+            Strength of the notes that are not in chord
+
+        Returns
+        -------
+        pitches: list[list[(int, float)]]
+        """
         import random
-        # melody= [[(s0, 1), (s1, 0)], [], []]
         tone, mode = ChordElement.get_key_mode(tonality)
         # Get pitches from melody
         base_chord = ChordElement.get_tonic_chord(tonality)
@@ -79,22 +149,25 @@ class Arranger:
             if len(temp_pitches) > 0:
                 pitches.append(temp_pitches)
 
-        if candidates is None:
-            candidates = [None] * len(pitches)
+        return pitches
+
+    def arrange(self, melody, tonality, candidates=None, instrument='piano',
+                temperature=0.0, eps=1e-5, zero_diag=True, weak_beat_importance=0.5,
+                return_score=False
+                ):
 
-        chords, proba = self.get_chord_progression(pitches, candidates, tonality,
-                                              self.states,
-                                              self.priors,
-                                              self.transitions,
-                                              self.emissions,
-                                              temperature=temperature,
-                                              eps=eps,
-                                              zero_diag=zero_diag)
+        # melody= [[(s0, 1), (s1, 0)], [], []]
+        chords = self.arrange_batch([melody], tonality, candidates=[candidates],
+                                    temperature=temperature, eps=eps, zero_diag=zero_diag,
+                                    weak_beat_importance=weak_beat_importance)[0]
 
         if not return_score:
             return chords
         # Re-arrange the melody inside the chords
-        score = None
+        from musiclang import ScoreBuilder
+        base_chord = ChordElement.get_tonic_chord(tonality)
+        curr_pitch = None
+        score = ScoreBuilder()
         for literal_chord, chord_change in zip(chords, melody):
             chord_melody = None
             chord = ChordElement(literal_chord).parse_with_tonality(tonality)
@@ -109,91 +182,206 @@ class Arranger:
             score += chord(**{instrument: chord_melody})
 
 
-        return score
+        return score.freeze()
 
+    def arrange_batch(self, melodies, tonality, candidates=None, temperature=0.0, eps=1e-5, zero_diag=True,
+                      weak_beat_importance=0.5):
+        """
+        Find the chord progressions of several melodies, decoded together.
+        It gives the same progressions as calling :func:`Arranger.arrange` on each melody, except that with
+        a temperature the noise is drawn once per mode for the whole batch.
 
+        Parameters
+        ----------
+        melodies: list[list[list[(Note, bool)]]]
+            Melodies in the format of :func:`Arranger.arrange`
+        tonality: str or list[str]
+            Tonality of all the melodies, or of each melody
+        candidates: list or None
+            Candidates of each melody (see :func:`Arranger.arrange`), None for no candidates
+        temperature: float, default=0.0
+        eps: float, default=1e-5
+        zero_diag: bool, default=True
+        weak_beat_importance: float, default=0.5
 
-    def viterbi(self, obs, candidates, states, start_p, trans_p, emit_p, eps=1e-5):
+        Returns
+        -------
+        chords: list[list[str]]
+            Chord progression of each melody
+        """
+        tonalities = [tonality] * len(melodies) if isinstance(tonality, str) else list(tonality)
+        if candidates is None:
+            candidates = [None] * len(melodies)
+        pitches = [self.get_pitches(melody, tonality, weak_beat_importance=weak_beat_importance)
+                   for melody, tonality in zip(melodies, tonalities)]
+        candidates = [[None] * len(obs) if candidate is None else candidate
+                      for obs, candidate in zip(pitches, candidates)]
+        modes = [ChordElement.get_key_mode(tonality)[1] for tonality in tonalities]
 
-        def get_emit(st, t):
-            if isinstance(obs[t], int):
-                # If observable is a single pitch
-                emit = emit_p[st][obs[t]]
-            else:
-                # If multi pitches
-                emit = 1.0
-                for ob, strength in obs[t]:
-                    emit *= emit_p[st][ob] * strength
-            if candidates[t] is not None:
-                if isinstance(candidates[t], str):
-                    emit = 1.0 * (st == candidates[t]) + eps
-                else:
-                    emit = 1.0 * (st in candidates[t]) / len(candidates[t]) + eps
-
-            return emit
-
-        V = [{}]
-        for st in states:
-            V[0][st] = {"prob": start_p[st] * get_emit(st, 0), "prev": None}
-        # Run Viterbi when t > 0
-        for t in range(1, len(obs)):
-            V.append({})
-            for st in states:
-                max_tr_prob = V[t - 1][states[0]]["prob"] * trans_p[states[0]][st] * get_emit(st, t)
-                prev_st_selected = states[0]
-                for prev_st in states[1:]:
-                    tr_prob = V[t - 1][prev_st]["prob"] * trans_p[prev_st][st] * get_emit(st, t)
-                    if tr_prob > max_tr_prob:
-                        max_tr_prob = tr_prob
-                        prev_st_selected = prev_st
-
-                max_prob = max_tr_prob
-                V[t][st] = {"prob": max_prob, "prev": prev_st_selected}
-
-        opt = []
-        max_prob = - np.inf
-        best_st = None
-        # Get most probable state and its backtrack
-        for st, data in V[-1].items():
-            if data["prob"] > max_prob:
-                max_prob = data["prob"]
-                best_st = st
-        opt.append(best_st)
-        previous = best_st
-
-        # Follow the backtrack till the first observation
-        for t in range(len(V) - 2, -1, -1):
-            opt.insert(0, V[t + 1][previous]["prev"])
-            previous = V[t + 1][previous]["prev"]
-        return opt, max_prob
-
-    def dptable(self, V):
-        # Print a table of steps from dictionary
-        yield " " * 5 + "     ".join(("%3d" % i) for i in range(len(V)))
-        for state in V[0]:
-            yield "%.7s: " % state + " ".join("%.7s" % ("%lf" % v[state]["prob"]) for v in V)
-
-    def get_chord_progression(self, pitches, candidates, tonality, states, priors, transitions,
-                              emissions, temperature=0.0, eps=1e-5, zero_diag=True):
-        # Get pitch relative to tonality
-        tone, mode = ChordElement.get_key_mode(tonality)
-        #obs = [((p[0] - tone) % 12, p[1]) if isinstance(p[0], tuple) else [((pi[0] - tone), pi[1]) % 12 for pi in p] for p in pitches]
-        obs = pitches
-        # If temperature add random noise to each matrix
-        if temperature > 0:
-            priors = {m: prior + (temperature * np.random.randn(*prior.shape)) for m, prior in priors.items()}
-            transitions = {m: transition + (temperature * np.random.randn(*transition.shape)) for m, transition in transitions.items()}
-            emissions = {m: emission + (temperature * np.random.randn(*emission.shape)) for m, emission in emissions.items()}
+        chords = [None] * len(melodies)
+        for mode in sorted(set(modes)):
+            indexes = [idx for idx, melody_mode in enumerate(modes) if melody_mode == mode]
+            model = self.get_model(mode, eps=eps, zero_diag=zero_diag, temperature=temperature)
+            paths = self.viterbi_batch([pitches[idx] for idx in indexes], [candidates[idx] for idx in indexes],
+                                       mode, model, eps=eps)
+            for idx, (path, log_prob) in zip(indexes, paths):
+                chords[idx] = path
+        return chords
 
-        if zero_diag:
-            for mode_ in transitions.keys():
-                transitions[mode_] = transitions[mode_] * (1 - np.eye(*transitions[mode_].shape))
-        chords, prob = self.viterbi(obs,
-                               candidates,
-                               states[mode],
-                               (priors[mode]).to_dict(),
-                               (transitions[mode].T + eps).to_dict(),
-                               (emissions[mode].T + eps).to_dict(),
-                               eps=eps)
-        return chords, prob
+    def get_emissions(self, obs, candidates, mode, emissions, eps=1e-5):
+        """
+        Emission probability of each state at each step of a sequence
+
+        Parameters
+        ----------
+        obs: list
+            Observation of each step, a pitch class or a list of (pitch class, strength)
+        candidates: list
+            None, a state or a list of states for each step, that replaces the emission by
+            the probability to be one of the candidates
+        mode: str
+        emissions: np.ndarray
+            Emission matrix of the states
+        eps: float, default=1e-5
+
+        Returns
+        -------
+        emit: np.ndarray
+            (steps x states) array
+        """
+        emissions_by_pitch = emissions.T
+        obs = [[(ob, None)] if isinstance(ob, (int, np.integer)) else ob for ob in obs]
+        emit = np.ones((len(obs), emissions.shape[0]))
+        # Multiplied in the order of the observations of each step
+        for position in range(max((len(ob) for ob in obs), default=0)):
+            steps = [t for t, ob in enumerate(obs) if len(ob) > position]
+            pitches = [obs[t][position][0] for t in steps]
+            factors = emissions_by_pitch[pitches]
+            # A single pitch observation has no strength
+            strengths = [obs[t][position][1] for t in steps]
+            weighted = [idx for idx, strength in enumerate(strengths) if strength is not None]
+            factors[weighted] *= np.asarray([strengths[idx] for idx in weighted], dtype=np.float64)[:, None]
+            emit[steps] *= factors
+
+        state_index = self.state_index[mode]
+        for t, candidate in enumerate(candidates):
+            if candidate is None:
+                continue
+            candidate = [candidate] if isinstance(candidate, str) else candidate
+            indicator = np.zeros(emissions.shape[0])
+            indicator[[state_index[state] for state in set(candidate) if state in state_index]] = 1.0
+            emit[t] = indicator / len(candidate) + eps
+        return emit
+
+    def viterbi(self, obs, candidates, mode, model, eps=1e-5):
+        """
+        Most probable sequence of states of one sequence of observations, see :func:`Arranger.viterbi_batch`
+
+        Returns
+        -------
+        states: list[str]
+        log_prob: float
+        """
+        return self.viterbi_batch([obs], [candidates], mode, model, eps=eps)[0]
+
+    def viterbi_batch(self, observations, candidates, mode, model, eps=1e-5, max_block_size=2 ** 18):
+        """
+        Viterbi decoding of several sequences of observations at once.
 
+        Each step is vectorized over the states and the sequences of a block, the blocks being bounded
+        to ``max_block_size`` (sequences x states x states) scores. The scores of each step are rescaled by
+        a power of two, so long sequences do not underflow, and the comparisons are exactly the ones of
+        the product of the probabilities (ties go to the first state).
+
+        Parameters
+        ----------
+        observations: list[list]
+            Observations of each sequence, see :func:`Arranger.get_emissions`
+        candidates: list[list]
+            Candidates of each step of each sequence
+        mode: str
+        model: tuple
+            Priors, transitions and emissions matrices, see :func:`Arranger.get_model`
+        eps: float, default=1e-5
+        max_block_size: int
+
+        Returns
+        -------
+        paths: list[(list[str], float)]
+            Most probable states of each sequence and its log probability
+        """
+        priors, transitions, emissions = model
+        states = self.states[mode]
+        nb_states = len(states)
+        emits = [self.get_emissions(obs, candidate, mode, emissions, eps=eps)
+                 for obs, candidate in zip(observations, candidates)]
+        block_size = max(max_block_size // max(nb_states * nb_states, 1), 1)
+        paths = []
+        for start in range(0, len(emits), block_size):
+            for path, log_prob in zip(*self._viterbi_block(emits[start:start + block_size], priors, transitions)):
+                paths.append(([states[idx] for idx in path], log_prob))
+        return paths
+
+    @staticmethod
+    def _viterbi_block(emits, priors, transitions):
+        nb_sequences = len(emits)
+        nb_states = len(priors)
+        lengths = np.asarray([len(emit) for emit in emits])
+        nb_steps = max(lengths.max(), 1)
+        padded_emits = np.ones((nb_steps, nb_sequences, nb_states))
+        for idx, emit in enumerate(emits):
+            padded_emits[:len(emit), idx] = emit
+
+        # Scores of the sequences finishing at each step are kept when they are finished
+        last_steps = lengths - 1
+        finishing = {t: np.where(last_steps == t)[0] for t in np.unique(last_steps).tolist()}
+        final_scores = np.full((nb_sequences, nb_states), -np.inf)
+        final_exponents = np.zeros(nb_sequences, dtype=np.int64)
+
+        scores = priors[None, :] * padded_emits[0]
+        exponents = np.zeros(nb_sequences, dtype=np.int64)
+        backpointers = np.zeros((nb_steps, nb_sequences, nb_states), dtype=np.int32)
+        # total[s, j, k] : score of state j at the next step coming from state k
+        incoming = np.ascontiguousarray(transitions.T)
+        total = np.empty((nb_sequences, nb_states, nb_states))
+        flat_total = total.reshape(-1)
+        offsets = np.arange(nb_sequences * nb_states) * nb_states
+        for t in range(nb_steps):
+            # Exact rescaling by a power of two, scores = probabilities * 2 ** -exponents
+            exponent = np.frexp(np.abs(scores).max(axis=1))[1]
+            scores = np.ldexp(scores, -exponent[:, None])
+            exponents += exponent
+            if t in finishing:
+                final_scores[finishing[t]] = scores[finishing[t]]
+                final_exponents[finishing[t]] = exponents[finishing[t]]
+            if t == nb_steps - 1:
+                break
+            np.multiply(scores[:, None, :], incoming[None, :, :], out=total)
+            np.multiply(total, padded_emits[t + 1][:, :, None], out=total)
+            best = total.argmax(axis=2)
+            backpointers[t + 1] = best
+            scores = flat_total[offsets + best.reshape(-1)].reshape(nb_sequences, nb_states)
+
+        sequences = np.arange(nb_sequences)
+        index = np.argmax(final_scores, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_probs = np.log(final_scores[sequences, index]) + final_exponents * np.log(2)
+        path = np.zeros((nb_steps, nb_sequences), dtype=np.int64)
+        for t in range(nb_steps - 1, -1, -1):
+            path[t] = index
+            if t > 0:
+                index = np.where(last_steps >= t, backpointers[t, sequences, index], index)
+        return [path[:length, idx].tolist() for idx, length in enumerate(lengths)], log_probs.tolist()
+
+    def get_chord_progression(self, pitches, candidates, tonality, temperature=0.0, eps=1e-5, zero_diag=True):
+        """
+        Most probable chord progression of the observed pitches in a tonality
+
+        Returns
+        -------
+        chords: list[str]
+        log_prob: float
+        """
+        tone, mode = ChordElement.get_key_mode(tonality)
+        model = self.get_model(mode, eps=eps, zero_diag=zero_diag, temperature=temperature)
+        return self.viterbi(pitches, candidates, mode, model, eps=eps)
@@ -207,10 +207,11 @@ class Transformer:
         return chord(**{part: melody for part, melody in chord.score.items() if melody is not None})
 
     def apply_on_score(self, element, on=Mask(), **kwargs):
+        from musiclang import ScoreBuilder
         beat = 0
         idx = 0
         last_chord = None
-        score = None
+        score = ScoreBuilder()
         for m in element.chords:
             chord = self(m, on=on.child(element, **kwargs), chord_beat=beat, chord_idx=idx, last_chord=last_chord, **kwargs)\
                 if on(m, chord_beat=beat, chord_idx=idx, last_chord=last_chord, **kwargs) else self.get_default(m)
@@ -220,7 +221,7 @@ class Transformer:
             if chord is not None:
                 score += chord
 
-        return score.add_tags(element.tags)
+        return score.freeze().add_tags(element.tags)
 
     @staticmethod
     def get_part(inst, voice, chord: 'Chord'):
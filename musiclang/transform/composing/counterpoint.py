@@ -3,11 +3,12 @@ from .project import project_on_rhythm, project_on_one_chord,\
 import numpy as np
 
 
-def create_counterpoint(fixed_voices, voices):
+def create_counterpoint(fixed_voices, voices, method='greedy', beam_width=16):
     """
     Create a counterpoint given a list of fixed voices and voices to adapt.
     You should provide all the melodies, the counterpoint only mutate existing voices to fit best the fixed voices.
-    It tries to maximize a score, greedily, note per note and voice per voice. This score uses the following rules :
+    It tries to maximize a score, note per note (greedily or with a beam search) and voice per voice.
+    This score uses the following rules :
 
     - No consecutives fifths or octaves or unissons
     - No hidden fifths or octaves
@@ -24,7 +25,13 @@ def create_counterpoint(fixed_voices, voices):
     voices :  list[Melody]
               Voices that will be modified to fit the cantus firmus.
               Only the notes will be changed, never the rythm.
-        
+
+    method : str
+             'greedy' chooses the best note at each step, 'beam' keeps the ``beam_width`` best partial voices
+             (Default value = 'greedy')
+
+    beam_width : int
+                 Number of partial voices kept at each step by the beam search (Default value = 16)
 
     Returns
     -------
@@ -45,7 +52,12 @@ def create_counterpoint(fixed_voices, voices):
         voice = get_absolute_voice(voice)
         subjects = get_projections_on_voice(melody_subjects, voice)
         voice_to_fix = get_array(voice)
-        fixed_voice = get_counterpoint(subjects, voice_to_fix)
+        if method == 'greedy':
+            fixed_voice = get_counterpoint(subjects, voice_to_fix)
+        elif method == 'beam':
+            fixed_voice = get_counterpoint_beam(subjects, voice_to_fix, beam_width=beam_width)
+        else:
+            raise ValueError(f'Unknown counterpoint method : {method}, available : greedy, beam')
         melody_fixed = convert_array_to_melody(voice, fixed_voice)
         melody_subjects.append(melody_fixed)
         result.append(melody_fixed)
@@ -54,7 +66,7 @@ def create_counterpoint(fixed_voices, voices):
     return result
 
 
-def create_counterpoint_on_score(score, fixed_parts, counterpoint_parts=None):
+def create_counterpoint_on_score(score, fixed_parts, counterpoint_parts=None, method='greedy', beam_width=16):
     """
     Create a counterpoint on parts for a score
     - Put everything on the same chord
@@ -62,7 +74,8 @@ def create_counterpoint_on_score(score, fixed_parts, counterpoint_parts=None):
     - Put everything back in the original chord progression
 
     You should provide all the melodies, the counterpoint only mutate existing voices to fit best the fixed voices.
-    It tries to maximize a score, greedily, note per note and voice per voice. This score uses the following rules :
+    It tries to maximize a score, note per note (greedily or with a beam search) and voice per voice.
+    This score uses the following rules :
 
     - No consecutives fifths or octaves or unissons
     - No hidden fifths or octaves
@@ -78,6 +91,10 @@ def create_counterpoint_on_score(score, fixed_parts, counterpoint_parts=None):
     counterpoint_parts: list[str] or None
         Name of parts that will move (eg: piano__1)
         If None, all the remaining voices will be applied a counterpoint on the fixed_parts
+    method: str
+        'greedy' or 'beam', see :func:`~create_counterpoint` (Default value = 'greedy')
+    beam_width: int
+        Number of partial voices kept at each step by the beam search (Default value = 16)
 
     Returns
     -------
@@ -93,14 +110,14 @@ def create_counterpoint_on_score(score, fixed_parts, counterpoint_parts=None):
     chord, _, chords_offsets, _, chords = project_on_one_chord(score)
     fixed_voices = [chord.score[part] for part in fixed_parts]
     moving_voices = [chord.score[part] for part in counterpoint_parts]
-    moving_voices = create_counterpoint(fixed_voices, moving_voices)
+    moving_voices = create_counterpoint(fixed_voices, moving_voices, method=method, beam_width=beam_width)
     for voice, part in zip(moving_voices, counterpoint_parts):
         chord.score[part] = voice
     projection = chord.to_score().project_on_score(score)
     return projection
 
 
-def create_counterpoint_on_chord(chord, subject_parts, counterpoint_parts):
+def create_counterpoint_on_chord(chord, subject_parts, counterpoint_parts, method='greedy', beam_width=16):
     """
 
     Parameters
@@ -111,6 +128,10 @@ def create_counterpoint_on_chord(chord, subject_parts, counterpoint_parts):
         
     counterpoint_parts :
         
+    method :
+         (Default value = 'greedy')
+    beam_width :
+         (Default value = 16)
 
     Returns
     -------
@@ -118,7 +139,7 @@ def create_counterpoint_on_chord(chord, subject_parts, counterpoint_parts):
     """
     fixed_voices = [chord.score[chord.parts[idx]] for idx in subject_parts]
     voices = [chord.score[chord.parts[idx]] for idx in counterpoint_parts]
-    new_voices = create_counterpoint(fixed_voices, voices)
+    new_voices = create_counterpoint(fixed_voices, voices, method=method, beam_width=beam_width)
     return chord(**{**chord.score, **{chord.parts[idx]: voice for idx, voice in zip(counterpoint_parts, new_voices)}})
 
 
@@ -181,6 +202,10 @@ def get_projections_on_voice(voices, reference):
 
 AUTHORIZED_INTERVALS = [0, 2, 3, 4, 5]
 FORBIDDEN_PARALLELS = [0, 4, 3, 7]
+IS_AUTHORIZED = np.isin(np.arange(7), AUTHORIZED_INTERVALS)
+IS_FORBIDDEN_PARALLEL = np.isin(np.arange(7), FORBIDDEN_PARALLELS)
+# Deltas explored by the beam search, ties are resolved in favor of the smallest moves
+BEAM_DELTAS = np.asarray([0, 1, -1, 2, -2, 3, -3, 4, -4])
 
 
 def get_future_delta(delta):
@@ -472,6 +497,143 @@ def get_counterpoint(subjects, to_fix):
     return result
 
 
+def _first_unique_states(notes, intervals):
+    """Sorted indexes of the first occurrence of each (note, intervals) state
+
+    Parameters
+    ----------
+    notes : np.ndarray
+            Last note of each state
+    intervals : np.ndarray
+                Last intervals with the subjects of each state, between -1 and 6
+
+    Returns
+    -------
+    first: np.ndarray
+
+    """
+    nb_subjects = intervals.shape[1]
+    if nb_subjects <= 16:
+        # Pack each state in one integer, 3 bits per interval
+        keys = notes * 8 ** nb_subjects + (intervals + 1) @ (8 ** np.arange(nb_subjects, dtype=np.int64))
+        _, first = np.unique(keys, return_index=True)
+    else:
+        _, first = np.unique(np.column_stack([notes, intervals]), axis=0, return_index=True)
+    return np.sort(first)
+
+
+def get_counterpoint_beam(subjects, to_fix, beam_width=16):
+    """Given a list of subjects modify the voice to best fit a counterpoint, with a beam search.
+
+    Uses the same score as :func:`~get_counterpoint` but keeps the ``beam_width`` best partial voices at each note
+    instead of only the best one. The candidates of all the beams are scored at once against all the subjects.
+    Partial voices that end on the same note with the same intervals to the subjects are merged, keeping the best.
+
+    Parameters
+    ----------
+    subjects : list[list[int or None]]
+               Notes of the fixed voices, projected on the rhythm of the voice to fix
+    to_fix : list[int or None]
+             Notes of the voice to fix (None for silences)
+    beam_width : int
+                 Number of partial voices kept at each step (Default value = 16)
+
+    Returns
+    -------
+    result: list[int or None]
+            The counterpointed voice
+
+    """
+    nb_subjects = len(subjects)
+    mask = np.asarray([[n is not None for n in subject] for subject in subjects],
+                      dtype=bool).reshape(nb_subjects, len(to_fix)).T
+    notes = np.asarray([[0 if n is None else n for n in subject] for subject in subjects],
+                       dtype=np.int64).reshape(nb_subjects, len(to_fix)).T
+    positions = [i for i, n in enumerate(to_fix) if n is not None]
+    if len(positions) == 0:
+        return list(to_fix)
+
+    # Terms that does not depend on the beams, for all the notes at once : (notes, deltas, subjects)
+    mask, notes = mask[positions][:, None, :], notes[positions][:, None, :]
+    candidates = np.asarray([to_fix[i] for i in positions], dtype=np.int64)[:, None] + BEAM_DELTAS[None, :]
+    intervals = np.abs(notes - candidates[:, :, None]) % 7
+    dissonnances = ~IS_AUTHORIZED[intervals] & mask
+    forbidden_parallels = IS_FORBIDDEN_PARALLEL[intervals] & mask
+    candidates_mod, notes_mod = (candidates % 7)[:, :, None], notes % 7
+    tritons = (((candidates_mod == 3) & (notes_mod == 6)) | ((candidates_mod == 6) & (notes_mod == 3))) & mask
+    static = 10 - 3.0 * dissonnances.sum(axis=2) - 2.0 * tritons.sum(axis=2) - 0.5 * np.abs(BEAM_DELTAS)[None, :]
+    # Interval kept with each subject after choosing each candidate, -2 when the subject is silent
+    intervals = np.where(mask, intervals, -2)
+
+    # State of each beam : last chosen note, last interval with each subject (-1 for None) and cumulated score
+    last_notes = np.zeros(1, dtype=np.int64)
+    last_intervals = np.full((1, nb_subjects), -1, dtype=np.int64)
+    scores = np.zeros(1)
+    history = []
+    for k in range(len(positions)):
+        valid = last_intervals >= 0
+        nb_forbidden_parallels = ((intervals[k][None] == last_intervals[:, None, :])
+                                  & forbidden_parallels[k][None]).sum(axis=2)
+        last_dissonnances = (~IS_AUTHORIZED[last_intervals] & valid).astype(np.int64)
+        nb_parallel_dissonnances = last_dissonnances @ dissonnances[k].T.astype(np.int64)
+        last_note_same = (candidates[k][None, :] == last_notes[:, None]) & (k > 0)
+        total = (scores[:, None] + static[k][None, :] - 4 * nb_forbidden_parallels - 4 * nb_parallel_dissonnances
+                 - 2.0 * last_note_same).ravel()
+
+        # New state of each (beam, delta), a silent subject keeps its last interval unless it is an unisson
+        kept_intervals = np.where(last_intervals > 0, last_intervals, -1)
+        new_intervals = np.where(intervals[k][None] >= 0, intervals[k][None],
+                                 kept_intervals[:, None, :]).reshape(total.size, nb_subjects)
+        new_notes = np.broadcast_to(candidates[k], (len(scores), len(BEAM_DELTAS))).ravel()
+
+        # Best first, merge identical states then keep the best beams
+        order = np.argsort(-total, kind='stable')
+        first = _first_unique_states(new_notes[order], new_intervals[order])
+        keep = order[first[:beam_width]]
+        parents, deltas = np.divmod(keep, len(BEAM_DELTAS))
+        history.append((positions[k], parents, candidates[k][deltas]))
+        last_notes, last_intervals, scores = new_notes[keep], new_intervals[keep], total[keep]
+
+    result = [None] * len(to_fix)
+    beam = 0
+    for i, parents, chosen in reversed(history):
+        result[i] = int(chosen[beam])
+        beam = parents[beam]
+    return result
+
+
+def counterpoint_score(subjects, to_fix, result):
+    """Total score of a counterpointed voice, as maximized by :func:`~get_counterpoint`
+    and :func:`~get_counterpoint_beam`
+
+    Parameters
+    ----------
+    subjects : list[list[int or None]]
+               Notes of the fixed voices, projected on the rhythm of the voice to fix
+    to_fix : list[int or None]
+             Notes of the original voice
+    result : list[int or None]
+             Notes of the counterpointed voice
+
+    Returns
+    -------
+    score: float
+
+    """
+    last_intervals = [[None for s in subjects]]
+    last_notes = []
+    total_score = 0
+    for i, (n, candidate) in enumerate(zip(to_fix, result)):
+        if n is None:
+            continue
+        subjects_notes = [subject[i] for subject in subjects]
+        total_score += scorer(subjects_notes, n, candidate - n, last_intervals, last_notes)
+        last_intervals = [[interval(s, candidate, replace=old_inter)
+                           for s, old_inter in zip(subjects_notes, last_intervals[-1])]]
+        last_notes.append(candidate)
+    return total_score
+
+
 def convert_array_to_melody(rythm, notes):
     """
 
@@ -254,7 +254,8 @@ def reproject_on_multiple_chords(chords, new_chord, idx_stops, offsets, offset=T
     -------
 
     """
-    new_score = None
+    from musiclang import ScoreBuilder
+    new_score = ScoreBuilder()
     # Put everything back on same melody
     #accs = {key: 0 for key in idx_stops.keys()}
     for idx, chord in enumerate(chords):
@@ -269,7 +270,7 @@ def reproject_on_multiple_chords(chords, new_chord, idx_stops, offsets, offset=T
 
         new_score += chord(**res_chord)
 
-    return new_score
+    return new_score.freeze()
 
 def parse_relative_to_absolute(melody, chord=None):
     """
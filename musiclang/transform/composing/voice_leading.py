@@ -4,6 +4,9 @@ def best_voice_leading(fpd, pcd):
     pass
 
 
+import multiprocessing as mp
+import time
+
 import numpy as np
 
 class Rules:
@@ -19,6 +22,10 @@ ALL_RULES = [Rules.PARALLEL_OCTAVES, Rules.PARALLEL_FIFTHS,
              Rules.PARALLEL_DISSONNANCES, Rules.CROSSING,
              Rules.UNISSON]
 
+DISSONNANCES = [1, 2, 6, 11, 10]
+# Lookup of the dissonnant intervals (in 0-11)
+IS_DISSONNANCE = np.isin(np.arange(12), DISSONNANCES)
+
 
 class VoiceLeading:
     """
@@ -90,11 +97,13 @@ class VoiceLeading:
         score: Score
             Musiclang score on which to apply voice leading algorithm
         method: str
-            Method, existing are : "voices", "voices_and_rules", "rules", "random"
+            Method, existing are : "voices", "voices_and_rules", "rules", "random", "population"
             - voices : Try to create a parcimonious voice leading, starting with the proposed solution
             - rules : Try to erase voices movements errors (like parallel octaves or fifths)
             - voices_and_rules: Combo of both
             - random: Same metric as "voices" but the optimisation algorithm is completely random, use only if you know what you do
+            - population: Metrics of "voices" and "rules" together, a population of solutions is scored at each iteration
+              (see :meth:`population_optim`)
 
         kwargs: **kwargs
             Optimizer parameters
@@ -103,6 +112,7 @@ class VoiceLeading:
             - max_norm: Max movement allowed in term of relative value of note, set low if you want minimal changes
             - temperature: Set high for high degree of randomness
             - min_temperature: Temperature at the end of the voice optimisation (only for voice optimisation)
+            - population_size, restarts, n_jobs, mutation_rate, rules_weight: Parameters of the population optimizer
 
         Returns
         -------
@@ -121,8 +131,11 @@ class VoiceLeading:
             solution = self.optimize_rules(dvals, **self.kwargs)
         elif self.method == 'random':
             solution = self.random_optim(dvals, **self.kwargs)
+        elif self.method == 'population':
+            solution = self.population_optim(dvals, **self.kwargs)
         else:
-            raise Exception('Not existing method, existing are : "voices", "voices_and_rules", "rules", "random"')
+            raise Exception('Not existing method, existing are : "voices", "voices_and_rules", "rules", "random", '
+                            '"population"')
         #######################
 
         return self.get_score(score, solution)
@@ -155,10 +168,11 @@ class VoiceLeading:
             else:
                 return chord
 
-        new_score = None
+        from musiclang import ScoreBuilder
+        new_score = ScoreBuilder()
         for chord in score.chords:
-            new_score += recursive_correct_octave(chord)
-        return new_score
+            new_score += recursive_correct_octave(chord.copy())
+        return new_score.freeze()
 
     def __call__(self, score, skip=False, **kwargs):
         # First Find best chords octaves
@@ -226,9 +240,24 @@ class VoiceLeading:
         self.candidates = [[self.candidates_raw[idxc][self.type[idxi, idxc]]
                             for idxc, chord in enumerate(score.chords)]
                            for idxi, instrument in enumerate(self.instruments)]
+        self.init_candidates_table()
 
         return score
 
+    def init_candidates_table(self):
+        """
+        Pad the candidates of each voice and chord into an array of shape (nb_voices, nb_chords, max_candidates),
+        with the number of candidates of each cell, so that the pitch solutions are computed with numpy indexing
+        """
+        sizes = [[len(candidates) for candidates in row] for row in self.candidates]
+        self.candidates_size = np.asarray(sizes, dtype=np.int64).reshape(self.pitch.shape)
+        max_candidates = int(self.candidates_size.max(initial=1))
+        self.candidates_table = np.zeros((*self.pitch.shape, max_candidates), dtype=np.int64)
+        values = [value for row in self.candidates for candidates in row for value in candidates]
+        self.candidates_table[np.arange(max_candidates) < self.candidates_size[..., None]] = values
+        # Silences and continuations are ignored on the next chord by the parallel rules
+        self.rest_mask = np.isin(self.type, ['r', 'l']).reshape(self.pitch.shape)
+
     def get_candidate_at(self, idx_ins, idx_chord):
         return self.candidates[idx_ins][idx_chord]
 
@@ -236,30 +265,45 @@ class VoiceLeading:
         return self.pitch[idx_ins, idx_chord]
 
     def get_pitch_solution(self, dvals):
-        new_vals = self.val + dvals
-        octs = self.octave
-        pitches = np.asarray([[self.candidates[idxi][idxc][new_val % len(self.candidates[idxi][idxc])]
-                               + 12 * (new_val // len(self.candidates[idxi][idxc]))
-                               for idxc, new_val in enumerate(row)]
-                              for idxi, row in enumerate(new_vals)])
-        pitches += 12 * octs
+        """
+        Pitches of a solution, the candidate value of each cell being the current value plus the delta
+
+        Parameters
+        ----------
+        dvals: np.ndarray
+            Deltas of shape (nb_voices, nb_chords), or a stack of deltas of shape (..., nb_voices, nb_chords)
+
+        Returns
+        -------
+        pitches: np.ndarray
+            Pitches with the same shape as dvals
+        """
+        new_vals = self.val + np.asarray(dvals, dtype=np.int64)
+        octaves, new_vals = np.divmod(new_vals, self.candidates_size)
+        nb_voices, nb_chords = self.candidates_size.shape
+        pitches = self.candidates_table[np.arange(nb_voices)[:, None], np.arange(nb_chords)[None, :], new_vals]
+        pitches += 12 * (octaves + self.octave)
 
         return pitches
 
 
     def crossing_and_unisson_score(self, dvals):
-        pitches = self.get_pitch_solution(dvals)
+        return self.crossing_score(self.get_pitch_solution(dvals))
+
+    def crossing_score(self, pitches):
         crossings = np.std(pitches.argsort(axis=0), axis=1)
         crossing_score = np.sum(np.power(crossings, 2))
         return crossing_score
 
     def eval_solution(self, dvals):
-        pitches = self.get_pitch_solution(dvals)
+        return self.eval_pitches(self.get_pitch_solution(dvals))
+
+    def eval_pitches(self, pitches):
         # Minimize movement
         movement = self.get_movement(pitches)
         movement_score = np.mean(np.power(np.abs(movement), 1))
         # Check if crossings are present
-        crossing_score = self.crossing_and_unisson_score(dvals)
+        crossing_score = self.crossing_score(pitches)
         total_score = 10 * crossing_score + movement_score
         # space = np.diff(pitches, axis=0)
         # space_score =  np.mean(np.power(space, 2))
@@ -280,11 +324,11 @@ class VoiceLeading:
         return solutions[best]
 
     def voices_optim(self, dvals, max_iter=100, max_norm=3, temperature=8, min_temperature=1, **kwargs):
-        min_score = self.eval_solution(dvals)
+        pitches = self.get_pitch_solution(dvals)
+        min_score = self.eval_pitches(pitches)
         start_temp = temperature
         end_temp = min_temperature
         for it in range(max_iter):
-            pitches = self.get_pitch_solution(dvals)
             mov = self.get_movement(pitches).astype(np.float32)  # Find movements
             mov *= self.dvalsmask[:, :-1]
             sgn_mov = np.sign(mov)
@@ -298,34 +342,27 @@ class VoiceLeading:
             delta2 = (np.c_[np.zeros(len(delta2)), delta2])
             mov = (delta1 + delta2).astype(int)
             proposed_sol = (dvals + mov).clip(-max_norm, max_norm)
-            score = self.eval_solution(proposed_sol)
+            proposed_pitches = self.get_pitch_solution(proposed_sol)
+            score = self.eval_pitches(proposed_pitches)
             if score < min_score:
                 min_score = score
                 dvals = proposed_sol
+                pitches = proposed_pitches
             coeff = (it / max_iter)
             temperature = coeff * end_temp + (1 - coeff) * start_temp
 
-        self.eval_solution(dvals)
-
         return dvals
         # Move in direction of sgn
 
 
     def optimize_rules(self, dvals, max_iter_rules=100, max_norm_rules=3, temperature=1, **kwargs):
 
-        def eval_solution(dvals):
-            pitches = self.get_pitch_solution(dvals)
-            problems = self.get_problems(pitches)
-            return np.sum(problems)
-
         pitches = self.get_pitch_solution(dvals)
         problems = self.get_problems(pitches)
-        min_score = eval_solution(dvals)
-        crossing_and_unisson_score = self.crossing_and_unisson_score(dvals)
+        min_score = np.sum(problems)
+        crossing_and_unisson_score = self.crossing_score(pitches)
         tried = set()
         for i in range(max_iter_rules):
-            pitches = self.get_pitch_solution(dvals)
-            problems = self.get_problems(pitches)
             noise = 0.0
             proba = np.exp((problems + noise)/temperature)/np.sum(np.exp((problems + noise)/temperature))
             m, M = -1, 2
@@ -333,21 +370,23 @@ class VoiceLeading:
             delta = delta.clip(-max_norm_rules, max_norm_rules)
             proposed_sol = (dvals + delta)
             proposed_sol *= self.dvalsmask
-            proposed_set = tuple(proposed_sol.flatten().tolist())
+            proposed_set = proposed_sol.tobytes()
             if proposed_set in tried:
                 continue
             else:
                 tried.add(proposed_set)
 
-            score = eval_solution(proposed_sol)
-            crossing_and_unisson_score_new = self.crossing_and_unisson_score(proposed_sol)
+            proposed_pitches = self.get_pitch_solution(proposed_sol)
+            proposed_problems = self.get_problems(proposed_pitches)
+            score = np.sum(proposed_problems)
+            crossing_and_unisson_score_new = self.crossing_score(proposed_pitches)
             if score < min_score and crossing_and_unisson_score_new <= crossing_and_unisson_score:
                 min_score = score
                 dvals = proposed_sol
+                problems = proposed_problems
                 crossing_and_unisson_score = crossing_and_unisson_score_new
             if min_score == 0:
                 break
-        score = self.eval_solution(dvals)
         return dvals
 
     def get_val(self, pitches, v1, v2, idxc):
@@ -361,64 +400,179 @@ class VoiceLeading:
         return abs(pitches[v1, idxc] - pitches[v2, idxc]) % 12
 
     def get_problems(self, pitches):
-        # Parallel only counts if movement is not null
-        movement = self.get_movement(pitches)
-        moving = movement != 0
-        dissonnances = {1, 2, 6, 11, 10}
-        # Find intervals between all instruments
-        intervals = np.zeros((pitches.shape[0], *pitches.shape))
-        abs_intervals = np.zeros((pitches.shape[0], *pitches.shape))
-        parallel_fifths = np.zeros(pitches.shape)
-        parallel_octaves = np.zeros(pitches.shape)
-        parallel_dissonnances = np.zeros(pitches.shape)
-        unissons = np.zeros(pitches.shape)
-        crossings = np.zeros(pitches.shape)
-        for v1 in range(pitches.shape[0]):
-            for v2 in range(pitches.shape[0]):
-                if v2 >= v1:
-                    break
-                for idxc in range(pitches.shape[1]):
-                    rel_val = pitches[v1, idxc] - pitches[v2, idxc]
-                    abs_val = abs(rel_val)
-                    val = abs_val % 12
-                    intervals[v1, v2, idxc] = val
-                    intervals[v2, v1, idxc] = val
-                    abs_intervals[v1, v2, idxc] = abs_val
-                    if Rules.PARALLEL_FIFTHS in self.rules:
-                        if val == 7 and val == self.get_val(pitches, v1, v2, idxc + 1):
-                            parallel_fifths[v1, idxc] += 1
-                            parallel_fifths[v2, idxc] += 1
-                            parallel_fifths[v1, idxc + 1] += 1
-                            parallel_fifths[v2, idxc + 1] += 1
-
-                    if Rules.PARALLEL_OCTAVES in self.rules:
-                        if val == 0 and val == self.get_val(pitches, v1, v2, idxc + 1):
-                            parallel_octaves[v1, idxc] += 1
-                            parallel_octaves[v2, idxc] += 1
-                            parallel_octaves[v1, idxc + 1] += 1
-                            parallel_octaves[v2, idxc + 1] += 1
-                    if Rules.PARALLEL_DISSONNANCES in self.rules:
-
-                        if val in dissonnances and self.get_val(pitches, v1, v2, idxc + 1) in dissonnances:
-                            parallel_dissonnances[v1, idxc] += 1
-                            parallel_dissonnances[v2, idxc] += 1
-                            parallel_dissonnances[v1, idxc + 1] += 1
-                            parallel_dissonnances[v2, idxc + 1] += 1
-                    if Rules.CROSSING in self.rules:
-                        if rel_val < 0:
-                            crossings[v1, idxc] += 3
-                            crossings[v2, idxc] += 3
-                    if Rules.UNISSON in self.rules:
-                        if abs_val == 0:
-                            unissons[v1, idxc] += 5
-                            unissons[v2, idxc] += 5
-
-        problems = parallel_fifths + parallel_octaves + parallel_dissonnances + unissons + crossings
-        has_crossing_or_unisson = crossings + unissons
+        """
+        Number of rule violations of each note (weighted 3 for crossings and 5 for unissons)
+
+        A parallel (fifths, octaves or dissonnances) counts for both voices on both chords,
+        the interval of the next chord is ignored if one of its notes is a silence or a continuation.
+        The intervals of each voice with all the voices above it are computed at once.
+
+        Parameters
+        ----------
+        pitches: np.ndarray
+            Pitches of shape (nb_voices, nb_chords), or a stack of pitches of shape (..., nb_voices, nb_chords)
+
+        Returns
+        -------
+        problems: np.ndarray
+            Problems with the same shape as pitches, zero for the notes that are not optimized
+        """
+        pitches = np.asarray(pitches, dtype=np.int16)
+        parallel_rules = [rule for rule in [Rules.PARALLEL_FIFTHS, Rules.PARALLEL_OCTAVES, Rules.PARALLEL_DISSONNANCES]
+                          if rule in self.rules]
+        problems = np.zeros(pitches.shape)
+        for v2 in range(pitches.shape[-2] - 1):
+            # Intervals between the voices v1 > v2 and the voice v2
+            rel_vals = pitches[..., v2 + 1:, :] - pitches[..., v2:v2 + 1, :]
+            abs_vals = np.abs(rel_vals)
+            vals = abs_vals % 12
+            pairs_problems = np.zeros(rel_vals.shape, dtype=np.int8)
+            if parallel_rules:
+                parallels = np.zeros(rel_vals.shape[:-1] + (rel_vals.shape[-1] - 1,), dtype=np.int8)
+                for rule in parallel_rules:
+                    if rule == Rules.PARALLEL_FIFTHS:
+                        is_interval = vals == 7
+                    elif rule == Rules.PARALLEL_OCTAVES:
+                        is_interval = vals == 0
+                    else:
+                        is_interval = IS_DISSONNANCE[vals]
+                    parallels += is_interval[..., :-1] & is_interval[..., 1:]
+                parallels *= ~(self.rest_mask[v2 + 1:, 1:] | self.rest_mask[v2, 1:])
+                pairs_problems[..., :-1] += parallels
+                pairs_problems[..., 1:] += parallels
+            if Rules.CROSSING in self.rules:
+                pairs_problems += np.multiply(rel_vals < 0, 3, dtype=np.int8)
+            if Rules.UNISSON in self.rules:
+                pairs_problems += np.multiply(abs_vals == 0, 5, dtype=np.int8)
+            # Problems of a pair count for both of its voices
+            problems[..., v2 + 1:, :] += pairs_problems
+            problems[..., v2, :] += pairs_problems.sum(axis=-2)
         problems *= self.dvalsmask
         return problems
 
 
+    def population_fitness(self, pitches, rules_weight=1):
+        """
+        Fitness of a stack of solutions, the lower the better : the movement and crossing score of
+        :meth:`eval_solution` plus the weighted number of rule violations of :meth:`get_problems`
+
+        Parameters
+        ----------
+        pitches: np.ndarray
+            Stack of pitches of shape (population_size, nb_voices, nb_chords)
+        rules_weight: float
+            Weight of one rule violation
+
+        Returns
+        -------
+        fitness: np.ndarray
+            Fitness of each solution
+        problems: np.ndarray
+            Problems of each solution
+        """
+        problems = self.get_problems(pitches)
+        if pitches.shape[-1] > 1:
+            movement_score = np.mean(np.abs(self.get_movement(pitches)), axis=(-2, -1))
+        else:
+            movement_score = np.zeros(pitches.shape[:-2])
+        crossings = np.std(pitches.argsort(axis=-2), axis=-1)
+        crossing_score = np.sum(np.power(crossings, 2), axis=-1)
+        fitness = 10 * crossing_score + movement_score + rules_weight * np.sum(problems, axis=(-2, -1))
+        return fitness, problems
+
+    def population_search(self, dvals, seed, population_size=16, max_iter=100, max_norm=3, mutation_rate=0.05,
+                          rules_weight=1):
+        """
+        One run of the population optimizer : at each iteration ``population_size`` mutations of the best solution
+        are scored together, the notes with problems being more likely to move.
+
+        Parameters
+        ----------
+        dvals: np.ndarray
+            Initial solution
+        seed: int or np.random.SeedSequence
+            Seed of the mutations
+
+        Returns
+        -------
+        dvals: np.ndarray
+            Best solution
+        history: dict
+            Convergence curve ("fitness", best fitness after each iteration), number of solutions scored,
+            duration in seconds, solutions scored and fitness decrease per second
+        """
+        rg = np.random.default_rng(seed)
+        start = time.perf_counter()
+        best = np.asarray(dvals, dtype=np.int64)
+        fitness, problems = self.population_fitness(self.get_pitch_solution(best[None]), rules_weight=rules_weight)
+        best_fitness, best_problems = fitness[0], problems[0]
+        curve = [best_fitness]
+        movable = self.dvalsmask > 0
+        for _ in range(max_iter):
+            weights = 1 + best_problems
+            proba = np.minimum(mutation_rate * weights / np.mean(weights), 1)
+            mutations = (rg.random((population_size, *best.shape)) < proba) & movable
+            steps = rg.integers(1, 3, mutations.shape) * rg.choice([-1, 1], mutations.shape)
+            population = (best + mutations * steps).clip(-max_norm, max_norm)
+            fitness, problems = self.population_fitness(self.get_pitch_solution(population),
+                                                        rules_weight=rules_weight)
+            idx = int(np.argmin(fitness))
+            if fitness[idx] < best_fitness:
+                best, best_fitness, best_problems = population[idx], fitness[idx], problems[idx]
+            curve.append(best_fitness)
+
+        duration = time.perf_counter() - start
+        evaluations = 1 + population_size * max_iter
+        history = {'fitness': np.asarray(curve), 'best_fitness': best_fitness, 'evaluations': evaluations,
+                   'duration': duration,
+                   'evaluations_per_second': evaluations / duration if duration > 0 else float('inf'),
+                   'fitness_per_second': (curve[0] - best_fitness) / duration if duration > 0 else 0.0}
+        return best, history
+
+    def population_optim(self, dvals, population_size=16, restarts=1, n_jobs=1, max_iter=100, max_norm=3,
+                         mutation_rate=0.05, rules_weight=1, **kwargs):
+        """
+        Population optimizer, optimizing both the voice movements and the rules (see :meth:`population_search`).
+
+        Each restart has its own seed derived from ``self.seed``, so the result does not depend on ``n_jobs``.
+        The history of each restart is stored in ``self.population_history``.
+
+        Parameters
+        ----------
+        dvals: np.ndarray
+            Initial solution
+        population_size: int
+            Number of solutions scored together at each iteration
+        restarts: int
+            Number of independent runs, the best solution is kept
+        n_jobs: int
+            Number of processes running the restarts
+        max_iter: int
+            Number of iterations of each run
+        max_norm: int
+            Max movement allowed in term of relative value of note
+        mutation_rate: float
+            Mean probability of a note to move in a mutation
+        rules_weight: float
+            Weight of one rule violation in the fitness
+
+        Returns
+        -------
+        dvals: np.ndarray
+            Best solution
+        """
+        parameters = dict(population_size=population_size, max_iter=max_iter, max_norm=max_norm,
+                          mutation_rate=mutation_rate, rules_weight=rules_weight)
+        tasks = [(self, dvals, seed, parameters) for seed in np.random.SeedSequence(self.seed).spawn(restarts)]
+        if n_jobs > 1 and restarts > 1:
+            with mp.Pool(min(n_jobs, restarts)) as pool:
+                results = pool.map(_population_search, tasks)
+        else:
+            results = [_population_search(task) for task in tasks]
+        self.population_history = [history for _, history in results]
+        best = int(np.argmin([history['best_fitness'] for history in self.population_history]))
+        return results[best][0]
+
     def voices_and_rules(self, dvals, **kwargs):
         dvals = self.voices_optim(dvals, **kwargs)
         # REMOVE CONSECUTIVE FIFTHS AND OCTAVES
@@ -448,3 +602,8 @@ class VoiceLeading:
 
         return new_score
 
+
+def _population_search(task):
+    """One restart of VoiceLeading.population_optim, in the current process or in a pool worker"""
+    voice_leading, dvals, seed, parameters = task
+    return voice_leading.population_search(dvals, seed, **parameters)
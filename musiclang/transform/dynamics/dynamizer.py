@@ -35,8 +35,9 @@ class PitchDynamizer:
         for i in range(5):
             amps = [(a + b)/2 for a, b in zip(amps, [amps[0]] + amps[:-1])]
 
-        new_score = None
+        from musiclang import ScoreBuilder
+        new_score = ScoreBuilder()
         for chord, amp in zip(score.chords, amps):
             new_score += chord.set_amp(amp)
 
-        return new_score
\ No newline at end of file
+        return new_score.freeze()
\ No newline at end of file
@@ -0,0 +1,483 @@
+"""
+Copyright (c) 2023, Florian GARDIN
+All rights reserved.
+
+This source code is licensed under the BSD-style license found in the
+LICENSE file in the root directory of this source tree.
+
+Binary score format
+-------------------
+
+A compact file format for scores that does not depend on the class layout (unlike pickle) and that can be
+memory-mapped, so that a chord or a time range is read without loading the whole file.
+All the integers are little endian.
+
+==========  =======================================================================================
+Bytes       Content
+==========  =======================================================================================
+8           Magic ``b'MLSCORE\\x00'``
+4           Format version (uint32), currently 1
+4           Length of the header in bytes (uint32), padded with spaces to a multiple of 64 bytes
+header      UTF-8 JSON object, see below
+data        The ``chords``, ``parts`` and ``notes`` tables, each one starting on a multiple of 64 bytes
+==========  =======================================================================================
+
+The header contains :
+
+- ``resolution``: number of ticks per quarter, all the durations and times are integer ticks
+- ``strings``: list of the strings of the score (instruments, chord extensions, modes, accidents, note types).
+  String columns are int32 codes in this list, -1 for None
+- ``tag_sets``: list of the distinct tag sets, the first one is the empty set. Tags columns are int32 codes
+  in this list
+- ``config`` and ``tags``: config and tags code of the score
+- ``arrays``: for each table its numpy ``dtype`` description, number of rows and offset from the start of the
+  data section
+
+The tables are packed numpy structured arrays (see the ``*_DTYPE`` constants) :
+
+- ``chords``: one row per chord, with its start time and duration in ticks and its parts as the range
+  ``[first_part, first_part + nb_parts)`` of the parts table
+- ``parts``: one row per melody of a chord, with its notes as the range ``[first_note, first_note + nb_notes)``
+  of the notes table
+- ``notes``: one row per note : its value, octave, and the codes of its duration and style
+- ``durations``: the distinct note durations, as fractions of quarters
+- ``styles``: the distinct (type, mode, accident, amplitude, tags, pedal, tempo) of the notes. ``flags`` bit 0 is
+  set when the amplitude is an integer, bit 1 when the tempo is an integer. ``pedal`` is -1 for None, 0 for
+  False and 1 for True. ``tempo`` is NaN for None
+"""
+import json
+import math
+import struct
+from fractions import Fraction as frac
+
+import numpy as np
+
+MAGIC = b'MLSCORE\x00'
+FORMAT_VERSION = 1
+#: Extension of the binary score files written by :class:`musiclang.analyze.dataset_extractor.DatasetExtractor`
+BINARY_EXTENSION = '.mlb'
+_ALIGNMENT = 64
+_PREFIX = struct.Struct('<8sII')
+
+CHORD_DTYPE = np.dtype([
+    ('element', '<i2'),
+    ('extension', '<i4'),        # Code in strings
+    ('octave', '<i2'),
+    ('tonality_degree', '<i2'),
+    ('tonality_mode', '<i4'),    # Code in strings, -1 for a chord without tonality
+    ('tonality_octave', '<i2'),
+    ('tonality_tags', '<i4'),    # Code in tag_sets
+    ('tags', '<i4'),
+    ('start', '<i8'),            # Ticks
+    ('duration', '<i8'),         # Ticks
+    ('first_part', '<i8'),
+    ('nb_parts', '<i4'),
+])
+
+PART_DTYPE = np.dtype([
+    ('instrument', '<i4'),       # Code in strings, eg : piano__0
+    ('tags', '<i4'),
+    ('nb_bars', '<i4'),
+    ('first_note', '<i8'),
+    ('nb_notes', '<i4'),
+])
+
+NOTE_DTYPE = np.dtype([
+    ('style', '<i4'),            # Row of the styles table
+    ('duration', '<i4'),         # Row of the durations table
+    ('val', '<i4'),
+    ('octave', '<i2'),
+])
+
+DURATION_DTYPE = np.dtype([
+    ('numerator', '<i8'),
+    ('denominator', '<i8'),
+])
+
+STYLE_DTYPE = np.dtype([
+    ('type', '<i4'),             # Code in strings
+    ('mode', '<i4'),
+    ('accident', '<i4'),
+    ('tags', '<i4'),
+    ('amp', '<f8'),
+    ('tempo', '<f8'),
+    ('pedal', 'i1'),
+    ('flags', 'u1'),
+])
+
+_TABLES = [('chords', CHORD_DTYPE), ('parts', PART_DTYPE), ('notes', NOTE_DTYPE), ('durations', DURATION_DTYPE),
+           ('styles', STYLE_DTYPE)]
+
+
+def _encode_value(value):
+    """
+    JSON compatible version of a config value, keeping tuples and fractions
+    """
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode_value(v) for v in value]}
+    if isinstance(value, frac):
+        return {'__fraction__': [value.numerator, value.denominator]}
+    if isinstance(value, list):
+        return [_encode_value(v) for v in value]
+    if isinstance(value, dict):
+        return {key: _encode_value(v) for key, v in value.items()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, list):
+        return [_decode_value(v) for v in value]
+    if isinstance(value, dict):
+        if '__tuple__' in value:
+            return tuple(_decode_value(v) for v in value['__tuple__'])
+        if '__fraction__' in value:
+            return frac(*value['__fraction__'])
+        return {key: _decode_value(v) for key, v in value.items()}
+    return value
+
+
+class _Codes:
+    """
+    Codes of the strings, tag sets, note durations and note styles of a score, in order of first appearance
+    """
+
+    def __init__(self):
+        self.strings = {}
+        self.tag_sets = {frozenset(): 0}
+        self.durations = {}
+        self.duration_ids = {}  # Durations are interned : most lookups are by id, without hashing a fraction
+        self.styles = {}
+
+    def string(self, value):
+        if value is None:
+            return -1
+        return self.strings.setdefault(value, len(self.strings))
+
+    def tags(self, tags):
+        if not tags:
+            return 0
+        return self.tag_sets.setdefault(frozenset(tags), len(self.tag_sets))
+
+    def duration(self, duration):
+        code = self.duration_ids.get(id(duration))
+        if code is None:
+            code = self.durations.setdefault(frac(duration), len(self.durations))
+            self.duration_ids[id(duration)] = code
+        return code
+
+    def style(self, note):
+        amp, tempo = note.amp, note.tempo
+        key = (note.type, note.mode, note.accident, self.tags(note.tags), amp, tempo, note.pedal,
+               isinstance(amp, (int, np.integer)) + 2 * isinstance(tempo, (int, np.integer)))
+        code = self.styles.get(key)
+        if code is None:
+            code = self.styles[key] = len(self.styles)
+        return code
+
+
+def _fill(dtype, columns):
+    table = np.zeros(len(next(iter(columns.values()))), dtype=dtype)
+    for name, values in columns.items():
+        table[name] = values
+    return table
+
+
+def write_binary_score(score, filepath):
+    """
+    Write a score in the binary score format, see :mod:`musiclang.write.binary_score`
+
+    Parameters
+    ----------
+    score: Score or Chord
+    filepath: str
+    """
+    from .chord import Chord
+    from .score import Score
+    if isinstance(score, Chord):
+        score = Score([score])
+    codes = _Codes()
+    chords = {name: [] for name in CHORD_DTYPE.names if name not in ('start', 'duration')}
+    parts = {name: [] for name in PART_DTYPE.names}
+    notes = {name: [] for name in NOTE_DTYPE.names}
+    for chord in score.chords:
+        tonality = chord.tonality
+        chords['element'].append(chord.element)
+        chords['extension'].append(codes.string(str(chord.extension)))
+        chords['octave'].append(chord.octave)
+        chords['tonality_degree'].append(tonality.degree if tonality is not None else 0)
+        chords['tonality_mode'].append(codes.string(tonality.mode) if tonality is not None else -1)
+        chords['tonality_octave'].append(tonality.octave if tonality is not None else 0)
+        chords['tonality_tags'].append(codes.tags(tonality.tags) if tonality is not None else 0)
+        chords['tags'].append(codes.tags(chord.tags))
+        chords['first_part'].append(len(parts['instrument']))
+        chords['nb_parts'].append(len(chord.score))
+        for instrument, melody in chord.score.items():
+            parts['instrument'].append(codes.string(instrument))
+            parts['tags'].append(codes.tags(melody.tags))
+            parts['nb_bars'].append(melody.nb_bars)
+            parts['first_note'].append(len(notes['style']))
+            parts['nb_notes'].append(len(melody.notes))
+            for note in melody.notes:
+                notes['style'].append(codes.style(note))
+                notes['duration'].append(codes.duration(note.duration))
+                notes['val'].append(note.val)
+                notes['octave'].append(note.octave)
+
+    tables = {name: np.zeros(0, dtype=dtype) for name, dtype in _TABLES}
+    durations = list(codes.durations)
+    if durations:
+        tables['durations'] = _fill(DURATION_DTYPE, {'numerator': [d.numerator for d in durations],
+                                                     'denominator': [d.denominator for d in durations]})
+        styles = list(codes.styles)
+        tables['styles'] = _fill(STYLE_DTYPE, {
+            'type': [codes.string(style[0]) for style in styles],
+            'mode': [codes.string(style[1]) for style in styles],
+            'accident': [codes.string(style[2]) for style in styles],
+            'tags': [style[3] for style in styles],
+            'amp': [style[4] for style in styles],
+            'tempo': [np.nan if style[5] is None else style[5] for style in styles],
+            'pedal': [-1 if style[6] is None else int(style[6]) for style in styles],
+            'flags': [style[7] for style in styles],
+        })
+        tables['notes'] = _fill(NOTE_DTYPE, notes)
+    resolution = math.lcm(*[duration.denominator for duration in durations]) if durations else 1
+    if parts['instrument']:
+        tables['parts'] = _fill(PART_DTYPE, parts)
+    if chords['element']:
+        table = _fill(CHORD_DTYPE, chords)
+        # Duration of a chord is the duration of its longest part, as in ``Chord.duration``
+        part_durations = np.zeros(len(tables['parts']), dtype=np.int64)
+        if len(tables['notes']):
+            ticks = [duration.numerator * (resolution // duration.denominator) for duration in durations]
+            if max(map(abs, ticks)) * len(tables['notes']) >= 2 ** 62:
+                raise ValueError(f'Durations of the score cannot be stored with a resolution of {resolution} ticks')
+            note_ticks = np.asarray(ticks, dtype=np.int64)[tables['notes']['duration']]
+            not_empty = tables['parts']['nb_notes'] > 0
+            part_durations[not_empty] = np.add.reduceat(note_ticks, tables['parts']['first_note'][not_empty])
+        chord_of_part = np.repeat(np.arange(len(table)), table['nb_parts'])
+        np.maximum.at(table['duration'], chord_of_part, part_durations)
+        table['start'] = np.cumsum(table['duration']) - table['duration']
+        tables['chords'] = table
+
+    score_tags = codes.tags(score.tags)
+    _write_tables(filepath, tables, {
+        'resolution': resolution,
+        'strings': list(codes.strings),
+        'tag_sets': [sorted(tags, key=str) for tags in codes.tag_sets],
+        'config': _encode_value(score.config),
+        'tags': score_tags,
+    })
+
+
+def _write_tables(filepath, tables, header):
+    offset, arrays = 0, {}
+    for name, dtype in _TABLES:
+        arrays[name] = {'dtype': np.lib.format.dtype_to_descr(dtype), 'shape': len(tables[name]), 'offset': offset}
+        offset += -(-tables[name].nbytes // _ALIGNMENT) * _ALIGNMENT
+    header = json.dumps({**header, 'arrays': arrays}).encode('utf-8')
+    header += b' ' * (-(len(header) + _PREFIX.size) % _ALIGNMENT)
+    with open(filepath, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, _ in _TABLES:
+            data = tables[name].tobytes()
+            f.write(data + b'\x00' * (-len(data) % _ALIGNMENT))
+
+
+class BinaryScore:
+    """
+    Score stored in the binary score format (see :mod:`musiclang.write.binary_score`), opened with
+    :func:`~BinaryScore.open`.
+
+    The tables are memory-mapped numpy arrays : only the accessed chords are read from the file and
+    converted to :class:`Chord` objects.
+
+    Examples
+    --------
+
+    >>> from musiclang.library import *
+    >>> score = (I % I.M)(piano__0=s0 + s2.h) + (V % I.M)(piano__0=s4.w) + (I % I.M)(piano__0=s0.w)
+    >>> score.to_binary('/tmp/score.mlb')
+    >>> binary = BinaryScore.open('/tmp/score.mlb')
+    >>> len(binary), binary.duration
+    (3, Fraction(11, 1))
+    >>> binary[1] == score[1]
+    True
+    >>> binary.chords_between(4, 5) == score[1:2]
+    True
+    """
+
+    def __init__(self, header, chords, parts, notes, durations, styles):
+        from .note import Silence, Continuation, Note, _intern_duration
+        self.header = header
+        self.chords = chords
+        self.parts = parts
+        self.notes = notes
+        self.resolution = header['resolution']
+        self.strings = header['strings']
+        self.tag_sets = [set(tags) for tags in header['tag_sets']]
+        # Small tables, decoded once
+        self.durations = [_intern_duration(frac(numerator, denominator))
+                          for numerator, denominator in durations.tolist()]
+        self.styles = [({'r': Silence, 'l': Continuation}.get(self.strings[note_type], Note), self.strings[note_type],
+                        self._string(mode), self._string(accident), self.tag_sets[tags],
+                        int(amp) if flags & 1 else amp, None if pedal < 0 else bool(pedal),
+                        None if math.isnan(tempo) else (int(tempo) if flags & 2 else tempo))
+                       for note_type, mode, accident, tags, amp, tempo, pedal, flags in styles.tolist()]
+
+    @classmethod
+    def open(cls, filepath, memory_map=True):
+        """
+        Open a binary score file
+
+        Parameters
+        ----------
+        filepath: str
+        memory_map: bool, default=True
+            If False, the whole file is read in memory
+
+        Returns
+        -------
+        binary_score: BinaryScore
+        """
+        with open(filepath, 'rb') as f:
+            magic, version, header_length = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(f'{filepath} is not a musiclang binary score')
+            if version > FORMAT_VERSION:
+                raise ValueError(f'Binary score version {version} is not supported (version {FORMAT_VERSION} or '
+                                 f'lower), update musiclang to read {filepath}')
+            header = json.loads(f.read(header_length).decode('utf-8'))
+            if not memory_map:
+                data = np.frombuffer(f.read(), dtype=np.uint8)
+        if memory_map:
+            if any(array['shape'] for array in header['arrays'].values()):
+                data = np.memmap(filepath, dtype=np.uint8, mode='r', offset=_PREFIX.size + header_length)
+            else:
+                data = np.zeros(0, dtype=np.uint8)  # An empty file cannot be memory-mapped
+        tables = {}
+        for name, _ in _TABLES:
+            array = header['arrays'][name]
+            dtype = np.lib.format.descr_to_dtype(array['dtype'])
+            start = array['offset']
+            # Plain ndarray views of the mapped file, slicing a memmap object is slower
+            tables[name] = np.asarray(data[start:start + dtype.itemsize * array['shape']]).view(dtype)
+        return cls(header, **tables)
+
+    def __len__(self):
+        return len(self.chords)
+
+    @property
+    def config(self):
+        return _decode_value(self.header['config'])
+
+    @property
+    def duration(self):
+        """
+        Duration of the score in quarters
+        """
+        if len(self.chords) == 0:
+            return frac(0)
+        last = self.chords[-1]
+        return frac(int(last['start'] + last['duration']), self.resolution)
+
+    def _string(self, code):
+        return None if code < 0 else self.strings[code]
+
+    def _tags(self, code):
+        return set(self.tag_sets[code])
+
+    def _chord(self, idx):
+        """
+        Create the chord at index idx from the tables
+        """
+        from .chord import Chord
+        from .melody import Melody
+        from .note import Note
+        from .tonality import Tonality
+        (element, extension, octave, tonality_degree, tonality_mode, tonality_octave, tonality_tags, tags,
+         _, _, first_part, nb_parts) = self.chords[idx].tolist()
+        tonality = None
+        if tonality_mode >= 0:
+            tonality = Tonality(tonality_degree, mode=self.strings[tonality_mode], octave=tonality_octave,
+                                tags=self._tags(tonality_tags))
+        parts = self.parts[first_part:first_part + nb_parts].tolist()
+        first_note = parts[0][3] if parts else 0
+        notes = self.notes[first_note:first_note + sum(part[4] for part in parts)].tolist()
+        score = {}
+        for instrument, part_tags, nb_bars, part_first_note, nb_notes in parts:
+            melody = []
+            start = part_first_note - first_note
+            for style, duration, val, note_octave in notes[start:start + nb_notes]:
+                note_class, note_type, mode, accident, note_tags, amp, pedal, tempo = self.styles[style]
+                note = Note.__new__(note_class)
+                Note.__init__(note, note_type, val, note_octave, self.durations[duration], mode=mode, accident=accident,
+                              amp=amp, tags=set(note_tags) if note_tags else None, pedal=pedal, tempo=tempo)
+                melody.append(note)
+            score[self.strings[instrument]] = Melody(melody, nb_bars=nb_bars, tags=self._tags(part_tags))
+        return Chord(element, extension=self.strings[extension], tonality=tonality, score=score, octave=octave,
+                     tags=self._tags(tags))
+
+    def __getitem__(self, item):
+        """
+        Chord at an index, or list of chords for a slice
+        """
+        if isinstance(item, slice):
+            return [self._chord(idx) for idx in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(f'Chord index {item} out of range')
+        return self._chord(item)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self._chord(idx)
+
+    def chord_range(self, start, end):
+        """
+        Indexes ``[first, last)`` of the chords that overlap the time range ``[start, end)`` (in quarters),
+        found with a binary search on the chord start times
+
+        Parameters
+        ----------
+        start: float or Fraction
+        end: float or Fraction
+
+        Returns
+        -------
+        first, last: int
+        """
+        starts = self.chords['start']
+        ends = starts + self.chords['duration']
+        first = int(np.searchsorted(ends, math.floor(frac(start) * self.resolution), side='right'))
+        last = int(np.searchsorted(starts, math.ceil(frac(end) * self.resolution), side='left'))
+        return first, max(first, last)
+
+    def chords_between(self, start, end):
+        """
+        Score of the chords that overlap the time range ``[start, end)`` in quarters, the chords are not cut
+
+        Parameters
+        ----------
+        start: float or Fraction
+        end: float or Fraction
+
+        Returns
+        -------
+        score: Score
+        """
+        from .score import Score
+        first, last = self.chord_range(start, end)
+        return Score(self[first:last], config=self.config, tags=self._tags(self.header['tags']))
+
+    def to_score(self):
+        """
+        Read the whole score
+
+        Returns
+        -------
+        score: Score
+        """
+        from .score import Score
+        return Score(list(self), config=self.config, tags=self._tags(self.header['tags']))
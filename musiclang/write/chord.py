@@ -322,8 +322,8 @@ class Chord:
             chords[-1].score['piano__0'] = chords[-1].score['piano__0'].set_duration(remaining_duration)
         else:
             chords = chords[:-1]
-        chords = sum(chords, None)
-        return self.project_on_score(chords)
+        from .score import Score
+        return self.project_on_score(Score.concat(chords))
 
 
     @property
@@ -382,6 +382,21 @@ class Chord:
         """
         return self(**{key: item.to_melody().pedal for key, item in self.score.items()}, tags=set(self.tags))
 
+    @property
+    def pitch_key(self):
+        """
+        Hashable identity of the chord as far as pitch resolution is concerned (the score is ignored).
+        It is the chord part of the key of the pitch resolution cache, see :func:`~Chord.to_pitch()`
+
+        Returns
+        -------
+        key: tuple
+
+        """
+        tonality = self.tonality
+        tonality_key = (tonality.degree, tonality.mode, tonality.octave) if tonality is not None else None
+        return (type(self).__name__, self.element, self.extension, self.octave, tonality_key)
+
     def to_pitch(self, note, last_pitch=None):
         """
 
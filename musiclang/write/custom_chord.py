@@ -68,6 +68,10 @@ class CustomChord(Chord):
         return [n.copy() for n in self.notes]
 
 
+    @property
+    def pitch_key(self):
+        return super().pitch_key + (tuple(n.pitch_key for n in self.notes),)
+
     def tonality_to_str(self):
         """
         Convert the tonality of the chord to a string.
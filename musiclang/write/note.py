@@ -9,6 +9,43 @@ LICENSE file in the root directory of this source tree.
 from .constants import *
 LIMIT_DENOM = int(1e3)
 
+#: Shared tag set of every note without tags, never mutated in place
+EMPTY_TAGS = frozenset()
+
+#: Interned durations, so that notes with the same duration share the same ``Fraction`` object
+_DURATIONS = {}
+#: Ids of the interned values, copying a note does not hash its duration again (hashing a ``Fraction`` is slow)
+_INTERNED_IDS = set()
+_MAX_INTERNED_DURATIONS = 4096
+
+
+def _intern_duration(duration):
+    """
+    Return a shared ``Fraction`` equal to duration, limiting its denominator to ``LIMIT_DENOM``
+    """
+    if id(duration) in _INTERNED_IDS:
+        return duration
+    interned = _DURATIONS.get(duration)
+    if interned is not None:
+        return interned
+    value = frac(duration)
+    if value.denominator > LIMIT_DENOM:
+        value = value.limit_denominator(LIMIT_DENOM)
+    if len(_DURATIONS) < _MAX_INTERNED_DURATIONS:
+        _DURATIONS[duration] = value
+        _INTERNED_IDS.add(id(value))
+    return value
+
+
+def _copy_tags(tags):
+    """
+    Return a copy of tags, or the shared empty tag set
+    """
+    if not tags:
+        return EMPTY_TAGS
+    return set(tags)
+
+
 class Note:
     """
     Represents a note in MusicLang.
@@ -120,18 +157,39 @@ class Note:
     """
     DEFAULT_AMP = 66
 
+    __slots__ = ('type', 'val', 'octave', '_duration', 'amp', 'accident', 'mode', 'tags', 'pedal', 'tempo',
+                 '_properties')
+
     def __init__(self, type, val, octave, duration, mode=None, accident=None, amp=DEFAULT_AMP, tags=None, pedal=None, tempo=None):
         self.type = type
         self.val = val
         self.octave = octave
-        self.duration = frac(duration).limit_denominator(LIMIT_DENOM)
+        self._duration = _intern_duration(duration)
         self.amp = amp
         self.accident = accident
         self.mode = mode
-        self.properties = self.init_properties()
-        self.tags = tags if tags is not None else set()
+        self.tags = tags if tags else EMPTY_TAGS
         self.pedal = pedal
         self.tempo = tempo
+        self._properties = None
+
+    @property
+    def duration(self):
+        return self._duration
+
+    @duration.setter
+    def duration(self, value):
+        self._duration = _DURATIONS.get(value, value)
+
+    @property
+    def properties(self):
+        """
+        Properties of the note, created on first access
+        """
+        properties = self._properties
+        if properties is None:
+            properties = self._properties = self.init_properties()
+        return properties
 
     def has_tag(self, tag):
         """
@@ -160,7 +218,7 @@ class Note:
         note: Note
         """
         cp = self.copy()
-        cp.tags.add(tag)
+        cp.tags = {*cp.tags, tag}
         return cp
 
     def add_tags(self, tags):
@@ -179,7 +237,7 @@ class Note:
 
         """
         cp = self.copy()
-        cp.tags = cp.tags.union(set(tags))
+        cp.tags = _copy_tags(set(cp.tags).union(set(tags)))
         return cp
 
     @property
@@ -315,7 +373,7 @@ class Note:
 
         """
         cp = self.copy()
-        cp.tags = cp.tags - set(tags)
+        cp.tags = _copy_tags(cp.tags - set(tags))
         return cp
 
     def clear_note_tags(self):
@@ -334,7 +392,9 @@ class Note:
         note: Note
         """
         cp = self.copy()
-        cp.tags.remove(tag)
+        tags = set(cp.tags)
+        tags.remove(tag)
+        cp.tags = _copy_tags(tags)
         return cp
 
     def clear_tags(self):
@@ -350,12 +410,24 @@ class Note:
         note: Note
         """
         cp = self.copy()
-        cp.tags = set()
+        cp.tags = EMPTY_TAGS
         return cp
 
     def __iter__(self):
         return [self].__iter__()
 
+    @property
+    def pitch_key(self):
+        """
+        Hashable tuple of the fields that determine the pitch of the note on a given chord
+        (duration, amplitude and tags are ignored)
+
+        Returns
+        -------
+        key: tuple
+        """
+        return (self.type, self.val, self.octave, self.accident, self.mode)
+
     def real_chord(self, chord):
         """
 
@@ -436,8 +508,8 @@ class Note:
 
     def copy(self):
         """ """
-        return Note(self.type, self.val, self.octave, self.duration, mode=self.mode, accident=self.accident,
-                    amp=self.amp, tags=set(self.tags),
+        return Note(self.type, self.val, self.octave, self._duration, mode=self.mode, accident=self.accident,
+                    amp=self.amp, tags=_copy_tags(self.tags),
                     tempo=self.tempo,
                     pedal=self.pedal
                     )
@@ -1015,21 +1087,35 @@ class Note:
                    (self.octave == other.octave) and (self.mode == other.mode)
 
     def __getstate__(self):
-        return self.__dict__
+        return {'type': self.type, 'val': self.val, 'octave': self.octave, 'duration': self._duration,
+                'amp': self.amp, 'accident': self.accident, 'mode': self.mode, 'tags': self.tags,
+                'pedal': self.pedal, 'tempo': self.tempo}
 
     def __setstate__(self, d):
-        self.__dict__ = d
+        # Also accepts the ``__dict__`` state of notes pickled before the slots layout
+        self.type = d['type']
+        self.val = d['val']
+        self.octave = d['octave']
+        self._duration = _intern_duration(d['duration'])
+        self.amp = d.get('amp', Note.DEFAULT_AMP)
+        self.accident = d.get('accident', None)
+        self.mode = d.get('mode', None)
+        self.tags = d.get('tags') or EMPTY_TAGS
+        self.pedal = d.get('pedal', None)
+        self.tempo = d.get('tempo', None)
+        self._properties = None
 
     def __getattr__(self, item):
-        try:
+        if item in STR_TO_DURATION:
             note = self.copy()
-            note.duration *= STR_TO_DURATION[item]
+            note.duration = note.duration * STR_TO_DURATION[item]
             return note
-        except KeyError:
-            if hasattr(self.properties, item):
-                return getattr(self.properties, item)
-            else:
-                raise AttributeError('Not existing properties of attribute {}'.format(item))
+        if item.startswith('__') or item == '_properties':
+            raise AttributeError(item)
+        try:
+            return getattr(self.properties, item)
+        except AttributeError:
+            raise AttributeError('Not existing properties of attribute {}'.format(item))
 
     def __mul__(self, other):
         """
@@ -1057,13 +1143,14 @@ class Silence(Note):
 
     Only takes a duration as a parameter
     """
+    __slots__ = ()
 
     def __init__(self, duration, tags=None, tempo=None, pedal=None):
         super().__init__("r", 0, 0, duration, tags=tags, tempo=tempo, pedal=pedal)
 
     def copy(self):
         """ """
-        return Silence(self.duration, tempo=self.tempo, pedal=self.pedal, tags=set(self.tags))
+        return Silence(self._duration, tempo=self.tempo, pedal=self.pedal, tags=_copy_tags(self.tags))
 
 
 class Continuation(Note):
@@ -1072,10 +1159,11 @@ class Continuation(Note):
 
     Only takes a duration as a parameter
     """
+    __slots__ = ()
 
     def __init__(self, duration, tags=None, tempo=None, pedal=None):
         super().__init__("l", 0, 0, duration, tempo=tempo, pedal=pedal, tags=tags)
 
     def copy(self):
         """ """
-        return Continuation(self.duration, pedal=self.pedal, tags=set(self.tags))
+        return Continuation(self._duration, pedal=self.pedal, tags=_copy_tags(self.tags))
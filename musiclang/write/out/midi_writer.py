@@ -0,0 +1,376 @@
+"""
+Copyright (c) 2023, Florian GARDIN
+All rights reserved.
+
+This source code is licensed under the BSD-style license found in the
+LICENSE file in the root directory of this source tree.
+"""
+import io
+import math
+import struct
+
+import mido
+import numpy as np
+from mido import MetaMessage
+
+from ..pitches.pitches_utils import note_to_pitch_result
+
+NOTE_MATRIX_DTYPE = np.dtype([
+    ('pitch', 'i8'),
+    ('offset', 'i8'),  # In units of 1 / resolution quarter
+    ('duration', 'i8'),  # In units of 1 / resolution quarter
+    ('velocity', 'i8'),
+    ('track', 'i8'),
+    ('silence', '?'),
+    ('continuation', '?'),
+    ('tempo', 'f8'),  # NaN when the note does not change the tempo
+    ('pedal', 'i1'),  # -1 : no pedal information, 0 : pedal off, 1 : pedal on
+])
+
+TICKS_PER_BEAT = 480
+
+_MAX_TICKS = 2 ** 62
+_NOTE_OFF = 0x80
+_NOTE_ON = 0x90
+_CONTROL_CHANGE = 0xB0
+_PROGRAM_CHANGE = 0xC0
+_END_OF_TRACK = b'\x00\xff\x2f\x00'
+
+
+def _encode_variable_int(value):
+    """
+    Encode a delta time as a MIDI variable length integer
+    """
+    if value < 0x80:
+        return bytes((value,))
+    result = [value & 0x7F]
+    value >>= 7
+    while value:
+        result.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(result))
+
+
+def _iter_track_notes(score, track):
+    """
+    Iterate over the notes of a track with their tags realized, in the same order as
+    :func:`~musiclang.write.out.to_midi.create_melody_for_track`
+
+    Yields (chord index, chord, note) and (chord index, None, None) for each chord that does not contain the track
+    """
+    from musiclang import Melody, Silence
+    chords = score.chords
+    default = Melody([Silence(1)])
+    for idx_chord, chord in enumerate(chords):
+        part = chord.score.get(track, None)
+        if part is None:
+            yield idx_chord, None, None
+            continue
+        notes = part.notes
+        if not any(note.tags for note in notes):
+            for note in notes:
+                yield idx_chord, chord, note
+            continue
+        last_note = chords[idx_chord - 1].score.get(track, default).notes[-1] if idx_chord - 1 >= 0 else None
+        final_note = chords[idx_chord + 1].score.get(track, default).notes[0] if idx_chord + 1 < len(chords) else None
+        for idx, note in enumerate(notes):
+            previous_note = notes[idx - 1] if idx - 1 >= 0 else last_note
+            next_note = notes[idx + 1] if idx + 1 < len(notes) else final_note
+            if not note.tags:
+                yield idx_chord, chord, note
+                continue
+            for realized in note.realize_tags(last_note=previous_note, next_note=next_note).notes:
+                yield idx_chord, chord, realized
+
+
+def score_to_note_matrix(score, tracks):
+    """
+    Build the note matrix of a score in one pass per track.
+
+    It contains the same rows as :func:`~musiclang.write.out.to_midi.get_notes` (one per note, silence and
+    continuation) but offsets and durations are integers in units of ``1 / resolution`` quarter.
+
+    Parameters
+    ----------
+    score: Score
+    tracks: list[str]
+        Parts of the score, in track order
+
+    Returns
+    -------
+    matrix: np.ndarray
+        Structured array of dtype ``NOTE_MATRIX_DTYPE``
+    resolution: int or None
+        Number of units per quarter, None if the durations would overflow 64 bits integers
+
+    """
+    chord_durations = [chord.duration for chord in score.chords]
+
+    pitches, chord_idxs, durations, velocities, track_idxs = [], [], [], [], []
+    silences, continuations, tempos, pedals = [], [], [], []
+    for track_idx, track in enumerate(tracks):
+        last_pitch = None
+        for idx_chord, chord, note in _iter_track_notes(score, track):
+            if chord is None:
+                last_pitch = None
+                continue
+            note_type = note.type
+            is_silence = note_type == 'r'
+            is_continuation = note_type == 'l'
+            if is_silence or is_continuation:
+                pitch = 0
+            else:
+                pitch = note_to_pitch_result(note, chord, last_pitch=last_pitch if last_pitch is not None else 0)
+                if pitch is None:
+                    pitch = 0
+                last_pitch = pitch
+            pitches.append(pitch)
+            chord_idxs.append(idx_chord)
+            durations.append(note.duration)
+            velocities.append(note.amp)
+            track_idxs.append(track_idx)
+            silences.append(is_silence or (is_continuation and last_pitch is None))
+            continuations.append(is_continuation and last_pitch is not None)
+            tempos.append(note.tempo)
+            pedals.append(note.pedal)
+
+    matrix = np.zeros(len(pitches), dtype=NOTE_MATRIX_DTYPE)
+    resolution = math.lcm(*{d.denominator for d in durations}, *{d.denominator for d in chord_durations})
+    if resolution * (sum(chord_durations) + 1) * TICKS_PER_BEAT >= _MAX_TICKS:
+        return matrix, None
+
+    # Offsets : start of the chord plus the durations of the previous notes of the same (track, chord) segment
+    chord_starts = np.zeros(len(chord_durations) + 1, dtype=np.int64)
+    chord_starts[1:] = np.cumsum([int(d * resolution) for d in chord_durations])
+    numerators = np.fromiter((d.numerator for d in durations), dtype=np.int64, count=len(durations))
+    denominators = np.fromiter((d.denominator for d in durations), dtype=np.int64, count=len(durations))
+    ticks = numerators * (resolution // denominators)
+    chord_idxs = np.asarray(chord_idxs, dtype=np.int64)
+    track_idxs = np.asarray(track_idxs, dtype=np.int64)
+    before = np.cumsum(ticks) - ticks
+    new_segment = np.ones(len(ticks), dtype=bool)
+    new_segment[1:] = (chord_idxs[1:] != chord_idxs[:-1]) | (track_idxs[1:] != track_idxs[:-1])
+    segment_start = np.maximum.accumulate(np.where(new_segment, np.arange(len(ticks)), 0))
+
+    matrix['pitch'] = pitches
+    matrix['offset'] = chord_starts[chord_idxs] + before - before[segment_start]
+    matrix['duration'] = ticks
+    matrix['velocity'] = velocities
+    matrix['track'] = track_idxs
+    matrix['silence'] = silences
+    matrix['continuation'] = continuations
+    matrix['tempo'] = [np.nan if t is None else t for t in tempos]
+    matrix['pedal'] = [-1 if p is None else int(bool(p)) for p in pedals]
+    return matrix, resolution
+
+
+def merge_continuations(matrix):
+    """
+    Add the duration of each continuation to the previous note or silence of its track,
+    then keep only the sounding notes
+
+    Parameters
+    ----------
+    matrix: np.ndarray
+        Note matrix of dtype ``NOTE_MATRIX_DTYPE``, with the rows of each track contiguous and in time order
+
+    Returns
+    -------
+    matrix: np.ndarray
+    """
+    matrix = matrix.copy()
+    continuation = matrix['continuation']
+    previous = np.maximum.accumulate(np.where(~continuation, np.arange(len(matrix)), -1))
+    merge = continuation & (previous >= 0)
+    np.add.at(matrix['duration'], previous[merge], matrix['duration'][merge])
+    return matrix[~continuation & ~matrix['silence']]
+
+
+def group_tracks(instrument_names, instruments):
+    """
+    Group the tracks that share an instrument (all the drums are grouped together).
+    Same grouping as :func:`~musiclang.write.out.midi_utils.setup_instruments`
+
+    Returns
+    -------
+    mapping: dict
+        Old track index -> new track index
+    instrument_names: list[str]
+    instruments: dict
+        New track index -> midi program
+    """
+    instrument_group = {}
+    for track_nb, program in instruments.items():
+        if instrument_names[track_nb].startswith('drums'):
+            program = -1
+        instrument_group.setdefault(program, []).append(track_nb)
+
+    mapping = {}
+    new_names = []
+    for new_track, (program, tracks) in enumerate(instrument_group.items()):
+        new_names.append('drums_0' if program == -1 else instrument_names[tracks[0]])
+        for track in tracks:
+            mapping[track] = new_track
+    new_instruments = {i: program if program != -1 else 0 for i, program in enumerate(instrument_group.keys())}
+    return mapping, new_names, new_instruments
+
+
+def note_matrix_to_midi_bytes(matrix, resolution, instruments, instrument_names, tempo=120, time_signature=(4, 4)):
+    """
+    Encode a note matrix (without continuations and silences) as the bytes of a type 1 midi file.
+
+    The output is byte-identical to :func:`~musiclang.write.out.midi_utils.matrix_to_mid` : one track per
+    instrument, note offs sorted before note ons at the same time, delta times truncated to 480 ticks per quarter.
+
+    Parameters
+    ----------
+    matrix: np.ndarray
+        Sounding notes, see :func:`merge_continuations`
+    resolution: int
+        Units of offsets and durations per quarter
+    instruments: dict
+        Track index -> midi program
+    instrument_names: list[str]
+    tempo: int or float
+    time_signature: tuple
+
+    Returns
+    -------
+    data: bytes
+    """
+    nb_tracks = int(matrix['track'].max())
+    instrument_list = list(sorted(list(set([0] + list(instruments.values())))))
+    channels = [instrument_list.index(instruments.get(i, 0)) for i in range(nb_tracks + 1)]
+    channels = [c if c < 9 else c + 1 for c in channels]
+
+    # Events : note ons then note offs, sorted by track, time, type (note off first), start of the note, row
+    nb_notes = len(matrix)
+    rows = np.concatenate([np.arange(nb_notes), np.arange(nb_notes)])
+    event_on = np.concatenate([np.ones(nb_notes, dtype=bool), np.zeros(nb_notes, dtype=bool)])
+    starts = matrix['offset'][rows]
+    times = starts + np.where(event_on, 0, matrix['duration'][rows])
+    tracks = matrix['track'][rows]
+    order = np.lexsort((rows, starts, event_on, times, tracks))
+    rows, event_on, times, tracks = rows[order], event_on[order], times[order], tracks[order]
+
+    first_of_track = np.ones(len(rows), dtype=bool)
+    first_of_track[1:] = tracks[1:] != tracks[:-1]
+    deltas = times - np.where(first_of_track, 0, np.roll(times, 1))
+    deltas = (deltas * TICKS_PER_BEAT) // resolution
+
+    pitches = matrix['pitch'][rows] + 60
+    velocities = matrix['velocity'][rows]
+    if ((pitches < 0) | (pitches > 127)).any() or ((velocities < 0) | (velocities > 127)).any():
+        raise ValueError('data byte must be in range 0..127')
+
+    # A tempo change is written each time the tempo of an event differs from the current one
+    event_tempos = matrix['tempo'][rows]
+    has_tempo = ~np.isnan(event_tempos)
+    valid_tempos = event_tempos[has_tempo]
+    tempo_changes = np.zeros(len(rows), dtype=bool)
+    tempo_changes[has_tempo] = valid_tempos != np.concatenate([[tempo], valid_tempos[:-1]])
+    pedals = matrix['pedal'][rows] == 1
+
+    # Header of each track : program change, and the metadata of the file on the first track
+    track_data = []
+    for i in range(nb_tracks + 1):
+        data = bytearray()
+        if (len(instrument_names) > i) and instrument_names[i].startswith('drum'):
+            channels[i] = 9
+            data.extend((0, _PROGRAM_CHANGE | 9, 0))
+        elif i in instruments.keys():
+            data.extend((0, _PROGRAM_CHANGE | channels[i], instruments.get(i, 0)))
+        elif i != 9:
+            data.extend((0, _PROGRAM_CHANGE | channels[i], 0))
+        track_data.append(data)
+    if max(channels) > 15:
+        raise ValueError('channel must be in range 0..15')
+    for message in [MetaMessage("track_name", name='track', time=0),
+                    MetaMessage("set_tempo", tempo=mido.bpm2tempo(tempo), time=0),
+                    MetaMessage("time_signature", numerator=time_signature[0], denominator=time_signature[1], time=0)]:
+        track_data[0].append(0)
+        track_data[0].extend(message.bytes())
+
+    running_status = {i: (_PROGRAM_CHANGE | channels[i]) if len(track_data[i]) else None for i in range(nb_tracks + 1)}
+    running_status[0] = None
+    for track, delta, on, pitch, velocity, tempo_change, tempo_value, pedal in zip(
+            tracks.tolist(), deltas.tolist(), event_on.tolist(), pitches.tolist(), velocities.tolist(),
+            tempo_changes.tolist(), event_tempos.tolist(), pedals.tolist()):
+        data = track_data[track]
+        channel = channels[track]
+        status = (_NOTE_ON if on else _NOTE_OFF) | channel
+        data.extend(_encode_variable_int(delta))
+        if status != running_status[track]:
+            data.append(status)
+        data.append(pitch)
+        data.append(velocity)
+        running_status[track] = status
+        if tempo_change:
+            data.append(0)
+            data.extend(MetaMessage("set_tempo", tempo=(480000 * 120) // int(tempo_value), time=0).bytes())
+            running_status[track] = None
+        if pedal:
+            status = _CONTROL_CHANGE | channel
+            data.append(0)
+            if status != running_status[track]:
+                data.append(status)
+            data.extend((4, 127))
+            running_status[track] = status
+
+    result = bytearray(b'MThd' + struct.pack('>L', 6) + struct.pack('>hhh', 1, nb_tracks + 1, TICKS_PER_BEAT))
+    for data in track_data:
+        data.extend(_END_OF_TRACK)
+        result.extend(b'MTrk')
+        result.extend(struct.pack('>L', len(data)))
+        result.extend(data)
+    return bytes(result)
+
+
+def _legacy_midi_bytes(score, tracks, instruments, instrument_names, **kwargs):
+    """
+    Midi bytes produced through :func:`~musiclang.write.out.midi_utils.matrix_to_mid`
+    """
+    from .to_midi import get_notes
+    from .midi_utils import matrix_to_mid
+    output = io.BytesIO()
+    matrix_to_mid(get_notes(score), output_file=output, instruments=instruments,
+                  instrument_names=instrument_names, **kwargs)
+    return output.getvalue()
+
+
+def score_to_midi_bytes(score, tempo=120, time_signature=(4, 4), one_track_per_instrument=True, **kwargs):
+    """
+    Encode a score as the bytes of a midi file without going through per-note python objects
+
+    Parameters
+    ----------
+    score: Score
+    tempo: int or float, default=120
+    time_signature: tuple, default=(4, 4)
+    one_track_per_instrument: bool, default=True
+        If True, the parts that share an instrument are written on the same track
+
+    Returns
+    -------
+    data: bytes
+
+    """
+    from .to_midi import get_track_list, tracks_to_instruments
+    tracks = get_track_list(score)
+    instruments, instrument_names = tracks_to_instruments(tracks)
+    matrix, resolution = score_to_note_matrix(score, tracks)
+    matrix = merge_continuations(matrix)
+    if resolution is None or len(matrix) == 0:
+        return _legacy_midi_bytes(score, tracks, instruments, instrument_names, tempo=tempo,
+                                  time_signature=time_signature, one_track_per_instrument=one_track_per_instrument,
+                                  **kwargs)
+
+    if one_track_per_instrument:
+        mapping, instrument_names, instruments = group_tracks(instrument_names, instruments)
+        lookup = np.zeros(len(tracks), dtype=np.int64)
+        for track, new_track in mapping.items():
+            lookup[track] = new_track
+        matrix['track'] = lookup[matrix['track']]
+
+    return note_matrix_to_midi_bytes(matrix, resolution, instruments, instrument_names,
+                                     tempo=tempo, time_signature=time_signature)
@@ -249,31 +249,32 @@ def get_notes(score):
 def score_to_midi(score, filepath, **kwargs):
     """Transform a score to a midi file
 
+    The notes are encoded in one pass per track with :func:`~musiclang.write.out.midi_writer.score_to_midi_bytes`,
+    the result is the same file as the one produced by :func:`~musiclang.write.out.midi_utils.matrix_to_mid`
+
     Parameters
     ----------
-    score :
-        param filepath:
-    kwargs :
-        return:
-    filepath :
-        
+    score : Score
+    filepath : str or file-like or None
+        Where to write the midi file. If None the file is only returned
     **kwargs :
-        
+        tempo, time_signature, one_track_per_instrument
 
     Returns
     -------
+    data: bytes
+        Content of the midi file
 
     """
-
-    # Get all tracks
-    tracks = get_track_list(score)
-
-    # For each track create melody
-    notes = get_notes(score)
-    instruments, instrument_names = tracks_to_instruments(tracks)
-
-    res = to_midi(notes, output_file=filepath, instruments=instruments, instrument_names=instrument_names, **kwargs)
-    return res
+    from .midi_writer import score_to_midi_bytes
+
+    data = score_to_midi_bytes(score, **kwargs)
+    if isinstance(filepath, str):
+        with open(filepath, 'wb') as f:
+            f.write(data)
+    elif filepath is not None:
+        filepath.write(data)
+    return data
 
 
 def score_to_events(score, **kwargs):
@@ -6,7 +6,145 @@ This source code is licensed under the BSD-style license found in the
 LICENSE file in the root directory of this source tree.
 """
 
-import numpy as np
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+PitchCacheInfo = namedtuple('PitchCacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+DEFAULT_PITCH_CACHE_SIZE = 65536
+
+
+class PitchCache:
+    """
+    Bounded LRU table of resolved pitches, used by :func:`note_to_pitch_result`.
+
+    Keys are ``(chord.pitch_key, note.pitch_key, last_pitch)`` tuples, values are the resolved pitches.
+    Hits and misses are counted so that the size of the table can be tuned on real workloads.
+    """
+
+    def __init__(self, maxsize=DEFAULT_PITCH_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._table = OrderedDict()
+
+    def get(self, key, compute, *args):
+        """
+        Return the value stored for ``key``, calling ``compute(*args)`` and storing its result on a miss
+
+        Parameters
+        ----------
+        key: tuple
+            Hashable key of the value
+        compute: callable
+            Function computing the value on a miss
+
+        Returns
+        -------
+        value: object
+
+        """
+        table = self._table
+        try:
+            value = table[key]
+        except KeyError:
+            self.misses += 1
+            value = compute(*args)
+            if self.maxsize > 0:
+                table[key] = value
+                if len(table) > self.maxsize:
+                    table.popitem(last=False)
+            return value
+        self.hits += 1
+        table.move_to_end(key)
+        return value
+
+    def resize(self, maxsize):
+        """
+        Change the maximum number of entries, evicting the least recently used ones if needed
+        """
+        self.maxsize = maxsize
+        while len(self._table) > max(maxsize, 0):
+            self._table.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all the entries and reset the counters
+        """
+        self._table.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """
+        Get the statistics of the cache
+
+        Returns
+        -------
+        info: PitchCacheInfo
+            Named tuple (hits, misses, maxsize, currsize)
+        """
+        return PitchCacheInfo(self.hits, self.misses, self.maxsize, len(self._table))
+
+
+PITCH_CACHE = PitchCache()
+
+
+def pitch_cache_info():
+    """
+    Get the hit/miss counters and the size of the pitch resolution cache
+
+    Returns
+    -------
+    info: PitchCacheInfo
+        Named tuple (hits, misses, maxsize, currsize)
+
+    Examples
+    --------
+
+    >>> from musiclang.write.pitches.pitches_utils import pitch_cache_info, clear_pitch_cache
+    >>> clear_pitch_cache()
+    >>> pitch_cache_info()
+    PitchCacheInfo(hits=0, misses=0, maxsize=65536, currsize=0)
+    """
+    return PITCH_CACHE.info()
+
+
+def clear_pitch_cache():
+    """
+    Empty the pitch resolution cache and reset its counters
+    """
+    PITCH_CACHE.clear()
+
+
+def set_pitch_cache_size(maxsize):
+    """
+    Set the maximum number of pitches kept by the pitch resolution cache. A size of 0 disables the cache.
+
+    Parameters
+    ----------
+    maxsize: int
+    """
+    PITCH_CACHE.resize(maxsize)
+
+
+@lru_cache(maxsize=1024)
+def _scale_table(scale_pitches):
+    """
+    One-octave table of a scale, sorted pitch classes (duplicates are kept)
+    """
+    return tuple(sorted([i % 12 for i in scale_pitches]))
+
+
+def _scale_value(index, scale_mod):
+    """
+    Pitch of the ``index``-th element of the scale repeated over all the octaves (index 0 is the first element of octave 0)
+    """
+    octave, idx = divmod(index, len(scale_mod))
+    return scale_mod[idx] + 12 * octave
+
+
 def relative_scale_up_value(delta, last_pitch, scale_pitches):
     """
 
@@ -22,19 +160,15 @@ def relative_scale_up_value(delta, last_pitch, scale_pitches):
     pitch: int
 
     """
-    scale_mod = list(sorted([i % 12 for i in scale_pitches]))
-    # Get scale index
+    scale_mod = _scale_table(tuple(scale_pitches))
+    octave, pitch_class = divmod(last_pitch, 12)
+    idx = bisect_left(scale_mod, pitch_class)
+    # Index of the first pitch of the scale greater or equal to last_pitch
+    index = octave * len(scale_mod) + idx
     if delta == 0:
-        whole_scale = [s + octave * 12 for octave in range(-10, 10) for s in scale_mod]
-        whole_scale = [s for s in whole_scale if s >= last_pitch]
-        new_pitch = whole_scale[0]
-        return new_pitch
-    # else:
-    whole_scale = [s + octave * 12 for octave in range(-10, 10) for s in scale_mod]
-    dists = np.asarray(whole_scale) - last_pitch
-    dists = dists[dists >= 0] + last_pitch
-    new_pitch = dists[delta - 1 * (last_pitch not in whole_scale)]
-    return new_pitch
+        return _scale_value(index, scale_mod)
+    in_scale = idx < len(scale_mod) and scale_mod[idx] == pitch_class
+    return _scale_value(index + delta - 1 * (not in_scale), scale_mod)
 
 
 def relative_scale_down_value(delta, last_pitch, scale_pitches):
@@ -52,19 +186,15 @@ def relative_scale_down_value(delta, last_pitch, scale_pitches):
     pitch: int
 
     """
-    scale_mod = list(sorted([i % 12 for i in scale_pitches]))
-    # Get scale index
+    scale_mod = _scale_table(tuple(scale_pitches))
+    octave, pitch_class = divmod(last_pitch, 12)
+    idx = bisect_right(scale_mod, pitch_class) - 1
+    # Index of the last pitch of the scale lower or equal to last_pitch
+    index = octave * len(scale_mod) + idx
     if delta == 0:
-        whole_scale = [s + octave * 12 for octave in range(-10, 10) for s in scale_mod]
-        whole_scale = [s for s in whole_scale if s <= last_pitch]
-        new_pitch = whole_scale[-1]
-        return new_pitch
-    # else:
-    whole_scale = [s + octave * 12 for octave in range(-10, 10) for s in scale_mod]
-    dists = np.asarray(whole_scale) - last_pitch
-    dists = dists[dists <= 0] + last_pitch
-    new_pitch = dists[-(delta + 1) + 1 * (last_pitch not in whole_scale)]
-    return new_pitch
+        return _scale_value(index, scale_mod)
+    in_scale = idx >= 0 and scale_mod[idx] == pitch_class
+    return _scale_value(index - delta + 1 * (not in_scale), scale_mod)
 
 
 def get_relative_scale_value(note, last_pitch, scale_pitches):
@@ -138,6 +268,11 @@ def get_value_to_scale_note(value, scale_pitches):
 
 def note_to_pitch_result(note, chord, last_pitch=None):
     """
+    Resolve the pitch of a note played on a chord.
+
+    Results are memoized in a bounded LRU table keyed by the chord identity (tonality degree, mode, chord element,
+    octave, extension), the note fields and the last pitch (only for relative notes).
+    See :func:`pitch_cache_info` for the hit/miss counters.
 
     Parameters
     ----------
@@ -153,6 +288,16 @@ def note_to_pitch_result(note, chord, last_pitch=None):
     pitch: int
            Resulting pitch
 
+    """
+    note_type = note.type
+    is_relative = note_type != 'd' and ('u' in note_type or 'd' in note_type)
+    key = (chord.pitch_key, note.pitch_key, last_pitch if is_relative else None)
+    return PITCH_CACHE.get(key, _note_to_pitch_result, note, chord, last_pitch)
+
+
+def _note_to_pitch_result(note, chord, last_pitch=None):
+    """
+    Uncached implementation of :func:`note_to_pitch_result`
     """
     real_chord = note.real_chord(chord)
     scale_pitches = real_chord.scale_pitches
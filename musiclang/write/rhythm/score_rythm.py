@@ -37,7 +37,8 @@ class ScoreRhythm:
         -------
         """
 
-        new_score = None
+        from musiclang import ScoreBuilder
+        new_score = ScoreBuilder()
         time = 0
         for chord in score.chords:
             duration = chord.duration
@@ -65,5 +66,5 @@ class ScoreRhythm:
             new_score += chord(**new_part)
             time += duration
 
-        return new_score
+        return new_score.freeze()
 
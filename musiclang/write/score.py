@@ -6,7 +6,6 @@ This source code is licensed under the BSD-style license found in the
 LICENSE file in the root directory of this source tree.
 """
 from musiclang.library import *
-import re
 
 
 
@@ -279,7 +278,7 @@ class Score:
 
             chords.append(chord(**chord_score))
 
-        return sum(chords, None)
+        return Score.concat(chords)
 
     def normalize_instrument_names(self):
         """
@@ -415,6 +414,33 @@ class Score:
         else:
             raise Exception('Cannot add to Score if not Chord or Score')
 
+    @classmethod
+    def concat(cls, items):
+        """
+        Concatenate chords and scores in linear time, without copying them.
+        Same result as summing the items with ``+`` : the config is the one of the first score and the tags
+        of the scores are merged.
+
+        Parameters
+        ----------
+        items: Iterable[Chord | Score]
+
+        Returns
+        -------
+        score: Score
+
+        Examples
+        --------
+
+        >>> from musiclang.library import *
+        >>> Score.concat([(I % I.M)(piano__0=s0), (V % I.M)(piano__0=s4)])
+        (I % I.M)(
+            piano__0=s0)+
+        (V % I.M)(
+            piano__0=s4)
+        """
+        return ScoreBuilder().extend(items).freeze()
+
     def __iter__(self):
         return self.chords.__iter__()
 
@@ -534,11 +560,11 @@ class Score:
         Returns
         -------
         """
-        score = None
+        score = ScoreBuilder()
         for chord in self:
             score += chord(**{instrument: melody.o(instruments_octaves.get(instrument, 0)) for instrument, melody in chord.items()})
 
-        return score
+        return score.freeze()
 
     def to_events(self, tempo=120, **kwargs):
         from musiclang.write.out import score_to_events
@@ -575,11 +601,11 @@ class Score:
                The score with voicings corresponding to chords
 
         """
-        score = None
+        score = ScoreBuilder()
         for chord in self:
             score += chord.to_voicing(nb_voices=nb_voices, instruments=instruments)
 
-        return score
+        return score.freeze()
 
     def show(self, *args, **kwargs):
         """Wrapper to the music21 show method
@@ -612,33 +638,19 @@ class Score:
         If str return a score with only this voice
         else returns item getter of the list of chords and convert it back to a score
         """
-        from .note import Silence
         from .chord import Chord
-        if isinstance(item, str):
-            new_score = None
-            for chord in self:
-                if item in chord.score.keys():
-                    new_score += chord(**{item: chord.score[item]})
-                else:
-                    new_score += chord(**{item: Silence(chord.duration)})
-            return new_score
-        elif isinstance(item, list):
-            new_score = None
-            for chord in self:
-                chord_score = {}
-                for it in item:
-                    if it in chord.score.keys():
-                        chord_score[it] = chord.score[it]
-                    else:
-                        chord_score[it] = Silence(chord.duration)
-                new_score += chord(**chord_score)
-
-            return new_score
+        if isinstance(item, (str, list)):
+            if len(self.chords) == 0:
+                return None
+            parts = [item] if isinstance(item, str) else item
+            return Score.from_table(self.to_table(pitches=False).get_parts(parts))
         else:
             chords = self.chords.__getitem__(item)
             if isinstance(chords, Chord):
                 return chords
-            return sum(chords, None)
+            if len(chords) == 0:
+                return None
+            return Score.concat(chord.copy() for chord in chords)
 
 
     def get_instruments(self, instruments):
@@ -740,6 +752,24 @@ class Score:
             data = f.read()
         return cls.from_str(data)
 
+    @classmethod
+    def iter_file(cls, filepath, chunk_size=1 << 20):
+        """
+        Iterate over the chords of a musiclang text file, parsing them one at a time without loading the whole file
+
+        Parameters
+        ----------
+        filepath: str
+        chunk_size: int, default=1048576
+                    Number of characters read at once
+
+        Returns
+        -------
+        chords: Iterator[Chord]
+        """
+        from .text_parser import iter_chords
+        return iter_chords(filepath, chunk_size=chunk_size)
+
     def to_pickle(self, filepath, create_dir=False):
         """
         Save the score into a pickle file
@@ -759,6 +789,25 @@ class Score:
         with open(filepath, 'wb') as f:
             pickle.dump(self, f)
 
+    def to_binary(self, filepath, create_dir=False):
+        """
+        Save the score in the binary score format (integer coded note columns and a dictionary of the strings,
+        see :mod:`musiclang.write.binary_score`), smaller and faster to load than a pickle
+
+        Parameters
+        ----------
+        filepath : str
+                   Filepath on which to save the score
+        create_dir : bool (Default value = False)
+                    Create the directory if it does not exist
+        """
+        import os
+        from .binary_score import write_binary_score
+        directory = os.path.dirname(filepath)
+        if create_dir and not os.path.exists(directory):
+            os.makedirs(directory)
+        write_binary_score(self, filepath)
+
 
     def normalize_chord_duration(self):
         """
@@ -1117,7 +1166,7 @@ class Score:
         if keep_score:
             if not allow_override and len(set(result_score.parts).intersection(score2.parts)) != 0:
                 raise Exception('If keep_score flag is True, parts should be differents between the scores')
-            result_score = sum([c1(**{**c2.score, **c1.score}) for c1, c2 in zip(result_score.chords, score2.chords)], None)
+            result_score = Score.concat(c1(**{**c2.score, **c1.score}) for c1, c2 in zip(result_score.chords, score2.chords))
 
         if keep_pitch:
             result_score = result_score.to_scale_notes()
@@ -1162,6 +1211,9 @@ class Score:
         ----------
         fixed_parts: list[str]
             List of parts that should not be changed (eg : piano__0)
+        kwargs:
+            Options of :func:`musiclang.transform.composing.counterpoint.create_counterpoint_on_score`
+            (eg : method='beam', beam_width=16)
 
         Returns
         -------
@@ -1173,7 +1225,7 @@ class Score:
         # Extract drums
         drums = self.get_instrument_names(['drums_0'])
         score_without_drums = self.remove_drums()
-        score = create_counterpoint_on_score(score_without_drums, fixed_parts=fixed_parts)
+        score = create_counterpoint_on_score(score_without_drums, fixed_parts=fixed_parts, **kwargs)
         # Reproject drums
         if drums is not None and len(drums.instruments) > 0:
             score = drums.project_on_score(score, voice_leading=False, keep_score=True)
@@ -1195,56 +1247,15 @@ class Score:
 
 
     def extract_densities(self):
-        instruments = self.instruments
-        densities = {}
-        total_duration = self.duration
-        for instrument in instruments:
-            densities[instrument] = 0
-            for chord in self.chords:
-                if instrument in chord.score:
-                    ins_score = chord.score[instrument]
-                    notes = ins_score.notes
-                    for note in notes:
-                        if note.is_note or note.type == 'd':
-                            densities[instrument] += 1
-
-        return {k: v / total_duration for k, v in densities.items()}
+        return self.to_table(pitches=False).densities()
 
     def extract_mean_octaves(self):
-        instruments = self.instruments
-        octaves = {}
-        nb = {}
-        for instrument in instruments:
-            octaves[instrument] = 0
-            nb[instrument] = 0
-            for chord in self.chords:
-                if instrument in chord.score:
-                    ins_score = chord.score[instrument]
-                    notes = ins_score.notes
-                    for note in notes:
-                        if note.is_note or note.type == 'd':
-                            octaves[instrument] += note.octave
-                            nb[instrument] += 1
-        return {k: round(v / nb[k] if nb[k] > 0 else 0) for k, v in octaves.items()}
+        return self.to_table(pitches=False).mean_octaves()
 
     def extract_mean_amplitudes(self):
         from musiclang import Note
-        instruments = self.instruments
-        amp = {}
-        nb = {}
-        for instrument in instruments:
-            amp[instrument] = 0
-            nb[instrument] = 0
-            for chord in self.chords:
-                if instrument in chord.score:
-                    ins_score = chord.score[instrument]
-                    notes = ins_score.notes
-                    for note in notes:
-                        if note.is_note or note.type == 'd':
-                            amp[instrument] += note.amp
-                            nb[instrument] += 1
-
-        return {k: Note(0, 0, 0, 1, amp=int(v / nb[k]) if nb[k]> 0 else 0).amp_figure for k, v in amp.items()}
+        amplitudes = self.to_table(pitches=False).mean_amplitudes()
+        return {k: Note(0, 0, 0, 1, amp=v).amp_figure for k, v in amplitudes.items()}
 
     def get_maximum_density_instrument(self, exclude_instruments=None):
         densities = self.extract_densities()
@@ -1259,28 +1270,7 @@ class Score:
         Returns
         -------
         """
-        import numpy as np
-        instruments = self.instruments
-        statistics = {}
-        total_duration = self.duration
-        for instrument in instruments:
-            if instrument.startswith('drums'):
-                continue
-            pitches = []
-            last_pitch = None
-            for chord in self.chords:
-                if instrument in chord.score:
-                    ins_score = chord.score[instrument]
-                    notes = ins_score.notes
-                    for note in notes:
-                        if note.is_note:
-                            new_pitch =chord.to_pitch(note, last_pitch=last_pitch)
-                            pitches.append(new_pitch)
-                            last_pitch = new_pitch
-
-            statistics[instrument] = (min(pitches), max(pitches), float(np.mean(pitches)), float(np.std(pitches)))
-
-        return statistics
+        return self.to_table().pitch_statistics()
 
     def get_bass_instrument(self):
         """
@@ -1376,8 +1366,10 @@ class Score:
         -------
 
         """
-        from .time_utils import get_score_between
-        return get_score_between(self, start, end)
+        table = self.to_table(pitches=False).get_between(start, end)
+        if len(table.chords) == 0:
+            return None
+        return Score.from_table(table)
 
     def reduce(self, n_voices=4, start_low=False, instruments=None):
         """
@@ -1464,8 +1456,8 @@ class Score:
         .. warning:: This step can take some time depending on the length of the file
         Parameters
         ----------
-        filename : str
-                   Filepath of the file
+        filename : str, bytes or miditoolkit.MidiFile
+                   Filepath of the file, or content of a midi file already in memory
         fast_chord_inference: bool (Default value = True)
             If True, the chord scales inference will be faster but less accurate
              (we use a markov optimisation to infer the chords instead of a ML model)
@@ -1616,18 +1608,24 @@ class Score:
 
     @classmethod
     def from_str(cls, s):
-        try:
-            from musiclang import Chord
-            pattern = re.compile(r'(?<=\))\s*\+\s*(?=\()')
-            data = re.split(pattern, str(s))
-            chords = [eval(str(d).replace('\n', '')) for d in data]
-            assert isinstance(chords[0], Chord)
-            result = Score(chords)
-            if len(result.chords) == 1:
-                return result.chords[0]
-            return result
-        except:
-            return eval(str(s).replace('\n', ''))
+        """
+        Parse a musiclang text (the ``str`` of a score, chord, melody or note) without evaluating python code
+
+        See Also
+        --------
+        :func:`~musiclang.write.text_parser.parse_text`
+
+        Parameters
+        ----------
+        s: str
+
+        Returns
+        -------
+        result: Score, Chord, Melody or Note
+                A chord if the text contains a single chord
+        """
+        from .text_parser import parse_text
+        return parse_text(s)
 
     @classmethod
     def from_sequence(cls, sequence, **kwargs):
@@ -1662,6 +1660,64 @@ class Score:
         from .sequence.sequence import score_to_sequence
         return score_to_sequence(self, **kwargs)
 
+    def to_columnar_sequence(self):
+        """
+        Convert the score to a :class:`~musiclang.write.sequence.columnar.ColumnarSequence`,
+        the rows of :func:`~Score.to_sequence` stored in typed numpy columns
+
+        Returns
+        -------
+        sequence: ColumnarSequence
+        """
+        from .sequence.columnar import ColumnarSequence
+        return ColumnarSequence.from_score(self)
+
+    @classmethod
+    def from_columnar_sequence(cls, sequence):
+        """
+        Create a score from a :class:`~musiclang.write.sequence.columnar.ColumnarSequence`,
+        inverse of :func:`~Score.to_columnar_sequence`
+
+        Parameters
+        ----------
+        sequence: ColumnarSequence
+
+        Returns
+        -------
+        score: Score
+        """
+        return sequence.to_score()
+
+    def to_table(self, pitches=True):
+        """
+        Convert the score to a columnar :class:`~musiclang.write.table.NoteTable` (one row per note)
+
+        Parameters
+        ----------
+        pitches: bool (Default value = True)
+            If False, don't compute the absolute pitch of the notes
+
+        Returns
+        -------
+        table: NoteTable
+        """
+        from .table import NoteTable
+        return NoteTable.from_score(self, pitches=pitches)
+
+    @classmethod
+    def from_table(cls, table):
+        """
+        Create a score from a :class:`~musiclang.write.table.NoteTable`, inverse of :func:`~Score.to_table`
+
+        Parameters
+        ----------
+        table: NoteTable
+
+        Returns
+        -------
+        score: Score
+        """
+        return table.to_score()
 
     @classmethod
     def from_pickle(cls, filepath):
@@ -1681,6 +1737,23 @@ class Score:
             data = pickle.load(f)
         return data
 
+    @classmethod
+    def from_binary(cls, filepath):
+        """
+        Load a score from a binary score file written by :func:`~Score.to_binary`.
+        Use :class:`musiclang.write.binary_score.BinaryScore` to read only some chords of the file
+
+        Parameters
+        ----------
+        filepath: str
+
+        Returns
+        -------
+        score: Score
+        """
+        from .binary_score import BinaryScore
+        return BinaryScore.open(filepath).to_score()
+
     def __call__(self, *args, **kwargs):
         return Score([chord(*args, **kwargs) for chord in self.chords], tags=set(self.tags))
     def __eq__(self, other):
@@ -1734,7 +1807,7 @@ class Score:
         If other is Integer, repeat the note other times
         """
         if isinstance(other, int):
-            return sum([self.copy() for i in range(other)], None)
+            return Score.concat(self.copy() for i in range(other))
         else:
             raise Exception('Cannot multiply Score and ' + str(type(other)))
 
@@ -1782,7 +1855,7 @@ class Score:
 
 
     def realize_tags(self):
-        new_score = None
+        new_score = ScoreBuilder()
         last_notes = {}
         final_notes = {}
         for idx, chord in enumerate(self.chords):
@@ -1793,7 +1866,7 @@ class Score:
 
             new_score += chord.realize_tags(last_note=last_notes, final_note=final_notes)
 
-        return new_score
+        return new_score.freeze()
 
     def to_code_file(self, filepath, **kwargs):
         """Export the chord serie as a file representing valid python code that recreates the score
@@ -2039,3 +2112,105 @@ class Score:
             time += chord.duration
         final_score = Score(all_chords)
         return final_score.to_scale_note()
+
+
+
+class ScoreBuilder:
+    """
+    Build a score chord by chord in linear time.
+
+    ``score += chord`` copies the whole score at each addition, which is quadratic in the number of chords.
+    The builder only stores the chords that are added (they are not copied) and creates the score with :func:`~freeze`.
+
+    Examples
+    --------
+
+    >>> from musiclang.library import *
+    >>> from musiclang import ScoreBuilder
+    >>> builder = ScoreBuilder()
+    >>> builder += (I % I.M)(piano__0=s0)
+    >>> builder.extend([(IV % I.M)(piano__0=s2), (V % I.M)(piano__0=s4)])
+    >>> builder.freeze()
+    (I % I.M)(
+        piano__0=s0)+
+    (IV % I.M)(
+        piano__0=s2)+
+    (V % I.M)(
+        piano__0=s4)
+    """
+
+    def __init__(self, config=None, tags=None):
+        """
+
+        Parameters
+        ----------
+        config: dict or None
+            Config of the score, if None use the config of the first score added (or the default config)
+        tags: set or None
+            Tags of the score
+        """
+        self.chords = []
+        self.config = config
+        self.tags = set(tags) if tags is not None else set()
+
+    def append(self, chord):
+        """
+        Add a chord at the end of the score
+
+        Parameters
+        ----------
+        chord: Chord
+
+        Returns
+        -------
+        builder: ScoreBuilder
+        """
+        self.chords.append(chord)
+        return self
+
+    def extend(self, items):
+        """
+        Add a score, a chord, or an iterable of chords and scores at the end of the score
+
+        Parameters
+        ----------
+        items: Score or Chord or Iterable[Chord | Score]
+
+        Returns
+        -------
+        builder: ScoreBuilder
+        """
+        from .chord import Chord
+        if items is None:
+            return self
+        if isinstance(items, Chord):
+            return self.append(items)
+        if isinstance(items, Score):
+            if self.config is None and len(self.chords) == 0:
+                self.config = items.config
+            self.tags.update(items.tags)
+            self.chords.extend(items.chords)
+            return self
+        for item in items:
+            if isinstance(item, Chord):
+                self.chords.append(item)
+            else:
+                self.extend(item)
+        return self
+
+    def __iadd__(self, other):
+        return self.extend(other)
+
+    def __len__(self):
+        return len(self.chords)
+
+    def freeze(self):
+        """
+        Create the score
+
+        Returns
+        -------
+        score: Score
+        """
+        config = self.config.copy() if self.config is not None else None
+        return Score(list(self.chords), config=config, tags=set(self.tags))
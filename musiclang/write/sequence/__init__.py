@@ -0,0 +1,8 @@
+"""
+Copyright (c) 2023, Florian GARDIN
+All rights reserved.
+
+This source code is licensed under the BSD-style license found in the
+LICENSE file in the root directory of this source tree.
+"""
+from .columnar import ColumnarSequence, SEQUENCE_COLUMNS
@@ -0,0 +1,531 @@
+"""
+Copyright (c) 2023, Florian GARDIN
+All rights reserved.
+
+This source code is licensed under the BSD-style license found in the
+LICENSE file in the root directory of this source tree.
+"""
+import math
+from fractions import Fraction as frac
+
+import numpy as np
+
+#: Columns of :func:`~musiclang.write.sequence.sequence.score_to_sequence`, in order
+SEQUENCE_COLUMNS = ['chord_time', 'chord_idx', 'chord_relative_start', 'chord_relative_end', 'pitch', 'instrument',
+                    'start', 'end', 'chord_degree', 'chord_extension', 'chord_octave', 'tonality_degree',
+                    'tonality_mode', 'tonality_octave', 'silence', 'continuation',
+                    'note_type', 'note_val', 'note_octave', 'note_amp', 'note_duration', 'note_idx']
+
+#: One row per note, filled in a single traversal of the score
+_ROW_DTYPE = np.dtype([
+    ('chord_idx', np.int32),
+    ('chord', np.int32),       # Index in ``ColumnarSequence.chords``
+    ('tonality', np.int32),    # Index in ``ColumnarSequence.tonalities``
+    ('instrument', np.int32),  # Index in ``ColumnarSequence.instruments``
+    ('note_type', np.int32),   # Index in ``ColumnarSequence.note_types``
+    ('note_val', np.int64),
+    ('note_octave', np.int64),
+    ('note_amp', np.float64),
+    ('pitch', np.float64),     # NaN for silences, continuations and drums parts patterns
+    ('silence', np.bool_),
+    ('continuation', np.bool_),
+])
+
+#: Metadata keys of the resolution and of the type of the amplitudes in arrow and parquet files
+RESOLUTION_KEY = b'musiclang.resolution'
+INTEGER_AMPS_KEY = b'musiclang.integer_amps'
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('Writing and reading columnar sequences requires pyarrow, install it with '
+                          '`pip install pyarrow`')
+    return pyarrow
+
+
+def _decode_dictionary(column):
+    """
+    Codes and categories of a string arrow column, dictionary encoded or not
+    """
+    pa = _require_pyarrow()
+    if isinstance(column, pa.ChunkedArray):
+        if pa.types.is_dictionary(column.type):
+            column = column.unify_dictionaries()
+        column = column.combine_chunks()
+    if not pa.types.is_dictionary(column.type):
+        column = column.dictionary_encode()
+    return column.indices.to_numpy(zero_copy_only=False).astype(np.int32), column.dictionary.to_pylist()
+
+
+def _unique_rows(*columns):
+    """
+    Sorted distinct rows of integer columns and the code of each row, packing each row in a single integer
+    (much faster than ``np.unique(axis=0)`` which sorts the rows as structured values)
+    """
+    uniques, codes = zip(*[np.unique(column, return_inverse=True) for column in columns])
+    shape = tuple(max(len(unique), 1) for unique in uniques)
+    keys, codes = np.unique(np.ravel_multi_index(codes, shape), return_inverse=True)
+    rows = zip(*[unique[indexes] for unique, indexes in zip(uniques, np.unravel_index(keys, shape))])
+    return list(rows), codes.reshape(-1)
+
+
+def _build_score(chords, chord_indexes, instruments, silences, continuations, types, vals, octaves, durations, amps):
+    """
+    Create a score from the values of each row of a sequence, rows are grouped by chord index
+    (sorted) and by instrument (in order of first appearance in the chord)
+
+    Parameters
+    ----------
+    chords: dict
+        Chord index -> (chord_degree, chord_extension, chord_octave, tonality_degree, tonality_mode, tonality_octave)
+    chord_indexes, instruments, silences, continuations, types, vals, octaves, durations, amps: list
+        Values of each row
+
+    Returns
+    -------
+    score: Score
+    """
+    from ..score import Score
+    from ..melody import Melody
+    from ..chord import Chord
+    from ..tonality import Tonality
+    from ..note import Note, Silence, Continuation
+
+    parts = {chord_idx: {} for chord_idx in sorted(chords)}
+    for chord_idx, instrument, silence, continuation, type, val, octave, duration, amp in zip(
+            chord_indexes, instruments, silences, continuations, types, vals, octaves, durations, amps):
+        if silence:
+            note = Silence(duration)
+        elif continuation:
+            note = Continuation(duration)
+        else:
+            note = Note(type, val=int(val), octave=int(octave), duration=duration, amp=int(amp))
+        parts[chord_idx].setdefault(instrument, []).append(note)
+
+    score = []
+    for chord_idx, chord_parts in parts.items():
+        degree, extension, octave, tonality_degree, tonality_mode, tonality_octave = chords[chord_idx]
+        tonality = Tonality(int(tonality_degree), mode=tonality_mode, octave=int(tonality_octave))
+        chord = Chord(int(degree), extension=extension, octave=int(octave), tonality=tonality)
+        score.append(chord(**{instrument: Melody(notes) for instrument, notes in chord_parts.items()}))
+    return Score(score)
+
+
+class ColumnarSequence:
+    """
+    Columnar version of the sequence of :func:`Score.to_sequence` : the same rows (one per note, in score order)
+    stored as one typed numpy array per column, without python objects.
+
+    - Times are integer ticks with ``resolution`` ticks per quarter, so the conversion is exact
+    - Chords, tonalities, instruments and note types are categorical : an int32 code per row and a list of
+      categories. A chord is (degree, extension, octave), a tonality (degree, mode, octave)
+    - Pitch is NaN for silences and continuations
+    - ``score_idx`` is the index of the score of each row, when several sequences are concatenated
+      with :func:`~ColumnarSequence.concat`
+
+    Start and end of the notes are ``chord_time + chord_relative_start`` and ``chord_time + chord_relative_end``.
+
+    Examples
+    --------
+
+    >>> from musiclang.library import *
+    >>> score = (I % I.M)(piano__0=s0 + s2.e + s4.e, violin__0=s4.h) + (V % I.M)(piano__0=s0.h)
+    >>> sequence = ColumnarSequence.from_score(score)
+    >>> sequence.columns['pitch']
+    array([0., 4., 7., 7., 7.])
+    >>> sequence.to_score() == score
+    True
+    """
+
+    def __init__(self, columns, chords, tonalities, instruments, note_types, resolution=1, integer_amps=True):
+        self.columns = columns
+        self.chords = chords
+        self.tonalities = tonalities
+        self.instruments = instruments
+        self.note_types = note_types
+        self.resolution = resolution
+        # Amplitudes are python ints in the score, the pandas sequence then has an integer column
+        self.integer_amps = integer_amps
+
+    def __len__(self):
+        return len(self.columns['chord_idx'])
+
+    @property
+    def nb_scores(self):
+        """
+        Number of scores in the sequence
+        """
+        return int(self.columns['score_idx'].max()) + 1 if len(self) > 0 else 0
+
+    @classmethod
+    def from_score(cls, score):
+        """
+        Create the columnar sequence of a score in a single traversal of its notes
+
+        Parameters
+        ----------
+        score: Score
+
+        Returns
+        -------
+        sequence: ColumnarSequence
+        """
+        chords = {}
+        tonalities = {}
+        instruments = {}
+        note_types = {}
+        rows = []
+        numerators = []
+        denominators = []
+        for chord_idx, chord in enumerate(score.chords):
+            tonality = chord.tonality
+            chord_code = chords.setdefault((chord.element, chord.extension, chord.octave), len(chords))
+            tonality_code = tonalities.setdefault((tonality.degree, tonality.mode, tonality.octave), len(tonalities))
+            for part, melody in chord.score.items():
+                instrument = instruments.setdefault(part, len(instruments))
+                for note in melody.notes:
+                    pitch = chord.to_pitch(note)
+                    duration = note.duration
+                    numerators.append(duration.numerator)
+                    denominators.append(duration.denominator)
+                    rows.append((chord_idx, chord_code, tonality_code, instrument,
+                                 note_types.setdefault(note.type, len(note_types)),
+                                 note.val, note.octave, note.amp, np.nan if pitch is None else pitch,
+                                 note.is_silence, note.is_continuation))
+
+        integer_amps = all(isinstance(row[7], int) for row in rows)
+        rows = np.array(rows, dtype=_ROW_DTYPE)
+        numerators = np.asarray(numerators, dtype=np.int64)
+        denominators = np.asarray(denominators, dtype=np.int64)
+        resolution = math.lcm(*np.unique(denominators).tolist()) if len(rows) > 0 else 1
+        durations = numerators * (resolution // denominators)
+
+        # Relative start of each note in its melody, and duration of each chord as its longest melody
+        ends = np.cumsum(durations)
+        new_melody = np.ones(len(rows), dtype=bool)
+        new_melody[1:] = (rows['chord_idx'][1:] != rows['chord_idx'][:-1]) | \
+                         (rows['instrument'][1:] != rows['instrument'][:-1])
+        melody_starts = (ends - durations)[new_melody]
+        relative_starts = ends - durations - melody_starts[np.cumsum(new_melody) - 1]
+        chord_durations = np.zeros(len(score.chords), dtype=np.int64)
+        np.maximum.at(chord_durations, rows['chord_idx'], relative_starts + durations)
+        chord_times = np.concatenate([[0], np.cumsum(chord_durations)[:-1]]).astype(np.int64)
+
+        columns = {name: np.ascontiguousarray(rows[name]) for name in _ROW_DTYPE.names}
+        columns['score_idx'] = np.zeros(len(rows), dtype=np.int32)
+        columns['chord_time'] = chord_times[rows['chord_idx']]
+        columns['chord_relative_start'] = relative_starts
+        columns['chord_relative_end'] = relative_starts + durations
+        return cls(columns, list(chords), list(tonalities), list(instruments), list(note_types),
+                   resolution=resolution, integer_amps=integer_amps)
+
+    @classmethod
+    def concat(cls, sequences):
+        """
+        Concatenate the sequences of several scores (eg: a whole corpus) in one sequence,
+        the rows of each sequence get a new ``score_idx``.
+        Amplitudes of the pandas sequences are integers only if they are integers in all the scores
+
+        Parameters
+        ----------
+        sequences: list[ColumnarSequence]
+
+        Returns
+        -------
+        sequence: ColumnarSequence
+        """
+        resolution = math.lcm(*[sequence.resolution for sequence in sequences]) if len(sequences) > 0 else 1
+        categories = {name: {} for name in ['chords', 'tonalities', 'instruments', 'note_types']}
+        parts = []
+        nb_scores = 0
+        for sequence in sequences:
+            columns = dict(sequence.columns)
+            for category, column in [('chords', 'chord'), ('tonalities', 'tonality'),
+                                     ('instruments', 'instrument'), ('note_types', 'note_type')]:
+                codes = categories[category]
+                mapping = np.asarray([codes.setdefault(value, len(codes)) for value in getattr(sequence, category)]
+                                     + [0], dtype=np.int32)
+                columns[column] = mapping[columns[column]]
+            factor = resolution // sequence.resolution
+            for column in ['chord_time', 'chord_relative_start', 'chord_relative_end']:
+                columns[column] = columns[column] * factor
+            columns['score_idx'] = columns['score_idx'] + nb_scores
+            nb_scores += max(sequence.nb_scores, 1)
+            parts.append(columns)
+
+        if len(parts) == 0:
+            from ..score import Score
+            return cls.from_score(Score([]))
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        return cls(columns, list(categories['chords']), list(categories['tonalities']),
+                   list(categories['instruments']), list(categories['note_types']), resolution=resolution,
+                   integer_amps=all(sequence.integer_amps for sequence in sequences))
+
+    def split(self):
+        """
+        Split a concatenated sequence into the sequence of each score
+
+        Returns
+        -------
+        sequences: list[ColumnarSequence]
+        """
+        boundaries = np.searchsorted(self.columns['score_idx'], np.arange(self.nb_scores + 1))
+        sequences = []
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            columns = {name: column[start:end] for name, column in self.columns.items()}
+            columns['score_idx'] = np.zeros(end - start, dtype=np.int32)
+            sequences.append(ColumnarSequence(columns, self.chords, self.tonalities, self.instruments,
+                                              self.note_types, resolution=self.resolution,
+                                              integer_amps=self.integer_amps))
+        return sequences
+
+    def _check_one_score(self):
+        if self.nb_scores > 1:
+            raise ValueError(f'The sequence contains {self.nb_scores} scores, convert them one by one with split()')
+
+    def _to_fractions(self, ticks):
+        """
+        Convert ticks to a list of fractions of quarters, creating one fraction per distinct value
+        """
+        values, codes = np.unique(ticks, return_inverse=True)
+        fractions = np.empty(len(values), dtype=object)
+        fractions[:] = [frac(int(tick), self.resolution) for tick in values.tolist()]
+        return fractions[codes]
+
+    def _to_times(self, ticks):
+        """
+        Convert ticks to fractions of quarters, with the types of the row by row sequence where times start from the
+        integer 0 : the zero times are integers and the column is an int64 column if all of them are zero
+        """
+        if len(ticks) > 0 and not ticks.any():
+            return np.zeros(len(ticks), dtype=np.int64)
+        times = self._to_fractions(ticks)
+        times[ticks == 0] = 0
+        return times
+
+    def to_score(self):
+        """
+        Convert back to a score, inverse of :func:`~ColumnarSequence.from_score` for the attributes
+        stored in a sequence
+
+        Returns
+        -------
+        score: Score
+        """
+        self._check_one_score()
+        columns = self.columns
+        chord_indexes = columns['chord_idx']
+        _, first_rows = np.unique(chord_indexes, return_index=True)
+        chords = {int(chord_indexes[row]): self.chords[columns['chord'][row]] + self.tonalities[columns['tonality'][row]]
+                  for row in first_rows.tolist()}
+        durations = self._to_fractions(columns['chord_relative_end'] - columns['chord_relative_start'])
+        instruments = np.asarray(self.instruments + [None], dtype=object)[columns['instrument']]
+        types = np.asarray(self.note_types + [None], dtype=object)[columns['note_type']]
+        return _build_score(chords, chord_indexes.tolist(), instruments.tolist(), columns['silence'].tolist(),
+                            columns['continuation'].tolist(), types.tolist(), columns['note_val'].tolist(),
+                            columns['note_octave'].tolist(), durations, columns['note_amp'].tolist())
+
+    def to_frame(self):
+        """
+        Convert to the pandas sequence of :func:`Score.to_sequence`, with the same columns, types and row order
+
+        Returns
+        -------
+        sequence: pandas.DataFrame
+        """
+        import pandas as pd
+        self._check_one_score()
+        columns = self.columns
+        chords = np.empty(len(self.chords) + 1, dtype=object)
+        chords[:-1] = self.chords
+        chords = chords[columns['chord']]
+        tonalities = np.empty(len(self.tonalities) + 1, dtype=object)
+        tonalities[:-1] = self.tonalities
+        tonalities = tonalities[columns['tonality']]
+        start = columns['chord_time'] + columns['chord_relative_start']
+        end = columns['chord_time'] + columns['chord_relative_end']
+
+        if len(self) == 0:
+            frame = pd.DataFrame([], columns=SEQUENCE_COLUMNS)
+            frame['note_idx'] = np.arange(0)
+            return frame
+        pitches = columns['pitch']
+        if np.isnan(pitches).all():
+            pitches = np.full(len(pitches), None, dtype=object)
+        elif not np.isnan(pitches).any():
+            pitches = pitches.astype(np.int64)
+
+        frame = pd.DataFrame({
+            'chord_time': self._to_times(columns['chord_time']),
+            'chord_idx': columns['chord_idx'].astype(np.int64),
+            'chord_relative_start': self._to_times(columns['chord_relative_start']),
+            'chord_relative_end': self._to_fractions(columns['chord_relative_end']),
+            'pitch': pitches,
+            'instrument': np.asarray(self.instruments + [None], dtype=object)[columns['instrument']],
+            'start': self._to_times(start),
+            'end': self._to_fractions(end),
+            'chord_degree': np.asarray([chord[0] for chord in chords], dtype=np.int64),
+            'chord_extension': np.asarray([chord[1] for chord in chords], dtype=object),
+            'chord_octave': np.asarray([chord[2] for chord in chords], dtype=np.int64),
+            'tonality_degree': np.asarray([tonality[0] for tonality in tonalities], dtype=np.int64),
+            'tonality_mode': np.asarray([tonality[1] for tonality in tonalities], dtype=object),
+            'tonality_octave': np.asarray([tonality[2] for tonality in tonalities], dtype=np.int64),
+            'silence': columns['silence'],
+            'continuation': columns['continuation'],
+            'note_type': np.asarray(self.note_types + [None], dtype=object)[columns['note_type']],
+            'note_val': columns['note_val'],
+            'note_octave': columns['note_octave'],
+            'note_amp': columns['note_amp'].astype(np.int64) if self.integer_amps else columns['note_amp'],
+            'note_duration': self._to_fractions(columns['chord_relative_end'] - columns['chord_relative_start']),
+            'note_idx': np.arange(len(self), dtype=np.int64),
+        }, columns=SEQUENCE_COLUMNS)
+        return frame.sort_values(by='start', ascending=True)
+
+    def to_arrow(self):
+        """
+        Convert to a pyarrow table without object columns : times are int64 ticks (the resolution is stored
+        in the schema metadata), instruments, note types, chord extensions and tonality modes are dictionary encoded
+
+        Returns
+        -------
+        table: pyarrow.Table
+        """
+        pa = _require_pyarrow()
+        columns = self.columns
+        chords = np.asarray([chord[0] for chord in self.chords] + [0], dtype=np.int16), \
+            [chord[1] for chord in self.chords], np.asarray([chord[2] for chord in self.chords] + [0], dtype=np.int16)
+        tonalities = np.asarray([tonality[0] for tonality in self.tonalities] + [0], dtype=np.int16), \
+            [tonality[1] for tonality in self.tonalities], \
+            np.asarray([tonality[2] for tonality in self.tonalities] + [0], dtype=np.int16)
+
+        def dictionary(codes, categories):
+            return pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int32()),
+                                                  pa.array(categories, type=pa.string()))
+
+        def category_codes(values):
+            categories = list(dict.fromkeys(values))
+            return np.asarray([categories.index(value) for value in values] + [0], dtype=np.int32), categories
+
+        extension_codes, extensions = category_codes(chords[1])
+        mode_codes, modes = category_codes(tonalities[1])
+        pitch = columns['pitch']
+        arrays = {
+            'score_idx': pa.array(columns['score_idx'], type=pa.int32()),
+            'chord_idx': pa.array(columns['chord_idx'], type=pa.int32()),
+            'chord_time': pa.array(columns['chord_time'], type=pa.int64()),
+            'chord_relative_start': pa.array(columns['chord_relative_start'], type=pa.int64()),
+            'chord_relative_end': pa.array(columns['chord_relative_end'], type=pa.int64()),
+            'pitch': pa.array(np.nan_to_num(pitch).astype(np.int32), mask=np.isnan(pitch), type=pa.int32()),
+            'instrument': dictionary(columns['instrument'], self.instruments),
+            'chord_degree': pa.array(chords[0][columns['chord']], type=pa.int16()),
+            'chord_extension': dictionary(extension_codes[columns['chord']], extensions),
+            'chord_octave': pa.array(chords[2][columns['chord']], type=pa.int16()),
+            'tonality_degree': pa.array(tonalities[0][columns['tonality']], type=pa.int16()),
+            'tonality_mode': dictionary(mode_codes[columns['tonality']], modes),
+            'tonality_octave': pa.array(tonalities[2][columns['tonality']], type=pa.int16()),
+            'silence': pa.array(columns['silence'], type=pa.bool_()),
+            'continuation': pa.array(columns['continuation'], type=pa.bool_()),
+            'note_type': dictionary(columns['note_type'], self.note_types),
+            'note_val': pa.array(columns['note_val'], type=pa.int64()),
+            'note_octave': pa.array(columns['note_octave'], type=pa.int64()),
+            'note_amp': pa.array(columns['note_amp'], type=pa.float64()),
+        }
+        return pa.table(arrays, metadata={RESOLUTION_KEY: str(self.resolution).encode(),
+                                          INTEGER_AMPS_KEY: str(int(self.integer_amps)).encode()})
+
+    @classmethod
+    def from_arrow(cls, table):
+        """
+        Create a sequence from a pyarrow table written by :func:`~ColumnarSequence.to_arrow`
+
+        Parameters
+        ----------
+        table: pyarrow.Table
+
+        Returns
+        -------
+        sequence: ColumnarSequence
+        """
+        def numpy(name, dtype):
+            return table.column(name).to_numpy().astype(dtype, copy=False)
+
+        metadata = table.schema.metadata
+        resolution = int(metadata[RESOLUTION_KEY])
+        integer_amps = bool(int(metadata.get(INTEGER_AMPS_KEY, b'1')))
+        instrument_codes, instruments = _decode_dictionary(table.column('instrument'))
+        type_codes, note_types = _decode_dictionary(table.column('note_type'))
+        extension_codes, extensions = _decode_dictionary(table.column('chord_extension'))
+        mode_codes, modes = _decode_dictionary(table.column('tonality_mode'))
+
+        chord_keys, chord_codes = _unique_rows(numpy('chord_degree', np.int64), extension_codes,
+                                               numpy('chord_octave', np.int64))
+        tonality_keys, tonality_codes = _unique_rows(numpy('tonality_degree', np.int64), mode_codes,
+                                                     numpy('tonality_octave', np.int64))
+        pitch = table.column('pitch')
+        columns = {
+            'score_idx': numpy('score_idx', np.int32),
+            'chord_idx': numpy('chord_idx', np.int32),
+            'chord': chord_codes.astype(np.int32),
+            'tonality': tonality_codes.astype(np.int32),
+            'instrument': instrument_codes,
+            'note_type': type_codes,
+            'note_val': numpy('note_val', np.int64),
+            'note_octave': numpy('note_octave', np.int64),
+            'note_amp': numpy('note_amp', np.float64),
+            'pitch': np.where(pitch.is_null().to_numpy(zero_copy_only=False), np.nan,
+                              pitch.fill_null(0).to_numpy().astype(np.float64)),
+            'silence': numpy('silence', np.bool_),
+            'continuation': numpy('continuation', np.bool_),
+            'chord_time': numpy('chord_time', np.int64),
+            'chord_relative_start': numpy('chord_relative_start', np.int64),
+            'chord_relative_end': numpy('chord_relative_end', np.int64),
+        }
+        chords = [(int(degree), extensions[extension], int(octave)) for degree, extension, octave in chord_keys]
+        tonalities = [(int(degree), modes[mode], int(octave)) for degree, mode, octave in tonality_keys]
+        return cls(columns, chords, tonalities, instruments, note_types, resolution=resolution,
+                   integer_amps=integer_amps)
+
+    def write(self, path):
+        """
+        Write the sequence in a parquet file if the path ends with ``.parquet``, else in an arrow IPC file
+        that can be memory-mapped by :func:`~ColumnarSequence.read`
+
+        Parameters
+        ----------
+        path: str
+        """
+        pa = _require_pyarrow()
+        table = self.to_arrow()
+        if str(path).endswith('.parquet'):
+            import pyarrow.parquet as pq
+            pq.write_table(table, path)
+        else:
+            with pa.OSFile(str(path), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+
+    @classmethod
+    def read(cls, path, memory_map=True):
+        """
+        Read a sequence written with :func:`~ColumnarSequence.write`
+
+        Parameters
+        ----------
+        path: str
+        memory_map: bool (Default value = True)
+            If True memory-map the file instead of reading it
+
+        Returns
+        -------
+        sequence: ColumnarSequence
+        """
+        pa = _require_pyarrow()
+        if str(path).endswith('.parquet'):
+            import pyarrow.parquet as pq
+            table = pq.read_table(str(path), memory_map=memory_map)
+        else:
+            source = pa.memory_map(str(path), 'r') if memory_map else pa.OSFile(str(path), 'rb')
+            table = pa.ipc.open_file(source).read_all()
+        return cls.from_arrow(table)
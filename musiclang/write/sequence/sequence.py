@@ -6,9 +6,10 @@ This source code is licensed under the BSD-style license found in the
 LICENSE file in the root directory of this source tree.
 """
 
-# Groupby
 from fractions import Fraction as frac
-from musiclang import Score, Melody
+
+from .columnar import ColumnarSequence, _build_score
+
 
 def sequence_to_score(sequence, sort_by_time=False, **kwargs):
     """Convert a dataframe (called a sequence) to a MusicLang score
@@ -28,40 +29,27 @@ def sequence_to_score(sequence, sort_by_time=False, **kwargs):
         score, Score : converted score
 
     """
-    from ..chord import Chord
-    from ..tonality import Tonality
-    from ..note import Note, Silence, Continuation
     if sort_by_time:
         sequence = sequence.sort_values(by='start', ascending=True)
-    groups_chord = sequence.groupby('chord_idx')
-    score = []
-    for chord_idx, group_chord in groups_chord:
-        chord_row = group_chord.iloc[0]
-        tonality = Tonality(int(chord_row['tonality_degree']), mode=chord_row['tonality_mode'],
-                            octave=int(chord_row['tonality_octave']))
-        chord = Chord(int(chord_row['chord_degree']), extension=chord_row['chord_extension'],
-                      octave=chord_row['chord_octave'],
-                      tonality=tonality)
-        parts = {}
-        groups_instrument = group_chord.groupby('instrument', sort=False)
-
-        for instrument, row in groups_instrument:
-            part = []
-            for idx_note, note in row.iterrows():
-                if note['silence']:
-                    new_note = Silence(note['note_duration'])
-                elif note['continuation']:
-                    new_note = Continuation(note['note_duration'])
-                else:
-                    new_note = Note(note['note_type'],
-                                val=int(note['note_val']),
-                                octave=int(note['note_octave']),
-                                duration=frac(note['note_duration']).limit_denominator(8),
-                                amp=int(note['note_amp']))
-                part.append( new_note)
-            parts[instrument] = Melody(part)
-        score.append(chord(**parts))
-    return Score(score)
+    # Chord and tonality of each chord are read on its first row
+    first_rows = sequence.drop_duplicates('chord_idx')
+    chords = {chord_idx: chord for chord_idx, *chord in zip(
+        *[first_rows[column].tolist() for column in ['chord_idx', 'chord_degree', 'chord_extension', 'chord_octave',
+                                                     'tonality_degree', 'tonality_mode', 'tonality_octave']])}
+    silences = sequence['silence'].tolist()
+    continuations = sequence['continuation'].tolist()
+    # Durations of the notes are rounded, once per distinct duration
+    rounded = {}
+    durations = []
+    for duration, silence, continuation in zip(sequence['note_duration'].tolist(), silences, continuations):
+        if not silence and not continuation:
+            if duration not in rounded:
+                rounded[duration] = frac(duration).limit_denominator(8)
+            duration = rounded[duration]
+        durations.append(duration)
+    return _build_score(chords, sequence['chord_idx'].tolist(), sequence['instrument'].tolist(), silences,
+                        continuations, sequence['note_type'].tolist(), sequence['note_val'].tolist(),
+                        sequence['note_octave'].tolist(), durations, sequence['note_amp'].tolist())
 
 
 def score_to_sequence(score, **kwargs):
@@ -80,40 +68,4 @@ def score_to_sequence(score, **kwargs):
         sequence, pandas.DataFrame : converted sequence
 
     """
-
-    sequence = []
-    time = 0
-    for idx, chord in enumerate(score):
-        sequence += [[time, idx] + s for s in chord.to_sequence()]
-        time += chord.duration
-
-    import pandas as pd
-    import numpy as np
-
-    sequence = pd.DataFrame(sequence,
-                            columns=['chord_time', 'chord_idx', 'chord_relative_start', 'chord_relative_end', 'pitch',
-                                     'chord', 'instrument', 'note'])
-    sequence['start'] = sequence['chord_time'] + sequence['chord_relative_start']
-    sequence['end'] = sequence['chord_time'] + sequence['chord_relative_end']
-    sequence['chord_degree'] = sequence['chord'].apply(lambda x: x.element)
-    sequence['chord_extension'] = sequence['chord'].apply(lambda x: x.extension)
-    sequence['chord_octave'] = sequence['chord'].apply(lambda x: x.octave)
-    sequence['tonality_degree'] = sequence['chord'].apply(lambda x: x.tonality.degree)
-    sequence['tonality_mode'] = sequence['chord'].apply(lambda x: x.tonality.mode)
-    sequence['tonality_octave'] = sequence['chord'].apply(lambda x: x.tonality.octave)
-
-    sequence['silence'] = sequence['note'].apply(lambda x: x.is_silence)
-    sequence['continuation'] = sequence['note'].apply(lambda x: x.is_continuation)
-    sequence['note_type'] = sequence['note'].apply(lambda x: x.type)
-    sequence['note_val'] = sequence['note'].apply(lambda x: x.val)
-    sequence['note_octave'] = sequence['note'].apply(lambda x: x.octave)
-    sequence['note_amp'] = sequence['note'].apply(lambda x: x.amp)
-    sequence['note_duration'] = sequence['note'].apply(lambda x: x.duration)
-    sequence['note_idx'] = np.arange(len(sequence))
-    COLUMNS = ['chord_time', 'chord_idx', 'chord_relative_start', 'chord_relative_end', 'pitch', 'instrument',
-                'start', 'end', 'chord_degree', 'chord_extension', 'chord_octave', 'tonality_degree',
-               'tonality_mode', 'tonality_octave', 'silence', 'continuation',
-               'note_type', 'note_val', 'note_octave', 'note_amp',
-               'note_duration', 'note_idx'
-               ]
-    return sequence[COLUMNS].sort_values(by='start', ascending=True)
\ No newline at end of file
+    return ColumnarSequence.from_score(score).to_frame()
@@ -0,0 +1,496 @@
+"""
+Copyright (c) 2023, Florian GARDIN
+All rights reserved.
+
+This source code is licensed under the BSD-style license found in the
+LICENSE file in the root directory of this source tree.
+"""
+import math
+from fractions import Fraction as frac
+
+import numpy as np
+
+#: One row per note of the score
+NOTE_TABLE_DTYPE = np.dtype([
+    ('chord', np.int32),       # Index of the chord in the score
+    ('instrument', np.int32),  # Index in ``NoteTable.instruments`` (part name, eg: piano__0)
+    ('index', np.int32),       # Index of the note in its melody
+    ('onset', np.int64),       # Start of the note since the beginning of the score, in ticks
+    ('duration', np.int64),    # Duration of the note in ticks
+    ('type', np.int16),        # Index in ``NoteTable.types``
+    ('val', np.int32),
+    ('octave', np.int32),
+    ('amp', np.float64),
+    ('pitch', np.int32),       # Absolute pitch of the note (-1 for silences, continuations and patterns)
+    ('mode', np.int16),        # Index in ``NoteTable.modes``, -1 if None
+    ('accident', np.int16),    # Index in ``NoteTable.accidents``, -1 if None
+    ('tags', np.int32),        # Index in ``NoteTable.tag_sets``, 0 is the empty tag set
+    ('pedal', np.int8),        # -1 if None, else 0/1
+    ('tempo', np.float64),     # NaN if None
+])
+
+NOT_PITCHED_TYPES = ('r', 'l', 'd', 'x')
+
+
+def _chord_with_score(chord, score):
+    """
+    Shallow copy of a chord with another score, without copying the melodies of the chord.
+    Cached pitch properties of the chord are kept since they don't depend on the score
+    """
+    new_chord = chord.__class__.__new__(chord.__class__)
+    new_chord.__dict__.update(chord.__dict__)
+    new_chord.score = score
+    new_chord.tonality = chord.tonality.copy() if chord.tonality is not None else None
+    new_chord.tags = set(chord.tags)
+    return new_chord
+
+
+def _to_number(value):
+    """
+    Convert a float back to an int when it has no decimal part
+    """
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class NoteTable:
+    """
+    Columnar representation of a score : a numpy structured array with one row per note
+    (see :data:`NOTE_TABLE_DTYPE`) and a few lookup tables for the categorical values.
+
+    Onsets and durations are stored as integer ticks with ``resolution`` ticks per quarter, so the conversion
+    from and to a :class:`~musiclang.Score` is lossless.
+    Selecting instruments, slicing time ranges and computing statistics are done with vectorized masks.
+
+    Examples
+    --------
+
+    >>> from musiclang.library import *
+    >>> score = (I % I.M)(piano__0=s0 + s2.e + s4.e, violin__0=s4.h) + (V % I.M)(piano__0=s0.h)
+    >>> table = score.to_table()
+    >>> table.notes['pitch']
+    array([ 0,  4,  7,  7,  7], dtype=int32)
+    >>> Score.from_table(table) == score
+    True
+    """
+
+    def __init__(self, notes, chords, parts, instruments, types, modes=None, accidents=None,
+                 tag_sets=None, melodies=None, resolution=1, config=None, tags=None):
+        self.notes = notes
+        self.chords = chords
+        self.parts = parts
+        self.instruments = instruments
+        self.types = types
+        self.modes = modes if modes is not None else []
+        self.accidents = accidents if accidents is not None else []
+        self.tag_sets = tag_sets if tag_sets is not None else [frozenset()]
+        self.melodies = melodies if melodies is not None else {}
+        self.resolution = resolution
+        self.config = config
+        self.tags = set(tags) if tags is not None else set()
+        self.chord_onsets, self.chord_durations = self._compute_onsets()
+
+    def __len__(self):
+        return len(self.notes)
+
+    @classmethod
+    def from_score(cls, score, pitches=True):
+        """
+        Create the note table of a score
+
+        Parameters
+        ----------
+        score: Score
+        pitches: bool (Default value = True)
+            If False the pitch column is not computed (filled with -1), which is much faster
+
+        Returns
+        -------
+        table: NoteTable
+        """
+        instruments = {}
+        types = {}
+        modes = {}
+        accidents = {}
+        tag_sets = {frozenset(): 0}
+        chords = []
+        parts = []
+        melodies = {}
+        rows = []
+        numerators = []
+        denominators = []
+        last_pitches = {}
+
+        for chord_idx, chord in enumerate(score.chords):
+            chords.append(_chord_with_score(chord, {}))
+            chord_parts = []
+            for part, melody in chord.score.items():
+                ins = instruments.setdefault(part, len(instruments))
+                chord_parts.append(ins)
+                if melody.nb_bars != 1 or len(melody.tags) > 0:
+                    melodies[(chord_idx, ins)] = (melody.nb_bars, set(melody.tags))
+                last_pitch = last_pitches.get(ins, None)
+                for idx, note in enumerate(melody.notes):
+                    pitch = -1
+                    if pitches and note.type == 'd':
+                        pitch = note.val + 12 * note.octave
+                    elif pitches and note.type not in NOT_PITCHED_TYPES:
+                        pitch = chord.to_pitch(note, last_pitch=last_pitch if last_pitch is not None else 0)
+                        last_pitch = pitch
+                    duration = frac(note.duration)
+                    numerators.append(duration.numerator)
+                    denominators.append(duration.denominator)
+                    rows.append((chord_idx, ins, idx, 0, 0,
+                                 types.setdefault(note.type, len(types)),
+                                 note.val, note.octave, note.amp, pitch,
+                                 modes.setdefault(note.mode, len(modes)) if note.mode is not None else -1,
+                                 accidents.setdefault(note.accident, len(accidents)) if note.accident is not None else -1,
+                                 tag_sets.setdefault(frozenset(note.tags), len(tag_sets)) if note.tags else 0,
+                                 -1 if note.pedal is None else int(note.pedal),
+                                 np.nan if note.tempo is None else note.tempo
+                                 ))
+                last_pitches[ins] = last_pitch
+            parts.append(chord_parts)
+
+        notes = np.array(rows, dtype=NOTE_TABLE_DTYPE)
+        numerators = np.asarray(numerators, dtype=np.int64)
+        denominators = np.asarray(denominators, dtype=np.int64)
+        resolution = math.lcm(*[int(d) for d in np.unique(denominators)]) if len(rows) > 0 else 1
+        notes['duration'] = numerators * (resolution // denominators)
+
+        return cls(notes, chords, parts, list(instruments.keys()), list(types.keys()),
+                   modes=list(modes.keys()), accidents=list(accidents.keys()),
+                   tag_sets=[set(tags) for tags in tag_sets.keys()], melodies=melodies,
+                   resolution=resolution, config=dict(score.config), tags=set(score.tags))
+
+    def to_score(self):
+        """
+        Convert back the table to a :class:`~musiclang.Score`
+
+        Returns
+        -------
+        score: Score
+        """
+        from ..score import Score
+        from ..melody import Melody
+        from ..note import Note, Silence, Continuation
+
+        notes = self.notes
+        durations = {int(d): frac(int(d), self.resolution) for d in np.unique(notes['duration'])}
+        tags = self.tag_sets
+        melodies = {(chord_idx, ins): [] for chord_idx, chord_parts in enumerate(self.parts) for ins in chord_parts}
+        for chord_idx, ins, type, val, octave, duration, amp, mode, accident, tag, pedal, tempo in zip(
+                notes['chord'].tolist(), notes['instrument'].tolist(), notes['type'].tolist(), notes['val'].tolist(),
+                notes['octave'].tolist(), notes['duration'].tolist(), notes['amp'].tolist(), notes['mode'].tolist(),
+                notes['accident'].tolist(), notes['tags'].tolist(), notes['pedal'].tolist(), notes['tempo'].tolist()):
+            type = self.types[type]
+            if type == 'r':
+                note = Silence(durations[duration])
+            elif type == 'l':
+                note = Continuation(durations[duration])
+            else:
+                note = Note(type, val, octave, durations[duration])
+            note.val = val
+            note.octave = octave
+            note.amp = _to_number(amp)
+            note.mode = self.modes[mode] if mode >= 0 else None
+            note.accident = self.accidents[accident] if accident >= 0 else None
+            note.tags = set(tags[tag]) if tag > 0 else note.tags
+            note.pedal = bool(pedal) if pedal >= 0 else None
+            note.tempo = _to_number(tempo) if not math.isnan(tempo) else None
+            melodies[(chord_idx, ins)].append(note)
+
+        chords = []
+        for chord_idx, (chord, chord_parts) in enumerate(zip(self.chords, self.parts)):
+            score = {}
+            for ins in chord_parts:
+                nb_bars, melody_tags = self.melodies.get((chord_idx, ins), (1, None))
+                score[self.instruments[ins]] = Melody(melodies[(chord_idx, ins)], nb_bars=nb_bars, tags=melody_tags)
+            chords.append(_chord_with_score(chord, score))
+
+        config = dict(self.config) if self.config is not None else None
+        return Score(chords, config=config, tags=set(self.tags))
+
+    def _compute_onsets(self):
+        """
+        Compute the onset of each note and the onset and duration of each chord (in ticks),
+        notes must be sorted by chord, part and index
+        """
+        notes = self.notes
+        nb_chords = len(self.chords)
+        chord_durations = np.zeros(nb_chords, dtype=np.int64)
+        if len(notes) > 0:
+            durations = notes['duration']
+            ends = np.cumsum(durations)
+            new_group = np.ones(len(notes), dtype=bool)
+            new_group[1:] = (notes['chord'][1:] != notes['chord'][:-1]) | \
+                            (notes['instrument'][1:] != notes['instrument'][:-1])
+            group_ids = np.cumsum(new_group) - 1
+            group_starts = (ends - durations)[new_group]
+            offsets = ends - durations - group_starts[group_ids]
+            melody_durations = np.add.reduceat(durations, np.flatnonzero(new_group))
+            np.maximum.at(chord_durations, notes['chord'][new_group], melody_durations)
+        chord_onsets = np.zeros(nb_chords, dtype=np.int64)
+        chord_onsets[1:] = np.cumsum(chord_durations)[:-1]
+        if len(notes) > 0:
+            notes['onset'] = chord_onsets[notes['chord']] + offsets
+        return chord_onsets, chord_durations
+
+    def _derive(self, notes, parts=None, chords=None, melodies=None):
+        """
+        Create a new table with other notes (and optionally other chords) and the same lookup tables
+        """
+        return NoteTable(notes, self.chords if chords is None else chords,
+                         self.parts if parts is None else parts, self.instruments, self.types,
+                         modes=self.modes, accidents=self.accidents, tag_sets=self.tag_sets,
+                         melodies=self.melodies if melodies is None else melodies,
+                         resolution=self.resolution, config=self.config, tags=self.tags)
+
+    def to_ticks(self, time):
+        """
+        Convert a time in quarters to the ticks of this table, increasing the resolution of the table if needed
+
+        Parameters
+        ----------
+        time: int or fractions.Fraction
+
+        Returns
+        -------
+        ticks: int
+        """
+        time = frac(time)
+        if self.resolution % time.denominator != 0:
+            self.set_resolution(math.lcm(self.resolution, time.denominator))
+        return time.numerator * (self.resolution // time.denominator)
+
+    def set_resolution(self, resolution):
+        """
+        Change inplace the number of ticks per quarter, must be a multiple of the current resolution
+        """
+        if resolution % self.resolution != 0:
+            raise ValueError(f'New resolution {resolution} must be a multiple of {self.resolution}')
+        factor = resolution // self.resolution
+        self.notes['onset'] *= factor
+        self.notes['duration'] *= factor
+        self.chord_onsets *= factor
+        self.chord_durations *= factor
+        self.resolution = resolution
+
+    @property
+    def part_names(self):
+        """
+        Part names of the table, in order of first appearance
+        """
+        codes = dict.fromkeys(ins for chord_parts in self.parts for ins in chord_parts)
+        return [self.instruments[ins] for ins in codes]
+
+    @property
+    def duration(self):
+        """
+        Duration of the table in quarters
+        """
+        return frac(int(self.chord_durations.sum()), self.resolution)
+
+    def type_mask(self, *types):
+        """
+        Mask of the notes whose type is one of types
+        """
+        categories = np.array([t in types for t in self.types] + [False], dtype=bool)
+        return categories[self.notes['type']]
+
+    @property
+    def sounding_mask(self):
+        """
+        Mask of the notes with a pitch (notes and drum notes)
+        """
+        categories = np.array([t not in NOT_PITCHED_TYPES or t == 'd' for t in self.types] + [False], dtype=bool)
+        return categories[self.notes['type']]
+
+    @property
+    def pitched_mask(self):
+        """
+        Mask of the notes that are not drums, silences, continuations or patterns
+        """
+        categories = np.array([t not in NOT_PITCHED_TYPES for t in self.types] + [False], dtype=bool)
+        return categories[self.notes['type']]
+
+    def get_parts(self, parts):
+        """
+        Keep only the given parts in every chord, in the given order.
+        When a part is missing in a chord, it is replaced by a silence lasting for the chord duration.
+
+        Parameters
+        ----------
+        parts: list[str]
+            Part names (eg: ['piano__0', 'violin__0'])
+
+        Returns
+        -------
+        table: NoteTable
+        """
+        parts = list(dict.fromkeys(parts))
+        instruments = list(self.instruments)
+        codes = {ins: idx for idx, ins in enumerate(instruments)}
+        for part in parts:
+            if part not in codes:
+                codes[part] = len(instruments)
+                instruments.append(part)
+        selected = np.array([codes[part] for part in parts], dtype=np.int32)
+
+        notes = self.notes[np.isin(self.notes['instrument'], selected)]
+        chord_parts = [set(p) for p in self.parts]
+        missing = [(chord_idx, ins) for chord_idx in range(len(self.chords)) for ins in selected.tolist()
+                   if ins not in chord_parts[chord_idx]]
+        types = list(self.types)
+        if len(missing) > 0:
+            if 'r' not in types:
+                types.append('r')
+            silences = np.zeros(len(missing), dtype=NOTE_TABLE_DTYPE)
+            missing_chords = np.array([m[0] for m in missing], dtype=np.int32)
+            silences['chord'] = missing_chords
+            silences['instrument'] = [m[1] for m in missing]
+            silences['duration'] = self.chord_durations[missing_chords]
+            silences['type'] = types.index('r')
+            silences['amp'] = 66
+            silences['pitch'] = -1
+            silences['mode'] = -1
+            silences['accident'] = -1
+            silences['pedal'] = -1
+            silences['tempo'] = np.nan
+            notes = np.concatenate([notes, silences])
+
+        order = np.argsort(selected)
+        position = order[np.searchsorted(selected, notes['instrument'], sorter=order)]
+        notes = notes[np.lexsort((notes['index'], position, notes['chord']))]
+        melodies = {key: val for key, val in self.melodies.items() if key[1] in set(selected.tolist())}
+        table = self._derive(notes, parts=[selected.tolist() for _ in self.chords], melodies=melodies)
+        table.instruments = instruments
+        table.types = types
+        return table
+
+    def get_between(self, start=None, end=None):
+        """
+        Get the notes between start and end time, with the same semantic than :func:`~Score.get_score_between`.
+        Notes starting before start are replaced by continuations, notes ending after end are shortened.
+
+        Parameters
+        ----------
+        start: int or fractions.Fraction or None
+            Start time in quarters (Default value = None, start of the table)
+        end: int or fractions.Fraction or None
+            End time in quarters (Default value = None, end of the table)
+
+        Returns
+        -------
+        table: NoteTable
+        """
+        # Increase the resolution once for both bounds, the ticks of start would be stale after converting end
+        bounds = [frac(time) for time in (start, end) if time is not None]
+        self.set_resolution(math.lcm(self.resolution, *[bound.denominator for bound in bounds]))
+        start = self.to_ticks(start) if start is not None else 0
+        end = self.to_ticks(end) if end is not None else int(self.chord_durations.sum())
+        chord_ends = self.chord_onsets + self.chord_durations
+        kept_chords = np.flatnonzero((chord_ends > start) & (self.chord_onsets < end))
+        cut_chords = (self.chord_onsets < start) | (chord_ends >= end)
+
+        notes = self.notes[np.isin(self.notes['chord'], kept_chords)]
+        onsets = notes['onset']
+        note_ends = onsets + notes['duration']
+        is_cut = cut_chords[notes['chord']]
+        notes = notes[~is_cut | ((onsets < end) & ~((onsets < start) & (note_ends <= start)))]
+        is_cut = cut_chords[notes['chord']]
+        onsets = notes['onset']
+        truncated = is_cut & (notes['onset'] + notes['duration'] >= end)
+        notes['duration'][truncated] = end - onsets[truncated]
+
+        continuations = is_cut & (onsets < start)
+        if np.any(continuations):
+            types = list(self.types)
+            if 'l' not in types:
+                types.append('l')
+            continuation = notes[continuations]
+            continuation['duration'] -= start - continuation['onset']
+            continuation['type'] = types.index('l')
+            continuation['val'] = 0
+            continuation['octave'] = 0
+            continuation['amp'] = 66
+            continuation['pitch'] = -1
+            continuation['mode'] = -1
+            continuation['accident'] = -1
+            continuation['tags'] = 0
+            continuation['pedal'] = -1
+            continuation['tempo'] = np.nan
+            notes[continuations] = continuation
+        else:
+            types = self.types
+
+        if np.any(notes['duration'] < 0):
+            raise Exception('Get a negative duration in get_between')
+
+        # Reindex the chords
+        new_chord_index = np.full(len(self.chords), -1, dtype=np.int32)
+        new_chord_index[kept_chords] = np.arange(len(kept_chords), dtype=np.int32)
+        notes['chord'] = new_chord_index[notes['chord']]
+        kept = kept_chords.tolist()
+        melodies = {(int(new_chord_index[key[0]]), key[1]): val for key, val in self.melodies.items()
+                    if new_chord_index[key[0]] >= 0 and not cut_chords[key[0]]}
+        table = self._derive(notes, parts=[self.parts[idx] for idx in kept],
+                             chords=[self.chords[idx] for idx in kept], melodies=melodies)
+        table.types = types
+        return table
+
+    def _count_by_instrument(self, mask, weights=None):
+        instruments = self.notes['instrument'][mask]
+        weights = weights[mask] if weights is not None else None
+        return np.bincount(instruments, weights=weights, minlength=len(self.instruments))
+
+    def densities(self):
+        """
+        Number of notes per quarter for each part, see :func:`~Score.extract_densities`
+        """
+        counts = self._count_by_instrument(self.sounding_mask)
+        duration = self.duration
+        return {name: int(counts[self.instruments.index(name)]) / duration for name in self.part_names}
+
+    def mean_octaves(self):
+        """
+        Mean octave of the notes of each part, see :func:`~Score.extract_mean_octaves`
+        """
+        mask = self.sounding_mask
+        counts = self._count_by_instrument(mask)
+        octaves = self._count_by_instrument(mask, weights=self.notes['octave'].astype(np.float64))
+        result = {}
+        for name in self.part_names:
+            ins = self.instruments.index(name)
+            result[name] = round(int(octaves[ins]) / int(counts[ins]) if counts[ins] > 0 else 0)
+        return result
+
+    def mean_amplitudes(self):
+        """
+        Mean amplitude of the notes of each part, see :func:`~Score.extract_mean_amplitudes`
+        """
+        mask = self.sounding_mask
+        counts = self._count_by_instrument(mask)
+        amps = self._count_by_instrument(mask, weights=self.notes['amp'])
+        result = {}
+        for name in self.part_names:
+            ins = self.instruments.index(name)
+            result[name] = int(amps[ins] / counts[ins]) if counts[ins] > 0 else 0
+        return result
+
+    def pitch_statistics(self):
+        """
+        (min_pitch, max_pitch, mean_pitch, std_pitch) for each part that is not a drum part,
+        see :func:`~Score.get_pitch_statistics`
+        """
+        mask = self.pitched_mask
+        instruments = self.notes['instrument'][mask]
+        pitches = self.notes['pitch'][mask]
+        statistics = {}
+        for name in self.part_names:
+            if name.startswith('drums'):
+                continue
+            part_pitches = pitches[instruments == self.instruments.index(name)]
+            statistics[name] = (int(part_pitches.min()), int(part_pitches.max()),
+                                float(np.mean(part_pitches)), float(np.std(part_pitches)))
+        return statistics
@@ -0,0 +1,328 @@
+"""
+Copyright (c) 2023, Florian GARDIN
+All rights reserved.
+
+This source code is licensed under the BSD-style license found in the
+LICENSE file in the root directory of this source tree.
+"""
+import functools
+import operator
+import re
+from ast import literal_eval
+from fractions import Fraction as frac
+
+from . import library
+from .chord import Chord
+from .constants import STR_TO_DURATION
+from .element import Element
+from .melody import Melody
+from .note import Note
+
+#: Attributes and methods that can be chained after a name of the library (eg : ``s0.h.o(1).f``)
+ALLOWED_ATTRIBUTES = set(STR_TO_DURATION) | {
+    'M', 'm', 'mm', 'dorian', 'phrygian', 'lydian', 'mixolydian', 'aeolian', 'locrian',
+    'dim', 'min', 'natural', 'maj', 'aug',
+    'n', 'ppp', 'pp', 'p', 'mp', 'mf', 'f', 'ff', 'fff',
+    'b', 's', 'd', 'u',
+}
+ALLOWED_METHODS = {'o', 'oabs', 'augment', 'set_duration', 'add_tag', 'add_tags'}
+
+_CALL = r"""\((?:[^()'"]|'[^']*'|"[^"]*"|\([^()]*\))*\)"""
+_CHAIN = rf"(?:\.[A-Za-z_]\w*(?:{_CALL})?)"
+_NAME = rf"[A-Za-z_]\w*{_CHAIN}*"
+_NAME_REGEX = re.compile(_NAME)
+#: A whole melody like ``s0.h + s2.o(1)`` is a single name token, split with ``_NAME_REGEX``
+_TOKEN_REGEX = re.compile(rf"""\s*(?:
+    (?P<name>{_NAME}(?:\s*\+\s*{_NAME})*)
+  | (?P<chain>{_CHAIN}+)
+  | (?P<string>'[^']*'|"[^"]*")
+  | (?P<symbol>[()\[\]%+,=])
+)""", re.VERBOSE)
+_LINK_REGEX = re.compile(r"\.([A-Za-z_]\w*)(\(.*?\))?(?=\.[A-Za-z_]|$)", re.DOTALL)
+_FRAC_REGEX = re.compile(r"^frac\(\s*(-?\d+)\s*(?:,\s*(-?\d+)\s*)?\)$")
+#: Two consecutive chords in the text of a score, same split as the former ``Score.from_str``
+_CHORD_SEPARATOR = re.compile(r'(?<=\))\s*\+\s*(?=\()')
+
+
+@functools.lru_cache(maxsize=1)
+def _namespace():
+    """
+    Notes, elements and chords of the library that can start an expression
+    """
+    return {name: value for name, value in vars(library).items()
+            if not name.startswith('_') and isinstance(value, (Note, Element, Chord))}
+
+
+def _tokenize(text):
+    """
+    Split the text in ``(kind, value, position)`` tokens, kind is one of name, chain, string or symbol
+    """
+    tokens = []
+    position, end = 0, len(text.rstrip())
+    match = _TOKEN_REGEX.match
+    while position < end:
+        token = match(text, position)
+        if token is None:
+            raise ValueError(f'Cannot parse musiclang text at position {position} : {text[position:position + 30]!r}')
+        kind = token.lastgroup
+        tokens.append((kind, token.group(kind), token.start(kind)))
+        position = token.end()
+    return tokens
+
+
+def _parse_argument(text):
+    """
+    Parse a literal argument of a method : integer, ``frac(a, b)``, string or set of strings
+    """
+    text = text.strip()
+    fraction = _FRAC_REGEX.match(text)
+    if fraction is not None:
+        return frac(int(fraction.group(1)), int(fraction.group(2) or 1))
+    try:
+        return literal_eval(text)
+    except (ValueError, SyntaxError):
+        raise ValueError(f'Invalid argument in musiclang text : {text!r}')
+
+
+def _apply_chain(obj, chain):
+    """
+    Apply a chain of allowed attributes and method calls (eg : ``.h.o(1).f``) to an object
+    """
+    position = 0
+    for link in _LINK_REGEX.finditer(chain):
+        if link.start() != position:
+            break
+        attribute, arguments = link.groups()
+        if arguments is None:
+            if attribute not in ALLOWED_ATTRIBUTES:
+                raise ValueError(f'Unknown attribute in musiclang text : {attribute!r}')
+            obj = getattr(obj, attribute)
+        else:
+            if attribute not in ALLOWED_METHODS:
+                raise ValueError(f'Unknown method in musiclang text : {attribute!r}')
+            obj = getattr(obj, attribute)(_parse_argument(arguments[1:-1]))
+        position = link.end()
+    if position != len(chain):
+        raise ValueError(f'Cannot parse musiclang expression : {chain!r}')
+    return obj
+
+
+@functools.lru_cache(maxsize=65536)
+def _evaluate_name(text):
+    """
+    Evaluate a library name followed by a chain of attributes, the result is cached so that each distinct note
+    token of a text is only evaluated once : use a copy of the result
+    """
+    name, _, chain = text.partition('.')
+    namespace = _namespace()
+    if name not in namespace:
+        raise ValueError(f'Unknown name in musiclang text : {name!r}')
+    return _apply_chain(namespace[name], '.' + chain if chain else '')
+
+
+@functools.lru_cache(maxsize=4096)
+def _evaluate_header(element, extension, tonality, chain):
+    """
+    Evaluate the chord of a header like ``(V['7'] % I.M).o(1)``, cached like :func:`_evaluate_name`
+    """
+    chord = _evaluate_name(element)
+    if isinstance(chord, Element):
+        chord = Chord(element=chord.val)
+    if not isinstance(chord, Chord):
+        return None
+    if extension is not None:
+        chord = chord[extension]
+    if tonality is not None:
+        chord = chord % _evaluate_name(tonality)
+    if chain is not None:
+        chord = _apply_chain(chord, chain)
+    return chord
+
+
+class _Parser:
+    """
+    Recursive descent parser of the musiclang text syntax produced by ``str(score)`` :
+
+    - expression : item (``+`` item)*
+    - item : chord | note
+    - chord : ``(`` header ``)`` [chain] [``(`` [argument (``,`` argument)*] ``)``]
+    - header : name [``[`` string ``]``] [``%`` name]
+    - argument : [name ``=``] (melody | ``[`` melody (``,`` melody)* ``]``)
+    - melody : note (``+`` note)*, a single token
+    """
+
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.index = 0
+
+    def error(self, expected):
+        if self.index < len(self.tokens):
+            kind, value, position = self.tokens[self.index]
+            raise ValueError(f'Expected {expected} at position {position} of musiclang text, got {value!r}')
+        raise ValueError(f'Expected {expected} at the end of musiclang text')
+
+    def peek(self):
+        return self.tokens[self.index][1] if self.index < len(self.tokens) else None
+
+    def expect(self, kind, value=None):
+        if self.index >= len(self.tokens):
+            self.error(value or kind)
+        token_kind, token_value, _ = self.tokens[self.index]
+        if token_kind != kind or (value is not None and token_value != value):
+            self.error(value or kind)
+        self.index += 1
+        return token_value
+
+    def parse(self):
+        items = self.item()
+        while self.peek() == '+':
+            self.index += 1
+            items += self.item()
+        if self.index != len(self.tokens):
+            self.error("'+'")
+        return items
+
+    def item(self):
+        if self.peek() == '(':
+            return [self.chord()]
+        return self.notes()
+
+    def notes(self):
+        return [_evaluate_name(name).copy() for name in _NAME_REGEX.findall(self.expect('name'))]
+
+    def melody(self):
+        notes = self.notes()
+        if len(notes) == 1:
+            return notes[0].to_melody() if isinstance(notes[0], Note) else notes[0]
+        return functools.reduce(operator.add, notes) if not all(isinstance(n, Note) for n in notes) \
+            else Melody(notes)
+
+    def header(self):
+        start = self.index
+        self.expect('symbol', '(')
+        element = self.expect('name')
+        extension = tonality = chain = None
+        if self.peek() == '[':
+            self.index += 1
+            extension = literal_eval(self.expect('string'))
+            self.expect('symbol', ']')
+        if self.peek() == '%':
+            self.index += 1
+            tonality = self.expect('name')
+        self.expect('symbol', ')')
+        if self.index < len(self.tokens) and self.tokens[self.index][0] == 'chain':
+            chain = self.expect('chain')
+        chord = _evaluate_header(element, extension, tonality, chain)
+        if chord is None:
+            self.index = start
+            self.error('chord')
+        return chord
+
+    def chord(self):
+        chord = self.header().copy()
+        if self.peek() != '(':
+            return chord
+        self.index += 1
+        score, named, positional = {}, {}, 0
+        while self.peek() != ')':
+            if score or named or positional:
+                self.expect('symbol', ',')
+            kind, value, _ = self.tokens[self.index]
+            if kind == 'name' and self.index + 1 < len(self.tokens) and self.tokens[self.index + 1][1] == '=':
+                self.index += 2
+                part = value
+            else:
+                part = f'piano__{positional}'
+                positional += 1
+            if self.peek() == '[':
+                self.index += 1
+                melodies = [self.melody()]
+                while self.peek() == ',':
+                    self.index += 1
+                    melodies.append(self.melody())
+                self.expect('symbol', ']')
+                named[part] = melodies
+                continue
+            melody = self.melody()
+            instrument, _, number = part.partition('__')
+            if number and not instrument.startswith('drums'):
+                score[f'{instrument}__{int(number)}'] = melody
+            else:
+                named[part] = melody
+        self.expect('symbol', ')')
+        if named:
+            score.update(chord.preparse_named_melodies(named))
+        chord.score = score
+        return chord
+
+
+def _combine(items):
+    from .score import Score
+    if all(isinstance(item, Chord) for item in items):
+        return items[0] if len(items) == 1 else Score(items)
+    if len(items) > 1 and all(isinstance(item, Note) for item in items):
+        return Melody(items)
+    return functools.reduce(operator.add, items)
+
+
+def parse_text(text):
+    """
+    Parse a musiclang text (the ``str`` of a score, chord, melody or note) without evaluating python code.
+
+    Only the names of the library (notes, degrees), the tonality, duration, octave, amplitude and
+    accident attributes, and the ``o``, ``oabs``, ``augment``, ``set_duration`` and ``add_tags`` methods
+    with literal arguments are accepted. Each distinct note token is evaluated once and copied afterwards.
+
+    Parameters
+    ----------
+    text: str
+
+    Returns
+    -------
+    result: Score, Chord, Melody or Note
+            A chord if the text contains a single chord, as in :func:`Score.from_str`
+
+    Examples
+    --------
+    >>> from musiclang.write.text_parser import parse_text
+    >>> score = parse_text('(I % I.M)(piano__0=s0.h + s2.o(1).h) + (V % I.M)(piano__0=s4.w)')
+    >>> score.chords[0].score['piano__0']
+    s0.h + s2.h.o(1)
+    """
+    return _combine(_Parser(str(text)).parse())
+
+
+def iter_chords(source, chunk_size=1 << 20):
+    """
+    Parse the chords of a musiclang text file one at a time, reading the file by chunks
+
+    Parameters
+    ----------
+    source: str or file object
+            Path of the file or text file object
+    chunk_size: int
+            Number of characters read at once
+
+    Yields
+    ------
+    chord: Chord
+    """
+    if isinstance(source, str):
+        with open(source, 'r') as f:
+            yield from iter_chords(f, chunk_size=chunk_size)
+        return
+    buffer = ''
+    while True:
+        chunk = source.read(chunk_size)
+        buffer += chunk
+        pieces = _CHORD_SEPARATOR.split(buffer)
+        buffer = pieces.pop()
+        for piece in pieces:
+            yield _combine(_Parser(piece).parse())
+        if not chunk:
+            break
+    if buffer.strip():
+        chord = _combine(_Parser(buffer).parse())
+        if not isinstance(chord, Chord):
+            raise ValueError(f'Expected a chord at the end of musiclang text, got {type(chord).__name__}')
+        yield chord
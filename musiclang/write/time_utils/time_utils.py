@@ -5,7 +5,7 @@ All rights reserved.
 This source code is licensed under the BSD-style license found in the
 LICENSE file in the root directory of this source tree.
 """
-from musiclang import Melody
+from musiclang import Melody, ScoreBuilder
 
 
 def put_on_same_chord(score):
@@ -76,7 +76,7 @@ def project_on_score(score, score2, keep_score=False):
     """
 
     start_time = 0
-    new_score = None
+    new_score = ScoreBuilder()
     #
     instruments1 = [(ins.split('__')[0], int(ins.split('__')[1])) for ins in score.instruments]
 
@@ -101,7 +101,7 @@ def project_on_score(score, score2, keep_score=False):
 
         start_time = end_time
 
-    return new_score
+    return new_score.freeze()
 
 
 
@@ -217,7 +217,7 @@ def get_score_between(score, start=None, end=None):
     """
     start = start if start is not None else 0
     end = end if end is not None else score.duration
-    new_score = None
+    new_score = ScoreBuilder()
     time = 0
     for chord in score.chords:
         chord_start = time
@@ -240,4 +240,4 @@ def get_score_between(score, start=None, end=None):
 
         time += chord.duration
 
-    return new_score
+    return new_score.freeze() if len(new_score) > 0 else None
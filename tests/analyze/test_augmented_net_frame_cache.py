@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+
+from musiclang.analyze.augmented_net import frame_cache, inference, score_parser
+from .test_augmented_net_inference import FakeModel, make_score, read_annotation
+
+
+def test_frame_cache_skips_parsing(tmp_path, monkeypatch):
+    path = str(tmp_path / 'score.musicxml')
+    make_score(path, 0)
+    expected_frames = {offset: score_parser.parseScore(path, fixedOffset=offset) for offset in [0.125, 0.25]}
+    expected_events = score_parser.parseScore(path, eventBased=True)
+    model = FakeModel()
+    inference.predict(model, path)
+    expected = read_annotation(path)
+
+    monkeypatch.setattr(frame_cache, 'FRAME_CACHE', None)
+    frame_cache.set_frame_cache(str(tmp_path / 'cache'))
+    for offset, frames in expected_frames.items():
+        pd.testing.assert_frame_equal(score_parser.parseScore(path, fixedOffset=offset), frames)
+    pd.testing.assert_frame_equal(score_parser.parseScore(path, eventBased=True), expected_events)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('The score should not be parsed again')
+
+    monkeypatch.setattr(score_parser, 'parseScoreSummary', fail)
+    monkeypatch.setattr(frame_cache, 'parseScoreSummary', fail)
+    for offset, frames in expected_frames.items():
+        pd.testing.assert_frame_equal(score_parser.parseScore(path, fixedOffset=offset), frames)
+    os.remove(path.rsplit('.', 1)[0] + '_annotated.rntxt')
+    inference.predict(model, path)
+    assert read_annotation(path) == expected
+
+
+def test_frame_cache_eviction(tmp_path):
+    cache = frame_cache.FrameCache(str(tmp_path / 'cache'), maxEntries=2)
+    paths = [str(tmp_path / f'score{idx}.musicxml') for idx in range(3)]
+    for idx, path in enumerate(paths):
+        make_score(path, idx)
+        cache.score(path)
+    keys = [cache.key(path) for path in paths]
+    assert sorted(os.listdir(cache.directory)) == sorted(f'{key}.score.npz' for key in keys[1:])
+
+    cache.maxBytes = 0
+    cache.evict()
+    assert os.listdir(cache.directory) == []
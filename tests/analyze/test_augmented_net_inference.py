@@ -0,0 +1,112 @@
+import os
+
+import music21
+import numpy as np
+
+from musiclang.analyze.augmented_net import inference, score_parser
+from musiclang.analyze.augmented_net.chord_vocabulary import closestPcSet, closestPcSets, cosineSimilarity, frompcset
+from musiclang.analyze.augmented_net.output_representations import available_representations
+
+
+class Layer:
+
+    def __init__(self, name, shape=None):
+        self.name = name
+        self.shape = shape
+
+
+class FakeModel:
+    """Model with the AugmentedNet inputs and outputs, predicting a function of each frame"""
+    output_names = ['Alto35', 'Bass35', 'HarmonicRhythm7', 'LocalKey38', 'PitchClassSet121', 'RomanNumeral31',
+                    'Soprano35', 'Tenor35', 'TonicizedKey38']
+
+    def __init__(self):
+        self.inputs = [Layer('X_Bass19', (None, 64, 19)), Layer('X_Chromagram19', (None, 64, 19)),
+                       Layer('X_MeasureNoteOnset14', (None, 64, 14))]
+        self.outputs = [Layer(f'{name}/Softmax:0') for name in self.output_names]
+        self.batches = []
+
+    def predict(self, inputs, batch_size=None, verbose=None):
+        self.batches.append(inputs[0].shape[0])
+        features = np.concatenate(inputs, axis=2).sum(axis=2).astype(int)
+        return [np.eye(available_representations[name].classesNumber())[
+                    (features * 7 + 3) % available_representations[name].classesNumber()]
+                for name in self.output_names]
+
+
+def make_score(path, seed):
+    rng = np.random.default_rng(seed)
+    score = music21.stream.Score()
+    part = music21.stream.Part()
+    for _ in range(int(rng.integers(40, 80))):
+        part.append(music21.note.Note(int(rng.integers(55, 75)), quarterLength=float(rng.choice([0.5, 1, 2]))))
+    score.append(part)
+    score.write('musicxml', path)
+
+
+def read_annotation(path):
+    with open(path.rsplit('.', 1)[0] + '_annotated.rntxt', 'r') as f:
+        return f.read()
+
+
+def test_infer_chords_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(inference, 'MODEL', FakeModel())
+    paths = [str(tmp_path / f'score{idx}.musicxml') for idx in range(3)]
+    for idx, path in enumerate(paths):
+        make_score(path, idx)
+    bad_path = str(tmp_path / 'bad.musicxml')
+    with open(bad_path, 'w') as f:
+        f.write('not a score')
+
+    expected = []
+    for path in paths:
+        inference.predict(inference.MODEL, path)
+        expected.append(read_annotation(path))
+        os.remove(path.rsplit('.', 1)[0] + '_annotated.rntxt')
+
+    inference.MODEL.batches = []
+    summary = inference.infer_chords_batch(paths + [bad_path], filesPerBatch=2, verbose=False)
+    # One predict call per group of files, with the sequences of all the files of the group
+    assert len(inference.MODEL.batches) == 2
+    assert [read_annotation(path) for path in paths] == expected
+    assert summary['files'] == 3
+    assert list(summary['errors'].keys()) == [bad_path]
+    assert summary['frames'] > 0 and summary['frames_per_second'] > 0
+
+
+def test_predict_parses_score_once(tmp_path, monkeypatch):
+    path = str(tmp_path / 'score.musicxml')
+    make_score(path, 0)
+    inference.predict(FakeModel(), path)
+    expected = read_annotation(path)
+
+    calls = []
+    for name in ['m21Parse', '_initialDataFrame']:
+        def counted(*args, _function=getattr(score_parser, name), _name=name, **kwargs):
+            calls.append(_name)
+            return _function(*args, **kwargs)
+        monkeypatch.setattr(score_parser, name, counted)
+    os.remove(path.rsplit('.', 1)[0] + '_annotated.rntxt')
+    inference.predict(FakeModel(), path)
+    assert calls == ['m21Parse', '_initialDataFrame']
+    assert read_annotation(path) == expected
+
+
+def test_closest_pcsets_matches_cosine_similarity():
+    rng = np.random.default_rng(0)
+    vectors = rng.integers(0, 3, (200, 12)).astype(float)
+    expected = []
+    for vector in vectors:
+        similarities = [cosineSimilarity(vector, np.isin(np.arange(12), pcset)) for pcset in frompcset]
+        expected.append(list(frompcset)[int(np.argmax(similarities))])
+    assert closestPcSets(vectors) == expected
+    assert closestPcSet((0, 4, 7)) == (0, 4, 7)
+
+
+def test_resolve_roman_numerals_batch():
+    analyses = [('C', 'E', 'G', 'C', (0, 4, 7), 'C', 'I', 'C'),
+                ('B', 'D', 'F', 'G', (2, 5, 7, 11), 'C', 'V', 'C'),
+                ('F#', 'A', 'C', 'E-', (0, 3, 6, 9), 'C', 'viio', 'G')]
+    resolved = inference.resolveRomanNumeralsCosine(analyses)
+    assert resolved == [inference.resolveRomanNumeralCosine(*analysis) for analysis in analyses]
+    assert resolved[:2] == [('I', 'Cmaj'), ('V65', 'G7/B')]
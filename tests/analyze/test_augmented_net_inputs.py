@@ -0,0 +1,71 @@
+import re
+
+import numpy as np
+
+from musiclang.analyze.augmented_net import score_parser
+from musiclang.analyze.augmented_net.cache import TransposePitch, m21Pitch
+from musiclang.analyze.augmented_net.feature_representation import NOTENAMES, SPELLINGS
+from musiclang.analyze.augmented_net.input_representations import available_representations
+from .test_augmented_net_inference import make_score
+
+INTERVALS = ['P1', 'm3', 'A4', '-M2', 'd5']
+
+
+def frame_chromagram19(df, transposition):
+    array = np.zeros((len(df.index), 19), dtype='i8')
+    for frame, notes in enumerate(df.s_notes):
+        for note in notes:
+            pitch = m21Pitch(TransposePitch(note, transposition))
+            array[frame, NOTENAMES.index(pitch.step)] = 1
+            array[frame, 7 + pitch.pitchClass] = 1
+    return array
+
+
+def frame_bass35(df, transposition):
+    array = np.zeros((len(df.index), 35), dtype='i8')
+    for frame, notes in enumerate(df.s_notes):
+        transposed = TransposePitch(re.sub(r"\d", "", notes[0]), transposition)
+        if transposed in SPELLINGS:
+            array[frame, SPELLINGS.index(transposed)] = 1
+    return array
+
+
+def frame_measure_onset7(df):
+    patterns = available_representations['MeasureOnset7'].pattern
+    array = np.zeros((len(df.index), 7), dtype='i8')
+    idx = 0
+    for frame, measure in enumerate(df.s_measure):
+        if frame > 0 and measure != df.s_measure.iloc[frame - 1]:
+            idx = 0
+        array[frame] = patterns[idx]
+        idx = min(idx + 1, len(patterns) - 1)
+    return array
+
+
+def test_input_representations_match_frame_encoding(tmp_path):
+    path = str(tmp_path / 'score.musicxml')
+    make_score(path, 3)
+    df = score_parser.parseScore(path)
+
+    chromagram = available_representations['Chromagram19'](df)
+    assert np.array_equal(chromagram.array, frame_chromagram19(df, 'P1'))
+    augmented = list(chromagram.dataAugmentation(INTERVALS))
+    assert all(np.array_equal(array, frame_chromagram19(df, interval)) for array, interval in zip(augmented, INTERVALS))
+
+    bass = available_representations['Bass35'](df)
+    assert all(np.array_equal(array, frame_bass35(df, interval))
+               for array, interval in zip(bass.runTranspositions(INTERVALS), INTERVALS))
+
+    onsets = available_representations['MeasureNoteOnset14'](df)
+    assert np.array_equal(onsets.array[:, :7], frame_measure_onset7(df))
+    assert np.array_equal(onsets.runTranspositions(INTERVALS), np.stack([onsets.array] * len(INTERVALS)))
+
+
+def test_composite_representations_concatenate_their_parts(tmp_path):
+    path = str(tmp_path / 'score.musicxml')
+    make_score(path, 4)
+    df = score_parser.parseScore(path)
+    bass_chroma = available_representations['BassChromagramIntervals77'](df).runTranspositions(INTERVALS)
+    parts = [available_representations[name](df).runTranspositions(INTERVALS)
+             for name in ['Bass19', 'Chromagram19', 'Intervals39']]
+    assert np.array_equal(bass_chroma, np.concatenate(parts, axis=2))
@@ -0,0 +1,179 @@
+import os
+
+import numpy as np
+import pytest
+
+from musiclang.analyze.chord_inference import get_chroma_vectors, get_bass_note_bar
+
+
+def get_notes():
+    # start, pitch, duration, _, _, channel
+    return np.asarray([
+        [0.0, 60, 2.0, 0, 0, 0],
+        [0.0, 64, 6.0, 0, 0, 0],  # Spans two bars
+        [2.0, 67, 2.0, 0, 0, 0],
+        [4.0, 50, 1.0, 0, 0, 9],  # Drums are ignored
+        [5.0, 62, 3.0, 0, 0, 1],
+        [10.0, 40, 1.0, 0, 0, 0],
+    ])
+
+
+def test_get_chroma_vectors():
+    bars = [(0, 4), (4, 8), (8, 12), (12, 16)]
+    chroma = get_chroma_vectors(get_notes(), bars)
+    expected = np.zeros((4, 12))
+    expected[0, [0, 4, 7]] = [2, 4, 2]
+    expected[1, [4, 2]] = [2, 3]
+    expected[2, 4] = 1
+    expected = expected / np.maximum(expected.sum(axis=1)[:, None], 1)
+    assert np.allclose(chroma, expected)
+
+
+def test_get_chroma_vectors_overlapping_bars():
+    bars = [(0, 4), (2, 6)]
+    chroma = get_chroma_vectors(get_notes(), bars)
+    expected = np.zeros((2, 12))
+    expected[0, [0, 4, 7]] = [2, 4, 2]
+    expected[1, [4, 7, 2]] = [4, 2, 1]
+    assert np.allclose(chroma, expected / expected.sum(axis=1)[:, None])
+
+
+def dense_chroma_vectors(notes, bars):
+    # Previous implementation : product of the dense bars x notes matrix, object arrays for Fraction times
+    notes = notes[notes[:, 5] != 9]
+    times_array = np.asarray([notes[:, 0], notes[:, 0] + notes[:, 2]])
+    pitches_class_matrix = np.asarray(
+        [[1.0 * ((i % 12) == pitch_class) for i in range(12)] for pitch_class in notes[:, 1] % 12])
+    starts = np.asarray([bar[0] for bar in bars])
+    ends = np.asarray([bar[1] for bar in bars])
+    intersections = np.maximum(0, np.minimum(times_array[1, :, None], ends[None, :])
+                               - np.maximum(times_array[0, :, None], starts[None, :])).T
+    bar_chroma_vectors = intersections.dot(pitches_class_matrix)
+    normalizer = bar_chroma_vectors.sum(axis=1)[:, None]
+    normalizer[normalizer == 0] = 1
+    return np.asarray(bar_chroma_vectors / normalizer, dtype=float)
+
+
+def test_get_chroma_vectors_fractions():
+    from fractions import Fraction as frac
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        notes = np.zeros((40, 6), dtype=object)
+        notes[:, 0] = [frac(int(rng.integers(0, 96)), int(rng.choice([1, 3, 4, 6]))) for _ in range(40)]
+        notes[:, 2] = [frac(int(rng.integers(1, 24)), 3) if rng.random() < 0.5 else float(rng.integers(1, 8)) / 2
+                       for _ in range(40)]
+        notes[:, 1] = rng.integers(40, 80, 40)
+        bounds = np.cumsum(rng.choice([3.0, 4.0], 10)).tolist()
+        bars = list(zip([0.0] + bounds[:-1], bounds))
+        # The chords are chosen with exact comparisons, the values must be the same and not only close
+        assert np.array_equal(get_chroma_vectors(notes, bars), dense_chroma_vectors(notes, bars))
+
+
+@pytest.mark.parametrize('name, expected_chords', [('test03.mid', {}), ('test06.mid', {3: '(II % II.M)'}),
+                                                    ('test07.mid', {20: "(II['64'] % IV.M)"})])
+def test_fast_chord_inference_midi_files(name, expected_chords):
+    import music21
+    from musiclang.analyze import chord_inference
+    from musiclang.analyze.midi_parser import parse_midi
+    from musiclang.analyze.parser import tokenize_midi
+    path = os.path.join(os.path.dirname(music21.__file__), 'midi', 'testPrimitive', name)
+    notes, _, _, _, bars = parse_midi(tokenize_midi(path, quantization=8))
+    chords = [str(chord.to_chord()).replace('\n', '').replace('\t', '')
+              for chord in chord_inference.fast_chord_inference(notes, bars).chords]
+    for idx, chord in expected_chords.items():
+        assert chords[idx].startswith(chord)
+
+    get_chroma = chord_inference.get_chroma_vectors
+    try:
+        chord_inference.get_chroma_vectors = dense_chroma_vectors
+        expected = [str(chord.to_chord()).replace('\n', '').replace('\t', '')
+                    for chord in chord_inference.fast_chord_inference(notes, bars).chords]
+    finally:
+        chord_inference.get_chroma_vectors = get_chroma
+    assert chords == expected
+
+
+def test_get_bass_note_bar():
+    bars = [(0, 4), (4, 8), (8, 12), (12, 16)]
+    assert get_bass_note_bar(get_notes(), bars) == [0, 2, 4, None]
+    # Notes that cover a bar entirely without starting or ending inside are not bass candidates
+    assert get_bass_note_bar(get_notes(), [(1, 2), (2, 3)]) == [None, 7]
+    assert get_bass_note_bar(get_notes()[:0], bars) == [None] * 4
+
+
+def test_tonality_vectors():
+    from musiclang.analyze.chord_inference import get_pitch_tonality_vector
+    from musiclang.analyze.chord_inference_utils import TONALITY_KEYS, TONALITY_VECTORS
+    for (tonality_root, tonality_mode), vector in zip(TONALITY_KEYS, TONALITY_VECTORS):
+        assert vector.tolist() == get_pitch_tonality_vector(tonality_root, tonality_mode)
+
+
+def test_fast_chord_inference_candidates():
+    import pandas as pd
+    from musiclang.analyze import chord_inference
+    from musiclang.analyze.chord_inference_utils import PITCH_CLASSES_DICT, CHORD_TYPE_TO_PITCHES, CHORD_TYPES
+
+    bars = [(0, 4), (4, 8), (8, 12)]
+    notes = pd.DataFrame(np.asarray([
+        [0.0, 60, 4.0, 0, 0, 0], [0.0, 64, 2.0, 0, 0, 0], [2.0, 67, 2.0, 0, 0, 0], [1.0, 69, 1.0, 0, 0, 0],
+        [4.0, 55, 4.0, 0, 0, 0], [4.0, 59, 4.0, 0, 0, 0], [4.0, 62, 2.0, 0, 0, 0], [6.0, 65, 2.0, 0, 0, 0],
+        [8.0, 57, 4.0, 0, 0, 0], [8.0, 60, 4.0, 0, 0, 0], [8.0, 64, 4.0, 0, 0, 0],
+    ]))
+
+    # Candidates scored one by one against the tonality vectors
+    chroma = chord_inference.get_chroma_vectors(notes.values, bars)
+    bass_notes = chord_inference.get_bass_note_bar(notes.values, bars)
+    chord_rootss, chord_typess = chord_inference.max_correlation_index(
+        chroma, chord_inference.CHROMA_VECTORS_MATRIX, bass_notes)
+    expected = []
+    for chord_roots, chord_types, bar_chroma in zip(chord_rootss, chord_typess, chroma):
+        bar_candidates = []
+        for chord_type, chord_root in zip(chord_roots, chord_types):
+            pitches = tuple(sorted([(chord_root + pitch) % 12 for pitch in CHORD_TYPE_TO_PITCHES[CHORD_TYPES[chord_type]]]))
+            subcandidates = PITCH_CLASSES_DICT[pitches]
+            correlations = np.asarray([np.correlate(bar_chroma, chord_inference.get_pitch_tonality_vector(root, mode))
+                                       for (roman, root, mode, extension) in subcandidates])
+            bar_candidates += [subcandidates[i] for i in np.where(correlations == correlations.max())[0]]
+        expected.append(bar_candidates)
+
+    captured = []
+    optimal_chord_inference = chord_inference.optimal_chord_inference
+
+    def capture_candidates(candidates, **kwargs):
+        captured.append(candidates)
+        return optimal_chord_inference(candidates, **kwargs)
+
+    try:
+        chord_inference.optimal_chord_inference = capture_candidates
+        chord_inference.fast_chord_inference(notes, bars)
+    finally:
+        chord_inference.optimal_chord_inference = optimal_chord_inference
+    assert captured == [expected]
+    assert len(chord_inference.fast_chord_inference(notes, bars).chords) == 3
+
+
+def test_dynamic_programming_for_chord_inference():
+    from musiclang.analyze.chord_inference import dynamic_programming_for_chord_inference
+    # Keeping the key 2 avoids a key change, ties go to the first candidate
+    assert dynamic_programming_for_chord_inference([[0, 2], [2, 5], [7, 2]]) == [1, 0, 1]
+    assert dynamic_programming_for_chord_inference([[0, 2], [5, 7]]) == [0, 0]
+    assert dynamic_programming_for_chord_inference([[3]]) == [0]
+
+
+def test_dynamic_programming_key_distance_cost():
+    from musiclang.analyze.chord_inference import dynamic_programming_for_chord_inference, key_distance_cost
+    # C -> G -> D : the change count is the same, but C -> G is closer than C -> F# on the circle of fifths
+    assert dynamic_programming_for_chord_inference([[6, 0], [7], [2]]) == [0, 0, 0]
+    assert dynamic_programming_for_chord_inference([[6, 0], [7], [2]], transition_cost=key_distance_cost) == [1, 0, 0]
+    assert key_distance_cost(np.asarray([0, 0, 0]), np.asarray([7, 6, 5])).tolist() == [1 / 6, 1, 1 / 6]
+
+
+def test_batch_dynamic_programming_for_chord_inference():
+    from musiclang.analyze.chord_inference import (dynamic_programming_for_chord_inference,
+                                                   batch_dynamic_programming_for_chord_inference)
+    rng = np.random.default_rng(0)
+    batch = [[rng.integers(0, 12, rng.integers(1, 6)).tolist() for _ in range(rng.integers(0, 20))]
+             for _ in range(50)]
+    # Small blocks to mix files of different lengths and widths
+    result = batch_dynamic_programming_for_chord_inference(batch, max_block_size=200)
+    assert result == [dynamic_programming_for_chord_inference(sequence) if sequence else [] for sequence in batch]
@@ -0,0 +1,52 @@
+from fractions import Fraction as frac
+
+import numpy as np
+
+from musiclang.analyze.chroma import iter_chromagram, musiclang_to_chromagram
+from musiclang import Score
+from musiclang.library import *
+
+
+def make_score():
+    return (I % I.M)(piano__0=s0.h + r + s2, piano__1=s4.w.o(-1), drums_0__0=s0.w) \
+        + (V % I.M)(piano__0=s0.e + s1.e + l + s2.h, piano__1=r.h + s0.h)
+
+
+def test_musiclang_to_chromagram():
+    Cs, t, time_signature = musiclang_to_chromagram(make_score())
+    # Continuations and drums are not in the chromagram
+    assert t.tolist() == [0, 3, 4, 4.5, 6]
+    expected = [[0, 7], [4, 7], [7], [9], [7, 11]]
+    assert [np.flatnonzero(row).tolist() for row in Cs] == expected
+    assert time_signature == (4, 4)
+
+    Cs, t, _ = musiclang_to_chromagram(make_score(), quantization=1)
+    # Frames without sounding notes are dropped
+    assert t.tolist() == [0, 1, 2, 3, 4, 6, 7]
+    assert np.flatnonzero(Cs[2]).tolist() == [7]
+
+
+def test_iter_chromagram():
+    score = make_score() + make_score() + make_score()
+    for quantization in [None, frac(1, 4)]:
+        Cs, t, _ = musiclang_to_chromagram(score, quantization=quantization)
+        windows = list(iter_chromagram(score, frac(3, 2), quantization=quantization))
+        assert np.array_equal(np.concatenate([window[0] for window in windows]), Cs)
+        assert np.array_equal(np.concatenate([window[1] for window in windows]), t)
+
+    windows = list(iter_chromagram(score, 2, quantization=frac(1, 2), empty_frames=True))
+    assert len(windows) == 12
+    assert all(window[0].shape == (4, 12) for window in windows)
+
+
+def test_iter_chromagram_trailing_silence():
+    # Windows after the last note are not emitted, even when a later chord only has rests
+    score = Score([(I % I.M)(piano__0=s0.augment(2) + r.augment(2)), (I % I.M)(piano__0=r.augment(4))])
+    silence_between = (I % I.M)(piano__0=s0.augment(2) + r.augment(2)) + (I % I.M)(piano__0=r.augment(4)) \
+        + (I % I.M)(piano__0=s2.augment(2))
+    for score in [score, silence_between, score + silence_between]:
+        for quantization, empty_frames in [(frac(1, 2), True), (frac(1, 2), False), (None, True), (None, False)]:
+            Cs, t, _ = musiclang_to_chromagram(score, quantization=quantization, empty_frames=empty_frames)
+            windows = list(iter_chromagram(score, 1, quantization=quantization, empty_frames=empty_frames))
+            assert np.array_equal(np.concatenate([window[0] for window in windows]), Cs)
+            assert np.array_equal(np.concatenate([window[1] for window in windows]), t)
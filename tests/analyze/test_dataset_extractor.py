@@ -0,0 +1,89 @@
+import json
+import os
+import time
+
+from musiclang import Score
+from musiclang.analyze.dataset_extractor import DatasetExtractor, read_manifest
+
+
+class FakeExtractor(DatasetExtractor):
+    """Extractor reading fake midi files whose content tells what to do"""
+
+    def extract_musiclang(self, filename):
+        from musiclang.library import I, s0, s2, s4
+        with open(filename, 'r') as f:
+            content = f.read()
+        if content == 'sleep':
+            time.sleep(30)
+        if content == 'error':
+            raise ValueError('Invalid file')
+        return (I % I.M)(piano__0=s0 + s2 + s4 + s0.o(1)) * 3
+
+
+def write_files(directory, contents):
+    os.makedirs(directory, exist_ok=True)
+    for name, content in contents.items():
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(content)
+
+
+def test_extract_all_files_manifest(tmp_path):
+    write_files(tmp_path / 'midi', {'a.mid': 'ok', 'b.mid': 'error', 'c.mid': 'sleep', 'd.mid': 'ok'})
+    output = str(tmp_path / 'out')
+    extractor = FakeExtractor(str(tmp_path / 'midi' / '*.mid'), output, time_budget_per_file=1)
+    summary = extractor.extract_all_files(n_jobs=2)
+    assert (summary['success'], summary['error'], summary['timeout']) == (2, 1, 1)
+    assert summary['files_per_second'] > 0
+
+    records = read_manifest(os.path.join(output, 'manifest.jsonl'))
+    assert {name: record['status'] for name, record in records.items()} == \
+           {'a.mid': 'success', 'b.mid': 'error', 'c.mid': 'timeout', 'd.mid': 'success'}
+    assert records['a.mid']['notes'] == 12
+    assert records['a.mid']['bars'] == 3
+    assert records['b.mid']['error'] == 'ValueError: Invalid file'
+    assert os.path.exists(os.path.join(output, 'text', 'a.txt'))
+    assert os.path.exists(os.path.join(output, 'pickle', 'd.pkl'))
+
+
+def test_extract_resume_from_manifest(tmp_path):
+    write_files(tmp_path / 'midi', {'a.mid': 'ok', 'b.mid': 'error'})
+    output = str(tmp_path / 'out')
+    FakeExtractor(str(tmp_path / 'midi' / '*.mid'), output).extract_all_files()
+
+    # Interrupted write of a record
+    with open(os.path.join(output, 'manifest.jsonl'), 'a') as f:
+        f.write(json.dumps({'file': 'c.mid'})[:5])
+    write_files(tmp_path / 'midi', {'b.mid': 'ok', 'c.mid': 'ok'})
+    extractor = FakeExtractor(str(tmp_path / 'midi' / '*.mid'), output)
+    assert [os.path.basename(f) for f in extractor.files] == ['c.mid']
+
+    extractor = FakeExtractor(str(tmp_path / 'midi' / '*.mid'), output, retry_failed=True)
+    assert sorted(os.path.basename(f) for f in extractor.files) == ['b.mid', 'c.mid']
+    summary = extractor.extract_all_files(n_jobs=1, max_files_per_worker=1)
+    assert summary['success'] == 2
+    records = read_manifest(os.path.join(output, 'manifest.jsonl'))
+    assert all(record['status'] == 'success' for record in records.values())
+
+
+def test_extract_binary_alongside_text(tmp_path):
+    write_files(tmp_path / 'midi', {'a.mid': 'ok'})
+    output = str(tmp_path / 'out')
+    FakeExtractor(str(tmp_path / 'midi' / '*.mid'), output, write_binary=True).extract_all_files()
+    score = Score.from_file(os.path.join(output, 'text', 'a.txt'))
+    assert Score.from_binary(os.path.join(output, 'binary', 'a.mlb')) == score
+
+
+def test_extract_resume_without_manifest(tmp_path):
+    # Output directory of an extraction made before the manifest : text outputs and errors.txt
+    write_files(tmp_path / 'midi', {'a.mid': 'ok', 'b.mid': 'ok', 'c.mid': 'ok'})
+    write_files(tmp_path / 'out' / 'text', {'a.txt': 'previous output'})
+    write_files(tmp_path / 'out', {'errors.txt': 'b.mid\n'})
+    output = str(tmp_path / 'out')
+    extractor = FakeExtractor(str(tmp_path / 'midi' / '*.mid'), output)
+    assert [os.path.basename(f) for f in extractor.files] == ['c.mid']
+    extractor.extract_all_files()
+    with open(os.path.join(output, 'text', 'a.txt'), 'r') as f:
+        assert f.read() == 'previous output'
+
+    extractor = FakeExtractor(str(tmp_path / 'midi' / '*.mid'), output, retry_failed=True)
+    assert [os.path.basename(f) for f in extractor.files] == ['b.mid']
@@ -0,0 +1,40 @@
+from fractions import Fraction
+
+import numpy as np
+from music21 import note, stream
+
+from musiclang.analyze.load_score import quantize
+
+
+def music21_quantize(onsets, durations, quantization):
+    s = stream.Stream()
+    for onset, duration in zip(onsets, durations):
+        n = note.Note()
+        n.quarterLength = duration
+        s.repeatInsert(n, [onset])
+    s.quantize(quantization, processOffsets=True, processDurations=True, inPlace=True)
+    return [e.offset for e in s], [e.quarterLength for e in s]
+
+
+def test_quantize_matches_music21():
+    rng = np.random.default_rng(0)
+    for trial, quantization in enumerate([(4, 3), (4,), (2, 3, 5), (16, 12)] * 5):
+        ticks_per_beat = int(rng.choice([96, 100, 480, 7]))
+        nb_notes = int(rng.integers(1, 100))
+        onsets = np.sort(rng.integers(0, ticks_per_beat * 20, nb_notes)) / ticks_per_beat
+        durations = np.maximum(rng.integers(-ticks_per_beat // 4, ticks_per_beat * 2, nb_notes), 0) / ticks_per_beat
+        channels = rng.integers(0, 3, nb_notes)
+        quantized_onsets, quantized_durations = quantize(onsets, durations, groups=channels, quantization=quantization)
+        for channel in np.unique(channels):
+            idx = np.flatnonzero(channels == channel)
+            expected_onsets, expected_durations = music21_quantize(onsets[idx].tolist(), durations[idx].tolist(),
+                                                                   quantization)
+            assert quantized_onsets[idx].tolist() == expected_onsets
+            assert quantized_durations[idx].tolist() == expected_durations
+
+
+def test_quantize_grid_values():
+    onsets, durations = quantize([0.0, 0.32, 0.74, 1.0], [0.3, 0.0, 0.26, 0.49], quantization=(4, 3))
+    # Thirds of quarters are not binary expressible, they are Fractions as in music21
+    assert onsets.tolist() == [0.0, Fraction(1, 3), 0.75, 1.0]
+    assert durations.tolist() == [Fraction(1, 3), 0.25, 0.25, 0.5]
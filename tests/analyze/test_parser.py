@@ -0,0 +1,65 @@
+import io
+import os
+
+import pytest
+
+from miditoolkit import MidiFile
+
+from musiclang import Score
+from musiclang.analyze.load_score import load_score
+from musiclang.analyze.parser import tokenize_midi, tokenize_midi_file
+from musiclang.library import *
+
+
+def write_score(path):
+    score = (I % I.M)(piano=r + s0 + s2 + s4, violin=s4.o(1).h + s2.o(1).h) \
+            + (V % I.M)(piano=s0 + s0 + s2 + s4, violin=s0.o(1).w) \
+            + (I % I.M)(piano=s0.w, violin=s2.o(1).h + s0.o(1).h)
+    score.to_midi(path, time_signature=(4, 4), tempo=97)
+    return score
+
+
+def test_tokenize_midi_in_memory_matches_written_file(tmp_path):
+    path = str(tmp_path / 'score.mid')
+    written = str(tmp_path / 'tokenized.mid')
+    write_score(path)
+    for chord_range in [None, (1, 3)]:
+        tokenize_midi_file(path, written, chord_range=chord_range, quantization=8)
+        df, bars, instruments, config = load_score(written)
+        df_memory, bars_memory, instruments_memory, config_memory = load_score(
+            tokenize_midi(path, chord_range=chord_range, quantization=8))
+        columns = [column for column in df.columns if column != 'voice']
+        assert df_memory[columns].reset_index(drop=True).equals(df[columns].reset_index(drop=True))
+        assert (bars_memory, instruments_memory, config_memory) == (bars, instruments, config)
+
+
+def test_from_midi_in_memory(tmp_path):
+    path = str(tmp_path / 'score.mid')
+    write_score(path)
+    expected = Score.from_midi(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert Score.from_midi(data) == expected
+    assert Score.from_midi(MidiFile(file=io.BytesIO(data))) == expected
+    assert Score.from_midi(data).config == expected.config
+
+
+def music21_midi_files():
+    import music21
+    directory = os.path.dirname(music21.__file__)
+    return [os.path.join(directory, 'midi', 'testPrimitive', 'test04.mid'), os.path.join(directory, 'omr', 'k525short.mid')]
+
+
+@pytest.mark.parametrize('path', music21_midi_files())
+def test_tokenize_midi_overlapping_notes_match_written_file(tmp_path, path):
+    # Overlapping notes with the same pitch are paired when the file is read
+    written = str(tmp_path / 'tokenized.mid')
+    tokenize_midi_file(path, written, quantization=8)
+    expected = MidiFile(written)
+    midi = tokenize_midi(path, quantization=8)
+    assert [[(note.start, note.end, note.pitch, note.velocity) for note in instrument.notes]
+            for instrument in midi.instruments] == \
+           [[(note.start, note.end, note.pitch, note.velocity) for note in instrument.notes]
+            for instrument in expected.instruments]
+    if path.endswith('k525short.mid'):
+        assert Score.from_midi(path) == Score.from_midi(written, tokenize_before=False)
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+from musiclang.library import *
+from musiclang.analyze.corpus_index import CorpusIndex, INDEX_FILENAME
+from musiclang.analyze.pattern_sampler import PicklePatternSampler, TextPatternSampler, BinaryPatternSampler
+from musiclang.analyze.pattern_analyzer import PatternExtractor
+
+
+def corpus_scores():
+    first = (I % I.M)(piano__0=s0.w, piano__1=s2.h + s4.h) \
+        + (V % I.M)(piano__0=s4.h) \
+        + (IV % I.m)(piano__0=s0.w, violin__0=s2.w, violin__1=s4.w)
+    second = (II % V.M)(piano__0=s0.w) + (VI % V.M)(piano__0=s0.w, piano__1=s2.w) + (I % I.M)(piano__0=s0.h)
+    return [first, second]
+
+
+def write_corpus(directory, to_file):
+    os.makedirs(directory / 'nested', exist_ok=True)
+    paths = []
+    for idx, score in enumerate(corpus_scores()):
+        path = str(directory / 'nested' / f'score_{idx}')
+        paths.append(to_file(score, path))
+    return paths
+
+
+def to_pickle(score, path):
+    score.to_pickle(path + '.pkl')
+    return path + '.pkl'
+
+
+def test_corpus_index(tmp_path):
+    files = write_corpus(tmp_path / 'corpus', to_pickle)
+    index = CorpusIndex.build(files, str(tmp_path / 'index'))
+    assert len(index) == 6
+    assert index.rows['nb_instruments'].tolist() == [2, 1, 3, 1, 2, 1]
+    assert index.rows['tonality_degree'].tolist() == [0, 0, 0, 7, 7, 0]
+    assert [index.modes[code] for code in index.rows['tonality_mode']] == ['M', 'M', 'm', 'M', 'M', 'M']
+
+    scores = corpus_scores()
+    rows = index.select(duration=4, min_nb_instruments=2)
+    assert [index.chord(row) for row in rows] == [scores[0][0], scores[0][2], scores[1][1]]
+    assert index.select(duration=2).tolist() == [1, 5]
+    assert index.select(tonality_mode='m').tolist() == [2]
+    assert index.select(tonality_mode='dorian').tolist() == []
+
+    loaded = CorpusIndex.load(str(tmp_path / 'index' / INDEX_FILENAME), max_open_files=1)
+    assert (loaded.rows == index.rows).all()
+    assert [loaded.chord(row) for row in range(len(loaded))] == scores[0].chords + scores[1].chords
+
+
+@pytest.mark.parametrize('sampler_class, to_file', [
+    (PicklePatternSampler, to_pickle),
+    (TextPatternSampler, lambda score, path: score.to_text_file(path + '.txt') or path + '.txt'),
+    (BinaryPatternSampler, lambda score, path: score.to_binary(path + '.mlb') or path + '.mlb'),
+])
+def test_sample(tmp_path, sampler_class, to_file):
+    write_corpus(tmp_path / 'corpus', to_file)
+    sampler = sampler_class(str(tmp_path / 'corpus'), index_directory=str(tmp_path / 'index'), seed=0)
+    scores = corpus_scores()
+    expected = [PatternExtractor().extract(chord) for chord in [scores[0][0], scores[0][2], scores[1][1]]]
+    patterns = sampler.sample_batch(10)
+    assert len(patterns) == 10
+    assert all(pattern in expected for pattern in patterns)
+    assert sampler.sample() in expected
+
+    # The index is reused with the same files
+    reused = sampler_class(str(tmp_path / 'corpus'), index_directory=str(tmp_path / 'index'), seed=0)
+    assert reused.index.sources == sampler.index.sources
+    assert reused.sample_batch(10) == sampler_class(str(tmp_path / 'corpus'), seed=0).sample_batch(10)
+
+
+def test_sample_prefetch(tmp_path):
+    write_corpus(tmp_path / 'corpus', to_pickle)
+    sampler = PicklePatternSampler(str(tmp_path / 'corpus'), prefetch=4, seed=1)
+    expected = PicklePatternSampler(str(tmp_path / 'corpus'), seed=1).sample_batch(8)
+    assert sampler.sample_batch(8) == expected
+    sampler.close()
+    assert sampler._queue is None
+    with pytest.raises(Exception, match='closed sampler'):
+        sampler.sample_batch(1)
+
+
+def test_sample_no_chord(tmp_path):
+    write_corpus(tmp_path / 'corpus', to_pickle)
+    sampler = PicklePatternSampler(str(tmp_path / 'corpus'), bar_duration=3, prefetch=2)
+    with pytest.raises(Exception, match='No chord respecting criterias'):
+        sampler.sample()
+
+
+@pytest.mark.parametrize('sampler_class, to_file', [
+    (PicklePatternSampler, to_pickle),
+    (BinaryPatternSampler, lambda score, path: score.to_binary(path + '.mlb') or path + '.mlb'),
+])
+def test_index_rebuilt_when_files_change(tmp_path, sampler_class, to_file):
+    files = write_corpus(tmp_path / 'corpus', to_file)
+    index_directory = str(tmp_path / 'index')
+    sampler = sampler_class(str(tmp_path / 'corpus'), index_directory=index_directory, seed=0)
+    assert len(sampler.index) == 6
+    sampler.close()
+
+    # The first file gets shorter : the index must not point to its former chords
+    to_file((I % I.M)(piano__0=s0.w, piano__1=s4.w) + (V % I.M)(piano__0=s4.h), files[0][:-4])
+    sampler = sampler_class(str(tmp_path / 'corpus'), index_directory=index_directory, seed=0)
+    assert len(sampler.index) == 5
+    expected = PatternExtractor().extract((I % I.M)(piano__0=s0.w, piano__1=s4.w))
+    assert expected in sampler.sample_batch(20)
+    assert all(sampler.index.chord(row) is not None for row in range(len(sampler.index)))
+    sampler.close()
+
+    reused = sampler_class(str(tmp_path / 'corpus'), index_directory=index_directory)
+    assert (reused.index.rows == sampler.index.rows).all()
+    assert reused.index.is_up_to_date(files)
+    assert not reused.index.is_up_to_date(files[:1])
+
+
+def test_temporary_index_directory_removed(tmp_path):
+    write_corpus(tmp_path / 'corpus', to_pickle)
+    sampler = PicklePatternSampler(str(tmp_path / 'corpus'), prefetch=2)
+    directory = os.path.dirname(sampler.index.files[0])
+    assert os.path.exists(os.path.join(directory, INDEX_FILENAME))
+    sampler.sample()
+    sampler.close()
+    assert not os.path.exists(directory)
@@ -0,0 +1,30 @@
+from fractions import Fraction
+
+from musiclang.analyze.item import Item
+from musiclang.analyze.to_musiclang import _bucket_notes, infer_score_with_chords_durations
+from musiclang.library import *
+
+
+def item(start, end, pitch=60, track=1, voice=0, channel=0):
+    return Item('name', Fraction(start), Fraction(end), vel=80, pitch=pitch, track=track, channel=channel,
+                voice=voice)
+
+
+def test_bucket_notes_per_chord_and_track():
+    notes = [item(-1, 0), item(0, 1), item(1, 2, track=2), item(4, 5), item(3, 4), item(5, 6, track=2),
+             item(Fraction(15, 2), 8), item(8, 9)]
+    chords_notes = _bucket_notes(notes, [4, 4, 8])
+    # Zero length chord has no notes, the notes after the last chord or before 0 are dropped
+    assert chords_notes == [{1: [notes[1], notes[4]], 2: [notes[2]]}, {}, {1: [notes[3], notes[6]], 2: [notes[5]]}]
+    assert chords_notes[0][1][1] is notes[4]
+
+
+def test_infer_score_with_chords_durations():
+    chords = [(I % I.M).set_duration(4), (V % I.M).set_duration(4)]
+    bars = [(0, 4), (4, 8)]
+    sequence = [item(0, 2, 60), item(0, 4, 48, track=2, channel=1), item(2, 4, 64), item(2, 3, 55, voice=1),
+                item(4, 8, 67), item(5, 6, 59, track=2, channel=1)]
+    score = infer_score_with_chords_durations(sequence, chords, {0: 'piano', 1: 'violin'}, bars)
+    assert score.chords[0].score == {'piano__0': s0.h.f + s2.h.f, 'piano__1': r.h + s4.o(-1).f + r,
+                                     'violin__2': s0.w.o(-1).f}
+    assert score.chords[1].score == {'piano__0': s0.w.f, 'violin__2': r + s2.o(-1).f + r.h}
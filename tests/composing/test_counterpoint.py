@@ -1,4 +1,9 @@
-from musiclang.transform.composing import create_counterpoint, create_counterpoint_on_score
+import numpy as np
+import pytest
+
+from musiclang.transform.composing import counterpoint, create_counterpoint, create_counterpoint_on_score
+from musiclang.transform.composing.counterpoint import BEAM_DELTAS, counterpoint_score, get_counterpoint, \
+    get_counterpoint_beam
 from musiclang.library import *
 
 def test_create_counterpoint():
@@ -7,4 +12,32 @@ def test_create_counterpoint():
 
     melody2_corrected = create_counterpoint([melody1], [melody2])
 
-    assert melody2_corrected[0] != s0 + s1 + s2
\ No newline at end of file
+    assert melody2_corrected[0] != s0 + s1 + s2
+
+def random_voices(rng, nb_subjects, nb_notes):
+    subjects = [[None if rng.random() < 0.1 else int(rng.integers(-7, 21)) for _ in range(nb_notes)]
+                for _ in range(nb_subjects)]
+    to_fix = [None if rng.random() < 0.1 else int(rng.integers(-7, 21)) for _ in range(nb_notes)]
+    return subjects, to_fix
+
+
+def test_counterpoint_beam(monkeypatch):
+    rng = np.random.default_rng(0)
+    monkeypatch.setattr(counterpoint, 'get_delta_list', lambda: BEAM_DELTAS.tolist())
+    for nb_subjects in [1, 3, 5]:
+        subjects, to_fix = random_voices(rng, nb_subjects, 80)
+        greedy = get_counterpoint(subjects, to_fix)
+        # With one beam the search is the greedy search
+        assert get_counterpoint_beam(subjects, to_fix, beam_width=1) == greedy
+        beam = get_counterpoint_beam(subjects, to_fix, beam_width=16)
+        assert [n is None for n in beam] == [n is None for n in to_fix]
+        assert counterpoint_score(subjects, to_fix, beam) >= counterpoint_score(subjects, to_fix, greedy)
+
+
+def test_create_counterpoint_beam():
+    melody1 = s0 + s1 + s2
+    melody2 = s0 + s1 + s2
+    melody2_corrected = create_counterpoint([melody1], [melody2], method='beam', beam_width=4)
+    assert melody2_corrected[0] != s0 + s1 + s2
+    with pytest.raises(ValueError):
+        create_counterpoint([melody1], [melody2], method='unknown')
@@ -1,5 +1,8 @@
+import numpy as np
+
 from musiclang.library import *
 from musiclang.transform.composing import VoiceLeading
+from musiclang.transform.composing.voice_leading import DISSONNANCES
 
 
 
@@ -69,4 +72,63 @@ def test_voice_leading_silences_works():
     )
     new_score = vl.optimize(score)
 
-    assert new_score == (I % I.M)(cello__0=s4.o(-1), violin__0=r)+ (I % I.M)(cello__0=s5.o(-1),	violin__0=r)
\ No newline at end of file
+    assert new_score == (I % I.M)(cello__0=s4.o(-1), violin__0=r)+ (I % I.M)(cello__0=s5.o(-1),	violin__0=r)
+
+def reference_problems(vl, pitches):
+    # Pair by pair count of the rule violations
+    problems = np.zeros(pitches.shape)
+    nb_voices, nb_chords = pitches.shape
+    for v1 in range(nb_voices):
+        for v2 in range(v1):
+            for idxc in range(nb_chords):
+                rel_val = pitches[v1, idxc] - pitches[v2, idxc]
+                val = abs(rel_val) % 12
+                has_next = idxc + 1 < nb_chords and not vl.rest_mask[v1, idxc + 1] and not vl.rest_mask[v2, idxc + 1]
+                next_val = abs(pitches[v1, idxc + 1] - pitches[v2, idxc + 1]) % 12 if has_next else -1
+                parallel = (val == 7 and next_val == 7) + (val == 0 and next_val == 0) \
+                    + (val in DISSONNANCES and next_val in DISSONNANCES)
+                for voice in [v1, v2]:
+                    problems[voice, idxc] += parallel + 3 * (rel_val < 0) + 5 * (rel_val == 0)
+                    if parallel:
+                        problems[voice, idxc + 1] += parallel
+    return problems * vl.dvalsmask
+
+
+def test_voice_leading_problems():
+    score = (I % I.M)(cello=s0, viola=s4, violin=s0.o(1), flute=r) \
+            + (II % I.M)(cello=s0, viola=s4, violin=s0.o(1), flute=s2) \
+            + (V % I.M)(cello=s0, viola=s6.o(-1), violin=l, flute=s4) \
+            + (I % I.M)(cello=s0, viola=s0, violin=s1, flute=s0)
+    vl = VoiceLeading(fixed_voices=['flute__0'])
+    vl.init(score)
+    rng = np.random.default_rng(0)
+    dvals = rng.integers(-4, 5, (8, *vl.pitch.shape))
+    pitches = vl.get_pitch_solution(dvals)
+    assert np.array_equal(pitches[3], vl.get_pitch_solution(dvals[3]))
+    problems = vl.get_problems(pitches)
+    for idx in range(len(dvals)):
+        assert np.array_equal(problems[idx], reference_problems(vl, pitches[idx]))
+    assert np.array_equal(vl.get_problems(vl.get_pitch_solution(np.zeros(vl.pitch.shape, dtype=int))),
+                          reference_problems(vl, vl.get_pitch_solution(np.zeros(vl.pitch.shape, dtype=int))))
+
+
+def test_voice_leading_population():
+    score = (I % I.M)(cello=s0, viola=s4, violin=s0.o(1)) + (II % I.M)(cello=s0, viola=s4, violin=s0.o(1)) \
+            + (V % I.M)(cello=s0, viola=s6.o(-1), violin=s1) + (I % I.M)(cello=s0, viola=s0, violin=s1)
+    vl = VoiceLeading(fixed_voices=['cello__0'], seed=2, method='population', population_size=8, restarts=2,
+                      max_iter=20)
+    new_score = vl.optimize(score)
+    assert len(vl.population_history) == 2
+    for history in vl.population_history:
+        assert len(history['fitness']) == 21
+        assert np.all(np.diff(history['fitness']) <= 0)
+        assert history['evaluations'] == 161
+    assert min(history['best_fitness'] for history in vl.population_history) < vl.population_history[0]['fitness'][0]
+    assert all(chord.score['cello__0'] == s0 for chord in new_score.chords)
+
+    # Same restarts when they run in a pool of processes
+    vl_pool = VoiceLeading(fixed_voices=['cello__0'], seed=2, method='population', population_size=8, restarts=2,
+                           max_iter=20, n_jobs=2)
+    assert vl_pool.optimize(score) == new_score
+    assert [history['best_fitness'] for history in vl_pool.population_history] \
+        == [history['best_fitness'] for history in vl.population_history]
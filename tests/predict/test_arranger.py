@@ -0,0 +1,78 @@
+import itertools
+import os
+
+import joblib
+import numpy as np
+
+from musiclang.library import *
+from musiclang.predict.arranger import Arranger
+
+
+def make_arranger(directory, nb_states=4, seed=0):
+    rng = np.random.default_rng(seed)
+    states, priors, transitions, emissions = {}, {}, {}, {}
+    for mode in ['M', 'm']:
+        names = [f'{mode}{i}' for i in range(nb_states)]
+        prior = rng.random(nb_states)
+        transition = rng.random((nb_states, nb_states))
+        emission = 1.0 * (rng.random((nb_states, 12)) < 0.5)
+        states[mode] = names
+        priors[mode] = dict(zip(names, (prior / prior.sum()).tolist()))
+        transition = transition / transition.sum(axis=1)[:, None]
+        transitions[mode] = {to: {fr: transition[i, j] for i, fr in enumerate(names)} for j, to in enumerate(names)}
+        emissions[mode] = {pitch: {name: emission[i, pitch] for i, name in enumerate(names)} for pitch in range(12)}
+    for name, obj in [('states', states), ('priors', priors), ('transitions', transitions), ('emissions', emissions)]:
+        joblib.dump(obj, os.path.join(directory, name + '.pickle'))
+    return Arranger(directory)
+
+
+def brute_force(arranger, pitches, mode='M', eps=1e-5):
+    priors, transitions, emissions = arranger.get_model(mode, eps=eps)
+    best, best_prob = None, -1
+    for path in itertools.product(range(len(priors)), repeat=len(pitches)):
+        prob = priors[path[0]]
+        for t, state in enumerate(path):
+            if t > 0:
+                prob *= transitions[path[t - 1], state]
+            for pitch, strength in pitches[t]:
+                prob *= emissions[state, pitch] * strength
+        if prob > best_prob:
+            best, best_prob = path, prob
+    return [arranger.states[mode][idx] for idx in best]
+
+
+def test_arrange_is_most_probable_path(tmp_path):
+    arranger = make_arranger(tmp_path)
+    melody = [[(s0, 1)], [(s2, 1), (s3, 0)], [(s4, 1)], [(s1, 1)], [(s5, 0), (s0, 1)]]
+    pitches = arranger.get_pitches(melody, 'C')
+    assert arranger.arrange(melody, 'C') == brute_force(arranger, pitches)
+
+
+def test_arrange_with_candidates(tmp_path):
+    arranger = make_arranger(tmp_path)
+    melody = [[(s0, 1)], [(s2, 1)], [(s4, 1)]]
+    chords = arranger.arrange(melody, 'C', candidates=['M3', None, ['M1', 'M2']])
+    assert chords[0] == 'M3'
+    assert chords[2] in ['M1', 'M2']
+
+
+def test_arrange_batch(tmp_path):
+    arranger = make_arranger(tmp_path)
+    melodies = [[[(s0, 1)], [(s2, 1)]], [[(s4, 1)]] * 7, [[(s1, 1)], [(s3, 1)], [(s6, 0)]]]
+    tonalities = ['C', 'a', 'G']
+    expected = [arranger.arrange(melody, tonality) for melody, tonality in zip(melodies, tonalities)]
+    assert arranger.arrange_batch(melodies, tonalities) == expected
+
+
+def test_viterbi_long_sequence_does_not_underflow(tmp_path):
+    arranger = make_arranger(tmp_path)
+    pitches = [[(t % 12, 0.5)] for t in range(2000)]
+    model = arranger.get_model('M')
+    path, log_prob = arranger.viterbi(pitches, [None] * len(pitches), 'M', model)
+    # The product of the probabilities is 0 in floating point, the log probability is still exact
+    priors, transitions, emissions = model
+    states = [arranger.state_index['M'][state] for state in path]
+    expected = np.log(priors[states[0]]) + np.log(transitions[states[:-1], states[1:]]).sum() \
+        + sum(np.log(emissions[state, pitch] * strength) for state, ((pitch, strength),) in zip(states, pitches))
+    assert np.isfinite(log_prob)
+    assert np.isclose(log_prob, expected)
@@ -0,0 +1,71 @@
+import io
+
+import numpy as np
+
+from musiclang import Score
+from musiclang.write.out.midi_utils import matrix_to_mid
+from musiclang.write.out.midi_writer import *
+from musiclang.write.out.to_midi import get_notes, get_track_list, tracks_to_instruments
+
+
+def legacy_midi_bytes(score, **kwargs):
+    instruments, instrument_names = tracks_to_instruments(get_track_list(score))
+    output = io.BytesIO()
+    matrix_to_mid(get_notes(score), output_file=output, instruments=instruments,
+                  instrument_names=instrument_names, **kwargs)
+    return output.getvalue()
+
+
+def get_score():
+    from musiclang.library import I, II, V, s0, s1, s2, s4, su1, sd1, c1, b0, h2, r, l, bd, sn, hh
+    chord1 = (I % I.M)(piano__0=s0 + su1.add_tag('mordant').h + l + r.e + l.e,
+                       piano__1=s4.o(-1).w.pedal_on,
+                       violin__0=s2.o(1).h + sd1.set_tempo(90).h,
+                       drums_0__0=bd.e + hh.e + sn.e + hh.e + bd.h)
+    chord2 = (V['7'] % II.m)(piano__0=c1.e3 + c1.e3 + c1.e3 + b0.h + h2.add_tag('accent').q,
+                             violin__0=l + s1.o(1).h.pedal_off + s0.q)
+    chord3 = (II % I.M)(piano__1=s0.o(-1).w, cello__0=b0.o(-2).h + l.h)
+    return chord1 + chord2 + chord3
+
+
+def test_midi_bytes_identical_to_matrix_to_mid():
+    score = get_score()
+    assert score_to_midi_bytes(score) == legacy_midi_bytes(score)
+    assert score_to_midi_bytes(score, tempo=90, time_signature=(3, 4)) == \
+           legacy_midi_bytes(score, tempo=90, time_signature=(3, 4))
+    assert score_to_midi_bytes(score, one_track_per_instrument=False) == \
+           legacy_midi_bytes(score, one_track_per_instrument=False)
+
+
+def test_score_to_midi_writes_file(tmp_path):
+    score = get_score()
+    path = str(tmp_path / 'test.mid')
+    data = score.to_midi(path)
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    output = io.BytesIO()
+    score.to_midi(output)
+    assert output.getvalue() == data == legacy_midi_bytes(score)
+
+
+def test_note_matrix():
+    from musiclang.library import I, s0, s2, l, r
+    score = (I % I.M)(piano__0=s0.e3 + s2.e3 + l.e3 + r.h, violin__0=l + s0) + (I % I.M)(violin__0=s2.h)
+    matrix, resolution = score_to_note_matrix(score, get_track_list(score))
+    assert resolution == 3
+    assert matrix['offset'].tolist() == [0, 1, 2, 3, 0, 3, 9]
+    assert matrix['duration'].tolist() == [1, 1, 1, 6, 3, 3, 6]
+    # A continuation without a previous note is a silence
+    assert matrix['silence'].tolist() == [False, False, False, True, True, False, False]
+    assert matrix['continuation'].tolist() == [False, False, True, False, False, False, False]
+    merged = merge_continuations(matrix)
+    assert merged['pitch'].tolist() == [0, 4, 0, 4]
+    assert merged['duration'].tolist() == [1, 2, 3, 6]
+
+
+def test_group_tracks():
+    mapping, names, instruments = group_tracks(['piano', 'violin', 'piano', 'drums_0', 'drums_1'],
+                                               {0: 0, 1: 40, 2: 0, 3: 0, 4: 0})
+    assert mapping == {0: 0, 1: 1, 2: 0, 3: 2, 4: 2}
+    assert names == ['piano', 'violin', 'drums_0']
+    assert instruments == {0: 0, 1: 40, 2: 0}
@@ -56,4 +56,57 @@ def test_get_relative_scale_value_down():
     scale_pitches = [0, 2, 4, 5, 7, 9, 11]
     result = get_relative_scale_value(note, last_pitch, scale_pitches)
 
-    assert result == -3
\ No newline at end of file
+    assert result == -3
+
+def test_relative_scale_value_negative_octaves():
+    assert relative_scale_up_value(2, -25, [0, 4, 7]) == -20
+    assert relative_scale_down_value(2, -25, [0, 4, 7]) == -32
+    assert relative_scale_down_value(0, -25, [0, 4, 7]) == -29
+
+
+def test_pitch_cache_hits():
+    from musiclang.library import I, II, s0, s2, su1, c1
+    clear_pitch_cache()
+    chord = II % I.M
+    assert chord.to_pitch(s0) == 2
+    assert chord.to_pitch(c1) == 5
+    info = pitch_cache_info()
+    # Chord notes are resolved through the chord pitches, which also use the cache
+    assert info.misses >= 2
+    misses = info.misses
+    assert chord.copy().to_pitch(s0) == 2
+    assert chord.to_pitch(su1, last_pitch=2) == 4
+    assert chord.to_pitch(su1, last_pitch=4) == 5
+    assert chord.to_pitch(su1, last_pitch=2) == 4
+    info = pitch_cache_info()
+    assert info.misses == misses + 2
+    assert info.hits >= 2
+    # Another tonality or mode is another entry
+    assert (II % I.m).to_pitch(c1) == 5
+    assert (I % I.m).to_pitch(c1) == 3
+    assert (I % I.M).to_pitch(s0.m) == 0
+    assert (I % I.M).to_pitch(s2.m) == 3
+
+
+def test_pitch_cache_size():
+    from musiclang.library import I, s0, s1, s2
+    try:
+        set_pitch_cache_size(2)
+        clear_pitch_cache()
+        for note in [s0, s1, s2]:
+            (I % I.M).to_pitch(note)
+        assert pitch_cache_info().currsize == 2
+        set_pitch_cache_size(0)
+        assert (I % I.M).to_pitch(s2) == 4
+        assert pitch_cache_info().currsize == 0
+    finally:
+        set_pitch_cache_size(DEFAULT_PITCH_CACHE_SIZE)
+
+
+def test_pitch_cache_custom_chord():
+    from musiclang.library import I, s0, s2, c1
+    from musiclang import CustomChord
+    chord1 = CustomChord([s0, s2], tonality=I.M)
+    chord2 = CustomChord([s0, s2.o(1)], tonality=I.M)
+    assert chord1.to_pitch(c1) == 4
+    assert chord2.to_pitch(c1) == 16
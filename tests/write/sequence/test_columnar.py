@@ -0,0 +1,105 @@
+from fractions import Fraction as frac
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from musiclang import Score
+from musiclang.library import *
+from musiclang.write.sequence import ColumnarSequence, SEQUENCE_COLUMNS
+
+
+def get_score():
+    return (I % I.M)(piano__0=s0 + s2.e + s4.e, violin__0=s4.h.o(1)) + \
+           (V % I.m)(piano__0=s0.e3 + s1.e3 + l.e3 + r, drums_0__0=d1.h) + \
+           (IV % I.m).o(1)['7'](violin__0=h3 + r + l.h)
+
+
+def reference_sequence(score):
+    # Rows of the chords, with the columns derived row by row
+    rows = []
+    time = 0
+    for idx, chord in enumerate(score):
+        rows += [[time, idx] + row for row in chord.to_sequence()]
+        time += chord.duration
+    sequence = pd.DataFrame(rows, columns=['chord_time', 'chord_idx', 'chord_relative_start', 'chord_relative_end',
+                                           'pitch', 'chord', 'instrument', 'note'])
+    sequence['start'] = sequence['chord_time'] + sequence['chord_relative_start']
+    sequence['end'] = sequence['chord_time'] + sequence['chord_relative_end']
+    for column, attribute in [('chord_degree', lambda c: c.element), ('chord_extension', lambda c: c.extension),
+                              ('chord_octave', lambda c: c.octave), ('tonality_degree', lambda c: c.tonality.degree),
+                              ('tonality_mode', lambda c: c.tonality.mode),
+                              ('tonality_octave', lambda c: c.tonality.octave)]:
+        sequence[column] = sequence['chord'].apply(attribute)
+    for column, attribute in [('silence', 'is_silence'), ('continuation', 'is_continuation'), ('note_type', 'type'),
+                              ('note_val', 'val'), ('note_octave', 'octave'), ('note_amp', 'amp'),
+                              ('note_duration', 'duration')]:
+        sequence[column] = sequence['note'].apply(lambda note: getattr(note, attribute))
+    sequence['note_idx'] = np.arange(len(sequence))
+    return sequence[SEQUENCE_COLUMNS].sort_values(by='start', ascending=True)
+
+
+def test_to_sequence_matches_row_by_row_sequence():
+    score = get_score()
+    sequence = score.to_sequence()
+    expected = reference_sequence(score)
+    assert list(sequence.index) == list(expected.index)
+    assert (sequence.dtypes == expected.dtypes).all()
+    assert sequence.fillna(-1).equals(expected.fillna(-1))
+
+
+@pytest.mark.parametrize('score', [
+    (I % I.M)(piano__0=s0 + s2.h).to_score(),
+    (I % I.M)(piano__0=r.h, violin__0=r) + (V % I.M)(piano__0=r),
+    (I % I.M)(piano__0=s0.w) + (V % I.M)(piano__0=s4.w, violin__0=s0.h),
+    Score([]),
+])
+def test_to_sequence_dtypes(score):
+    # Integer times of a single chord, only silences (no pitch), one note per melody, empty score
+    sequence = score.to_sequence()
+    expected = reference_sequence(score)
+    assert (sequence.dtypes == expected.dtypes).all()
+    assert sequence.equals(expected)
+
+
+def test_from_sequence():
+    score = get_score()
+    assert Score.from_sequence(score.to_sequence()) == score
+    assert Score.from_sequence(score.to_sequence().sample(frac=1, random_state=0), sort_by_time=True) == score
+
+
+def test_columnar_sequence():
+    score = get_score()
+    sequence = score.to_columnar_sequence()
+    assert len(sequence) == 12
+    assert sequence.resolution == 6
+    assert sequence.instruments == ['piano__0', 'violin__0', 'drums_0__0']
+    assert sequence.chords == [(0, '', 0), (4, '', 0), (3, '7', 1)]
+    assert sequence.columns['chord_time'].tolist() == [0] * 4 + [12] * 5 + [24] * 3
+    assert sequence.columns['chord_relative_start'].tolist()[:4] == [0, 6, 9, 0]
+    assert Score.from_columnar_sequence(sequence) == score
+
+    corpus = ColumnarSequence.concat([sequence, (I % I.M)(piano__0=s0.augment(frac(1, 5))).to_score().to_columnar_sequence()])
+    assert corpus.nb_scores == 2 and corpus.resolution == 30
+    with pytest.raises(ValueError):
+        corpus.to_score()
+    first, second = corpus.split()
+    assert first.to_score() == score
+    assert second.to_score() == (I % I.M)(piano__0=s0.augment(frac(1, 5)))
+    assert first.to_frame().equals(score.to_sequence())
+    assert (first.to_frame().dtypes == reference_sequence(score).dtypes).all()
+    assert (second.to_frame().dtypes == reference_sequence(Score([(I % I.M)(piano__0=s0.augment(frac(1, 5)))])).dtypes).all()
+
+
+@pytest.mark.parametrize('name', ['corpus.parquet', 'corpus.arrow'])
+def test_write_and_read_columnar_sequence(tmp_path, name):
+    pytest.importorskip('pyarrow')
+    score = get_score()
+    corpus = ColumnarSequence.concat([score.to_columnar_sequence(), (V % I.M)(piano__0=s0.h).to_score().to_columnar_sequence()])
+    path = str(tmp_path / name)
+    corpus.write(path)
+    for memory_map in [True, False]:
+        first, second = ColumnarSequence.read(path, memory_map=memory_map).split()
+        assert first.to_score() == score
+        assert second.to_score() == (V % I.M)(piano__0=s0.h)
+        assert first.to_frame().equals(score.to_sequence())
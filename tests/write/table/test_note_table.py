@@ -0,0 +1,72 @@
+from fractions import Fraction as frac
+
+from musiclang.library import *
+from musiclang import Score
+from musiclang.write.table import NoteTable
+
+
+def get_score():
+    return (I % I.M)(piano__0=s0 + s2.e + s4.e.add_tag('accent'), violin__0=s4.h.M.f) + \
+           (V % I.M)(piano__0=s0.e3 + su1.e3 + l.e3 + r, drums_0__0=d1.h) + \
+           (IV % I.m)(violin__0=h3.set_tempo(90) + r + l.h)
+
+
+def test_to_table_columns():
+    table = get_score().to_table()
+    assert len(table) == 12
+    assert table.instruments == ['piano__0', 'violin__0', 'drums_0__0']
+    assert table.resolution == 6
+    assert table.notes['onset'].tolist()[:4] == [0, 6, 9, 0]
+    assert table.notes['pitch'].tolist()[:7] == [0, 4, 7, 7, 7, 9, -1]
+    assert table.chord_durations.tolist() == [12, 12, 24]
+
+
+def test_table_round_trip():
+    score = get_score()
+    new_score = Score.from_table(score.to_table())
+    assert new_score == score
+    assert str(new_score) == str(score)
+    assert new_score.chords[2].score['violin__0'].notes[0].tempo == 90
+
+
+def test_table_round_trip_empty_score():
+    assert Score.from_table(Score([]).to_table()) == Score([])
+
+
+def test_get_part():
+    score = get_score()
+    assert score['violin__0'] == (I % I.M)(violin__0=s4.h.M.f) + (V % I.M)(violin__0=r.h) + (IV % I.m)(violin__0=h3 + r + l.h)
+
+
+def test_get_parts_keep_order():
+    score = get_score()
+    assert score[['violin__0', 'piano__0']].chords[0].parts == ['violin__0', 'piano__0']
+
+
+def test_get_score_between():
+    score = get_score()
+    assert score.get_score_between(frac(1, 2), 5) == (I % I.M)(piano__0=l.e + s2.e + s4.e.add_tag('accent'), violin__0=l.qd) + \
+           (V % I.M)(piano__0=s0.e3 + su1.e3 + l.e3 + r, drums_0__0=d1.h) + \
+           (IV % I.m)(violin__0=h3)
+
+
+def test_get_between_resolution():
+    table = get_score().to_table().get_between(frac(1, 4), 1)
+    assert table.resolution == 12
+    assert table.duration == frac(3, 4)
+
+
+def test_get_between_end_finer_than_start():
+    # The ticks of start must be computed at the resolution required by end
+    score = (I % I.M)(piano__0=r.e + s4.e, piano__1=s0) + (V % I.M)(piano__0=s0.h)
+    table = score.to_table().get_between(frac(1, 2), frac(13, 4))
+    assert table.resolution == 4
+    assert table.chord_durations.tolist() == [2, 8]
+    assert table.notes['onset'].tolist() == [0, 0, 2]
+    assert Score.from_table(table) == (I % I.M)(piano__0=s4.e, piano__1=l.e) + (V % I.M)(piano__0=s0.h)
+
+
+def test_statistics():
+    score = get_score()
+    assert score.extract_densities() == {'piano__0': frac(5, 8), 'violin__0': frac(1, 4), 'drums_0__0': frac(1, 8)}
+    assert score.get_pitch_statistics()['piano__0'][:2] == (0, 9)
@@ -0,0 +1,76 @@
+import pickle
+from fractions import Fraction
+
+import pytest
+
+from musiclang import Score, Silence, Continuation
+from musiclang.write.binary_score import BinaryScore, MAGIC
+from musiclang.write.library import *
+
+
+def example_score():
+    score = (I % I.M)(piano__0=s0.h + s2.o(1).e.f + r.e, violin__1=s4.augment(frac(1, 3)).M.dim.p + l.q3) \
+        + (V['7'] % II.b.dorian.o(-1)).o(1)(piano__0=su1.o(-1).w.add_tags({'accent'}), drums__0=sn + bd.h + hh) \
+        + (II['64'] % IV.s.m)(piano__3=l.w, violin__0=bd2 + cu1.hd + x0.fff + C4.ppp)
+    score.chords[0].score['piano__0'].notes[0].pedal = True
+    score.chords[0].score['piano__0'].notes[1].tempo = 90
+    score.chords[1].tags = {'cadence'}
+    score.chords[1].score['piano__0'].nb_bars = 2
+    score.config['pickup'] = Fraction(1, 2)
+    return score
+
+
+def note_attributes(score):
+    return [(type(note), note.type, note.val, note.octave, note.duration, note.amp, type(note.amp), note.mode,
+             note.accident, note.tags, note.pedal, note.tempo)
+            for chord in score.chords for melody in chord.score.values() for note in melody.notes]
+
+
+@pytest.mark.parametrize('memory_map', [True, False])
+def test_binary_score_round_trip(tmp_path, memory_map):
+    score = example_score()
+    path = str(tmp_path / 'score.mlb')
+    score.to_binary(path)
+    binary = BinaryScore.open(path, memory_map=memory_map)
+    result = binary.to_score()
+    expected = pickle.loads(pickle.dumps(score))
+    assert result == expected
+    assert str(result) == str(expected)
+    assert note_attributes(result) == note_attributes(expected)
+    assert isinstance(result.chords[0].score['piano__0'].notes[2], Silence)
+    assert isinstance(result.chords[0].score['violin__1'].notes[1], Continuation)
+    assert result.chords[1].tags == {'cadence'}
+    assert result.chords[1].score['piano__0'].nb_bars == 2
+    assert result.config == score.config
+    assert Score.from_binary(path) == score
+
+
+def test_binary_score_random_access(tmp_path):
+    score = example_score()
+    path = str(tmp_path / 'score.mlb')
+    score.to_binary(path)
+    binary = BinaryScore.open(path)
+    assert len(binary) == 3
+    assert binary.duration == score.duration
+    assert binary[-1] == score.chords[2]
+    assert binary[1:] == score.chords[1:]
+    assert binary.chord_range(0, 3) == (0, 1)
+    assert binary.chord_range(2.5, Fraction(7, 2)) == (0, 2)
+    assert binary.chord_range(100, 200) == (3, 3)
+    assert binary.chords_between(5, 9) == Score(score.chords[1:])
+    with pytest.raises(IndexError):
+        binary[3]
+
+
+def test_binary_score_invalid_files(tmp_path):
+    path = str(tmp_path / 'score.mlb')
+    with open(path, 'wb') as f:
+        f.write(b'not a score file')
+    with pytest.raises(ValueError):
+        BinaryScore.open(path)
+    with open(path, 'wb') as f:
+        f.write(MAGIC + (1000).to_bytes(4, 'little') + (0).to_bytes(4, 'little'))
+    with pytest.raises(ValueError):
+        BinaryScore.open(path)
+    Score().to_binary(path)
+    assert len(BinaryScore.open(path).to_score().chords) == 0
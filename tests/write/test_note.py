@@ -74,3 +74,55 @@ def test_to_chord_note():
     chord = (I % I.M)['2[add6]']
     note = s5
     assert note.to_chord_note(chord) == c3
+
+
+def test_note_has_no_instance_dict():
+    assert not hasattr(s0, '__dict__')
+    assert not hasattr(r, '__dict__')
+    assert not hasattr(l, '__dict__')
+
+
+def test_note_properties_created_once():
+    note = s2.e.o(1)
+    assert note.properties is note.properties
+    assert note.scale_pitch == 9
+    assert note.copy().properties is not note.properties
+    assert note.copy().properties.note == note
+
+
+def test_notes_share_empty_tags():
+    n1 = ml.Note("s", 1, 0, 1)
+    n2 = s2.e.o(1)
+    assert n1.tags is n2.tags
+    assert len(n1.tags) == 0
+
+
+def test_add_tag_does_not_change_original():
+    note = s0.e
+    tagged = note.add_tag('accent')
+    assert tagged.tags == {'accent'}
+    assert note.tags == set()
+    assert tagged.remove_tag('accent').tags == set()
+    assert tagged.clear_tags().tags == set()
+
+
+def test_notes_share_durations():
+    assert s0.e.duration is s2.e.duration
+    assert (s0 + s1.e).duration == frac(3, 2)
+
+
+def test_note_pickle():
+    import pickle
+    for note in [s0.e.o(1).f.add_tag('accent'), r.h, l.e3, h3.M.dim.set_tempo(90)]:
+        new_note = pickle.loads(pickle.dumps(note))
+        assert new_note.to_code() == note.to_code()
+        assert new_note.__class__ == note.__class__
+        assert new_note.tempo == note.tempo
+
+
+def test_note_setstate_from_dict_layout():
+    note = ml.Note.__new__(ml.Note)
+    note.__setstate__({'type': 's', 'val': 2, 'octave': 1, 'duration': frac(1, 2), 'amp': 66,
+                       'accident': None, 'mode': None, 'properties': None, 'tags': set()})
+    assert note == s2.e.o(1)
+    assert note.pedal is None
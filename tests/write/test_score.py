@@ -1,3 +1,4 @@
+from fractions import Fraction
 from musiclang.write.library import *
 
 
@@ -68,6 +69,15 @@ def test_multi_instrument_1_2_quarters_score_between():
     expected_result =  I(piano__0=s1, violin__0=s1)
     assert subscore == expected_result
 
+def test_fractional_score_between():
+    score = (V['6'] % VI.M).o(-2)(piano__0=r.e + s4.e, piano__1=s5.e.o(1) + s4.e.o(1), piano__2=s0.o(1), piano__3=s3.e + s2.e) \
+        + (I % I.M)(piano__0=s0.h, piano__1=s2.h, piano__2=s4.h, piano__3=s0.h)
+    subscore = score.get_score_between(start=Fraction(1, 2), end=Fraction(13, 4))
+    expected_result = (V['6'] % VI.M).o(-2)(piano__0=s4.e, piano__1=s4.e.o(1), piano__2=l.e, piano__3=s2.e) \
+        + (I % I.M)(piano__0=s0.h, piano__1=s2.h, piano__2=s4.h, piano__3=s0.h)
+    assert subscore == expected_result
+    assert subscore.chords[0].duration == Fraction(1, 2)
+
 def test_octaver():
 
     score = I(piano__0=s0 + s1 + s2, violin__0=s0 + s1 + s4) + II(piano__0=s1 + s2)
@@ -160,4 +170,29 @@ def test_split_too_long_chords():
         piano__0=l,
         piano__1=l)
     )
-    assert splitted_score == expected_score
\ No newline at end of file
+    assert splitted_score == expected_score
+
+def test_score_builder():
+    from musiclang import ScoreBuilder
+    chords = [I(piano__0=s0), II(piano__0=s1), III(piano__0=s2)]
+    builder = ScoreBuilder()
+    builder += chords[0]
+    builder += chords[1] + chords[2]
+    assert builder.freeze() == chords[0] + chords[1] + chords[2]
+    assert builder.freeze().chords[0] is chords[0]
+
+
+def test_score_concat():
+    from musiclang import Score
+    score = (I(piano__0=s0) + II(piano__0=s1)).add_tag('a')
+    result = Score.concat([score, III(piano__0=s2), score.add_tag('b')])
+    assert result == score + III(piano__0=s2) + score
+    assert result.tags == {'a', 'b'}
+    assert len(Score.concat([])) == 0
+
+
+def test_score_mul_and_slice():
+    score = I(piano__0=s0) + II(piano__0=s1)
+    assert score * 2 == score + score
+    assert score[1:] == II(piano__0=s1)
+    assert score[1:].chords[0] is not score.chords[1]
@@ -0,0 +1,53 @@
+import io
+
+import pytest
+
+from musiclang import Score, Melody
+from musiclang.write.library import *
+from musiclang.write.text_parser import parse_text, iter_chords
+
+
+def example_score():
+    return (I % I.M)(piano__0=s0.h + s2.o(1).e.f + r.e, violin__1=s4.augment(frac(1, 3)).M.dim.p) \
+        + (V['7'] % II.b.dorian.o(-1)).o(1)(piano__0=su1.o(-1).w.add_tags({'accent'}), drums__0=sn + bd.h + hh) \
+        + (II['64'] % IV.s.m)(piano__3=l.w, violin__0=bd2 + cu1.hd + x0.fff + C4.ppp)
+
+
+def test_parse_text_round_trip():
+    score = example_score()
+    text = str(score)
+    parsed = parse_text(text)
+    assert isinstance(parsed, Score)
+    assert parsed == score
+    assert str(parsed) == text
+    assert parsed.chords[1].score['piano__0'].notes[0].tags == {'accent'}
+    assert Score.from_str(text) == score
+
+
+def test_parse_text_items():
+    assert parse_text('(I % I.M)(s0, s2)') == (I % I.M)(s0, s2)
+    assert parse_text('(I % I.M)(violin=[s0, s2.h])').score == {'violin__0': s0.to_melody(),
+                                                                 'violin__1': s2.h.to_melody()}
+    assert parse_text('(I % I.M)(drums=s0.o(-2))') == (I % I.M)(drums=bd)
+    assert str(parse_text('(I % I.M)(\n)')) == str((I % I.M)())
+    assert parse_text('s0.h') == s0.h
+    assert isinstance(parse_text('s0 + s2.o(1)'), Melody)
+
+
+@pytest.mark.parametrize('text', ['__import__("os").system("ls")', 's0.__class__', 's0.o(open("f"))',
+                                  '(I % I.M)(piano__0=s0 s2)', '(I % I.M)(piano__0=s0 + )', 's0.h)'])
+def test_parse_text_rejects_code(text):
+    with pytest.raises(ValueError):
+        parse_text(text)
+
+
+def test_iter_chords(tmp_path):
+    score = example_score()
+    text = str(score)
+    for chunk_size in [1, 7, len(text)]:
+        chords = list(iter_chords(io.StringIO(text), chunk_size=chunk_size))
+        assert Score(chords) == score
+    path = str(tmp_path / 'score.txt')
+    score.to_text_file(path)
+    assert list(Score.iter_file(path)) == score.chords
+    assert Score.from_file(path) == score